@@ -0,0 +1,285 @@
+"""
+Benchmark de punta a punta de Groove Hub contra un proveedor falso local.
+
+Corre conversaciones guionadas de varios turnos a distintos largos de
+historial (midiendo cada etapa del turno: seguridad, agente, LLM, métricas,
+conteo de tokens y log) y sesiones concurrentes con el servicio asíncrono
+(throughput y latencia). Reporta también el pico de memoria de cada escenario,
+medido en una segunda pasada (tracemalloc distorsiona los tiempos).
+El resultado es un JSON con métricas planas y, si se pasan umbrales, las
+violaciones; el código de salida es 1 si alguna se incumple.
+
+Uso:
+    uv run python benchmarks/bench_e2e.py --output bench.json
+    uv run python benchmarks/bench_e2e.py --latency-ms 300 --jitter-ms 100 --error-rate 0.05
+    uv run python benchmarks/bench_e2e.py --record cassettes/real.json   # graba con OPENAI_API_KEY
+    uv run python benchmarks/bench_e2e.py --cassette cassettes/real.json # reproduce
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from fake_provider import Cassette, FakeProvider
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import build_turn_metrics, run_turn_async
+from groovehub.guardrails.safety import SecurityFilter
+from groovehub.observability.metrics import MetricsTracker, percentile
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.llm import AsyncLLMService, LLMService
+from groovehub.services.providers import ProviderConfig
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+SCRIPT = [
+    "Hola, se me rompieron mis baquetas, soy baterista de heavy, ¿qué me recomiendas?",
+    "¿Y si toco más jazz que heavy? ¿Cambia el modelo?",
+    "¿Tienen stock de las 7A de arce?",
+    "¿Cuánto tarda un envío a Córdoba?",
+    "Mi guitarra tiene trasteo en el traste 12 después de cambiar el calibre de cuerdas.",
+    "¿Conviene calibrar la altura del puente o el alma primero?",
+    "Quiero empezar a tocar la batería, ¿qué me recomiendas barato para departamento?",
+    "¿Las baterías electrónicas de malla hacen menos ruido que las de goma?",
+]
+STAGES = ("safety_ms", "llm_ms", "agent_overhead_ms", "metrics_ms", "count_tokens_ms", "save_log_ms", "turn_ms")
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(max(values, default=0.0), 3),
+    }
+
+
+def flatten(prefix: str, data: dict, out: dict):
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flatten(name, value, out)
+        else:
+            out[name] = value
+
+
+def _config(provider: FakeProvider, model: str) -> list[ProviderConfig]:
+    return [ProviderConfig("bench", model, "sk-bench", provider.base_url)]
+
+
+def run_conversation(provider: FakeProvider, turns: int, log_dir: str, model: str, counter: TokenCounter) -> dict:
+    """
+    Conversación guionada de `turns` turnos por el camino síncrono del CLI,
+    midiendo cada etapa. El historial crece turno a turno.
+    """
+    llm = LLMService(providers=_config(provider, model))
+    llm.pool.backoff_base = 0.01
+    # Construir el cliente y abrir la conexión no es costo del turno
+    llm.warm_up(connect=True)
+    tracker = MetricsTracker(log_dir=log_dir, token_counter=counter)
+    agent = MusicAgent(llm=llm, token_counter=counter)
+
+    llm_ms = []
+    get_completion = llm.get_completion
+
+    def timed_completion(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return get_completion(*args, **kwargs)
+        finally:
+            llm_ms.append((time.perf_counter() - start) * 1000)
+
+    # Envolvemos solo esta instancia para separar el tiempo de red del propio
+    llm.get_completion = timed_completion
+
+    samples = {stage: [] for stage in STAGES}
+    errors = 0
+    for index in range(turns):
+        query = SCRIPT[index % len(SCRIPT)]
+        turn_start = time.perf_counter()
+        SecurityFilter.check_safety(query)
+        safety_end = time.perf_counter()
+        calls_before = len(llm_ms)
+        try:
+            response = agent.ask(query)
+        except Exception:
+            errors += 1
+            continue
+        ask_end = time.perf_counter()
+        metrics = build_turn_metrics(tracker, agent, int((ask_end - safety_end) * 1000))
+        metrics_end = time.perf_counter()
+        response_json = response.model_dump_json()
+        tracker.count_tokens(response_json)
+        count_end = time.perf_counter()
+        tracker.save_log(query, response_json, metrics)
+        end = time.perf_counter()
+
+        turn_llm_ms = sum(llm_ms[calls_before:])
+        samples["safety_ms"].append((safety_end - turn_start) * 1000)
+        samples["llm_ms"].append(turn_llm_ms)
+        samples["agent_overhead_ms"].append((ask_end - safety_end) * 1000 - turn_llm_ms)
+        samples["metrics_ms"].append((metrics_end - ask_end) * 1000)
+        samples["count_tokens_ms"].append((count_end - metrics_end) * 1000)
+        samples["save_log_ms"].append((end - count_end) * 1000)
+        samples["turn_ms"].append((end - turn_start) * 1000)
+
+    tracker.close()
+    result = {stage: summarize(values) for stage, values in samples.items()}
+    result["errors"] = errors
+    result["prompt_messages"] = len(agent.last_prompt)
+    return result
+
+
+async def run_concurrent(
+    provider: FakeProvider, sessions: int, turns: int, log_dir: str, model: str, counter: TokenCounter
+) -> dict:
+    """
+    `sessions` conversaciones simultáneas de `turns` turnos sobre un solo
+    servicio asíncrono compartido, como el modo batch o un servidor.
+    """
+    llm = AsyncLLMService(providers=_config(provider, model))
+    llm.pool.backoff_base = 0.01
+    llm.warm_up()
+    tracker = MetricsTracker(log_dir=log_dir, token_counter=counter)
+    latencies: list[float] = []
+    errors = 0
+
+    async def session(offset: int):
+        nonlocal errors
+        agent = MusicAgent(llm=llm, token_counter=counter)
+        for index in range(turns):
+            start = time.perf_counter()
+            try:
+                await run_turn_async(agent, tracker, SCRIPT[(offset + index) % len(SCRIPT)])
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    await llm.aclose()
+    tracker.close()
+    return {
+        "turns_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "turn_ms": summarize(latencies),
+        "errors": errors,
+    }
+
+
+def peak_memory_kib(run) -> float:
+    """Vuelve a ejecutar un escenario bajo tracemalloc y devuelve el pico de memoria asignada."""
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def check_thresholds(metrics: dict, thresholds: dict) -> list[dict]:
+    """
+    Compara las métricas con los umbrales `{"métrica": {"max": x, "min": y}}`.
+
+    Returns:
+        list[dict]: Una entrada por umbral incumplido (o métrica inexistente).
+    """
+    violations = []
+    for name, limits in thresholds.items():
+        value = metrics.get(name)
+        if value is None:
+            violations.append({"metric": name, "value": None, "reason": "métrica inexistente"})
+            continue
+        if "max" in limits and value > limits["max"]:
+            violations.append({"metric": name, "value": value, "reason": f"> max {limits['max']}"})
+        if "min" in limits and value < limits["min"]:
+            violations.append({"metric": name, "value": value, "reason": f"< min {limits['min']}"})
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia simulada del proveedor.")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Jitter uniforme (±) de la latencia.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503.")
+    parser.add_argument("--history", default="1,8,32", help="Largos de conversación (turnos), separados por coma.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Sesiones simultáneas, separadas por coma.")
+    parser.add_argument("--turns", type=int, default=4, help="Turnos por sesión en los escenarios concurrentes.")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Modelo que se anuncia al proveedor falso.")
+    parser.add_argument("--cassette", default=None, help="Reproduce respuestas grabadas de este archivo.")
+    parser.add_argument("--record", default=None, help="Graba respuestas reales (OPENAI_API_KEY) en este archivo.")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON de umbrales ('' para no evaluar).")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    cassette, upstream = None, None
+    if args.record:
+        cassette = Cassette(args.record)
+        upstream = (os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"), os.environ["OPENAI_API_KEY"])
+    elif args.cassette:
+        cassette = Cassette(args.cassette)
+
+    counter = TokenCounter()
+    results = {"stages": {}, "throughput": {}, "memory_kib": {}}
+    # Los avisos del runtime (p. ej. el tokenizer) van a stderr: stdout queda solo para el JSON
+    with contextlib.redirect_stdout(sys.stderr), tempfile.TemporaryDirectory() as log_dir, FakeProvider(
+        args.latency_ms, args.jitter_ms, args.error_rate, cassette=cassette, upstream=upstream
+    ) as provider:
+        scenarios = {}
+        for turns in (int(n) for n in args.history.split(",")):
+            scenarios[("stages", f"h{turns}")] = lambda turns=turns, name=f"h{turns}": run_conversation(
+                provider, turns, os.path.join(log_dir, name), args.model, counter
+            )
+        for sessions in (int(n) for n in args.concurrency.split(",")):
+            scenarios[("throughput", f"c{sessions}")] = lambda sessions=sessions, name=f"c{sessions}": asyncio.run(
+                run_concurrent(provider, sessions, args.turns, os.path.join(log_dir, name), args.model, counter)
+            )
+
+        # Un turno previo sin medir: importaciones, tokenizer y conexión no cuentan
+        run_conversation(provider, 1, os.path.join(log_dir, "warmup"), args.model, counter)
+        for (group, name), run in scenarios.items():
+            results[group][name] = run()
+        for (group, name), run in scenarios.items():
+            results["memory_kib"][f"{group}_{name}"] = peak_memory_kib(run)
+        server = {"requests": provider.requests, "errors": provider.errors}
+
+    metrics = {}
+    flatten("", results, metrics)
+    thresholds = {}
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+    violations = check_thresholds(metrics, thresholds)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "thresholds")},
+            "server": server,
+        },
+        "metrics": metrics,
+        "thresholds": thresholds,
+        "violations": violations,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Resultados en {args.output} ({len(violations)} umbrales incumplidos)", file=sys.stderr)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
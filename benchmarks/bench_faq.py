@@ -0,0 +1,146 @@
+"""
+Benchmark del banco de preguntas frecuentes (MinHash/LSH).
+
+Genera un log sintético de `--turns` primeros turnos: una parte son
+variantes de `--questions` preguntas frecuentes (con y sin acentos,
+mayúsculas, signos, saludos y algún error de tipeo) y el resto consultas
+únicas. Mide el minado, la cobertura frente a una caché exacta (mismo
+texto normalizado) y la latencia de `FaqIndex.lookup` en microsegundos,
+tanto para aciertos como para consultas que no están en el banco.
+
+Uso:
+    uv run python benchmarks/bench_faq.py
+    uv run python benchmarks/bench_faq.py --turns 50000 --questions 200
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from groovehub.agent.faq import mine_faq
+from groovehub.observability.metrics import percentile, query_preview
+
+SUBJECTS = ["envíos", "cuotas", "garantía", "devoluciones", "retiro en tienda", "factura", "stock", "talleres"]
+PLACES = ["Córdoba", "Rosario", "Mendoza", "Salta", "Neuquén", "Ushuaia", "La Plata", "Tucumán"]
+TEMPLATES = [
+    "¿Cómo funcionan los {s} para {p}?",
+    "¿Tienen {s} disponibles en {p}?",
+    "Quería consultar por {s} en {p}",
+    "¿Cuánto cuestan los {s} a {p}?",
+]
+GREETINGS = ["", "hola ", "Hola! ", "buenas, "]
+INTENTS = ["shipping_info", "sales_advisory", "technical_support"]
+# Vocabulario de las consultas únicas (la cola larga que nunca se repite)
+WORDS = (
+    "guitarra bajo batería platillo pedal amplificador cuerdas púa baquetas micrófono teclado "
+    "eléctrica acústica zurdo usado nuevo negro rojo sunburst barato profesional principiante "
+    "suena zumba traste cejuela puente afinar trasteo hum distorsión jazz metal rock cumbia"
+).split()
+
+
+def variant(question: str, rng: random.Random) -> str:
+    text = rng.choice(GREETINGS) + question
+    if rng.random() < 0.4:
+        text = text.replace("á", "a").replace("é", "e").replace("í", "i").replace("ó", "o").replace("ú", "u")
+    if rng.random() < 0.3:
+        text = text.lower()
+    if rng.random() < 0.3:
+        text = text.strip("¿?") + "??"
+    if rng.random() < 0.15 and len(text) > 10:
+        # Un error de tipeo: dos letras intercambiadas
+        i = rng.randrange(len(text) - 1)
+        text = text[:i] + text[i + 1] + text[i] + text[i + 2 :]
+    return text
+
+
+def synthetic_log(args, rng: random.Random) -> tuple[list, list]:
+    questions = []
+    while len(questions) < args.questions:
+        question = rng.choice(TEMPLATES).format(s=rng.choice(SUBJECTS), p=rng.choice(PLACES))
+        if question not in questions:
+            questions.append(question)
+    entries = []
+    for _ in range(args.turns):
+        if rng.random() < args.faq_share:
+            number = min(int(rng.paretovariate(1.2)) - 1, len(questions) - 1)
+            query = variant(questions[number], rng)
+            intent = INTENTS[number % len(INTENTS)]
+        else:
+            query = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 9)))
+            intent = rng.choice(INTENTS)
+        entries.append(
+            {
+                "query_preview": query_preview(query),
+                "metrics": {"cost_usd": 0.0009, "latency_ms": 900, "turn_index": 1},
+                "response_data": {
+                    "answer": f"Respuesta sobre {query}",
+                    "confidence_score": round(rng.uniform(0.8, 1.0), 2),
+                    "intent": intent,
+                    "recommended_actions": ["none"],
+                },
+            }
+        )
+    return questions, entries
+
+
+def lookup_us(index, queries: list) -> list:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.lookup(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20000, help="Turnos del log sintético.")
+    parser.add_argument("--questions", type=int, default=100, help="Preguntas frecuentes distintas.")
+    parser.add_argument("--faq-share", type=float, default=0.6, help="Fracción de turnos que son preguntas frecuentes.")
+    parser.add_argument("--lookups", type=int, default=5000, help="Búsquedas a medir por escenario.")
+    parser.add_argument("--seed", type=int, default=7, help="Semilla del generador.")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions, entries = synthetic_log(args, rng)
+
+    start = time.perf_counter()
+    index, report = mine_faq(entries)
+    mine_s = time.perf_counter() - start
+
+    hits = [variant(rng.choice(questions), rng) for _ in range(args.lookups)]
+    misses = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 9))) for _ in range(args.lookups)]
+    hit_us, miss_us = lookup_us(index, hits), lookup_us(index, misses)
+    hit_rate = sum(index.lookup(query) is not None for query in hits) / len(hits)
+
+    metrics = {
+        "mine_s": round(mine_s, 3),
+        "mine_turns_per_s": round(len(entries) / mine_s),
+        **report,
+        "fresh_variant_hit_rate": round(hit_rate, 3),
+        "lookup_us.hit.p50": round(percentile(hit_us, 50), 1),
+        "lookup_us.hit.p99": round(percentile(hit_us, 99), 1),
+        "lookup_us.miss.p50": round(percentile(miss_us, 50), 1),
+        "lookup_us.miss.p99": round(percentile(miss_us, 99), 1),
+    }
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de la selección dinámica de ejemplos few-shot contra el prompt estático.
+
+Para cada consulta etiquetada del banco semilla de intenciones arma el prompt
+de las dos formas (System Prompt con sus ejemplos fijos vs. System Prompt base
+más los `k` ejemplos más parecidos) y reporta tokens de prompt (también los que
+costaría pegar el banco entero en el System Prompt), latencia de la selección
+y la coincidencia de intención del ejemplo más cercano con la etiqueta. Con
+`--live` además envía ambos prompts al LLM configurado y mide
+cuánto coinciden la intención y las acciones clasificadas.
+
+Uso:
+    uv run python benchmarks/bench_fewshot.py
+    uv run python benchmarks/bench_fewshot.py --k 4 --max-tokens 500 --bank-scale 30
+    uv run python benchmarks/bench_fewshot.py --live --limit 20   # usa la API Key del .env
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from groovehub.agent.context import ContextWindow
+from groovehub.agent.fewshot import DEFAULT_K, DEFAULT_MAX_TOKENS, FewShotSelector, load_examples
+from groovehub.agent.intent import load_seed_examples
+from groovehub.agent.prompts.main_prompt import BASE_SYSTEM_PROMPT, FEW_SHOT_EXAMPLES, REMINDER_PROMPT, SYSTEM_PROMPT
+from groovehub.agent.repair import ADVISOR_SCHEMA, extract_json
+from groovehub.observability.metrics import percentile
+from groovehub.observability.tokens import TokenCounter
+
+REMINDER = {"role": "system", "content": REMINDER_PROMPT}
+
+
+def build_prompt(counter: TokenCounter, system_prompt: str, query: str, examples: dict | None) -> list:
+    """Prompt del primer turno de una conversación, como lo arma `MusicAgent`."""
+    history = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"<user_input>{query}</user_input>"},
+    ]
+    return ContextWindow(counter).build(history, REMINDER, examples)
+
+
+def classify(llm, messages: list) -> tuple[str | None, tuple]:
+    """Intención y acciones que devuelve el modelo para un prompt (None si no es JSON)."""
+    data = extract_json(llm.get_completion(messages, use_cache=False).content) or {}
+    return data.get("intent"), tuple(sorted(data.get("recommended_actions") or ()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Ejemplos por consulta.")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS, help="Tope de tokens de los ejemplos.")
+    parser.add_argument("--bank-scale", type=int, default=1, help="Replica el banco N veces (latencia con bancos grandes).")
+    parser.add_argument("--live", action="store_true", help="Compara las clasificaciones del LLM con ambos prompts.")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de consultas (0 = todas).")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        counter = TokenCounter()
+        counter.warm_up()
+    queries = load_seed_examples()
+    if args.limit:
+        queries = queries[: args.limit]
+    bank = load_examples() * args.bank_scale
+    selector = FewShotSelector(bank, counter=counter, k=args.k, max_tokens=args.max_tokens)
+    # La alternativa sin selección: todo el banco pegado en el System Prompt
+    full_bank_prompt = SYSTEM_PROMPT.replace(
+        FEW_SHOT_EXAMPLES, "EJEMPLOS (FEW-SHOT):\n\n" + "\n\n".join(e.render() for e in bank) + "\n\n"
+    )
+
+    static_tokens, dynamic_tokens, full_tokens, select_us, nearest_agree = [], [], [], [], 0
+    prompts = []
+    for query, label in queries:
+        start = time.perf_counter()
+        examples = selector.message(query)
+        select_us.append((time.perf_counter() - start) * 1e6)
+        static = build_prompt(counter, SYSTEM_PROMPT, query, None)
+        dynamic = build_prompt(counter, BASE_SYSTEM_PROMPT, query, examples)
+        static_tokens.append(counter.count_messages(static))
+        dynamic_tokens.append(counter.count_messages(dynamic))
+        full_tokens.append(counter.count_messages(build_prompt(counter, full_bank_prompt, query, None)))
+        nearest = selector.index.search(query, k=1)
+        nearest_agree += bool(nearest) and nearest[0][1].intent == label
+        prompts.append((label, static, dynamic))
+
+    n = len(queries)
+    metrics = {
+        "queries": n,
+        "bank_examples": len(bank),
+        "prompt_tokens.static_mean": round(sum(static_tokens) / n, 1),
+        "prompt_tokens.dynamic_mean": round(sum(dynamic_tokens) / n, 1),
+        "prompt_tokens.dynamic_max": max(dynamic_tokens),
+        "prompt_tokens.full_bank_mean": round(sum(full_tokens) / n, 1),
+        "prompt_tokens.saved_vs_static_pct": round(100 * (1 - sum(dynamic_tokens) / sum(static_tokens)), 1),
+        "prompt_tokens.saved_vs_full_bank_pct": round(100 * (1 - sum(dynamic_tokens) / sum(full_tokens)), 1),
+        "select_us.p50": round(percentile(select_us, 50), 1),
+        "select_us.p95": round(percentile(select_us, 95), 1),
+        "nearest_example_intent_agreement": round(nearest_agree / n, 3),
+    }
+
+    if args.live:
+        from groovehub.services.llm import LLMService
+
+        llm = LLMService(response_schema=ADVISOR_SCHEMA)
+        same_intent = same_actions = static_ok = dynamic_ok = 0
+        confusion = Counter()
+        for label, static, dynamic in prompts:
+            static_intent, static_actions = classify(llm, static)
+            dynamic_intent, dynamic_actions = classify(llm, dynamic)
+            same_intent += static_intent == dynamic_intent
+            same_actions += static_actions == dynamic_actions
+            static_ok += static_intent == label
+            dynamic_ok += dynamic_intent == label
+            if static_intent != dynamic_intent:
+                confusion[f"{static_intent}->{dynamic_intent}"] += 1
+        metrics.update(
+            {
+                "live.model": llm.model,
+                "live.intent_agreement": round(same_intent / n, 3),
+                "live.actions_agreement": round(same_actions / n, 3),
+                "live.static_label_accuracy": round(static_ok / n, 3),
+                "live.dynamic_label_accuracy": round(dynamic_ok / n, 3),
+                "live.disagreements": dict(confusion),
+            }
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark del guardrail de salida (fugas del System Prompt).
+
+Arma un conjunto de respuestas limpias (las del banco few-shot) y otro con
+fugas (cada respuesta limpia con un fragmento del prompt incrustado, en
+mayúsculas o sin acentos a veces) y mide, en microsegundos por respuesta:
+revisar `answer` y `reasoning` completos, revisar `answer` en streaming en
+fragmentos de `--chunk` caracteres, y la alternativa ingenua (buscar cada
+ventana de palabras como substring del prompt normalizado). Reporta también
+detección, falsos positivos y el costo de construir el índice.
+
+Uso:
+    uv run python benchmarks/bench_leakage.py
+    uv run python benchmarks/bench_leakage.py --repeat 200 --chunk 4
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import unicodedata
+from datetime import datetime, timezone
+
+from groovehub.agent.fewshot import load_examples
+from groovehub.agent.prompts.main_prompt import BASE_SYSTEM_PROMPT, REMINDER_PROMPT
+from groovehub.guardrails.leakage import DEFAULT_MIN_SHINGLES, DEFAULT_SHINGLE_WORDS, LeakGuard
+from groovehub.guardrails.matcher import normalize_text
+from groovehub.models import AdvisorResponse
+from groovehub.observability.metrics import percentile
+
+
+def strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def leak_fragments(rng: random.Random, count: int) -> list[str]:
+    """Fragmentos del prompt de al menos 12 palabras, con alguna ofuscación."""
+    lines = [line for line in (BASE_SYSTEM_PROMPT + "\n" + REMINDER_PROMPT).splitlines() if len(line.split()) >= 12]
+    fragments = []
+    for _ in range(count):
+        words = rng.choice(lines).split()
+        start = rng.randint(0, len(words) - 12)
+        fragment = " ".join(words[start : start + rng.randint(12, len(words) - start)])
+        fragment = rng.choice([fragment, fragment.upper(), strip_accents(fragment)])
+        fragments.append(fragment)
+    return fragments
+
+
+def naive_leaks(response: AdvisorResponse, prompt_norm: str, n: int) -> int:
+    """Alternativa sin índice: cada ventana de n palabras se busca en el prompt."""
+    hits = 0
+    for text in (response.answer, response.reasoning):
+        words = normalize_text(text).split()
+        for i in range(len(words) - n + 1):
+            hits += " ".join(words[i : i + n]) in prompt_norm
+    return hits
+
+
+def timed_us(fn, items: list, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def stream_answer(guard: LeakGuard, text: str, chunk: int) -> str:
+    stream = guard.stream()
+    parts = [stream.feed(text[i : i + chunk]) for i in range(0, len(text), chunk)]
+    parts.append(stream.finish())
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50, help="Pasadas sobre cada conjunto.")
+    parser.add_argument("--chunk", type=int, default=8, help="Caracteres por fragmento en streaming.")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    clean = [AdvisorResponse(**example.assistant) for example in load_examples()]
+    leaky = []
+    for response, fragment in zip(clean, leak_fragments(rng, len(clean))):
+        words = response.answer.split()
+        cut = rng.randint(0, len(words))
+        answer = " ".join(words[:cut] + [fragment] + words[cut:])
+        leaky.append(response.model_copy(update={"answer": answer}))
+
+    start = time.perf_counter()
+    guard = LeakGuard()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    detected = sum(guard.check(r)[1] is not None for r in leaky)
+    false_positives = sum(guard.check(r)[1] is not None for r in clean)
+    streamed_ok = all(stream_answer(guard, r.answer, args.chunk) == guard.redact(r.answer)[0] for r in leaky)
+
+    check_clean = timed_us(guard.check, clean, args.repeat)
+    check_leaky = timed_us(guard.check, leaky, args.repeat)
+    stream_us = timed_us(lambda r: stream_answer(guard, r.answer, args.chunk), clean, args.repeat)
+    prompt_norm = normalize_text(BASE_SYSTEM_PROMPT + "\n" + REMINDER_PROMPT)
+    naive = timed_us(lambda r: naive_leaks(r, prompt_norm, DEFAULT_SHINGLE_WORDS), clean, args.repeat)
+
+    words = [len((r.answer + " " + r.reasoning).split()) for r in clean]
+    metrics = {
+        "responses": len(clean),
+        "words_per_response.mean": round(sum(words) / len(words), 1),
+        "index.shingles": len(guard),
+        "index.build_ms": round(build_ms, 2),
+        "detection_rate": round(detected / len(leaky), 3),
+        "false_positive_rate": round(false_positives / len(clean), 3),
+        "stream_matches_batch": streamed_ok,
+        "check_us.clean.p50": round(percentile(check_clean, 50), 1),
+        "check_us.clean.p99": round(percentile(check_clean, 99), 1),
+        "check_us.leaky.p50": round(percentile(check_leaky, 50), 1),
+        "check_us.leaky.p99": round(percentile(check_leaky, 99), 1),
+        "stream_answer_us.p50": round(percentile(stream_us, 50), 1),
+        "naive_substring_us.p50": round(percentile(naive, 50), 1),
+    }
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {
+                **{k: v for k, v in vars(args).items() if k != "output"},
+                "shingle_words": DEFAULT_SHINGLE_WORDS,
+                "min_shingles": DEFAULT_MIN_SHINGLES,
+            },
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Microbenchmark de SecurityFilter: bucle `bad_word in texto` vs. autómata Aho-Corasick.
+
+Genera una lista negra sintética de N frases y mide el costo por chequeo de
+ambas estrategias sobre entradas típicas del chat (sin coincidencias, que es
+el peor caso del bucle).
+
+Uso:
+    uv run python benchmarks/bench_safety.py --rules 5000 --inputs 200
+"""
+import argparse
+import random
+import string
+import time
+
+from groovehub.guardrails.matcher import AhoCorasick, normalize_text
+
+QUERIES = [
+    "Hola, se me rompieron mis baquetas, soy baterista de heavy, ¿qué me recomiendas?",
+    "¿Cuánto tarda un envío a Córdoba? Necesito las cuerdas antes del sábado.",
+    "Mi guitarra tiene trasteo en el traste 12 después de cambiar el calibre de cuerdas.",
+    "Quiero empezar a tocar la batería, ¿qué me recomiendas barato para departamento?",
+]
+
+
+def synthetic_rules(count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(count)]
+    return [f"{w} {rng.choice(words)}" if rng.random() < 0.5 else w for w in words]
+
+
+def bench(label: str, check, inputs: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in inputs:
+            check(text)
+    elapsed = time.perf_counter() - start
+    per_check_us = elapsed / (repeat * len(inputs)) * 1e6
+    print(f"{label:<28} {per_check_us:10.1f} µs/chequeo")
+    return per_check_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--inputs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rules = synthetic_rules(args.rules)
+    inputs = [QUERIES[i % len(QUERIES)] for i in range(args.inputs)]
+
+    start = time.perf_counter()
+    automaton = AhoCorasick([normalize_text(r) for r in rules])
+    print(f"Compilación del autómata ({len(rules)} reglas): {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    def loop_check(text):
+        lowered = text.lower()
+        return [r for r in rules if r in lowered]
+
+    def automaton_check(text):
+        return automaton.find_all(normalize_text(text))
+
+    loop_us = bench("Bucle (baseline)", loop_check, inputs, args.repeat)
+    ac_us = bench("Aho-Corasick + normalización", automaton_check, inputs, args.repeat)
+    print(f"\nAceleración: x{loop_us / ac_us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
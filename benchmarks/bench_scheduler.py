@@ -0,0 +1,132 @@
+"""
+Benchmark del planificador de llamadas al LLM bajo una cuota saturada.
+
+Levanta el proveedor falso con un límite de `--rpm` peticiones por minuto
+(la cuota arranca gastada: sobrecarga sostenida) y lanza `--clients`
+clientes concurrentes que hacen `--calls` llamadas cada uno con
+`AsyncLLMService`, en tres escenarios: sin planificador (los 429 vuelven
+del proveedor y todos reintentan a la vez), con planificador, y con
+planificador y una mezcla de clientes interactivos y batch. Reporta
+completadas, fallidas, rechazos tempranos, 429 recibidos, reintentos,
+throughput y latencia por prioridad.
+
+Uso:
+    uv run python benchmarks/bench_scheduler.py
+    uv run python benchmarks/bench_scheduler.py --rpm 1200 --clients 64 --calls 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+from fake_provider import FakeProvider
+
+from groovehub.agent.prompts.main_prompt import SYSTEM_PROMPT
+from groovehub.observability.metrics import percentile
+from groovehub.observability.tokens import ApproxEncoder, TokenCounter
+from groovehub.services.llm import AsyncLLMService
+from groovehub.services.providers import ProviderConfig
+from groovehub.services.scheduler import BATCH, INTERACTIVE, RateLimitedError, RateScheduler
+
+MESSAGES = [
+    {"role": "system", "content": SYSTEM_PROMPT},
+    {"role": "user", "content": "<user_input>¿Qué baquetas me recomiendas para heavy?</user_input>"},
+]
+# El planificador se configura un poco por debajo del límite real del proveedor
+HEADROOM = 0.95
+
+
+async def run_scenario(args, scheduled: bool, interactive_share: float) -> dict:
+    with FakeProvider(latency_ms=args.latency_ms, rpm=args.rpm) as provider:
+        scheduler = None
+        if scheduled:
+            scheduler = RateScheduler(TokenCounter(encoder=ApproxEncoder()))
+        llm = AsyncLLMService(
+            providers=[ProviderConfig("Fake", "gpt-4o-mini", "sk-bench", provider.base_url, rpm=int(args.rpm * HEADROOM))],
+            scheduler=scheduler,
+        )
+        if scheduler is not None:
+            # Misma situación que el proveedor: la cuota del minuto ya se gastó
+            scheduler._limiters["Fake"].requests.level = 0
+
+        latencies = {INTERACTIVE: [], BATCH: []}
+        counts = {"completed": 0, "failed": 0, "rejected": 0}
+        interactive_clients = round(args.clients * interactive_share)
+
+        async def client(index: int):
+            priority = INTERACTIVE if index < interactive_clients else BATCH
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                try:
+                    await llm.get_completion(MESSAGES, use_cache=False, priority=priority)
+                except RateLimitedError:
+                    counts["rejected"] += 1
+                    continue
+                except Exception:
+                    counts["failed"] += 1
+                    continue
+                counts["completed"] += 1
+                latencies[priority].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        # Los reintentos del pool imprimen cada error: se descartan para no ensuciar el reporte
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(client(i) for i in range(args.clients)))
+        elapsed = time.perf_counter() - start
+        await llm.aclose()
+
+    result = {
+        **counts,
+        "provider_429": provider.rate_limited,
+        "pool_retries": llm.pool.retries,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(counts["completed"] / elapsed, 1),
+    }
+    for priority, values in latencies.items():
+        if values:
+            result[f"latency_ms.{priority}.p50"] = round(percentile(values, 50), 1)
+            result[f"latency_ms.{priority}.p95"] = round(percentile(values, 95), 1)
+    if scheduler is not None:
+        stats = scheduler.stats()["Fake"]
+        result["queue_wait_ms.p95"] = {p: round(v["p95"], 1) for p, v in stats["wait_ms"].items()}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rpm", type=int, default=1800, help="Límite del proveedor falso (peticiones por minuto).")
+    parser.add_argument("--clients", type=int, default=32, help="Clientes concurrentes.")
+    parser.add_argument("--calls", type=int, default=6, help="Llamadas por cliente.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia del proveedor falso.")
+    parser.add_argument("--interactive-share", type=float, default=0.25, help="Fracción de clientes interactivos en el escenario mixto.")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    metrics = {
+        "unscheduled": asyncio.run(run_scenario(args, scheduled=False, interactive_share=1.0)),
+        "scheduled": asyncio.run(run_scenario(args, scheduled=True, interactive_share=1.0)),
+        "scheduled_mixed": asyncio.run(run_scenario(args, scheduled=True, interactive_share=args.interactive_share)),
+    }
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark de `groove stats`: JSONL en streaming vs. formato columnar compactado.
+
+Genera un log sintético de `--turns` turnos (repartidos en `--days` días,
+con varias intenciones, acciones y proveedores) en un directorio temporal y
+mide: recorrer el JSONL en streaming, compactarlo, consultar la versión
+columnar completa, con filtro de una semana y con filtro de intención, y
+compactar de nuevo tras agregar una cola chica (compactación incremental).
+Reporta también el tamaño en disco de cada formato y verifica que ambos
+caminos den el mismo reporte.
+
+Uso:
+    uv run python benchmarks/bench_stats.py
+    uv run python benchmarks/bench_stats.py --turns 2000000 --days 365
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from groovehub.observability.analytics import COLUMNAR_DIR, compact, compute_stats
+from groovehub.observability.log_store import encode_entry, segment_paths
+
+INTENTS = ["sales_advisory", "technical_support", "order_status", "off_topic", "greeting"]
+ACTIONS = ["show_catalog", "check_stock", "schedule_repair", "track_order", "none"]
+PROVIDERS = [("OpenAI", "gpt-3.5-turbo"), ("Groq", "llama-3.3-70b-versatile")]
+SEGMENT_ROWS = 20_000
+
+
+def write_log(log_dir: str, turns: int, days: int, start: datetime, seed: int, first_segment: int = 0) -> int:
+    """Escribe `turns` registros con la forma de `save_log`, en segmentos JSONL."""
+    rng = random.Random(seed)
+    step = days * 86400 / max(turns, 1)
+    segment = first_segment
+    f = None
+    for i in range(turns):
+        if i % SEGMENT_ROWS == 0:
+            if f is not None:
+                f.close()
+            f = open(os.path.join(log_dir, f"interactions-{segment:05d}.jsonl"), "w", encoding="utf-8")
+            segment += 1
+        provider, model = PROVIDERS[rng.random() < 0.3]
+        cached = rng.random() < 0.1
+        input_tokens, output_tokens = rng.randint(300, 2500), rng.randint(60, 400)
+        entry = {
+            "timestamp": (start + timedelta(seconds=i * step)).isoformat(),
+            "query_preview": "¿Tienen baquetas 5B de nogal americano para heavy...",
+            "metrics": {
+                "latency_ms": int(rng.lognormvariate(6.8, 0.5)),
+                "cost_usd": 0.0 if cached else round((input_tokens * 0.0015 + output_tokens * 0.002) / 1000, 6),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "model": model,
+                "provider": None if cached else provider,
+                "token_source": "cache" if cached else "provider",
+                "cache_hit": cached,
+            },
+        }
+        response = {
+            "answer": "Para heavy te recomiendo unas 5B de nogal: aguantan golpes fuertes.",
+            "confidence_score": round(rng.betavariate(8, 2), 2),
+            "intent": rng.choice(INTENTS),
+            "recommended_actions": rng.sample(ACTIONS, rng.randint(1, 2)),
+            "reasoning": "El usuario toca heavy y rompe baquetas: conviene una más gruesa.",
+        }
+        f.write(encode_entry(entry, json.dumps(response, ensure_ascii=False)))
+    if f is not None:
+        f.close()
+    return segment
+
+
+def timed(fn) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return round(time.perf_counter() - start, 3), result
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=500_000, help="Turnos del log sintético.")
+    parser.add_argument("--days", type=int, default=90, help="Días que abarca el log.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 1)
+    week = (start + timedelta(days=args.days // 2), start + timedelta(days=args.days // 2 + 7))
+    with tempfile.TemporaryDirectory() as log_dir:
+        generate_s, next_segment = timed(lambda: write_log(log_dir, args.turns, args.days, start, args.seed))
+        jsonl_bytes = sum(os.path.getsize(path) for path in segment_paths(log_dir))
+
+        stream_s, streamed = timed(lambda: compute_stats(log_dir))
+        compact_s, compacted = timed(lambda: compact(log_dir))
+        full_s, full = timed(lambda: compute_stats(log_dir))
+        week_s, weekly = timed(lambda: compute_stats(log_dir, since=week[0], until=week[1]))
+        intent_s, by_intent = timed(lambda: compute_stats(log_dir, intents=["technical_support"]))
+
+        # Cola nueva después de la compactación: se lee del JSONL y luego se compacta sola
+        tail = max(1, args.turns // 100)
+        write_log(log_dir, tail, 1, start + timedelta(days=args.days), args.seed + 1, first_segment=next_segment)
+        mixed_s, mixed = timed(lambda: compute_stats(log_dir))
+        incremental_s, incremental = timed(lambda: compact(log_dir))
+
+        strip = lambda report: {k: v for k, v in report.items() if k != "sources"}  # noqa: E731
+        metrics = {
+            "turns": args.turns,
+            "generate_s": generate_s,
+            "jsonl_mb": round(jsonl_bytes / 2**20, 1),
+            "columnar_mb": round(dir_size(os.path.join(log_dir, COLUMNAR_DIR)) / 2**20, 1),
+            "columnar_parts": compacted["parts_written"],
+            "stream_jsonl_s": stream_s,
+            "compact_s": compact_s,
+            "columnar_full_s": full_s,
+            "columnar_week_s": week_s,
+            "columnar_week_parts_skipped": weekly["sources"]["parts_skipped"],
+            "columnar_intent_s": intent_s,
+            "mixed_tail_s": mixed_s,
+            "incremental_compact_s": incremental_s,
+            "incremental_new_rows": incremental["new_rows"],
+            "speedup_full": round(stream_s / full_s, 1) if full_s else None,
+            "reports_match": strip(streamed) == strip(full),
+            "tail_included": mixed["turns"] == args.turns + tail,
+            "week_turns": weekly["turns"],
+            "intent_turns": by_intent["turns"],
+            "latency_p99_ms": full["latency_ms"]["p99"],
+        }
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Proveedor falso compatible con la API de chat completions, para benchmarks.
+
+Simula latencia con jitter, una tasa de errores transitorios, un límite de
+peticiones por minuto (429 al superarlo) y responde con contenido fijo o con
+respuestas grabadas (cassettes). En modo grabación
+reenvía cada petición a un proveedor real y guarda la respuesta, para luego
+reproducir corridas con contenido realista sin red ni costo.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_CONTENT = json.dumps(
+    {
+        "answer": "Para heavy te recomiendo baquetas 5B de nogal: más masa y durabilidad.",
+        "confidence_score": 0.9,
+        "intent": "sales_advisory",
+        "recommended_actions": ["check_stock", "show_catalog"],
+        "reasoning": "El cliente es baterista de heavy y necesita reponer baquetas.",
+    },
+    ensure_ascii=False,
+)
+CANNED_USAGE = {"prompt_tokens": 250, "completion_tokens": 60, "total_tokens": 310}
+
+
+def request_key(body: dict) -> str:
+    """Clave de una petición en el cassette: los mensajes (sin el modelo ni los parámetros)."""
+    payload = json.dumps(
+        [[m["role"], m.get("content") or ""] for m in body.get("messages", [])],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Respuestas grabadas, indexadas por `request_key`, en un archivo JSON.
+
+    En reproducción, una petición que no está en el cassette recibe la
+    respuesta grabada más parecida por posición (ronda circular), así un
+    guion con historiales más largos que los grabados sigue funcionando.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self._order = list(self.entries)
+
+    def lookup(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None and self._order:
+                self.misses += 1
+                entry = self.entries[self._order[self.misses % len(self._order)]]
+            return entry
+
+    def record(self, key: str, content: str, usage: dict | None):
+        with self._lock:
+            self.entries[key] = {"content": content, "usage": usage}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # El backlog por defecto (5) rechaza conexiones con decenas de sesiones simultáneas
+    request_queue_size = 256
+
+
+class FakeProvider:
+    """
+    Servidor HTTP local que habla `POST /v1/chat/completions` (normal y SSE).
+
+    Uso como context manager; `base_url` se pasa a `ProviderConfig`.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        content: str = CANNED_CONTENT,
+        cassette: Cassette | None = None,
+        upstream: tuple[str, str] | None = None,
+        seed: int = 7,
+        rpm: int | None = None,
+    ):
+        """
+        Args:
+            latency_ms (float): Latencia base de cada respuesta.
+            jitter_ms (float): Desvío uniforme (±) sobre la latencia base.
+            error_rate (float): Fracción de peticiones que responden 503.
+            content (str): Respuesta fija cuando no hay cassette.
+            cassette (Cassette | None): Respuestas grabadas a reproducir (o donde grabar).
+            upstream (tuple[str, str] | None): (base_url, api_key) de un proveedor real;
+                                               activa el modo grabación.
+            seed (int): Semilla del jitter y de los errores (corridas reproducibles).
+            rpm (int | None): Peticiones por minuto antes de responder 429. La cuota
+                              arranca gastada, como en una sobrecarga sostenida.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.content = content
+        self.cassette = cassette
+        self.upstream = upstream
+        self.requests = 0
+        self.errors = 0
+        self.rpm = rpm
+        self.rate_limited = 0
+        self._allowance = 0.0
+        self._refilled = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        if self.upstream is not None and self.cassette is not None:
+            self.cassette.save()
+
+    def _plan(self) -> tuple[float, bool]:
+        """Sortea la demora y si la petición falla (bajo lock: el RNG no es thread-safe)."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+            failing = self._rng.random() < self.error_rate
+            if failing:
+                self.errors += 1
+        return delay / 1000, failing
+
+    def _over_quota(self) -> bool:
+        if self.rpm is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rpm, self._allowance + (now - self._refilled) * self.rpm / 60)
+            self._refilled = now
+            if self._allowance < 1:
+                self.rate_limited += 1
+                return True
+            self._allowance -= 1
+            return False
+
+    def _respond(self, body: dict) -> tuple[str, dict | None]:
+        if self.upstream is not None:
+            content, usage = self._forward(body)
+            if self.cassette is not None:
+                self.cassette.record(request_key(body), content, usage)
+            return content, usage
+        if self.cassette is not None:
+            entry = self.cassette.lookup(request_key(body))
+            if entry is not None:
+                return entry["content"], entry["usage"] or CANNED_USAGE
+        return self.content, CANNED_USAGE
+
+    def _forward(self, body: dict) -> tuple[str, dict | None]:
+        base_url, api_key = self.upstream
+        payload = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+        request = urllib.request.Request(
+            f"{base_url.rstrip('/')}/chat/completions",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            data = json.loads(response.read())
+        return data["choices"][0]["message"]["content"], data.get("usage")
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Encabezados y cuerpo en un solo envío: con dos escrituras, Nagle y
+            # el ACK diferido del cliente suman ~40 ms por respuesta
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._send(200, "application/json", json.dumps({"object": "list", "data": []}))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake._over_quota():
+                    self._send(429, "application/json", json.dumps({"error": {"message": "rate limit"}}))
+                    return
+                delay, failing = fake._plan()
+                time.sleep(delay)
+                if failing:
+                    self._send(503, "application/json", json.dumps({"error": {"message": "falla simulada"}}))
+                    return
+                content, usage = fake._respond(body)
+                if body.get("stream"):
+                    self._send(200, "text/event-stream", _sse(body["model"], content, usage))
+                else:
+                    self._send(200, "application/json", json.dumps(_completion(body["model"], content, usage)))
+
+            def _send(self, status: int, content_type: str, payload: str):
+                data = payload.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _completion(model: str, content: str, usage: dict | None) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+def _sse(model: str, content: str, usage: dict | None, step: int = 16) -> str:
+    def event(choices, usage=None):
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": choices}
+        if usage:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    events = [
+        event([{"index": 0, "delta": {"content": content[i : i + step]}, "finish_reason": None}])
+        for i in range(0, len(content), step)
+    ]
+    events.append(event([], usage))
+    return "".join(events) + "data: [DONE]\n\n"
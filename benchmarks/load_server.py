@@ -0,0 +1,200 @@
+"""
+Prueba de carga del servidor HTTP/WebSocket (`groove serve`) contra un proveedor falso local.
+
+Levanta en el mismo proceso el proveedor falso y un `GrooveServer` en un
+puerto libre, y conecta `--clients` clientes virtuales simultáneos por
+WebSocket (o HTTP con keep-alive). Cada cliente abre una sesión nueva, hace
+`--turns` turnos y se desconecta, hasta completar `--sessions` sesiones.
+Reporta sesiones y turnos por segundo, latencia de turno (p50/p99), tiempo al
+primer fragmento por WebSocket, errores y el estado final del pool de sesiones
+(incluidos los desalojos si se achica `--max-memory-mb` o `--max-sessions`).
+
+Uso:
+    uv run python benchmarks/load_server.py
+    uv run python benchmarks/load_server.py --clients 500 --sessions 5000 --turns 3 --latency-ms 200
+    uv run python benchmarks/load_server.py --transport http --max-sessions 100
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from fake_provider import FakeProvider
+
+from groovehub.observability.metrics import MetricsTracker, percentile
+from groovehub.observability.tokens import TokenCounter
+from groovehub.server.app import GrooveServer
+from groovehub.server.pool import DEFAULT_MAX_SESSIONS, SessionPool
+from groovehub.server.websocket import connect
+from groovehub.services.llm import AsyncLLMService
+from groovehub.services.providers import ProviderConfig
+
+SCRIPT = [
+    "Hola, se me rompieron mis baquetas, soy baterista de heavy, ¿qué me recomiendas?",
+    "¿Tienen stock de las 7A de arce?",
+    "¿Cuánto tarda un envío a Córdoba?",
+    "Mi guitarra tiene trasteo en el traste 12 después de cambiar el calibre de cuerdas.",
+    "¿Las baterías electrónicas de malla hacen menos ruido que las de goma?",
+]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values, default=0.0), 2),
+    }
+
+
+async def ws_session(port: int, session_id: str, turns: int, offset: int, samples: dict):
+    ws = await connect("127.0.0.1", port, f"/v1/chat/ws?session_id={session_id}")
+    try:
+        await ws.recv()  # {"type": "session"}
+        for index in range(turns):
+            start = time.perf_counter()
+            first = None
+            await ws.send(json.dumps({"message": SCRIPT[(offset + index) % len(SCRIPT)]}))
+            while True:
+                event = json.loads(await ws.recv())
+                if event["type"] == "delta":
+                    first = first or time.perf_counter()
+                    continue
+                break
+            end = time.perf_counter()
+            if event["type"] != "final":
+                samples["errors"] += 1
+                continue
+            samples["turn_ms"].append((end - start) * 1000)
+            samples["first_delta_ms"].append(((first or end) - start) * 1000)
+    finally:
+        await ws.close()
+        ws.writer.close()
+
+
+async def http_session(port: int, session_id: str, turns: int, offset: int, samples: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for index in range(turns):
+            payload = json.dumps({"message": SCRIPT[(offset + index) % len(SCRIPT)], "session_id": session_id}).encode()
+            start = time.perf_counter()
+            writer.write(
+                b"POST /v1/chat HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii")
+                + payload
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":", 1)[1])
+                for line in head.split(b"\r\n")
+                if line.lower().startswith(b"content-length:")
+            )
+            await reader.readexactly(length)
+            if b" 200 " not in head.split(b"\r\n", 1)[0]:
+                samples["errors"] += 1
+                continue
+            samples["turn_ms"].append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+
+async def run_load(args, provider: FakeProvider, log_dir: str) -> dict:
+    with contextlib.redirect_stdout(sys.stderr):
+        counter = TokenCounter()
+        counter.warm_up()
+    llm = AsyncLLMService(providers=[ProviderConfig("bench", args.model, "sk-bench", provider.base_url)])
+    llm.pool.backoff_base = 0.01
+    llm.warm_up()
+    tracker = MetricsTracker(log_dir=log_dir, token_counter=counter)
+    pool = SessionPool(
+        lambda session_id: server._new_agent(session_id),
+        max_sessions=args.max_sessions,
+        max_memory_bytes=int(args.max_memory_mb * 1024 * 1024),
+    )
+    server = GrooveServer(llm, tracker, pool=pool, port=0, save_log=not args.no_log)
+    await server.start()
+
+    run_session = ws_session if args.transport == "ws" else http_session
+    samples = {"turn_ms": [], "first_delta_ms": [], "errors": 0}
+    next_session = 0
+
+    async def client():
+        nonlocal next_session
+        while next_session < args.sessions:
+            index = next_session
+            next_session += 1
+            try:
+                # Cada cliente virtual usa el token que el servidor le habría emitido
+                await run_session(server.port, server.tokens.sign(f"load-{index}"), args.turns, index, samples)
+            except Exception:
+                samples["errors"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    pool_stats = pool.stats()
+    await server.close()
+    await llm.aclose()
+    tracker.close()
+    metrics = {
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(args.sessions / elapsed, 2) if elapsed else 0.0,
+        "turns_per_s": round(len(samples["turn_ms"]) / elapsed, 2) if elapsed else 0.0,
+        "turn_ms": summarize(samples["turn_ms"]),
+        "errors": samples["errors"],
+        "pool": pool_stats,
+    }
+    if args.transport == "ws":
+        metrics["first_delta_ms"] = summarize(samples["first_delta_ms"])
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=100, help="Clientes simultáneos.")
+    parser.add_argument("--sessions", type=int, default=1000, help="Sesiones en total.")
+    parser.add_argument("--turns", type=int, default=2, help="Turnos por sesión.")
+    parser.add_argument("--transport", choices=("ws", "http"), default="ws")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latencia del proveedor falso.")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--max-memory-mb", type=float, default=256.0)
+    parser.add_argument("--no-log", action="store_true", help="No escribir el log de interacciones.")
+    parser.add_argument("--memory", action="store_true", help="Medir el pico de memoria (más lento).")
+    parser.add_argument("--model", default="gpt-4.1-nano")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout).")
+    args = parser.parse_args()
+
+    with FakeProvider(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate) as provider:
+        with tempfile.TemporaryDirectory() as log_dir:
+            if args.memory:
+                tracemalloc.start()
+            metrics = asyncio.run(run_load(args, provider, log_dir))
+            if args.memory:
+                metrics["peak_memory_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracemalloc.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+import json
+import os
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from groovehub.guardrails.matcher import normalize_text
+from groovehub.models.response import AdvisorResponse
+from groovehub.observability.log_store import iter_log_entries
+from groovehub.observability.metrics import PREVIEW_CHARS, PREVIEW_SUFFIX
+from groovehub.observability.tracing import traced
+
+DEFAULT_INDEX_PATH = os.path.join("metrics", "faq_index.json")
+# Jaccard mínimo (sobre shingles de caracteres) para agrupar dos consultas y
+# para responder desde el banco
+DEFAULT_THRESHOLD = 0.7
+# Turnos que tiene que sumar un grupo para guardarse
+DEFAULT_MIN_SUPPORT = 3
+# Confianza mínima de la respuesta elegida para el grupo
+DEFAULT_MIN_CONFIDENCE = 0.85
+# Fracción mínima de turnos del grupo con la misma intención: si el modelo
+# respondió cosas distintas a la misma pregunta, no hay una respuesta canónica
+DEFAULT_MIN_AGREEMENT = 0.8
+# Shingles de 4 caracteres sobre el texto normalizado
+SHINGLE_CHARS = 4
+# Firma de 64 posiciones en 16 bandas de 4 filas: un par con Jaccard 0.7 cae
+# en el mismo balde de alguna banda con probabilidad ~0.99, uno con 0.3 con
+# ~0.12 (y la verificación exacta lo descarta)
+NUM_BINS = 64
+BANDS = 16
+SEED = 17
+# Consultas de ejemplo que se guardan por grupo (las más frecuentes)
+MAX_QUERIES_PER_ANSWER = 50
+# Candidatos del LSH que se verifican con Jaccard exacto en cada búsqueda
+MAX_CANDIDATES = 16
+# Respuestas que dependen del stock o de precios vigentes: se vencen, no se precalculan
+VOLATILE_ACTIONS = frozenset({"check_stock"})
+_PRICE = re.compile(r"\$\s*\d|\d[\d.,]*\s*(?:usd|u\$s|dolares|pesos)\b|\busd\s*\d")
+# Tokens con dígitos (modelos, medidas, cantidades): "p-45" y "p-125" se
+# parecen carácter a carácter, pero son productos distintos
+_MODEL_TOKEN = re.compile(r"\S*\d\S*")
+_NON_WORD = re.compile(r"[\W_]")
+# Negaciones: "¿sirve para jazz?" y "¿no sirve para jazz?" difieren en una
+# palabra corta, pero piden la respuesta contraria
+_NEGATOR = re.compile(r"\b(?:no|sin|nunca|ni|tampoco|jamas)\b")
+
+_MASK32 = 0xFFFFFFFF
+
+
+class FaqMatch(NamedTuple):
+    """Respuesta del banco para una consulta."""
+    response: AdvisorResponse
+    # Jaccard con la consulta más parecida del grupo
+    similarity: float
+    # Índice de la respuesta en el banco
+    answer_id: int
+    # Consulta (normalizada) del banco con la que coincidió
+    query: str
+
+
+def normalize_query(text: str) -> str:
+    """`normalize_text` sin plegar leetspeak: los dígitos distinguen productos."""
+    return normalize_text(text, fold_leet=False)
+
+
+def exact_tokens(query: str) -> frozenset[str]:
+    """
+    Tokens con dígitos de una consulta normalizada, sin signos ("p-45?" -> "p45"),
+    y sus negaciones ("no", "sin", "nunca", "ni"...).
+
+    Dos consultas solo son la misma pregunta si coinciden exactamente en estos tokens.
+    """
+    tokens = {_NON_WORD.sub("", token) for token in _MODEL_TOKEN.findall(query)}
+    tokens.update(_NEGATOR.findall(query))
+    return frozenset(tokens)
+
+
+def shingles(text: str, size: int = SHINGLE_CHARS) -> set[str]:
+    """
+    Shingles de caracteres de un texto ya normalizado (con espacios en los bordes).
+
+    Args:
+        text (str): Texto normalizado (ver `normalize_query`).
+        size (int): Caracteres por shingle.
+
+    Returns:
+        set[str]: Shingles; un texto más corto que `size` es un único shingle.
+    """
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i : i + size] for i in range(len(padded) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    """Similitud de Jaccard entre dos conjuntos (0 si ambos están vacíos)."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class MinHasher:
+    """
+    Firmas MinHash de conjuntos de shingles y sus claves de banda para LSH.
+
+    Usa una sola permutación ("one permutation hashing"): cada shingle se
+    hashea una vez (CRC32, estable entre procesos, mezclado con un
+    multiplicador impar) y los bits altos lo reparten en `num_bins`
+    posiciones, de las que se guarda el mínimo. Las posiciones vacías toman
+    el valor de la siguiente ocupada (densificación por rotación). Dos
+    conjuntos coinciden en una posición con probabilidad ~ su Jaccard, igual
+    que con `num_bins` permutaciones, pero firmar cuesta O(shingles) en vez
+    de O(shingles × permutaciones): microsegundos en Python puro.
+    """
+
+    def __init__(self, num_bins: int = NUM_BINS, bands: int = BANDS, seed: int = SEED):
+        """
+        Args:
+            num_bins (int): Largo de la firma.
+            bands (int): Bandas del índice LSH (tienen que dividir a `num_bins`).
+            seed (int): Semilla del hash (la firma depende de ella).
+        """
+        if num_bins % bands:
+            raise ValueError(f"{bands} bandas no dividen una firma de {num_bins}")
+        self.num_bins = num_bins
+        self.bands = bands
+        self.rows = num_bins // bands
+        self.seed = seed
+        rng = random.Random(seed)
+        self._salt = rng.getrandbits(32)
+        self._multiplier = rng.getrandbits(32) | 1
+
+    def signature(self, shingle_set: set[str]) -> list[int]:
+        """Firma MinHash de un conjunto de shingles (no vacío)."""
+        size, salt, multiplier = self.num_bins, self._salt, self._multiplier
+        bins = [-1] * size
+        for shingle in shingle_set:
+            value = ((zlib.crc32(shingle.encode("utf-8")) ^ salt) * multiplier) & _MASK32
+            position = (value * size) >> 32
+            current = bins[position]
+            if current < 0 or value < current:
+                bins[position] = value
+        if -1 in bins:
+            # Densificación: cada posición vacía hereda de la siguiente ocupada
+            # (en círculo), más la distancia para no confundirse con un valor propio
+            dense, carried, distance = list(bins), -1, 0
+            for position in range(2 * size - 1, -1, -1):
+                value = bins[position % size]
+                if value >= 0:
+                    carried, distance = value, 0
+                else:
+                    distance += 1
+                    if position < size:
+                        dense[position] = carried + (distance << 32)
+            bins = dense
+        return bins
+
+    def band_keys(self, signature: list[int]) -> list[tuple]:
+        """Una clave por banda: (banda, filas de la firma en esa banda)."""
+        rows = self.rows
+        return [(band, *signature[band * rows : (band + 1) * rows]) for band in range(self.bands)]
+
+
+class FaqIndex:
+    """
+    Banco de respuestas precalculadas para preguntas frecuentes.
+
+    Cada respuesta viene con las consultas (normalizadas) que la originaron.
+    Buscar una consulta es calcular su firma MinHash, mirar los baldes LSH de
+    sus bandas y verificar el Jaccard exacto solo contra esos candidatos (que
+    además tienen que nombrar los mismos modelos y números): el costo no
+    depende del tamaño del banco. Lo arma `mine_faq` a partir del
+    log; el agente lo consulta en el primer turno de cada conversación.
+    """
+
+    def __init__(
+        self,
+        answers: list[dict],
+        threshold: float = DEFAULT_THRESHOLD,
+        hasher: MinHasher | None = None,
+    ):
+        """
+        Args:
+            answers (list[dict]): Respuestas del banco: `response` (campos de un
+                                  `AdvisorResponse`), `queries` y `support`.
+            threshold (float): Jaccard mínimo para responder desde el banco.
+            hasher (MinHasher | None): Parámetros de las firmas; por defecto los estándar.
+        """
+        self.answers = answers
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self.checks = 0
+        self.hits = 0
+        self.lookup_ms = 0.0
+        self._responses = [AdvisorResponse(**answer["response"]) for answer in answers]
+        # (respuesta, consulta, shingles, tokens exactos) por consulta conocida, y sus baldes por banda
+        self._queries: list[tuple[int, str, set[str], frozenset[str]]] = []
+        self._buckets: dict[tuple, list[int]] = {}
+        for answer_id, answer in enumerate(answers):
+            for query in answer["queries"]:
+                shingle_set = shingles(query)
+                position = len(self._queries)
+                self._queries.append((answer_id, query, shingle_set, exact_tokens(query)))
+                for key in self.hasher.band_keys(self.hasher.signature(shingle_set)):
+                    self._buckets.setdefault(key, []).append(position)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def lookup(self, user_query: str) -> FaqMatch | None:
+        """
+        Busca la pregunta frecuente más parecida a una consulta.
+
+        Args:
+            user_query (str): Consulta cruda del usuario.
+
+        Returns:
+            FaqMatch | None: La respuesta guardada si algún ejemplo del banco
+                             tiene Jaccard mayor o igual al umbral y los mismos
+                             tokens exactos, o None.
+        """
+        query = normalize_query(user_query)
+        shingle_set, tokens = shingles(query), exact_tokens(query)
+        # Se verifican solo los candidatos que coinciden en más bandas (las
+        # coincidencias estiman el Jaccard): el costo no crece con las variantes guardadas
+        candidates = Counter()
+        for key in self.hasher.band_keys(self.hasher.signature(shingle_set)):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_similarity = None, 0.0
+        for position, _ in candidates.most_common(MAX_CANDIDATES):
+            if self._queries[position][3] != tokens:
+                continue
+            similarity = jaccard(shingle_set, self._queries[position][2])
+            if similarity > best_similarity:
+                best, best_similarity = position, similarity
+        if best is None or best_similarity < self.threshold:
+            return None
+        answer_id, matched = self._queries[best][:2]
+        return FaqMatch(self._responses[answer_id], round(best_similarity, 3), answer_id, matched)
+
+    @traced("agent.faq")
+    def try_answer(self, user_query: str) -> FaqMatch | None:
+        """`lookup` que además lleva la cuenta de consultas, aciertos y tiempo."""
+        start = time.perf_counter()
+        match = self.lookup(user_query)
+        self.lookup_ms += (time.perf_counter() - start) * 1000
+        self.checks += 1
+        self.hits += match is not None
+        return match
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: Respuestas del banco, consultas evaluadas, aciertos y costo
+                  medio de la búsqueda.
+        """
+        return {
+            "answers": len(self.answers),
+            "checks": self.checks,
+            "hits": self.hits,
+            "avg_lookup_ms": round(self.lookup_ms / self.checks, 3) if self.checks else 0.0,
+        }
+
+    def save(self, path: str = DEFAULT_INDEX_PATH):
+        """Guarda el banco en JSON (las firmas se recalculan al cargarlo)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        hasher = self.hasher
+        data = {
+            "threshold": self.threshold,
+            "minhash": {"num_bins": hasher.num_bins, "bands": hasher.bands, "seed": hasher.seed},
+            "answers": self.answers,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH, threshold: float | None = None) -> "FaqIndex":
+        """
+        Carga un banco guardado con `save`.
+
+        Args:
+            path (str): Archivo JSON del banco.
+            threshold (float | None): Umbral a usar en lugar del guardado.
+
+        Returns:
+            FaqIndex: El banco listo para consultar.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["answers"],
+            threshold=data["threshold"] if threshold is None else threshold,
+            hasher=MinHasher(**data["minhash"]),
+        )
+
+
+def load_if_exists(path: str = DEFAULT_INDEX_PATH) -> FaqIndex | None:
+    """Carga el banco si ya se minó (`groove mine-faq`); si no, None."""
+    return FaqIndex.load(path) if os.path.exists(path) else None
+
+
+class _QueryStats:
+    """Lo acumulado de una consulta normalizada mientras se recorre el log."""
+
+    __slots__ = ("count", "cost_usd", "latency_ms", "intents", "best")
+
+    def __init__(self):
+        self.count = 0
+        self.cost_usd = 0.0
+        self.latency_ms = 0
+        self.intents: Counter = Counter()
+        # (confianza, respuesta) por intención
+        self.best: dict[str, tuple[float, dict]] = {}
+
+
+def _volatile(response: dict) -> bool:
+    # Stock y precios cambian: la respuesta de hoy sería falsa mañana
+    actions = response.get("recommended_actions") or []
+    if any(action in VOLATILE_ACTIONS for action in actions):
+        return True
+    return _PRICE.search(normalize_query(str(response.get("answer", "")))) is not None
+
+
+def _eligible(entry: dict) -> tuple[str, dict] | None:
+    # Consulta completa de un primer turno respondido por el LLM, o None
+    preview = entry.get("query_preview") or ""
+    if len(preview) >= PREVIEW_CHARS + len(PREVIEW_SUFFIX) and preview.endswith(PREVIEW_SUFFIX):
+        # Cortada: el final podría cambiar la pregunta
+        return None
+    metrics = entry.get("metrics") or {}
+    # Un seguimiento ("¿y en negro?") depende de la conversación; los
+    # registros viejos no traen `turn_index` y se aceptan
+    if metrics.get("turn_index", 1) > 1 or metrics.get("token_source") == "local":
+        return None
+    # Una respuesta tapada por el guardrail de salida no se vuelve a servir
+    if metrics.get("output_leak") or metrics.get("output_status") == "failed":
+        return None
+    response = entry.get("response_data")
+    if not isinstance(response, dict) or response.get("intent") in (None, "error") or _volatile(response):
+        return None
+    query = normalize_query(preview.removesuffix(PREVIEW_SUFFIX))
+    return (query, response) if query else None
+
+
+class _DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def mine_faq(
+    entries: Iterable[dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_support: int = DEFAULT_MIN_SUPPORT,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    min_agreement: float = DEFAULT_MIN_AGREEMENT,
+    hasher: MinHasher | None = None,
+) -> tuple[FaqIndex, dict]:
+    """
+    Arma el banco de preguntas frecuentes a partir del log de interacciones.
+
+    Recorre el log en streaming acumulando por consulta normalizada (la
+    memoria crece con las consultas distintas, no con los turnos). Después
+    agrupa las casi iguales con MinHash/LSH: solo los pares que comparten
+    algún balde se comparan con Jaccard exacto, y los que superan el umbral
+    se unen (clausura transitiva). De cada grupo con suficiente soporte y
+    una intención dominante se guarda la respuesta de mayor confianza.
+
+    Solo se usan primeros turnos con la consulta completa (el log guarda 50
+    caracteres) y respondidos por el LLM, sin respuestas de stock o precios
+    (se vencen). Dos consultas con números de modelo distintos nunca se unen.
+
+    Args:
+        entries (Iterable[dict]): Registros de `iter_log_entries`.
+        threshold (float): Jaccard mínimo para agrupar (y para responder después).
+        min_support (int): Turnos mínimos de un grupo.
+        min_confidence (float): Confianza mínima de la respuesta guardada.
+        min_agreement (float): Fracción mínima de turnos con la intención dominante.
+        hasher (MinHasher | None): Parámetros de las firmas.
+
+    Returns:
+        tuple[FaqIndex, dict]: El banco y el reporte de cobertura y ahorro estimado.
+    """
+    hasher = hasher or MinHasher()
+    turns = 0
+    stats: dict[str, _QueryStats] = {}
+    for entry in entries:
+        turns += 1
+        eligible = _eligible(entry)
+        if eligible is None:
+            continue
+        query, response = eligible
+        item = stats.get(query)
+        if item is None:
+            item = stats[query] = _QueryStats()
+        metrics = entry.get("metrics") or {}
+        item.count += 1
+        item.cost_usd += metrics.get("cost_usd") or 0.0
+        item.latency_ms += metrics.get("latency_ms") or 0
+        intent = response["intent"]
+        item.intents[intent] += 1
+        confidence = response.get("confidence_score") or 0.0
+        if confidence > item.best.get(intent, (-1.0, None))[0]:
+            item.best[intent] = (confidence, response)
+
+    queries = list(stats)
+    shingle_sets = [shingles(query) for query in queries]
+    tokens = [exact_tokens(query) for query in queries]
+    # Solo se unen consultas que el modelo respondió con la misma intención:
+    # evita que la clausura transitiva encadene preguntas distintas
+    # ("envíos a Córdoba" - "envíos a Rosario" - "cuotas en Rosario")
+    intents = [stats[query].intents.most_common(1)[0][0] for query in queries]
+    groups = _DisjointSet(len(queries))
+    buckets: dict[tuple, list[int]] = {}
+    compared = 0
+    for position, shingle_set in enumerate(shingle_sets):
+        candidates = set()
+        for key in hasher.band_keys(hasher.signature(shingle_set)):
+            bucket = buckets.setdefault(key, [])
+            candidates.update(bucket)
+            bucket.append(position)
+        for other in candidates:
+            # Si ya quedaron en el mismo grupo por otro camino no hace falta comparar
+            if (
+                intents[other] == intents[position]
+                and tokens[other] == tokens[position]
+                and groups.find(other) != groups.find(position)
+            ):
+                compared += 1
+                if jaccard(shingle_sets[other], shingle_set) >= threshold:
+                    groups.union(other, position)
+
+    clusters: dict[int, list[int]] = {}
+    for position in range(len(queries)):
+        clusters.setdefault(groups.find(position), []).append(position)
+
+    answers, covered, covered_cost, covered_ms = [], 0, 0.0, 0
+    for members in clusters.values():
+        items = [stats[queries[p]] for p in members]
+        support = sum(item.count for item in items)
+        if support < min_support:
+            continue
+        intent, count = sum((item.intents for item in items), Counter()).most_common(1)[0]
+        if count / support < min_agreement:
+            continue
+        confidence, response = max((item.best[intent] for item in items if intent in item.best), key=lambda b: b[0])
+        if confidence < min_confidence:
+            continue
+        try:
+            AdvisorResponse(**response)
+        except (TypeError, ValueError):
+            continue
+        members.sort(key=lambda p: -stats[queries[p]].count)
+        answers.append(
+            {
+                "response": response,
+                "support": support,
+                "queries": [queries[p] for p in members[:MAX_QUERIES_PER_ANSWER]],
+            }
+        )
+        covered += support
+        covered_cost += sum(item.cost_usd for item in items)
+        covered_ms += sum(item.latency_ms for item in items)
+
+    answers.sort(key=lambda answer: -answer["support"])
+    eligible_turns = sum(item.count for item in stats.values())
+    # Con el banco armado, cada turno cubierto salvo el que originó la
+    # respuesta se habría servido sin LLM; el ahorro usa su costo medio
+    saved = covered - len(answers)
+    share = saved / covered if covered else 0.0
+    report = {
+        "turns": turns,
+        "eligible_turns": eligible_turns,
+        "distinct_queries": len(queries),
+        "clusters": len(clusters),
+        "answers": len(answers),
+        "pairs_compared": compared,
+        # Lo que ya cubriría una caché exacta (repeticiones de la misma consulta normalizada)
+        "exact_repeat_rate": round((eligible_turns - len(queries)) / eligible_turns, 3) if eligible_turns else 0.0,
+        "coverage": round(covered / eligible_turns, 3) if eligible_turns else 0.0,
+        # Comparable con `exact_repeat_rate`: turnos aptos que no habrían llegado al LLM
+        "saved_rate": round(saved / eligible_turns, 3) if eligible_turns else 0.0,
+        "coverage_all_turns": round(covered / turns, 3) if turns else 0.0,
+        "llm_calls_saved": saved,
+        "cost_saved_usd": round(covered_cost * share, 6),
+        "ms_saved": round(covered_ms * share),
+    }
+    return FaqIndex(answers, threshold, hasher), report
+
+
+def mine_from_logs(log_dir: str = "metrics", **kwargs) -> tuple[FaqIndex, dict]:
+    """`mine_faq` sobre el log de un directorio de métricas."""
+    return mine_faq(iter_log_entries(log_dir), **kwargs)
@@ -0,0 +1,196 @@
+import heapq
+import json
+import math
+import os
+import zlib
+from collections import defaultdict
+from typing import NamedTuple
+
+from groovehub.agent.intent import char_ngrams
+from groovehub.observability.tokens import TokenCounter
+from groovehub.observability.tracing import traced
+
+BANK_PATH = os.path.join(os.path.dirname(__file__), "data", "fewshot.jsonl")
+DEFAULT_K = 3
+# Tope de tokens del bloque de ejemplos; los del prompt estático ocupan ~200
+DEFAULT_MAX_TOKENS = 350
+# Dimensión del espacio de hashing (2^14: colisiones despreciables con n-gramas de 2-4)
+HASH_DIMS = 1 << 14
+# Los n-gramas presentes en más de esta fracción de ejemplos (" de", "que ")
+# no distinguen nada y son las listas más largas de recorrer: se ignoran
+DEFAULT_MAX_DF = 0.2
+
+
+class Example(NamedTuple):
+    """Un ejemplo de entrada/salida para el prompt."""
+    user: str
+    # Salida esperada, con las claves en el orden en que se muestran al modelo
+    assistant: dict
+
+    @property
+    def intent(self) -> str:
+        return self.assistant["intent"]
+
+    def render(self) -> str:
+        """Formato del bloque de ejemplos del System Prompt."""
+        return f'Usuario: "{self.user}"\nAsistente: {json.dumps(self.assistant, ensure_ascii=False, indent=2)}'
+
+
+def load_examples(path: str = BANK_PATH) -> list[Example]:
+    """
+    Lee el banco de ejemplos (JSONL con `user` y `assistant`).
+
+    Args:
+        path (str): Archivo del banco.
+
+    Returns:
+        list[Example]: Ejemplos en el orden del archivo.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [Example(row["user"], row["assistant"]) for row in map(json.loads, f) if row]
+
+
+def hash_vector(text: str, dims: int = HASH_DIMS) -> dict[int, float]:
+    """
+    Embebe un texto con un vectorizador de hashing sobre n-gramas de caracteres.
+
+    No necesita vocabulario ni entrenamiento: cada n-grama cae en una
+    dimensión por CRC32 (estable entre procesos, a diferencia de `hash`). Se
+    usa frecuencia sublineal y normalización L2, así el producto punto es la
+    similitud coseno.
+
+    Args:
+        text (str): Texto crudo.
+        dims (int): Dimensiones del espacio.
+
+    Returns:
+        dict[int, float]: Vector disperso normalizado.
+    """
+    vector: dict[int, float] = {}
+    for gram, count in char_ngrams(text).items():
+        dim = zlib.crc32(gram.encode("utf-8")) % dims
+        vector[dim] = vector.get(dim, 0.0) + (1.0 if count == 1 else 1 + math.log(count))
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {i: v / norm for i, v in vector.items()}
+
+
+class ExampleIndex:
+    """
+    Índice de búsqueda por similitud coseno sobre vectores dispersos.
+
+    Guarda listas invertidas por dimensión: una consulta solo recorre los
+    ejemplos que comparten algún n-grama con ella, sin multiplicar matrices.
+    """
+
+    def __init__(self, examples: list[Example], dims: int = HASH_DIMS, max_df: float = DEFAULT_MAX_DF):
+        """
+        Args:
+            examples (list[Example]): Ejemplos a indexar (se embebe el texto del usuario).
+            dims (int): Dimensiones del vectorizador.
+            max_df (float): Fracción máxima de ejemplos en la que puede aparecer
+                            una dimensión para participar de la búsqueda.
+        """
+        self.examples = list(examples)
+        self.dims = dims
+        postings: dict[int, list[tuple[int, float]]] = defaultdict(list)
+        for i, example in enumerate(self.examples):
+            for dim, weight in hash_vector(example.user, dims).items():
+                postings[dim].append((i, weight))
+        limit = max(1, max_df * len(self.examples))
+        self._postings = {dim: entries for dim, entries in postings.items() if len(entries) <= limit}
+
+    def search(self, query: str, k: int = DEFAULT_K) -> list[tuple[float, Example]]:
+        """
+        Devuelve los `k` ejemplos más parecidos a la consulta.
+
+        Args:
+            query (str): Consulta del usuario.
+            k (int): Cantidad de resultados (0 = todos los que tengan similitud).
+
+        Returns:
+            list[tuple[float, Example]]: Pares (similitud coseno, ejemplo), de mayor a menor.
+        """
+        scores = [0.0] * len(self.examples)
+        postings = self._postings
+        for dim, weight in hash_vector(query, self.dims).items():
+            for i, other in postings.get(dim, ()):
+                scores[i] += weight * other
+        ranked = [(score, i) for i, score in enumerate(scores) if score > 0]
+        ranked = heapq.nlargest(k, ranked) if k else sorted(ranked, reverse=True)
+        return [(round(score, 4), self.examples[i]) for score, i in ranked]
+
+
+class FewShotSelector:
+    """
+    Elige por consulta los ejemplos few-shot que se envían al modelo.
+
+    En lugar de mandar todos los ejemplos en cada turno, se mandan solo los
+    `k` más parecidos a la consulta, sin pasarse de un presupuesto de tokens.
+    El banco puede crecer (más cobertura de intenciones) sin encarecer cada
+    petición.
+    """
+
+    def __init__(
+        self,
+        examples: list[Example] | None = None,
+        counter: TokenCounter | None = None,
+        k: int = DEFAULT_K,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+    ):
+        """
+        Args:
+            examples (list[Example] | None): Banco de ejemplos; por defecto el incluido.
+            counter (TokenCounter | None): Contador para el presupuesto de tokens.
+            k (int): Máximo de ejemplos por consulta.
+            max_tokens (int): Tope de tokens del bloque de ejemplos.
+        """
+        self.index = ExampleIndex(examples if examples is not None else load_examples())
+        self.counter = counter or TokenCounter()
+        self.k = k
+        self.max_tokens = max_tokens
+        self._tokens: dict[str, int] = {}
+
+    def _cost(self, example: Example) -> int:
+        cost = self._tokens.get(example.user)
+        if cost is None:
+            cost = self._tokens[example.user] = self.counter.count(example.render()) + 2
+        return cost
+
+    @traced("agent.few_shot")
+    def select(self, query: str) -> list[Example]:
+        """
+        Elige los ejemplos para una consulta: los más parecidos primero,
+        salteando los que no entran en el presupuesto.
+
+        Args:
+            query (str): Consulta cruda del usuario.
+
+        Returns:
+            list[Example]: Como mucho `k` ejemplos.
+        """
+        chosen, budget = [], self.max_tokens
+        # Se miran algunos candidatos extra por si el mejor no entra en el presupuesto
+        for _, example in self.index.search(query, k=self.k * 3):
+            cost = self._cost(example)
+            if cost <= budget:
+                chosen.append(example)
+                budget -= cost
+                if len(chosen) == self.k:
+                    break
+        return chosen
+
+    def message(self, query: str) -> dict | None:
+        """
+        Arma el mensaje de sistema con los ejemplos de la consulta.
+
+        Args:
+            query (str): Consulta cruda del usuario.
+
+        Returns:
+            dict | None: Mensaje 'system', o None si no hay ejemplos para enviar.
+        """
+        examples = self.select(query)
+        if not examples:
+            return None
+        body = "\n\n".join(example.render() for example in examples)
+        return {"role": "system", "content": f"EJEMPLOS (FEW-SHOT):\n\n{body}"}
@@ -0,0 +1,362 @@
+import json
+import math
+import os
+import random
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from groovehub.models.response import AdvisorAction, AdvisorResponse, UserIntent
+from groovehub.observability.log_store import iter_log_entries
+
+SEED_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_seed.jsonl")
+DEFAULT_MODEL_PATH = os.path.join("metrics", "intent_model.json")
+# Por debajo de este umbral la consulta siempre va al LLM
+DEFAULT_THRESHOLD = 0.85
+
+LABELS = [intent.value for intent in UserIntent if intent is not UserIntent.ERROR]
+
+_COMBINING = re.compile("[\u0300-\u036f]")
+
+
+def _prepare(text: str) -> str:
+    text = _COMBINING.sub("", unicodedata.normalize("NFKD", text.casefold()))
+    return f" {' '.join(text.split())} "
+
+
+def char_ngrams(text: str, min_n: int = 2, max_n: int = 4) -> Counter:
+    """
+    Extrae los n-gramas de caracteres de un texto normalizado (sin acentos,
+    en minúsculas y con espacios colapsados).
+
+    Args:
+        text (str): Texto crudo.
+        min_n (int): Largo mínimo del n-grama.
+        max_n (int): Largo máximo del n-grama.
+
+    Returns:
+        Counter: Frecuencia de cada n-grama.
+    """
+    prepared = _prepare(text)
+    return Counter(
+        prepared[i : i + n]
+        for n in range(min_n, max_n + 1)
+        for i in range(len(prepared) - n + 1)
+    )
+
+
+class IntentPrediction(NamedTuple):
+    """Intención predicha y la probabilidad asignada por el modelo."""
+    intent: UserIntent
+    confidence: float
+
+
+class IntentClassifier:
+    """
+    Clasificador local de intención: TF-IDF de n-gramas de caracteres más una
+    regresión logística multinomial, en Python puro.
+
+    Los n-gramas de caracteres toleran errores de tipeo y variaciones de
+    conjugación típicas del chat. Predecir cuesta microsegundos y no requiere
+    red, así que sirve como filtro previo al LLM.
+    """
+
+    def __init__(self, labels: list[str] = LABELS):
+        self.labels = list(labels)
+        self.idf: dict[str, float] = {}
+        self.weights: dict[str, list[float]] = {}
+        self.bias = [0.0] * len(self.labels)
+
+    def vectorize(self, text: str) -> dict[str, float]:
+        """
+        Convierte un texto en un vector TF-IDF disperso y normalizado (L2).
+
+        Los n-gramas que no se vieron en el entrenamiento se descartan.
+        """
+        vector = {
+            gram: (1 + math.log(count)) * self.idf[gram]
+            for gram, count in char_ngrams(text).items()
+            if gram in self.idf
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {gram: v / norm for gram, v in vector.items()}
+
+    def train(self, examples: list[tuple[str, str]], epochs: int = 25, lr: float = 0.5, l2: float = 1e-4, seed: int = 13):
+        """
+        Entrena el modelo con descenso por gradiente estocástico.
+
+        Args:
+            examples (list[tuple[str, str]]): Pares (consulta, intención).
+            epochs (int): Pasadas sobre los datos.
+            lr (float): Tasa de aprendizaje.
+            l2 (float): Regularización L2.
+            seed (int): Semilla para barajar los ejemplos.
+
+        Returns:
+            IntentClassifier: La misma instancia, entrenada.
+        """
+        examples = [(q, label) for q, label in examples if label in self.labels]
+        documents = [char_ngrams(q) for q, _ in examples]
+        df = Counter(gram for doc in documents for gram in doc)
+        total = len(documents)
+        self.idf = {gram: math.log((1 + total) / (1 + freq)) + 1 for gram, freq in df.items()}
+
+        data = [(self.vectorize(q), self.labels.index(label)) for q, label in examples]
+        self.weights = {gram: [0.0] * len(self.labels) for gram in self.idf}
+        self.bias = [0.0] * len(self.labels)
+
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for vector, target in data:
+                probs = self._softmax(vector)
+                for k in range(len(self.labels)):
+                    grad = probs[k] - (1.0 if k == target else 0.0)
+                    self.bias[k] -= lr * grad
+                    for gram, value in vector.items():
+                        w = self.weights[gram]
+                        w[k] -= lr * (grad * value + l2 * w[k])
+        return self
+
+    def predict(self, text: str) -> IntentPrediction:
+        """
+        Predice la intención de una consulta.
+
+        Args:
+            text (str): Consulta del usuario.
+
+        Returns:
+            IntentPrediction: Intención más probable y su probabilidad.
+        """
+        probs = self._softmax(self.vectorize(text))
+        best = max(range(len(self.labels)), key=probs.__getitem__)
+        return IntentPrediction(UserIntent(self.labels[best]), probs[best])
+
+    def save(self, path: str):
+        """Guarda el modelo entrenado como JSON."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"labels": self.labels, "idf": self.idf, "weights": self.weights, "bias": self.bias},
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """Carga un modelo guardado con `save`."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["labels"])
+        model.idf, model.weights, model.bias = data["idf"], data["weights"], data["bias"]
+        return model
+
+    def _softmax(self, vector: dict[str, float]) -> list[float]:
+        scores = list(self.bias)
+        for gram, value in vector.items():
+            for k, w in enumerate(self.weights[gram]):
+                scores[k] += w * value
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+
+def load_seed_examples(path: str = SEED_PATH) -> list[tuple[str, str]]:
+    """Ejemplos etiquetados que vienen con el paquete (arranque en frío)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(r["query"], r["intent"]) for r in map(json.loads, f) if r]
+
+
+def examples_from_logs(entries: Iterable[dict]) -> list[tuple[str, str]]:
+    """
+    Extrae pares (consulta, intención) del log de interacciones.
+
+    Se descartan los turnos con intención 'error' y se quita el "..." que
+    `save_log` agrega a las consultas truncadas.
+
+    Args:
+        entries (Iterable[dict]): Registros de `iter_log_entries`.
+
+    Returns:
+        list[tuple[str, str]]: Ejemplos etiquetados por el LLM.
+    """
+    examples = []
+    for entry in entries:
+        query = entry.get("query_preview") or ""
+        intent = (entry.get("response_data") or {}).get("intent")
+        if query and intent in LABELS:
+            examples.append((query.removesuffix("..."), intent))
+    return examples
+
+
+def load_or_train(path: str = DEFAULT_MODEL_PATH) -> IntentClassifier:
+    """
+    Carga el modelo entrenado con `groove train-intent` o, si no existe,
+    entrena uno al vuelo con los ejemplos semilla (toma pocos milisegundos).
+    """
+    if os.path.exists(path):
+        return IntentClassifier.load(path)
+    return IntentClassifier().train(load_seed_examples())
+
+
+def evaluate(classifier: IntentClassifier, examples: list[tuple[str, str]]) -> float:
+    """
+    Exactitud del clasificador sobre ejemplos etiquetados.
+
+    Returns:
+        float: Proporción de aciertos (0.0 si no hay ejemplos).
+    """
+    if not examples:
+        return 0.0
+    correct = sum(classifier.predict(q).intent.value == label for q, label in examples)
+    return correct / len(examples)
+
+
+def estimate_savings(classifier: IntentClassifier, entries: Iterable[dict], threshold: float = DEFAULT_THRESHOLD) -> dict:
+    """
+    Estima cuánto habría ahorrado el atajo local sobre el log de interacciones.
+
+    Cuenta los turnos que se habrían respondido sin LLM y suma su latencia y
+    costo registrados. También mide qué fracción de esos turnos el LLM también
+    había clasificado como `off_topic` (precisión del atajo). Como el atajo,
+    solo considera primeros turnos.
+
+    Args:
+        classifier (IntentClassifier): Modelo a evaluar.
+        entries (Iterable[dict]): Registros de `iter_log_entries`.
+        threshold (float): Umbral de confianza del atajo.
+
+    Returns:
+        dict: Turnos evaluados, llamadas evitadas, ms y USD ahorrados y precisión.
+    """
+    turns = hits = agree = 0
+    ms_saved = cost_saved = 0.0
+    for entry in entries:
+        query = (entry.get("query_preview") or "").removesuffix("...")
+        metrics = entry.get("metrics") or {}
+        # Los registros viejos no traen `turn_index` y se aceptan
+        if not query or metrics.get("turn_index", 1) > 1:
+            continue
+        turns += 1
+        prediction = classifier.predict(query)
+        if prediction.intent is UserIntent.OFF_TOPIC and prediction.confidence >= threshold:
+            hits += 1
+            ms_saved += metrics.get("latency_ms", 0)
+            cost_saved += metrics.get("cost_usd", 0.0)
+            agree += (entry.get("response_data") or {}).get("intent") == UserIntent.OFF_TOPIC.value
+    return {
+        "turns": turns,
+        "llm_calls_saved": hits,
+        "ms_saved": round(ms_saved),
+        "cost_saved_usd": round(cost_saved, 6),
+        "precision": round(agree / hits, 3) if hits else None,
+    }
+
+
+def train_from_logs(log_dir: str = "metrics", holdout: float = 0.2) -> tuple[IntentClassifier, dict]:
+    """
+    Entrena el clasificador con los ejemplos semilla más las etiquetas del log.
+
+    Reserva una fracción de los ejemplos para medir la exactitud y luego
+    entrena el modelo final con todos.
+
+    Args:
+        log_dir (str): Directorio del log de interacciones.
+        holdout (float): Fracción de ejemplos reservada para evaluación.
+
+    Returns:
+        tuple[IntentClassifier, dict]: El modelo final y un reporte de entrenamiento.
+    """
+    examples = load_seed_examples() + examples_from_logs(iter_log_entries(log_dir))
+    shuffled = list(examples)
+    random.Random(7).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    accuracy = evaluate(IntentClassifier().train(shuffled[:cut]), shuffled[cut:])
+
+    classifier = IntentClassifier().train(examples)
+    return classifier, {"examples": len(examples), "holdout_accuracy": round(accuracy, 3)}
+
+
+class IntentFastPath:
+    """
+    Atajo local previo al LLM para consultas claramente fuera de dominio.
+
+    Si el clasificador predice `off_topic` con confianza mayor o igual al
+    umbral, se responde con un `AdvisorResponse` predefinido sin llamar al
+    proveedor. Lleva la cuenta de las llamadas evitadas y estima los
+    milisegundos ahorrados con la latencia media observada del LLM.
+
+    El clasificador ve la consulta sola, sin la conversación, así que
+    `MusicAgent` lo consulta solo en el primer turno (igual que el banco de
+    preguntas frecuentes): a mitad de una charla la misma frase puede ser
+    un seguimiento.
+    """
+
+    CANNED_ANSWER = (
+        "Lo siento, aquí solo alimentamos el alma con música. 🎸 Puedo ayudarte "
+        "con instrumentos, accesorios, reparaciones y envíos."
+    )
+
+    def __init__(self, classifier: IntentClassifier, threshold: float = DEFAULT_THRESHOLD):
+        """
+        Args:
+            classifier (IntentClassifier): Modelo entrenado.
+            threshold (float): Confianza mínima para responder localmente.
+        """
+        self.classifier = classifier
+        self.threshold = threshold
+        self.checks = 0
+        self.hits = 0
+        self.classify_ms = 0.0
+        self._llm_calls = 0
+        self._llm_ms = 0.0
+
+    def try_answer(self, user_query: str) -> AdvisorResponse | None:
+        """
+        Intenta responder la consulta localmente.
+
+        Args:
+            user_query (str): Consulta del usuario.
+
+        Returns:
+            AdvisorResponse | None: La respuesta predefinida, o None si la
+                                    consulta debe ir al LLM.
+        """
+        start = time.perf_counter()
+        prediction = self.classifier.predict(user_query)
+        self.classify_ms += (time.perf_counter() - start) * 1000
+        self.checks += 1
+
+        if prediction.intent is not UserIntent.OFF_TOPIC or prediction.confidence < self.threshold:
+            return None
+
+        self.hits += 1
+        return AdvisorResponse(
+            answer=self.CANNED_ANSWER,
+            confidence_score=round(prediction.confidence, 2),
+            intent=UserIntent.OFF_TOPIC,
+            recommended_actions=[AdvisorAction.NONE],
+            reasoning=f"Clasificador local: consulta fuera de dominio (confianza {prediction.confidence:.2f}).",
+        )
+
+    def record_llm_latency(self, latency_ms: float):
+        """Registra la latencia de una llamada real al LLM (base para estimar el ahorro)."""
+        self._llm_calls += 1
+        self._llm_ms += latency_ms
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: Consultas evaluadas, llamadas al LLM evitadas, milisegundos
+                  ahorrados estimados y costo medio del clasificador.
+        """
+        avg_llm_ms = self._llm_ms / self._llm_calls if self._llm_calls else 0.0
+        return {
+            "checks": self.checks,
+            "llm_calls_saved": self.hits,
+            "ms_saved_est": round(self.hits * avg_llm_ms),
+            "avg_classify_ms": round(self.classify_ms / self.checks, 3) if self.checks else 0.0,
+        }
@@ -0,0 +1,146 @@
+import time
+from typing import Callable, NamedTuple
+
+from groovehub.agent.core import MusicAgent
+from groovehub.guardrails.leakage import OUTPUT_LEAK_KIND
+from groovehub.guardrails.safety import SecurityFilter
+from groovehub.models import AdvisorResponse
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tracing import traced
+
+
+class TurnOutcome(NamedTuple):
+    """Resultado de un turno completo del pipeline."""
+    response: AdvisorResponse | None
+    metrics: dict | None
+    blocked_reason: str | None = None
+
+
+@traced("metrics.build_turn")
+def build_turn_metrics(tracker: MetricsTracker, agent: MusicAgent, latency_ms: int) -> dict:
+    """
+    Arma el diccionario de métricas del último turno de un agente.
+
+    Usa el `usage` del proveedor si existe (o la estimación local del prompt
+    completo) y cotiza según el modelo del servicio. Las respuestas servidas
+    desde la caché o por el atajo local se reportan con costo cero. Si el
+    turno se escaló, la respuesta descartada del modelo rápido se suma a los
+    tokens y al costo (cotizada a su propio precio).
+
+    Args:
+        tracker (MetricsTracker): Tracker usado para contar tokens y cotizar.
+        agent (MusicAgent): Agente que acaba de responder.
+        latency_ms (int): Latencia medida del turno.
+
+    Returns:
+        dict: Métricas listas para mostrar y registrar.
+    """
+    completion = agent.last_completion
+    # Tokens del turno completo (System Prompt + historial + recordatorio)
+    usage = tracker.turn_usage(agent.last_prompt, completion.content, completion.usage)
+    input_tokens = usage["input_tokens"]
+    output_tokens = usage["output_tokens"]
+    # Una respuesta servida desde la caché o resuelta localmente no consume tokens del proveedor
+    free = completion.cached or completion.local
+    # Con varios proveedores, el modelo que efectivamente respondió puede no ser el principal
+    model = completion.model or agent.llm.model_for(agent.last_tier)
+    cost = 0.0 if free else tracker.calculate_cost(input_tokens, output_tokens, model)
+    escalation = agent.last_escalation
+    if escalation is not None and not escalation.cached:
+        discarded = tracker.turn_usage(agent.last_prompt, escalation.content, escalation.usage)
+        input_tokens += discarded["input_tokens"]
+        output_tokens += discarded["output_tokens"]
+        cost += tracker.calculate_cost(
+            discarded["input_tokens"], discarded["output_tokens"], escalation.model or agent.llm.fast_model
+        )
+    if completion.local:
+        token_source = "local"
+    elif completion.cached:
+        token_source = "cache"
+    else:
+        token_source = usage["token_source"]
+    return {
+        "latency_ms": latency_ms,
+        "cost_usd": cost,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "model": model,
+        "provider": completion.provider,
+        "token_source": token_source,
+        "cache_hit": completion.cached,
+        "context_tokens_saved": agent.context.last_tokens_saved,
+        # 'valid', 'repaired', 'reasked' o 'failed' (None si respondió el atajo local)
+        "output_status": agent.last_output_status,
+        # 'redacted' o 'blocked' si la respuesta repetía el System Prompt
+        "output_leak": agent.last_leak.action if agent.last_leak is not None else None,
+        # Nivel elegido por el router ('fast' o 'strong'; None sin router) y si se escaló
+        "route": agent.last_route.tier if agent.last_route is not None else None,
+        "escalated": escalation is not None,
+        # Número del turno en la conversación (1 = el que la abre) y si lo
+        # respondió el banco de preguntas frecuentes
+        "turn_index": agent.context.folded_turns + sum(m["role"] == "user" for m in agent.history),
+        "faq_hit": agent.last_faq is not None,
+        # Herramientas llamadas por el modelo (nombre, resultado y latencia) y rondas
+        "tool_calls": [
+            {"name": r.call.name, "status": r.status, "latency_ms": r.latency_ms} for r in agent.last_tool_results
+        ],
+        "tool_rounds": agent.last_tool_rounds,
+    }
+
+
+@traced("turn")
+async def run_turn_async(
+    agent: MusicAgent,
+    tracker: MetricsTracker,
+    user_query: str,
+    save_log: bool = True,
+    on_answer: Callable[[str], None] | None = None,
+    check_safety: bool = True,
+) -> TurnOutcome:
+    """
+    Ejecuta un turno completo de forma asíncrona: seguridad, consulta,
+    métricas y registro.
+
+    El tracker puede compartirse entre sesiones concurrentes: la latencia se
+    mide localmente (no con `tracker.start/stop`, que guardan estado) y el log
+    se escribe en segundo plano.
+
+    Args:
+        agent (MusicAgent): Sesión que atiende la consulta.
+        tracker (MetricsTracker): Tracker compartido.
+        user_query (str): Mensaje del usuario.
+        save_log (bool): Si es False, el turno no se agrega al log de interacciones.
+        on_answer (Callable[[str], None] | None): Receptor del texto de `answer` a
+                                                  medida que llega (pide streaming).
+        check_safety (bool): Si es False, se asume que la consulta ya pasó por
+                             `SecurityFilter` (p. ej. en un middleware del servidor).
+
+    Returns:
+        TurnOutcome: La respuesta y sus métricas, o el motivo del bloqueo. Si la
+                     salida del modelo no se pudo reparar, la respuesta es el
+                     objeto de error seguro del agente.
+    """
+    if check_safety:
+        is_safe, reason = await SecurityFilter.check_safety_async(user_query)
+        if not is_safe:
+            tracker.live.observe_block(SecurityFilter.block_kind(reason))
+            return TurnOutcome(None, None, reason)
+
+    start = time.perf_counter()
+    turn = {}
+
+    def measure(response: AdvisorResponse):
+        # Con el turno todavía tomado: otra consulta de la misma sesión no
+        # puede pisar los `last_*` del agente antes de leerlos
+        turn["metrics"] = build_turn_metrics(tracker, agent, int((time.perf_counter() - start) * 1000))
+        turn["leaked"] = agent.last_leak is not None
+
+    response = await agent.ask_async(user_query, on_answer=on_answer, on_turn=measure)
+    metrics = turn["metrics"]
+    tracker.live.observe_turn(metrics, response.intent.value)
+    if turn["leaked"]:
+        tracker.live.observe_block(OUTPUT_LEAK_KIND)
+    if save_log:
+        await tracker.save_log_async(user_query, response.model_dump_json(), metrics)
+    return TurnOutcome(response, metrics)
@@ -0,0 +1,298 @@
+import copy
+import json
+import re
+import unicodedata
+from enum import Enum
+from typing import NamedTuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from groovehub.models.response import AdvisorAction, AdvisorResponse, UserIntent
+
+# Validador precompilado: parsea y valida el JSON crudo en una sola pasada (pydantic-core)
+ADVISOR_ADAPTER = TypeAdapter(AdvisorResponse)
+
+# Sinónimos frecuentes que los modelos usan en lugar de los valores del enum
+INTENT_SYNONYMS = {
+    "sales": UserIntent.SALES_ADVISORY,
+    "sale": UserIntent.SALES_ADVISORY,
+    "sales_advice": UserIntent.SALES_ADVISORY,
+    "purchase": UserIntent.SALES_ADVISORY,
+    "recommendation": UserIntent.SALES_ADVISORY,
+    "product_recommendation": UserIntent.SALES_ADVISORY,
+    "venta": UserIntent.SALES_ADVISORY,
+    "ventas": UserIntent.SALES_ADVISORY,
+    "compra": UserIntent.SALES_ADVISORY,
+    "recomendacion": UserIntent.SALES_ADVISORY,
+    "support": UserIntent.TECHNICAL_SUPPORT,
+    "tech_support": UserIntent.TECHNICAL_SUPPORT,
+    "technical": UserIntent.TECHNICAL_SUPPORT,
+    "repair": UserIntent.TECHNICAL_SUPPORT,
+    "repair_support": UserIntent.TECHNICAL_SUPPORT,
+    "soporte": UserIntent.TECHNICAL_SUPPORT,
+    "soporte_tecnico": UserIntent.TECHNICAL_SUPPORT,
+    "reparacion": UserIntent.TECHNICAL_SUPPORT,
+    "shipping": UserIntent.SHIPPING_INFO,
+    "delivery": UserIntent.SHIPPING_INFO,
+    "shipping_information": UserIntent.SHIPPING_INFO,
+    "envio": UserIntent.SHIPPING_INFO,
+    "envios": UserIntent.SHIPPING_INFO,
+    "offtopic": UserIntent.OFF_TOPIC,
+    "other": UserIntent.OFF_TOPIC,
+    "unrelated": UserIntent.OFF_TOPIC,
+    "fuera_de_tema": UserIntent.OFF_TOPIC,
+}
+ACTION_SYNONYMS = {
+    "stock": AdvisorAction.CHECK_STOCK,
+    "check_inventory": AdvisorAction.CHECK_STOCK,
+    "check_availability": AdvisorAction.CHECK_STOCK,
+    "verificar_stock": AdvisorAction.CHECK_STOCK,
+    "discount": AdvisorAction.OFFER_DISCOUNT,
+    "apply_discount": AdvisorAction.OFFER_DISCOUNT,
+    "descuento": AdvisorAction.OFFER_DISCOUNT,
+    "escalate": AdvisorAction.ESCALATE_TO_HUMAN,
+    "human": AdvisorAction.ESCALATE_TO_HUMAN,
+    "human_handoff": AdvisorAction.ESCALATE_TO_HUMAN,
+    "handoff": AdvisorAction.ESCALATE_TO_HUMAN,
+    "catalog": AdvisorAction.SHOW_CATALOG,
+    "show_products": AdvisorAction.SHOW_CATALOG,
+    "recommend_products": AdvisorAction.SHOW_CATALOG,
+    "catalogo": AdvisorAction.SHOW_CATALOG,
+    "no_action": AdvisorAction.NONE,
+    "null": AdvisorAction.NONE,
+    "ninguna": AdvisorAction.NONE,
+}
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SEPARATORS = re.compile(r"[\s\-/.]+")
+
+
+def strict_json_schema(model=AdvisorResponse) -> dict:
+    """
+    Esquema JSON de un modelo Pydantic en la forma que exige el modo
+    `strict` de structured outputs: todos los campos obligatorios (los
+    opcionales aceptan null), sin propiedades extra, sin `default` y con las
+    referencias a enums resueltas en línea. `UserIntent.ERROR` se quita: es un
+    valor interno que el modelo no debe elegir.
+
+    Args:
+        model: Clase Pydantic a describir.
+
+    Returns:
+        dict: Esquema listo para `response_format={"type": "json_schema", ...}`.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, list):
+            return [resolve(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            target = copy.deepcopy(defs[node["$ref"].rsplit("/", 1)[-1]])
+            target.update({k: v for k, v in node.items() if k != "$ref"})
+            node = target
+        node = {k: resolve(v) for k, v in node.items() if k not in ("default", "title")}
+        if node.get("type") == "object":
+            node["required"] = list(node.get("properties", {}))
+            node["additionalProperties"] = False
+        if node.get("enum") and UserIntent.ERROR.value in node["enum"]:
+            node["enum"] = [v for v in node["enum"] if v != UserIntent.ERROR.value]
+        return node
+
+    return resolve(schema)
+
+
+def subset_schema(schema: dict, fields: list[str]) -> dict:
+    """Esquema estricto que solo contiene `fields` (para re-preguntar esos campos)."""
+    return {
+        **schema,
+        "properties": {name: schema["properties"][name] for name in fields},
+        "required": list(fields),
+    }
+
+
+ADVISOR_SCHEMA = strict_json_schema(AdvisorResponse)
+
+
+def extract_json(text: str) -> dict | None:
+    """
+    Extrae el primer objeto JSON de un texto de forma tolerante.
+
+    Acepta bloques de código markdown, texto antes o después del objeto y
+    comas finales sobrantes.
+
+    Args:
+        text (str): Salida cruda del modelo.
+
+    Returns:
+        dict | None: El objeto, o None si no hay uno recuperable.
+    """
+    text = _FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = escape = False
+    for index in range(start, len(text)):
+        ch = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                candidate = text[start : index + 1]
+                for attempt in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+                    try:
+                        value = json.loads(attempt)
+                    except json.JSONDecodeError:
+                        continue
+                    return value if isinstance(value, dict) else None
+                return None
+    return None
+
+
+def coerce_enum(value, enum_cls: type[Enum], synonyms: dict) -> Enum | None:
+    """
+    Lleva un valor "casi correcto" al miembro del enum que corresponde.
+
+    Normaliza mayúsculas, acentos y separadores ("Sales Advisory",
+    "sales-advisory") y consulta la tabla de sinónimos ("envío" -> shipping_info).
+
+    Args:
+        value: Valor devuelto por el modelo.
+        enum_cls (type[Enum]): Enum de destino.
+        synonyms (dict): Sinónimos normalizados -> miembro.
+
+    Returns:
+        Enum | None: El miembro, o None si no hay una correspondencia segura.
+    """
+    if isinstance(value, enum_cls):
+        return value
+    if not isinstance(value, str):
+        return None
+    key = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().casefold().strip()
+    key = _SEPARATORS.sub("_", key).strip("_")
+    try:
+        return enum_cls(key)
+    except ValueError:
+        return synonyms.get(key)
+
+
+class RepairResult(NamedTuple):
+    """Datos tras la reparación local y los campos que siguen sin arreglo."""
+    data: dict
+    repaired: list[str]
+    failing: list[str]
+
+
+def repair_fields(data: dict) -> RepairResult:
+    """
+    Repara localmente los campos de un `AdvisorResponse` mal formado.
+
+    Args:
+        data (dict): Objeto extraído de la salida del modelo.
+
+    Returns:
+        RepairResult: Los datos corregidos, qué campos se tocaron y cuáles no
+                      se pudieron arreglar sin volver a preguntar.
+    """
+    data = dict(data)
+    repaired, failing = [], []
+
+    if not isinstance(data.get("answer"), str) or not data["answer"].strip():
+        failing.append("answer")
+
+    intent = coerce_enum(data.get("intent"), UserIntent, INTENT_SYNONYMS)
+    if intent is None or intent is UserIntent.ERROR:
+        failing.append("intent")
+    elif intent.value != data.get("intent"):
+        data["intent"] = intent.value
+        repaired.append("intent")
+
+    actions = data.get("recommended_actions")
+    if actions is None or isinstance(actions, str):
+        actions = [actions] if actions else []
+    if isinstance(actions, list):
+        coerced = [coerce_enum(a, AdvisorAction, ACTION_SYNONYMS) for a in actions]
+        if any(a is None for a in coerced):
+            failing.append("recommended_actions")
+        else:
+            values = list(dict.fromkeys(a.value for a in coerced)) or [AdvisorAction.NONE.value]
+            if values != data.get("recommended_actions"):
+                data["recommended_actions"] = values
+                repaired.append("recommended_actions")
+    else:
+        failing.append("recommended_actions")
+
+    score = data.get("confidence_score")
+    try:
+        number = float(str(score).strip().rstrip("%")) if isinstance(score, str) else float(score)
+    except (TypeError, ValueError):
+        failing.append("confidence_score")
+    else:
+        # "85" o "85%" -> 0.85; el resto se acota a [0, 1]
+        if number > 1 and number <= 100:
+            number /= 100
+        number = min(max(number, 0.0), 1.0)
+        if number != score:
+            data["confidence_score"] = number
+            repaired.append("confidence_score")
+
+    reasoning = data.get("reasoning")
+    if reasoning is not None and not isinstance(reasoning, str):
+        data["reasoning"] = json.dumps(reasoning, ensure_ascii=False)
+        repaired.append("reasoning")
+
+    return RepairResult(data, repaired, failing)
+
+
+def validate_raw(raw: str) -> AdvisorResponse | None:
+    """Valida la salida cruda con el adaptador precompilado (None si no es válida)."""
+    try:
+        return ADVISOR_ADAPTER.validate_json(raw)
+    except ValidationError:
+        return None
+
+
+def build_reask_messages(user_query: str, raw: str, fields: list[str]) -> list:
+    """
+    Mensajes de la re-pregunta dirigida: sin historial, solo la consulta, la
+    respuesta defectuosa y los campos a completar con sus valores permitidos.
+
+    Args:
+        user_query (str): Consulta original del usuario.
+        raw (str): Salida defectuosa del modelo.
+        fields (list[str]): Campos a corregir.
+
+    Returns:
+        list: Mensajes listos para el LLM.
+    """
+    specs = []
+    for name in fields:
+        prop = ADVISOR_SCHEMA["properties"][name]
+        allowed = prop.get("enum") or prop.get("items", {}).get("enum")
+        detail = f" (valores permitidos: {', '.join(allowed)})" if allowed else ""
+        specs.append(f"- {name}: {prop.get('description', '')}{detail}")
+    system = (
+        "Eres un corrector de formato de Groove Hub. Te paso una consulta y una respuesta "
+        "previa del asistente con campos inválidos. Devuelve ÚNICAMENTE un objeto JSON con "
+        "estos campos corregidos, y nada más:\n" + "\n".join(specs)
+    )
+    user = (
+        f"<user_input>{user_query}</user_input>\n"
+        f"<respuesta_previa>{raw[:2000]}</respuesta_previa>"
+    )
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
@@ -0,0 +1,146 @@
+import json
+from typing import NamedTuple
+
+from groovehub.observability.tracing import traced
+from groovehub.services.providers import FAST, STRONG
+
+# 'strong' manda todo al modelo fuerte (el comportamiento de siempre), 'fast'
+# todo al rápido (escalando si hace falta) y 'auto' decide turno a turno
+POLICIES = (STRONG, FAST, "auto")
+# Confianza por debajo de la cual la respuesta del modelo rápido se descarta
+# y el turno se rehace con el fuerte
+DEFAULT_ESCALATE_BELOW = 0.6
+# Puntaje desde el que un turno va directo al modelo fuerte
+DEFAULT_THRESHOLD = 0.5
+# Con este largo (en palabras) la consulta suma el peso completo de `length`
+LONG_QUERY_WORDS = 40
+# Intenciones en las que el modelo rápido rinde peor (diagnóstico de equipos)
+HARD_INTENTS = {"technical_support"}
+# Respuestas previas del asistente que se miran
+RECENT_TURNS = 3
+# Aporte de cada señal al puntaje (cualquiera de las dos de 0.5 alcanza sola)
+WEIGHTS = {"length": 0.5, "intent": 0.3, "confidence": 0.5}
+
+
+class RouteDecision(NamedTuple):
+    """Nivel de modelo elegido para un turno y por qué."""
+    # 'fast' o 'strong'
+    tier: str
+    # Puntaje de dificultad entre 0 y 1 (None si lo fijó la política)
+    score: float | None
+    # Señales que sumaron (por ejemplo 'long_query', 'intent:technical_support')
+    reasons: tuple = ()
+
+
+class ModelRouter:
+    """
+    Elige, antes de cada llamada, entre el modelo rápido y barato y el fuerte.
+
+    El puntaje sale de señales que ya están en memoria y cuestan microsegundos:
+    el largo de la consulta, las intenciones de las últimas respuestas del
+    historial y la confianza de la anterior. Los turnos fáciles (envíos,
+    recomendaciones simples) van al modelo rápido; si su respuesta vuelve con
+    poca confianza o no valida, el agente la descarta y rehace el turno con
+    el fuerte (ver `should_escalate`).
+    """
+
+    def __init__(
+        self,
+        policy: str = "auto",
+        escalate_below: float = DEFAULT_ESCALATE_BELOW,
+        threshold: float = DEFAULT_THRESHOLD,
+    ):
+        """
+        Args:
+            policy (str): 'auto', 'fast' o 'strong'.
+            escalate_below (float): Confianza mínima aceptada del modelo rápido.
+            threshold (float): Puntaje desde el que se usa directo el modelo fuerte.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {policy!r} (usa {', '.join(POLICIES)})")
+        self.policy = policy
+        self.escalate_below = escalate_below
+        self.threshold = threshold
+
+    @traced("agent.route")
+    def route(self, user_query: str, history: list) -> RouteDecision:
+        """
+        Decide el nivel de modelo de un turno.
+
+        Args:
+            user_query (str): Consulta cruda del usuario.
+            history (list): Historial del agente (antes de agregar la consulta).
+
+        Returns:
+            RouteDecision: Nivel elegido, puntaje y señales que sumaron.
+        """
+        if self.policy != "auto":
+            return RouteDecision(self.policy, None, ("policy",))
+
+        score, reasons = 0.0, []
+        words = len(user_query.split())
+        if words:
+            score += WEIGHTS["length"] * min(words / LONG_QUERY_WORDS, 1.0)
+            if words >= LONG_QUERY_WORDS:
+                reasons.append("long_query")
+        intents, confidence = _recent_signals(history)
+        hard = sorted(intents & HARD_INTENTS)
+        if hard:
+            score += WEIGHTS["intent"]
+            reasons += [f"intent:{intent}" for intent in hard]
+        if confidence is not None and confidence < self.escalate_below:
+            score += WEIGHTS["confidence"]
+            reasons.append("low_confidence")
+        score = min(score, 1.0)
+        return RouteDecision(STRONG if score >= self.threshold else FAST, round(score, 3), tuple(reasons))
+
+    def should_escalate(self, response) -> bool:
+        """
+        Indica si hay que descartar la respuesta del modelo rápido.
+
+        Args:
+            response (AdvisorResponse | None): Respuesta validada (o reparada
+                localmente), o None si no pasó la validación.
+
+        Returns:
+            bool: True si no validó o su confianza es menor a `escalate_below`.
+        """
+        return response is None or response.confidence_score < self.escalate_below
+
+
+def _recent_signals(history: list) -> tuple[set, float | None]:
+    # Intenciones de las últimas respuestas y la confianza de la más reciente
+    intents, confidence, seen = set(), None, 0
+    for message in reversed(history):
+        if message["role"] != "assistant":
+            continue
+        try:
+            data = json.loads(message["content"])
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(data, dict):
+            continue
+        if confidence is None and isinstance(data.get("confidence_score"), (int, float)):
+            confidence = float(data["confidence_score"])
+        if isinstance(data.get("intent"), str):
+            intents.add(data["intent"])
+        seen += 1
+        if seen == RECENT_TURNS:
+            break
+    return intents, confidence
+
+
+def make_router(policy: str, escalate_below: float | None = None) -> ModelRouter | None:
+    """
+    Arma el router de una política del CLI.
+
+    Args:
+        policy (str): 'strong', 'fast' o 'auto'.
+        escalate_below (float | None): Confianza mínima del modelo rápido (default: 0.6).
+
+    Returns:
+        ModelRouter | None: None con 'strong' (es lo mismo que no tener router).
+    """
+    if policy == STRONG:
+        return None
+    return ModelRouter(policy, DEFAULT_ESCALATE_BELOW if escalate_below is None else escalate_below)
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from groovehub.models import AdvisorResponse
+
+DEFAULT_SESSIONS_PATH = os.path.join("metrics", "sessions.sqlite")
+# Turnos que se cargan como máximo al retomar una sesión (los anteriores
+# ya están en el resumen persistido)
+DEFAULT_RESUME_TURNS = 20
+
+_SCHEMA = (
+    # Textos largos compartidos (System Prompt, recordatorio), una sola copia por hash
+    "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, content TEXT NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " id TEXT PRIMARY KEY, system_hash TEXT NOT NULL, reminder_hash TEXT NOT NULL,"
+    " turns INTEGER NOT NULL DEFAULT 0, summary TEXT NOT NULL DEFAULT '',"
+    " folded_turns INTEGER NOT NULL DEFAULT 0, folded_tokens INTEGER NOT NULL DEFAULT 0,"
+    " created_at REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID",
+    # Append-only: una fila por turno con los campos ya validados, no el JSON crudo
+    "CREATE TABLE IF NOT EXISTS turns ("
+    " session_id TEXT NOT NULL, seq INTEGER NOT NULL, user TEXT NOT NULL,"
+    " answer TEXT NOT NULL, confidence REAL NOT NULL, intent TEXT NOT NULL,"
+    " actions TEXT NOT NULL, reasoning TEXT, created_at REAL NOT NULL,"
+    " PRIMARY KEY (session_id, seq)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (updated_at)",
+)
+
+
+def new_session_id() -> str:
+    """Genera un identificador corto de sesión."""
+    return uuid.uuid4().hex[:12]
+
+
+def encode_assistant(fields: tuple) -> str:
+    """
+    Reconstruye el mensaje del asistente a partir de una fila de `turns`.
+
+    Produce el mismo JSON compacto que `AdvisorResponse.model_dump_json()`,
+    sin pasar por Pydantic (los campos ya se validaron al guardarlos).
+
+    Args:
+        fields (tuple): (answer, confidence, intent, actions, reasoning).
+
+    Returns:
+        str: Contenido del mensaje 'assistant'.
+    """
+    answer, confidence, intent, actions, reasoning = fields
+    return json.dumps(
+        {
+            "answer": answer,
+            "confidence_score": confidence,
+            "intent": intent,
+            "recommended_actions": actions.split(",") if actions else [],
+            "reasoning": reasoning,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+class StoredSession(NamedTuple):
+    """Estado de una sesión listo para restaurar en un agente."""
+    session_id: str
+    # Pares (consulta cruda, contenido del asistente) de la ventana reciente
+    turns: list[tuple[str, str]]
+    summary: str
+    # Turnos que no se cargan textuales: el resumen más `unsummarized` los cubre
+    folded_turns: int
+    folded_tokens: int
+    total_turns: int
+    # Turnos fuera de la ventana que el resumen guardado todavía no cubre (el
+    # plegado no llegó a correr): hay que plegarlos antes de seguir
+    unsummarized: list[tuple[str, str]] = []
+
+
+class SessionStore:
+    """
+    Almacén persistente de conversaciones en SQLite, indexado por ID de sesión.
+
+    Cada turno es una fila nueva (append-only) con los campos validados de la
+    respuesta. El System Prompt y el recordatorio se guardan una sola vez por
+    hash y las sesiones solo los referencian. Al retomar una sesión se carga
+    únicamente el resumen persistido y los turnos posteriores a él, así que el
+    costo no depende del largo total de la conversación.
+    """
+
+    def __init__(self, path: str = DEFAULT_SESSIONS_PATH):
+        """
+        Args:
+            path (str): Archivo SQLite. ":memory:" desactiva la persistencia.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def intern(self, content: str) -> str:
+        """
+        Guarda un texto compartido una sola vez.
+
+        Args:
+            content (str): Texto a guardar.
+
+        Returns:
+            str: Su hash (SHA-256 truncado), usado como referencia.
+        """
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?)", (digest, content))
+            self._db.commit()
+        return digest
+
+    def blob(self, digest: str) -> str | None:
+        """Devuelve un texto compartido a partir de su hash (None si no existe)."""
+        row = self._db.execute("SELECT content FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def open(self, session_id: str, system_prompt: str, reminder: str) -> None:
+        """
+        Crea la sesión si no existe y registra la versión de los prompts en uso.
+
+        Args:
+            session_id (str): Identificador de la sesión.
+            system_prompt (str): System Prompt vigente.
+            reminder (str): Recordatorio del sistema vigente.
+        """
+        system_hash, reminder_hash = self.intern(system_prompt), self.intern(reminder)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (id, system_hash, reminder_hash, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET"
+                " system_hash = excluded.system_hash, reminder_hash = excluded.reminder_hash",
+                (session_id, system_hash, reminder_hash, now, now),
+            )
+            self._db.commit()
+
+    def latest(self) -> str | None:
+        """
+        Returns:
+            str | None: La sesión con turnos usada más recientemente, o None si no hay ninguna.
+        """
+        row = self._db.execute(
+            "SELECT id FROM sessions WHERE turns > 0 ORDER BY updated_at DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str, max_turns: int = DEFAULT_RESUME_TURNS) -> StoredSession | None:
+        """
+        Carga el resumen y la ventana reciente de una sesión.
+
+        Args:
+            session_id (str): Identificador de la sesión.
+            max_turns (int): Máximo de turnos textuales a cargar.
+
+        Returns:
+            StoredSession | None: El estado de la sesión, o None si no existe.
+                Si entre el resumen y la ventana quedaron turnos sin resumir,
+                van en `unsummarized` (a lo sumo otros `max_turns`: el resumen
+                tiene un largo máximo y descartaría los más viejos igual).
+        """
+        row = self._db.execute(
+            "SELECT turns, summary, folded_turns, folded_tokens FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        total, summary, folded, folded_tokens = row
+
+        # Solo lo posterior al resumen y, a lo sumo, los últimos `max_turns`
+        first = max(folded, total - max_turns) + 1
+        rows = self._db.execute(
+            "SELECT seq, user, answer, confidence, intent, actions, reasoning FROM turns"
+            " WHERE session_id = ? AND seq >= ? ORDER BY seq",
+            (session_id, max(folded + 1, first - max_turns)),
+        ).fetchall()
+        turns = [(r[0], r[1], encode_assistant(r[2:])) for r in rows]
+        window = [(user, content) for seq, user, content in turns if seq >= first]
+        unsummarized = [(user, content) for seq, user, content in turns if seq < first]
+        return StoredSession(session_id, window, summary, first - 1, folded_tokens, total, unsummarized)
+
+    def iter_conversations(self, limit: int | None = None):
+        """
+        Recorre las conversaciones guardadas, para re-jugarlas offline.
+
+        Args:
+            limit (int | None): Máximo de sesiones (las usadas más recientemente primero).
+
+        Yields:
+            tuple[str, list[tuple[str, str]]]: ID de la sesión y sus turnos en
+                orden, como pares (consulta cruda, intención registrada).
+        """
+        rows = self._db.execute(
+            "SELECT id FROM sessions WHERE turns > 0 ORDER BY updated_at DESC LIMIT ?",
+            (-1 if limit is None else limit,),
+        ).fetchall()
+        for (session_id,) in rows:
+            turns = self._db.execute(
+                "SELECT user, intent FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            yield session_id, turns
+
+    def append_turn(
+        self,
+        session_id: str,
+        user_query: str,
+        response: AdvisorResponse,
+        summary: str,
+        folded_turns: int,
+        folded_tokens: int,
+    ) -> int:
+        """
+        Agrega un turno y actualiza el resumen de la sesión en una sola transacción.
+
+        Args:
+            session_id (str): Identificador de la sesión (ya abierta con `open`).
+            user_query (str): Consulta cruda del usuario.
+            response (AdvisorResponse): Respuesta validada.
+            summary (str): Resumen vigente de los turnos plegados.
+            folded_turns (int): Turnos cubiertos por el resumen, contados desde el
+                                primero de la sesión (incluye los descartados por `clear`).
+            folded_tokens (int): Tokens que ocupaban esos turnos.
+
+        Returns:
+            int: Número de secuencia del turno (desde 1).
+        """
+        now = time.time()
+        actions = ",".join(action.value for action in response.recommended_actions)
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "UPDATE sessions SET turns = turns + 1, summary = ?, folded_turns = ?,"
+                    " folded_tokens = ?, updated_at = ? WHERE id = ?",
+                    (summary, folded_turns, folded_tokens, now, session_id),
+                )
+                (seq,) = self._db.execute("SELECT turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                self._db.execute(
+                    "INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        session_id,
+                        seq,
+                        user_query,
+                        response.answer,
+                        response.confidence_score,
+                        response.intent.value,
+                        actions,
+                        response.reasoning,
+                        now,
+                    ),
+                )
+        return seq
+
+    def clear(self, session_id: str) -> int:
+        """
+        Empieza de cero la conversación de una sesión sin borrar sus turnos:
+        todo lo anterior queda fuera de la ventana y sin resumen.
+
+        Returns:
+            int: Turnos descartados, desde donde cuenta `folded_turns` en adelante.
+        """
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "UPDATE sessions SET summary = '', folded_turns = turns, folded_tokens = 0,"
+                    " updated_at = ? WHERE id = ?",
+                    (time.time(), session_id),
+                )
+                row = self._db.execute("SELECT turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._db.close()
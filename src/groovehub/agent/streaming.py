@@ -0,0 +1,117 @@
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class AnswerStreamParser:
+    """
+    Parser JSON incremental que extrae un campo de texto mientras llega el stream.
+
+    Recorre cada fragmento una sola vez, llevando el estado mínimo (profundidad,
+    si está dentro de un string, escapes pendientes) para reconocer la clave
+    `field` del objeto raíz y decodificar su valor carácter a carácter, incluso
+    si un escape o un par sustituto `\\uXXXX` queda partido entre fragmentos.
+    No valida el documento: eso lo hace Pydantic cuando el objeto está completo.
+    """
+
+    def __init__(self, field: str = "answer"):
+        """
+        Args:
+            field (str): Clave del objeto raíz cuyo valor se quiere extraer.
+        """
+        self.field = field
+        self.value = ""
+        self.done = False
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: str | None = None
+        self._high_surrogate: int | None = None
+        self._expect_key = False
+        self._is_key = False
+        self._capturing = False
+        self._key_chars: list[str] = []
+        self._value_key: str | None = None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Procesa un fragmento del stream.
+
+        Args:
+            chunk (str): Texto crudo recibido del modelo.
+
+        Returns:
+            str: Los caracteres nuevos del campo buscado (puede ser vacío).
+        """
+        out: list[str] = []
+        for ch in chunk:
+            if self._in_string:
+                self._feed_string_char(ch, out)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._is_key = self._depth == 1 and self._expect_key
+                self._capturing = (
+                    self._depth == 1
+                    and not self._is_key
+                    and self._value_key == self.field
+                    and not self.done
+                )
+                self._key_chars = []
+            elif ch in "{[":
+                self._depth += 1
+                self._expect_key = self._depth == 1 and ch == "{"
+            elif ch in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._value_key = None
+
+        text = "".join(out)
+        self.value += text
+        return text
+
+    def _feed_string_char(self, ch: str, out: list):
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                code = int(self._unicode, 16)
+                self._unicode = None
+                self._emit_code_unit(code, out)
+            return
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self._emit(_ESCAPES.get(ch, ch), out)
+            return
+        if ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._is_key:
+                self._value_key = "".join(self._key_chars)
+            elif self._capturing:
+                self._capturing = False
+                self.done = True
+        else:
+            self._emit(ch, out)
+
+    def _emit_code_unit(self, code: int, out: list):
+        # Los caracteres fuera del BMP (emojis) llegan como par sustituto
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(code), out)
+
+    def _emit(self, text: str, out: list):
+        if self._capturing:
+            out.append(text)
+        elif self._is_key:
+            self._key_chars.append(text)
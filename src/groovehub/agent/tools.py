@@ -0,0 +1,442 @@
+import asyncio
+import contextvars
+import inspect
+import itertools
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Iterable, NamedTuple
+
+from groovehub.models.response import AdvisorAction
+from groovehub.observability.tracing import span, traced
+from groovehub.services.catalog import Catalog, Product, normalize
+
+# Rondas de llamadas a herramientas por turno; después de la última, el
+# modelo tiene que responder con lo que ya obtuvo
+DEFAULT_MAX_ROUNDS = 2
+# Tiempo máximo de cada herramienta; si se pasa, el modelo recibe un error
+DEFAULT_TIMEOUT_S = 2.0
+# Hilos para los handlers síncronos (compartidos por todas las sesiones)
+DEFAULT_MAX_WORKERS = 8
+# Productos que devuelve una búsqueda
+RESULT_LIMIT = 3
+
+
+class ToolCall(NamedTuple):
+    """Llamada a una herramienta pedida por el modelo."""
+    id: str
+    name: str
+    # Argumentos en JSON, tal como los generó el modelo
+    arguments: str
+
+
+class ToolResult(NamedTuple):
+    """Resultado de ejecutar una llamada."""
+    call: ToolCall
+    # Lo que se le devuelve al modelo (con 'error' si falló)
+    content: dict
+    # 'ok', 'error' o 'timeout'
+    status: str
+    latency_ms: float
+
+
+class ToolHandler:
+    """
+    Interfaz de una herramienta que el modelo puede llamar.
+
+    Una subclase define `name` (el valor de `AdvisorAction` que resuelve, u
+    otro nombre), `description`, el esquema JSON de sus argumentos en
+    `parameters` y `run`, que recibe los argumentos ya parseados y devuelve un
+    diccionario serializable. `run` puede ser síncrono (corre en el pool de
+    hilos del `ToolRunner`) o `async` (corre en el event loop). Las que vienen
+    acá usan el catálogo local o reglas fijas; para conectar un sistema real
+    (inventario, tickets, transporte) alcanza con otra subclase del mismo nombre.
+    """
+
+    name: str = ""
+    description: str = ""
+    parameters: dict = {"type": "object", "properties": {}}
+    # Tiempo máximo propio (None = el del runner)
+    timeout_s: float | None = None
+
+    def run(self, arguments: dict) -> dict:
+        raise NotImplementedError
+
+    def spec(self) -> dict:
+        """Definición en el formato de `tools` de chat completions."""
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+
+
+def _product(product: Product) -> dict:
+    return {
+        "sku": product.sku,
+        "name": product.name,
+        "brand": product.brand,
+        "price": product.price,
+        "stock": product.stock,
+    }
+
+
+class CheckStockTool(ToolHandler):
+    """`check_stock` contra el catálogo local."""
+
+    name = AdvisorAction.CHECK_STOCK.value
+    description = "Consulta precio y stock de un producto específico del catálogo de la tienda."
+    parameters = {
+        "type": "object",
+        "properties": {"product": {"type": "string", "description": "Nombre, marca o modelo del producto."}},
+        "required": ["product"],
+    }
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def run(self, arguments: dict) -> dict:
+        matches = self.catalog.lookup(arguments["product"], limit=RESULT_LIMIT).matches
+        return {"products": [_product(p) for p in matches], "found": bool(matches)}
+
+
+class ShowCatalogTool(ToolHandler):
+    """`show_catalog`: productos en stock de una categoría, del más barato al más caro."""
+
+    name = AdvisorAction.SHOW_CATALOG.value
+    description = "Lista productos disponibles relacionados con lo que busca el cliente, con un precio máximo opcional."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "Qué busca el cliente (categoría, estilo, uso)."},
+            "max_price": {"type": "number", "description": "Precio máximo en USD."},
+        },
+        "required": ["query"],
+    }
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def run(self, arguments: dict) -> dict:
+        hits = self.catalog.lookup(arguments["query"], limit=RESULT_LIMIT)
+        products = hits.related or hits.matches
+        max_price = arguments.get("max_price")
+        if max_price is not None:
+            products = [p for p in products if p.price <= max_price]
+        return {"products": [_product(p) for p in products]}
+
+
+class OfferDiscountTool(ToolHandler):
+    """`offer_discount` con una regla fija: más descuento cuanto más caro el producto."""
+
+    name = AdvisorAction.OFFER_DISCOUNT.value
+    description = "Calcula el descuento que se le puede ofrecer al cliente por un producto."
+    parameters = {
+        "type": "object",
+        "properties": {"product": {"type": "string", "description": "Producto por el que duda el cliente."}},
+        "required": ["product"],
+    }
+    # (precio desde, porcentaje), del tramo más alto al más bajo
+    TIERS = ((500.0, 10), (150.0, 7), (0.0, 5))
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def run(self, arguments: dict) -> dict:
+        matches = self.catalog.lookup(arguments["product"], limit=1).matches
+        if not matches:
+            return {"error": "Producto no encontrado en el catálogo"}
+        product = matches[0]
+        percent = next(p for floor, p in self.TIERS if product.price >= floor)
+        return {
+            "sku": product.sku,
+            "percent": percent,
+            "final_price": round(product.price * (100 - percent) / 100, 2),
+            "code": f"GROOVE{percent}",
+        }
+
+
+class EscalateToHumanTool(ToolHandler):
+    """
+    `escalate_to_human`: abre un ticket en una cola en memoria.
+
+    La cola se atiende a razón de un ticket cada `MINUTES_PER_TICKET`, así
+    que la espera estimada baja a medida que pasa el tiempo. Solo se guardan
+    los últimos `MAX_RECENT_TICKETS`: con `serve` una misma instancia atiende
+    a todas las sesiones durante toda la vida del proceso.
+    """
+
+    name = AdvisorAction.ESCALATE_TO_HUMAN.value
+    description = "Deriva la conversación a una persona del equipo (enojo, reclamo o problema complejo)."
+    parameters = {
+        "type": "object",
+        "properties": {"reason": {"type": "string", "description": "Motivo de la derivación, en una frase."}},
+        "required": ["reason"],
+    }
+    # Minutos que lleva atender cada ticket
+    MINUTES_PER_TICKET = 5
+    # Tickets recientes que se conservan para consulta
+    MAX_RECENT_TICKETS = 100
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Args:
+            clock (Callable[[], float]): Reloj en segundos (inyectable en tests).
+        """
+        self.tickets: deque[dict] = deque(maxlen=self.MAX_RECENT_TICKETS)
+        self._ids = itertools.count(1)
+        self._clock = clock
+        # Instante en que la cola termina con los tickets ya abiertos
+        self._free_at = 0.0
+        # Los handlers síncronos corren en varios hilos a la vez
+        self._lock = threading.Lock()
+
+    def run(self, arguments: dict) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._free_at = max(now, self._free_at) + self.MINUTES_PER_TICKET * 60
+            ticket = {"ticket": f"H-{next(self._ids):04d}", "reason": arguments["reason"]}
+            self.tickets.append(ticket)
+            eta_minutes = math.ceil((self._free_at - now) / 60)
+        return {"ticket": ticket["ticket"], "eta_minutes": eta_minutes}
+
+
+class QuoteShippingTool(ToolHandler):
+    """
+    Cotiza un envío con una tabla fija por destino. No es un `AdvisorAction`,
+    pero completa las consultas de 'shipping_info' ("¿cuánto sale mandarlo a Salta?").
+    """
+
+    name = "quote_shipping"
+    description = "Cotiza costo y plazo de envío de un producto a una ciudad o provincia."
+    parameters = {
+        "type": "object",
+        "properties": {
+            "destination": {"type": "string", "description": "Ciudad o provincia de destino."},
+            "product": {"type": "string", "description": "Producto a enviar (opcional)."},
+        },
+        "required": ["destination"],
+    }
+    # Destino (normalizado) -> (costo USD, días hábiles)
+    RATES = {"caba": (0.0, 1), "buenos aires": (8.0, 2), "cordoba": (12.0, 3), "rosario": (12.0, 3), "mendoza": (15.0, 4)}
+    DEFAULT_RATE = (18.0, 5)
+    # Desde este precio el envío es gratis
+    FREE_FROM = 300.0
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def run(self, arguments: dict) -> dict:
+        destination = normalize(arguments["destination"])
+        cost, days = next((rate for place, rate in self.RATES.items() if place in destination), self.DEFAULT_RATE)
+        product = arguments.get("product")
+        matches = self.catalog.lookup(product, limit=1).matches if product else []
+        if matches and matches[0].price >= self.FREE_FROM:
+            cost = 0.0
+        return {"destination": arguments["destination"], "cost_usd": cost, "business_days": days}
+
+
+class ToolRunner:
+    """
+    Ejecuta las llamadas a herramientas de una ronda del modelo.
+
+    Todas las llamadas de una ronda corren a la vez (handlers síncronos en un
+    pool de hilos, los `async` en el event loop), cada una con su propio
+    tiempo máximo: la ronda tarda lo que la herramienta más lenta, no la suma.
+    Una llamada que falla, se pasa de tiempo o nombra una herramienta
+    desconocida no corta el turno: el modelo recibe el error y sigue.
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[ToolHandler],
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        max_rounds: int = DEFAULT_MAX_ROUNDS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Args:
+            handlers (Iterable[ToolHandler]): Herramientas disponibles.
+            timeout_s (float): Tiempo máximo por herramienta (si no define uno propio).
+            max_rounds (int): Rondas de herramientas por turno.
+            max_workers (int): Hilos para los handlers síncronos.
+        """
+        self.handlers = {handler.name: handler for handler in handlers}
+        self.timeout_s = timeout_s
+        self.max_rounds = max_rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="groovehub-tools")
+
+    def request_params(self, last_round: bool = False) -> dict:
+        """
+        Parámetros de la petición al LLM.
+
+        Args:
+            last_round (bool): Si ya no quedan rondas, el modelo tiene que responder
+                               (`tool_choice='none'`, con las definiciones igual presentes
+                               porque el historial ya tiene llamadas).
+
+        Returns:
+            dict: `tools` y `tool_choice`.
+        """
+        return {
+            "tools": [handler.spec() for handler in self.handlers.values()],
+            "tool_choice": "none" if last_round else "auto",
+        }
+
+    def _timeout(self, call: ToolCall) -> float:
+        handler = self.handlers.get(call.name)
+        return handler.timeout_s if handler is not None and handler.timeout_s is not None else self.timeout_s
+
+    def _prepare(self, call: ToolCall) -> tuple[ToolHandler, dict]:
+        handler = self.handlers.get(call.name)
+        if handler is None:
+            raise LookupError(f"Herramienta desconocida: {call.name}")
+        arguments = json.loads(call.arguments or "{}")
+        if not isinstance(arguments, dict):
+            raise ValueError("Los argumentos tienen que ser un objeto JSON")
+        return handler, arguments
+
+    def _invoke(self, call: ToolCall) -> dict:
+        # Corre en un hilo del pool, con el contexto (y la traza) del turno
+        with span("agent.tool", tool=call.name):
+            handler, arguments = self._prepare(call)
+            content = handler.run(arguments)
+            if inspect.iscoroutine(content):
+                # Un handler async en modo síncrono corre en un loop propio dentro del hilo
+                content = asyncio.run(content)
+            return content
+
+    def _timed(self, call: ToolCall) -> tuple[dict, float]:
+        return self._invoke(call), time.perf_counter()
+
+    @staticmethod
+    def _result(
+        call: ToolCall,
+        start: float,
+        content=None,
+        error: BaseException | None = None,
+        end: float | None = None,
+    ) -> ToolResult:
+        latency_ms = round(((end or time.perf_counter()) - start) * 1000, 3)
+        if error is None:
+            return ToolResult(call, content, "ok", latency_ms)
+        if isinstance(error, (TimeoutError, FutureTimeoutError, asyncio.TimeoutError)):
+            return ToolResult(call, {"error": "La herramienta no respondió a tiempo"}, "timeout", latency_ms)
+        return ToolResult(call, {"error": str(error) or type(error).__name__}, "error", latency_ms)
+
+    @traced("agent.tools")
+    def run(self, calls: list[ToolCall]) -> list[ToolResult]:
+        """
+        Ejecuta en paralelo las llamadas de una ronda (modo síncrono).
+
+        Args:
+            calls (list[ToolCall]): Llamadas pedidas por el modelo.
+
+        Returns:
+            list[ToolResult]: Un resultado por llamada, en el mismo orden.
+        """
+        start = time.perf_counter()
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self._timed, call) for call in calls
+        ]
+        results = [None] * len(calls)
+        # Se espera primero a las de menor tiempo máximo, así un timeout corto
+        # no se detecta recién cuando terminó la herramienta más lenta
+        for i in sorted(range(len(calls)), key=lambda i: self._timeout(calls[i])):
+            call, future = calls[i], futures[i]
+            remaining = self._timeout(call) - (time.perf_counter() - start)
+            try:
+                content, end = future.result(timeout=max(remaining, 0))
+                results[i] = self._result(call, start, content, end=end)
+            except Exception as e:
+                # Un handler colgado sigue ocupando su hilo, pero el turno no lo espera
+                future.cancel()
+                results[i] = self._result(call, start, error=e)
+        return results
+
+    @traced("agent.tools")
+    async def run_async(self, calls: list[ToolCall]) -> list[ToolResult]:
+        """
+        Versión asíncrona de `run`: los handlers `async` corren en el event loop
+        y los síncronos en el pool de hilos, sin bloquearlo.
+
+        Args:
+            calls (list[ToolCall]): Llamadas pedidas por el modelo.
+
+        Returns:
+            list[ToolResult]: Un resultado por llamada, en el mismo orden.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def invoke_async(call: ToolCall) -> dict:
+            with span("agent.tool", tool=call.name):
+                handler, arguments = self._prepare(call)
+                return await handler.run(arguments)
+
+        async def invoke(call: ToolCall) -> ToolResult:
+            start = time.perf_counter()
+            handler = self.handlers.get(call.name)
+            if handler is not None and inspect.iscoroutinefunction(handler.run):
+                work = invoke_async(call)
+            else:
+                context = contextvars.copy_context()
+                work = loop.run_in_executor(self._executor, context.run, self._invoke, call)
+            try:
+                return self._result(call, start, await asyncio.wait_for(work, self._timeout(call)))
+            except Exception as e:
+                return self._result(call, start, error=e)
+
+        return list(await asyncio.gather(*(invoke(call) for call in calls)))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def default_tools(catalog: Catalog, **kwargs) -> ToolRunner:
+    """
+    Arma el runner con las herramientas locales: una por cada `AdvisorAction`
+    (salvo 'none') más la cotización de envíos.
+
+    Args:
+        catalog (Catalog): Catálogo local.
+        **kwargs: Opciones de `ToolRunner` (timeout_s, max_rounds, max_workers).
+
+    Returns:
+        ToolRunner: El runner listo para pasarle a `MusicAgent`.
+    """
+    handlers = [
+        CheckStockTool(catalog),
+        ShowCatalogTool(catalog),
+        OfferDiscountTool(catalog),
+        EscalateToHumanTool(),
+        QuoteShippingTool(catalog),
+    ]
+    return ToolRunner(handlers, **kwargs)
+
+
+def tool_messages(content: str | None, results: list[ToolResult]) -> list[dict]:
+    """
+    Mensajes que se agregan al prompt después de una ronda: el del asistente
+    con sus `tool_calls` y uno de rol 'tool' por resultado.
+
+    Args:
+        content (str | None): Texto que el modelo haya devuelto junto con las llamadas.
+        results (list[ToolResult]): Resultados de la ronda.
+
+    Returns:
+        list[dict]: Mensajes en el formato de chat completions.
+    """
+    assistant = {
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {"id": r.call.id, "type": "function", "function": {"name": r.call.name, "arguments": r.call.arguments}}
+            for r in results
+        ],
+    }
+    return [assistant] + [
+        {"role": "tool", "tool_call_id": r.call.id, "content": json.dumps(r.content, ensure_ascii=False)}
+        for r in results
+    ]
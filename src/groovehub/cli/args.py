@@ -0,0 +1,245 @@
+import argparse
+
+
+def _shared_options(subcommand: bool = False) -> argparse.ArgumentParser:
+    """
+    Opciones que valen igual para el chat, `batch` y `serve`, en un parser padre.
+
+    Se aceptan antes o después del subcomando (`groove --tools batch ...` o
+    `groove batch ... --tools`). La copia de los subcomandos no tiene valores
+    por defecto: si los tuviera, pisarían lo escrito antes del subcomando.
+
+    Args:
+        subcommand (bool): Arma la copia para un subcomando.
+
+    Returns:
+        argparse.ArgumentParser: Parser sin ayuda propia, para usar en `parents`.
+    """
+    parser = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS if subcommand else None)
+    parser.add_argument(
+        "--hedge-ms",
+        type=int,
+        help="Si un proveedor tarda más que esto, repite la petición en otro y usa la primera respuesta.",
+    )
+    parser.add_argument(
+        "--catalog",
+        help="Catálogo de productos (CSV o JSON) para check_stock/show_catalog (default: el de ejemplo).",
+    )
+    parser.add_argument(
+        "--leak-action",
+        choices=("redact", "block", "off"),
+        help="Qué hacer si una respuesta repite el System Prompt: tapar el fragmento, bloquearla o nada.",
+    )
+    parser.add_argument(
+        "--no-rate-limit",
+        dest="rate_limit",
+        action="store_false",
+        help="No regula las llamadas según los límites RPM/TPM de cada proveedor (<NOMBRE>_RPM, <NOMBRE>_TPM).",
+    )
+    parser.add_argument(
+        "--route",
+        choices=("strong", "fast", "auto"),
+        help="Nivel de modelo por turno: siempre el fuerte, siempre el rápido o según la consulta (con escalamiento).",
+    )
+    parser.add_argument(
+        "--escalate-below",
+        type=float,
+        metavar="C",
+        help="Con --route fast/auto, rehace con el modelo fuerte las respuestas rápidas con confianza menor a C (default: 0.6).",
+    )
+    parser.add_argument(
+        "--faq",
+        action="store_true",
+        help="Responde el primer turno desde el banco de preguntas frecuentes (ver `groove mine-faq`), si existe.",
+    )
+    parser.add_argument(
+        "--tools",
+        action="store_true",
+        help="El modelo puede consultar stock, catálogo, descuentos y envíos (herramientas locales) antes de responder.",
+    )
+    if not subcommand:
+        parser.set_defaults(leak_action="redact", route="strong")
+    return parser
+
+
+def parse_args(argv: list | None = None) -> argparse.Namespace:
+    """
+    Interpreta los argumentos de línea de comandos.
+
+    Args:
+        argv (list | None): Argumentos a interpretar; por defecto `sys.argv[1:]`.
+
+    Returns:
+        argparse.Namespace: Opciones de ejecución.
+    """
+    parser = argparse.ArgumentParser(prog="groove", description="Groove Hub CLI", parents=[_shared_options()])
+    parser.add_argument(
+        "--no-stream",
+        dest="stream",
+        action="store_false",
+        help="Espera la respuesta completa en lugar de mostrarla a medida que llega.",
+    )
+    parser.add_argument(
+        "--no-fast-path",
+        dest="fast_path",
+        action="store_false",
+        help="Envía todas las consultas al LLM (desactiva el clasificador local off-topic).",
+    )
+    parser.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="Abre en segundo plano la conexión TLS con los proveedores antes de la primera consulta.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Mide el costo de importación e inicialización de cada fase del arranque y sale.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Expone las métricas en formato Prometheus en http://127.0.0.1:<puerto>/metrics.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Después de cada turno muestra cuánto tardó cada etapa (seguridad, prompt, HTTP, validación, log...).",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Con --profile, agrega la variación de memoria de cada etapa (tracemalloc; más lento).",
+    )
+    parser.add_argument(
+        "--trace-out",
+        default=None,
+        help="Exporta las trazas: '.jsonl' agrega un span por línea; otro nombre escribe formato Chrome al salir.",
+    )
+    parser.add_argument(
+        "--few-shot",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Envía solo los K ejemplos más parecidos a cada consulta (de un banco local) en lugar de los fijos.",
+    )
+    parser.add_argument(
+        "--no-prefetch",
+        dest="prefetch",
+        action="store_false",
+        help="No precarga resultados del catálogo mientras se espera al LLM.",
+    )
+    parser.add_argument(
+        "--max-queue-wait",
+        type=float,
+        default=None,
+        metavar="S",
+        help="Espera estimada máxima de una consulta interactiva antes de rechazarla (default: 10 s).",
+    )
+    session = parser.add_mutually_exclusive_group()
+    session.add_argument(
+        "--session",
+        default=None,
+        help="Crea o retoma la conversación con este ID (se guarda en metrics/sessions.sqlite).",
+    )
+    session.add_argument(
+        "--resume",
+        action="store_true",
+        help="Retoma la conversación usada más recientemente.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser(
+        "batch",
+        help="Procesa un archivo JSONL de consultas sin interacción.",
+        parents=[_shared_options(subcommand=True)],
+    )
+    batch.add_argument("input", help="Archivo JSONL de entrada.")
+    batch.add_argument("output", help="Archivo JSONL de resultados (reanudable).")
+    batch.add_argument("--concurrency", type=int, default=8, help="Consultas simultáneas (default: 8).")
+    batch.add_argument("--field", default="query", help="Campo con la consulta (default: query).")
+    batch.add_argument("--id-field", default="id", help="Campo con el ID (default: id).")
+    batch.add_argument(
+        "--few-shot",
+        type=int,
+        default=argparse.SUPPRESS,
+        metavar="K",
+        help="Envía solo los K ejemplos más parecidos a cada consulta en lugar de los fijos.",
+    )
+    batch.add_argument(
+        "--no-fast-path",
+        dest="fast_path",
+        action="store_false",
+        default=argparse.SUPPRESS,
+        help="Envía todas las consultas al LLM (desactiva el clasificador local off-topic).",
+    )
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="Servidor HTTP/WebSocket multi-cliente para el chat de la tienda.",
+        parents=[_shared_options(subcommand=True)],
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (default: 127.0.0.1).")
+    serve.add_argument("--port", type=int, default=8080, help="Puerto (default: 8080).")
+    serve.add_argument("--max-sessions", type=int, default=None, help="Sesiones en memoria (default: 10000).")
+    serve.add_argument("--idle-timeout", type=float, default=None, help="Segundos sin actividad antes de desalojar (default: 900).")
+    serve.add_argument("--max-memory-mb", type=float, default=None, help="Tope de memoria de las sesiones (default: 256).")
+    serve.add_argument("--no-persist", dest="persist", action="store_false", help="No guarda las conversaciones en SQLite.")
+    serve.add_argument(
+        "--max-queue-wait",
+        type=float,
+        default=argparse.SUPPRESS,
+        metavar="S",
+        help="Espera estimada máxima de una consulta antes de rechazarla con 429 (default: 10 s).",
+    )
+
+    stats = subparsers.add_parser(
+        "stats", help="Estadísticas del log de interacciones (latencia, costo, intenciones, confianza)."
+    )
+    stats.add_argument("--log-dir", default="metrics", help="Directorio del log (default: metrics).")
+    stats.add_argument("--since", default=None, help="Desde esta fecha u hora ISO (inclusive).")
+    stats.add_argument("--until", default=None, help="Hasta esta fecha (inclusive) u hora ISO (exclusive).")
+    stats.add_argument("--intent", action="append", default=None, help="Solo esta intención (repetible).")
+    stats.add_argument(
+        "--compact",
+        action="store_true",
+        help="Antes de calcular, pasa lo nuevo del log al formato columnar (metrics/columnar/).",
+    )
+    stats.add_argument("--no-columnar", dest="columnar", action="store_false", help="Ignora la versión compactada.")
+    stats.add_argument("--json", action="store_true", help="Imprime el reporte en JSON.")
+
+    route_eval = subparsers.add_parser(
+        "route-eval",
+        help="Re-juega conversaciones guardadas con cada política de --route y compara costo, latencia e intención.",
+    )
+    route_eval.add_argument("--sessions", default=None, help="Base de sesiones (default: metrics/sessions.sqlite).")
+    route_eval.add_argument("--limit", type=int, default=50, help="Conversaciones a re-jugar, las más recientes (default: 50).")
+    route_eval.add_argument(
+        "--policy",
+        action="append",
+        choices=("strong", "fast", "auto"),
+        default=None,
+        help="Política a evaluar (repetible; default: las tres).",
+    )
+    route_eval.add_argument("--concurrency", type=int, default=8, help="Conversaciones simultáneas (default: 8).")
+    route_eval.add_argument("--json", action="store_true", help="Imprime el reporte en JSON.")
+
+    train = subparsers.add_parser(
+        "train-intent", help="Entrena el clasificador local de intención con el log de métricas."
+    )
+    train.add_argument("--log-dir", default="metrics", help="Directorio del log (default: metrics).")
+    train.add_argument("--output", default=None, help="Dónde guardar el modelo (default: metrics/intent_model.json).")
+    train.add_argument("--threshold", type=float, default=None, help="Umbral del atajo off-topic (default: 0.85).")
+
+    mine = subparsers.add_parser(
+        "mine-faq", help="Agrupa las preguntas casi iguales del log y guarda sus respuestas para servirlas sin LLM."
+    )
+    mine.add_argument("--log-dir", default="metrics", help="Directorio del log (default: metrics).")
+    mine.add_argument("--output", default=None, help="Dónde guardar el banco (default: metrics/faq_index.json).")
+    mine.add_argument("--threshold", type=float, default=None, help="Similitud de Jaccard mínima (default: 0.7).")
+    mine.add_argument("--min-support", type=int, default=None, help="Turnos mínimos por pregunta (default: 3).")
+    mine.add_argument(
+        "--min-confidence", type=float, default=None, help="Confianza mínima de la respuesta guardada (default: 0.85)."
+    )
+
+    return parser.parse_args(argv)
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import os
+import time
+
+from pydantic import ValidationError
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import TurnOutcome, run_turn_async
+from groovehub.agent.repair import ADVISOR_SCHEMA
+from groovehub.agent.faq import FaqIndex
+from groovehub.agent.fewshot import FewShotSelector
+from groovehub.agent.intent import IntentFastPath
+from groovehub.agent.router import ModelRouter
+from groovehub.agent.tools import ToolRunner
+from groovehub.guardrails.leakage import LeakGuard
+from groovehub.observability.metrics import MetricsTracker, percentile
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.cache import CompletionCache
+from groovehub.services.llm import AsyncLLMService
+from groovehub.services.scheduler import BATCH, RateLimitedError
+
+# Estados que cuentan como "terminado" al reanudar; los errores se reintentan
+COMPLETED_STATUSES = ("ok", "blocked")
+# Veces que una consulta rechazada por el planificador se reintenta (tras el
+# `retry_after` sugerido) antes de registrarla como error
+MAX_RATE_LIMIT_RETRIES = 5
+
+
+def load_completed_ids(output_path: str) -> set:
+    """
+    Lee los IDs ya procesados de un archivo de salida previo.
+
+    Tolera una última línea truncada (por ejemplo, tras un corte abrupto).
+
+    Args:
+        output_path (str): Archivo JSONL de resultados.
+
+    Returns:
+        set: IDs cuyo estado es 'ok' o 'blocked'.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") in COMPLETED_STATUSES:
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def iter_queries(input_path: str, query_field: str, id_field: str):
+    """
+    Recorre el archivo de entrada línea a línea, sin cargarlo completo.
+
+    Args:
+        input_path (str): Archivo JSONL de consultas.
+        query_field (str): Campo que contiene el texto de la consulta.
+        id_field (str): Campo con el identificador; si falta se usa el número de línea.
+
+    Yields:
+        tuple[int, str, str | None]: Índice, ID y consulta (None si la línea es inválida).
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                yield index, f"line-{index}", None
+                continue
+            query_id = record.get(id_field)
+            yield index, str(query_id if query_id is not None else f"line-{index}"), record.get(query_field)
+
+
+async def run_turn_with_retries(agent: MusicAgent, tracker: MetricsTracker, query: str) -> tuple[TurnOutcome, int]:
+    """
+    Corre un turno sin registrarlo en el log; si el planificador lo rechaza,
+    lo reintenta tras la espera sugerida (hasta `MAX_RATE_LIMIT_RETRIES` veces).
+
+    Args:
+        agent (MusicAgent): Sesión que atiende la consulta.
+        tracker (MetricsTracker): Tracker compartido.
+        query (str): Consulta del usuario.
+
+    Returns:
+        tuple[TurnOutcome, int]: El resultado del turno y los reintentos que hicieron falta.
+
+    Raises:
+        RateLimitedError: Si se rechazó también en el último intento.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            return await run_turn_async(agent, tracker, query, save_log=False), attempt
+        except RateLimitedError as e:
+            if attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    query_field: str = "query",
+    id_field: str = "id",
+    llm: AsyncLLMService | None = None,
+    token_counter: TokenCounter | None = None,
+    output_guard: LeakGuard | None = None,
+    router: ModelRouter | None = None,
+    faq: FaqIndex | None = None,
+    tools: ToolRunner | None = None,
+    few_shot: FewShotSelector | None = None,
+    fast_path: IntentFastPath | None = None,
+) -> dict:
+    """
+    Procesa un archivo JSONL de consultas con concurrencia acotada.
+
+    Cada consulta pasa por `SecurityFilter` y por un `MusicAgent` sin memoria
+    previa que comparte el servicio LLM asíncrono. Los resultados se agregan a
+    `output_path` apenas terminan, etiquetados con el índice y el ID de
+    entrada; al reanudar se omiten los IDs ya completados.
+
+    Sus llamadas van al planificador con prioridad 'batch' (detrás de las
+    interactivas); si las rechaza, se reintentan tras la espera sugerida.
+
+    Args:
+        input_path (str): Archivo JSONL de entrada.
+        output_path (str): Archivo JSONL de resultados (se agrega al final).
+        concurrency (int): Máximo de consultas en vuelo.
+        query_field (str): Campo con el texto de la consulta.
+        id_field (str): Campo con el identificador de la consulta.
+        llm (AsyncLLMService | None): Servicio a usar; por defecto uno con caché.
+        token_counter (TokenCounter | None): Contador de tokens compartido.
+        output_guard (LeakGuard | None): Guardrail de salida (respuestas que repiten el prompt).
+        router (ModelRouter | None): Elige el nivel de modelo de cada consulta.
+        faq (FaqIndex | None): Banco de preguntas frecuentes (responde sin LLM las conocidas).
+        tools (ToolRunner | None): Herramientas que el modelo puede llamar (compartidas).
+        few_shot (FewShotSelector | None): Ejemplos dinámicos en lugar de los fijos del prompt.
+        fast_path (IntentFastPath | None): Clasificador local que responde sin LLM las off-topic claras.
+
+    Returns:
+        dict: Resumen de throughput, latencia, costo y conteos por estado.
+    """
+    if llm is None:
+        llm = AsyncLLMService(cache=CompletionCache(), response_schema=ADVISOR_SCHEMA)
+    tracker = MetricsTracker(token_counter=token_counter)
+    completed = load_completed_ids(output_path)
+
+    counts = {"ok": 0, "blocked": 0, "error": 0, "skipped": 0}
+    rate_limited = 0
+    latencies = []
+    total_cost = 0.0
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        # Si un corte dejó la última línea truncada, empezamos en una línea nueva
+        if not _ends_with_newline(output_path):
+            out.write("\n")
+
+        async def process(index: int, query_id: str, query: str | None):
+            nonlocal total_cost, rate_limited
+            result = {"index": index, "id": query_id}
+            try:
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError(f"Campo '{query_field}' ausente o vacío")
+                agent = MusicAgent(
+                    llm=llm,
+                    token_counter=tracker.tokens,
+                    output_guard=output_guard,
+                    priority=BATCH,
+                    router=router,
+                    faq=faq,
+                    tools=tools,
+                    few_shot=few_shot,
+                    fast_path=fast_path,
+                )
+                outcome, retries = await run_turn_with_retries(agent, tracker, query)
+                rate_limited += retries
+                if outcome.blocked_reason is not None:
+                    result.update(status="blocked", reason=outcome.blocked_reason)
+                elif outcome.metrics["output_status"] == "failed":
+                    result.update(status="error", error="Salida del modelo inválida incluso tras re-preguntar")
+                else:
+                    result.update(
+                        status="ok",
+                        response=outcome.response.model_dump(mode="json"),
+                        metrics=outcome.metrics,
+                    )
+                    latencies.append(outcome.metrics["latency_ms"])
+                    total_cost += outcome.metrics["cost_usd"]
+            except (ValidationError, ValueError) as e:
+                result.update(status="error", error=str(e))
+            except Exception as e:
+                result.update(status="error", error=f"{type(e).__name__}: {e}")
+            finally:
+                semaphore.release()
+
+            counts[result["status"]] += 1
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+        for index, query_id, query in iter_queries(input_path, query_field, id_field):
+            if query_id in completed:
+                counts["skipped"] += 1
+                continue
+            # Backpressure: no leemos más entrada hasta que haya un lugar libre
+            await semaphore.acquire()
+            task = asyncio.create_task(process(index, query_id, query))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - start
+    tracker.close()
+    processed = counts["ok"] + counts["blocked"] + counts["error"]
+    return {
+        **counts,
+        "processed": processed,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_qps": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_max_ms": max(latencies, default=0),
+        "cost_usd": round(total_cost, 6),
+        "rate_limited_retries": rate_limited,
+    }
+
+
+def print_summary(summary: dict):
+    """
+    Imprime el resumen de una corrida batch.
+
+    Args:
+        summary (dict): Resultado de `run_batch`.
+    """
+    print("\n--- 📦 Resumen del batch ---")
+    print(
+        f"✅ OK: {summary['ok']} | 🚫 Bloqueadas: {summary['blocked']} | "
+        f"💥 Errores: {summary['error']} | ⏭️  Omitidas: {summary['skipped']}"
+    )
+    print(f"⏱️  Tiempo total: {summary['elapsed_s']} s ({summary['throughput_qps']} consultas/s)")
+    print(
+        f"📈 Latencia p50/p95/max: {summary['latency_p50_ms']} / "
+        f"{summary['latency_p95_ms']} / {summary['latency_max_ms']} ms"
+    )
+    print(f"💰 Costo Est.: ${summary['cost_usd']:.6f}")
+    if summary["rate_limited_retries"]:
+        print(f"🚦 Reintentos por límite de cuota: {summary['rate_limited_retries']}")
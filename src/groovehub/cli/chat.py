@@ -0,0 +1,396 @@
+from colorama import Fore, Style
+from pydantic import ValidationError
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.faq import load_if_exists
+from groovehub.agent.fewshot import FewShotSelector
+from groovehub.agent.intent import IntentFastPath, load_or_train
+from groovehub.agent.pipeline import build_turn_metrics
+from groovehub.agent.repair import ADVISOR_SCHEMA
+from groovehub.agent.router import make_router
+from groovehub.agent.sessions import SessionStore, new_session_id
+from groovehub.agent.tools import default_tools
+from groovehub.guardrails.leakage import OUTPUT_LEAK_KIND, LeakGuard
+from groovehub.guardrails.safety import SecurityFilter
+from groovehub.models.response import AdvisorResponse
+from groovehub.observability.live import MetricsServer
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tracing import enable_tracing, export_chrome, export_jsonl, span, span_tree
+from groovehub.services.cache import CompletionCache
+from groovehub.services.catalog import DEFAULT_CATALOG_PATH, ActionResult, Catalog, CatalogActions
+from groovehub.services.llm import LLMService
+from groovehub.services.scheduler import INTERACTIVE, RateLimitedError, RateScheduler
+
+
+def print_metrics(metrics: dict, cache_stats: dict | None = None):
+    """
+    Función auxiliar para imprimir las métricas de rendimiento y costo 
+    de manera formateada y visualmente clara en la consola.
+    
+    Args:
+        metrics (dict): Diccionario que contiene las métricas a mostrar 
+                        (latencia, costo, tokens).
+        cache_stats (dict | None): Contadores acumulados de la caché de respuestas.
+    """
+    print(Fore.CYAN + Style.BRIGHT + "\n--- 📊 Métricas de la Consulta ---")
+    print(f"⏱️  Latencia: {metrics['latency_ms']} ms")
+    if metrics.get("ttft_ms") is not None:
+        print(
+            f"⚡ Primer token: {metrics['ttft_ms']} ms | Primer carácter de respuesta: {metrics['ttfa_ms']} ms"
+        )
+    print(f"💰 Costo Est.: ${metrics['cost_usd']:.6f}")
+    print(
+        f"🧮 Tokens: {metrics['total_tokens']} (In: {metrics['input_tokens']} / Out: {metrics['output_tokens']})"
+    )
+    if "model" in metrics:
+        print(f"🧠 Modelo: {metrics['model']} (tokens: {metrics['token_source']})")
+    if metrics.get("escalated"):
+        print("🔀 Ruta: modelo rápido con poca confianza, escalado al fuerte")
+    elif metrics.get("route"):
+        print(f"🔀 Ruta: {metrics['route']}")
+    if metrics.get("tool_calls"):
+        calls = ", ".join(
+            f"{call['name']} {call['latency_ms']:.1f} ms" + ("" if call["status"] == "ok" else f" ({call['status']})")
+            for call in metrics["tool_calls"]
+        )
+        print(f"🛠️  Herramientas ({metrics['tool_rounds']} rondas): {calls}")
+    if metrics.get("context_tokens_saved"):
+        print(f"✂️  Tokens ahorrados por la ventana de contexto: {metrics['context_tokens_saved']}")
+    if cache_stats is not None:
+        status = "HIT" if metrics.get("cache_hit") else "MISS"
+        print(
+            f"🗄️  Caché: {status} (aciertos: {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}"
+            f" | ahorro: {cache_stats['latency_saved_ms']} ms)"
+        )
+    print(Fore.CYAN + Style.BRIGHT + "----------------------------------\n")
+
+
+def print_stats(snapshot: dict, scheduler_stats: dict | None = None):
+    """
+    Imprime el agregado de la sesión (comando `/stats`): percentiles por
+    ventana móvil, intenciones, bloqueos del guardrail, salida estructurada,
+    rutas de modelo, herramientas y colas del planificador de llamadas.
+
+    Args:
+        snapshot (dict): Resultado de `LiveMetrics.snapshot()`.
+        scheduler_stats (dict | None): Resultado de `RateScheduler.stats()`.
+    """
+    print(Fore.CYAN + Style.BRIGHT + "\n--- 📈 Estadísticas en vivo ---")
+    print(f"🕒 Activo hace {snapshot['uptime_s']} s | Turnos: {snapshot['turns']}")
+    labels = {"latency_ms": "⏱️  Latencia (ms)", "total_tokens": "🧮 Tokens", "cost_usd": "💰 Costo (USD)"}
+    for name, windows in snapshot["series"].items():
+        print(labels.get(name, name))
+        for window, values in windows.items():
+            fmt = ".6f" if name == "cost_usd" else ".0f"
+            print(
+                f"   {window:>5} (n={values['count']}): p50 {values['p50']:{fmt}} | "
+                f"p95 {values['p95']:{fmt}} | p99 {values['p99']:{fmt}}"
+            )
+    if snapshot["intents"]:
+        print("🎯 Intenciones: " + ", ".join(f"{k}={v}" for k, v in sorted(snapshot["intents"].items())))
+    if snapshot["blocks"]:
+        print("🚫 Bloqueos: " + ", ".join(f"{k}={v}" for k, v in sorted(snapshot["blocks"].items())))
+    if snapshot["outputs"]:
+        print(
+            "🧩 Salida estructurada: "
+            + ", ".join(f"{k}={v['count']} ({v['rate']:.0%})" for k, v in sorted(snapshot["outputs"].items()))
+        )
+    if snapshot["routes"]:
+        print("🔀 Rutas: " + ", ".join(f"{k}={v}" for k, v in sorted(snapshot["routes"].items())))
+    for name, stats in sorted(snapshot["tools"].items()):
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(stats["calls"].items()))
+        print(f"🛠️  {name}: {calls} | p50 {stats['p50_ms']:.2f} ms | p99 {stats['p99_ms']:.2f} ms")
+    for name, stats in (scheduler_stats or {}).items():
+        wait = stats["wait_ms"][INTERACTIVE]
+        print(
+            f"🚦 {name} ({stats['rpm']} RPM / {stats['tpm']} TPM): en cola {sum(stats['queued'].values())}"
+            f" | admitidas {sum(stats['admitted'].values())} | rechazadas {sum(stats['rejected'].values())}"
+            f" | espera p95 {wait['p95']:.0f} ms"
+        )
+    print(Fore.CYAN + Style.BRIGHT + "------------------------------\n")
+
+
+def print_profile(spans: list):
+    """
+    Imprime el desglose por etapa de un turno (`--profile`): duración de cada
+    span, su peso sobre el turno y, con `--profile-memory`, la variación de
+    memoria asignada.
+
+    Args:
+        spans (list[Span]): Spans del turno.
+    """
+    tree = span_tree(spans)
+    total_us = sum(s.duration_us for depth, s in tree if depth == 0) or 1.0
+    print(Fore.CYAN + Style.BRIGHT + "--- 🔬 Perfil del turno ---")
+    for depth, s in tree:
+        label = "  " * depth + s.name
+        line = f"{label:<34} {s.duration_us / 1000:9.2f} ms {s.duration_us / total_us:6.1%}"
+        if s.mem_delta_kib is not None:
+            line += f" {s.mem_delta_kib:+10.1f} KiB"
+        print(Style.DIM + line)
+    print(Fore.CYAN + Style.BRIGHT + "---------------------------\n")
+
+
+def print_catalog(results: list[ActionResult]):
+    """
+    Imprime el resultado de las acciones de catálogo (`check_stock`, `show_catalog`).
+
+    Args:
+        results (list[ActionResult]): Acciones ejecutadas en el turno.
+    """
+    titles = {"check_stock": "📦 Stock", "show_catalog": "🛒 Catálogo"}
+    for result in results:
+        origin = "precargado" if result.prefetched else "búsqueda"
+        print(
+            Fore.MAGENTA + Style.BRIGHT + f"{titles[result.action.value]}"
+            + Style.DIM + f" ({origin}, {result.wait_ms} ms de espera)"
+        )
+        if not result.products:
+            print(Style.DIM + "   Sin coincidencias en el catálogo.")
+        for product in result.products:
+            stock = f"{product.stock} u." if product.stock else Fore.RED + "sin stock"
+            print(f"   • {product.name} — {product.brand} | ${product.price:.2f} | {stock}")
+    if results:
+        print()
+
+
+class ChatSession:
+    """
+    Estado de la sesión interactiva: tracker, agente, atajo local, servicio LLM,
+    catálogo de productos y almacén de la conversación persistente.
+
+    Construirla es barato (el tokenizer y los clientes HTTP se crean en el
+    primer uso); `warm_up` adelanta esas inicializaciones y está pensado para
+    correr en un hilo de fondo mientras el usuario escribe la primera consulta.
+    """
+
+    def __init__(self, args):
+        """
+        Args:
+            args (argparse.Namespace): Opciones del CLI.
+        """
+        self.args = args
+        # Trazas por etapa: `--profile` las imprime, `--trace-out` las exporta
+        self.tracer = None
+        self.trace_spans = []
+        if args.profile or args.trace_out:
+            self.tracer = enable_tracing(memory=args.profile_memory)
+        self.tracker = MetricsTracker()
+        self.server = None
+        if args.metrics_port is not None:
+            self.server = MetricsServer(self.tracker.live, port=args.metrics_port).start()
+        self.fast_path = IntentFastPath(load_or_train()) if args.fast_path else None
+        scheduler = None
+        if args.rate_limit:
+            max_wait = {INTERACTIVE: args.max_queue_wait} if args.max_queue_wait is not None else None
+            scheduler = RateScheduler(self.tracker.tokens, max_wait_s=max_wait)
+        self.llm = LLMService(
+            cache=CompletionCache(),
+            hedge_after_ms=args.hedge_ms,
+            response_schema=ADVISOR_SCHEMA,
+            scheduler=scheduler,
+        )
+        few_shot = None
+        if args.few_shot:
+            few_shot = FewShotSelector(counter=self.tracker.tokens, k=args.few_shot)
+        output_guard = LeakGuard(action=args.leak_action) if args.leak_action != "off" else None
+        self.catalog = CatalogActions(Catalog.load(args.catalog or DEFAULT_CATALOG_PATH), speculative=args.prefetch)
+        self.tools = default_tools(self.catalog.catalog) if args.tools else None
+        self.agent = MusicAgent(
+            llm=self.llm,
+            token_counter=self.tracker.tokens,
+            fast_path=self.fast_path,
+            few_shot=few_shot,
+            output_guard=output_guard,
+            router=make_router(args.route, args.escalate_below),
+            faq=load_if_exists() if args.faq else None,
+            tools=self.tools,
+        )
+        self.tracker.attach_cache(self.llm.cache)
+
+        # Conversación persistente: `--session ID`, `--resume` (la última) o una nueva
+        self.sessions = SessionStore()
+        self.session_id = args.session or (self.sessions.latest() if args.resume else None) or new_session_id()
+        self.stored = self.agent.attach_session(self.sessions, self.session_id)
+
+    def warm_up(self, profile=None):
+        """
+        Carga el tokenizer, compila las reglas de seguridad y construye los
+        clientes LLM (y, con `--prewarm`, abre sus conexiones).
+
+        Args:
+            profile (StartupProfile | None): Registro donde medir cada fase.
+        """
+        steps = [
+            ("tokenizer cl100k_base", self.tracker.tokens.warm_up),
+            ("reglas de seguridad", SecurityFilter.load_rules),
+            ("clientes LLM (openai)", self.llm.warm_up),
+        ]
+        if self.args.prewarm:
+            steps.append(("pre-conexión TLS", lambda: self.llm.warm_up(connect=True)))
+        for name, step in steps:
+            if profile is None:
+                step()
+                continue
+            with profile.phase(name):
+                step()
+
+    def handle(self, user_input: str):
+        """
+        Atiende una consulta del usuario: seguridad, agente, métricas y registro.
+
+        Args:
+            user_input (str): Texto ingresado (no vacío).
+        """
+        if user_input == "/stats":
+            scheduler = self.llm.scheduler
+            print_stats(self.tracker.live.snapshot(), scheduler.stats() if scheduler is not None else None)
+            return
+        if self.tracer is None:
+            self._turn(user_input)
+            return
+
+        with span("turn"):
+            self._turn(user_input)
+        spans = self.tracer.drain()
+        if self.args.profile:
+            print_profile(spans)
+        if self.args.trace_out:
+            if self.args.trace_out.endswith(".jsonl"):
+                export_jsonl(spans, self.args.trace_out)
+            else:
+                self.trace_spans.extend(spans)
+
+    def _turn(self, user_input: str):
+        tracker, agent, fast_path, args = self.tracker, self.agent, self.fast_path, self.args
+        try:
+            # Capa de seguridad
+            is_safe, reason = SecurityFilter.check_safety(user_input)
+            if not is_safe:
+                tracker.live.observe_block(SecurityFilter.block_kind(reason))
+                print(Fore.RED + f"🚫 ALERTA DE SEGURIDAD: {reason}")
+                return
+
+            # Mientras el LLM piensa, buscamos en el catálogo lo que menciona la consulta
+            self.catalog.prefetch(user_input)
+
+            # --- INICIO DE LA MEDICIÓN ---
+            print(Style.DIM + "thinking...", end="\r")
+            tracker.start()
+
+            # Llamar al cerebro (El Agente)
+            if args.stream:
+                streamed = []
+
+                def on_answer(text: str):
+                    tracker.mark_first_answer_char()
+                    if not streamed:
+                        # Reemplazamos el "thinking..." por el inicio de la respuesta
+                        print(Fore.CYAN + "\n🤖 Groov: " + Fore.WHITE, end="")
+                    streamed.append(text)
+                    print(text, end="", flush=True)
+
+                response: AdvisorResponse = agent.ask(
+                    user_input,
+                    on_token=lambda _: tracker.mark_first_token(),
+                    on_answer=on_answer,
+                )
+            else:
+                streamed = None
+                response: AdvisorResponse = agent.ask(user_input)
+
+            # --- FIN DE LA MEDICIÓN ---
+            tracker.stop()
+
+            # Cálculos de Ingeniería (Métricas)
+            # Serializamos la respuesta una sola vez para el log
+            response_json = response.model_dump_json()
+            metrics_data = build_turn_metrics(tracker, agent, tracker.latency_ms)
+            if tracker.ttft_ms is not None:
+                metrics_data["ttft_ms"] = tracker.ttft_ms
+                metrics_data["ttfa_ms"] = tracker.ttfa_ms
+            tracker.live.observe_turn(metrics_data, response.intent.value)
+            if agent.last_leak is not None:
+                tracker.live.observe_block(OUTPUT_LEAK_KIND)
+
+            # Mostrar la Respuesta al Usuario (si no se mostró ya en streaming)
+            if streamed:
+                print()
+            else:
+                print(Fore.CYAN + "\n🤖 Groov: " + Fore.WHITE + response.answer)
+            print(
+                Style.DIM
+                + f"\n👀 (Confianza: {response.confidence_score * 100:.0f}% | Intención: {response.intent.value})"
+            )
+            print(Style.DIM + f"💭 {response.reasoning}")
+            if agent.last_leak is not None:
+                print(
+                    Fore.RED
+                    + f"🛡️  La respuesta repetía instrucciones internas ({agent.last_leak.words} palabras): "
+                    + ("bloqueada." if agent.last_leak.action == "blocked" else "fragmentos tapados.")
+                )
+
+            # Mostrar acciones sugeridas (si las hay)
+            if response.recommended_actions:
+                actions_str = ", ".join(
+                    [action.value for action in response.recommended_actions]
+                )
+                print(
+                    Fore.MAGENTA
+                    + Style.BRIGHT
+                    + f"\n⚡ Acciones sugeridas: [{actions_str}]"
+                )
+            print_catalog(self.catalog.execute(user_input, response))
+
+            # Mostrar el reporte técnico (JSON + Métricas)
+            print_metrics(metrics_data, tracker.cache_stats())
+            if agent.last_faq is not None:
+                report = agent.faq.report()
+                print(
+                    Style.DIM
+                    + f"📚 Pregunta frecuente (similitud {agent.last_faq.similarity:.2f} con "
+                    f"\"{agent.last_faq.query}\"): {report['hits']} respondidas desde el banco en la sesión\n"
+                )
+            elif agent.last_completion.local:
+                report = fast_path.report()
+                print(
+                    Style.DIM
+                    + f"⚡ Respondido localmente: {report['llm_calls_saved']} llamadas al LLM evitadas "
+                    f"(~{report['ms_saved_est']} ms ahorrados en la sesión)\n"
+                )
+
+            # Guardar el registro (append-only, escrito en segundo plano)
+            tracker.save_log(
+                user_query=user_input,
+                response_json=response_json,
+                metrics=metrics_data,
+            )
+
+        except RateLimitedError as e:
+            tracker.stop()
+            print(Fore.YELLOW + f"\n⏳ {e.provider} está al límite de su cuota: reintenta en {e.retry_after:.0f} s.")
+
+        except ValidationError as e:
+            tracker.stop()
+            print(Fore.RED + "\n⚠️  Alerta de Alucinación:")
+            print(Fore.YELLOW + "El modelo intentó usar una categoría no permitida.")
+            print(Fore.WHITE + "Por favor, intenta reformular tu pregunta.\n")
+            print(Fore.RED + "\n" + str(e))
+
+        except Exception as e:
+            print(Fore.RED + f"💥 Error inesperado: {e}")
+
+    def close(self):
+        """
+        Vacía el log pendiente, cierra el almacén de sesiones y el catálogo,
+        escribe la traza (formato Chrome) y detiene el endpoint de métricas.
+        """
+        self.tracker.close()
+        self.catalog.close()
+        if self.tools is not None:
+            self.tools.close()
+        self.sessions.close()
+        if self.trace_spans:
+            export_chrome(self.trace_spans, self.args.trace_out)
+        if self.server is not None:
+            self.server.close()
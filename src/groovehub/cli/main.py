@@ -1,40 +1,252 @@
+import argparse
+import asyncio
 import sys
 from colorama import init, Fore, Style
-from pydantic import ValidationError
 
-from groovehub.agent.core import MusicAgent
-from groovehub.observability.metrics import MetricsTracker
-from groovehub.models.response import AdvisorResponse
-from groovehub.guardrails.safety import SecurityFilter
+from groovehub.cli.args import parse_args
+from groovehub.cli.startup import StartupProfile, Warmup, print_startup_report
+
+# Solo lo imprescindible para mostrar el banner se importa arriba: el agente,
+# pydantic, openai y tiktoken se cargan en segundo plano (ver `main`).
 
 
 init(autoreset=True)
 
 
-def print_metrics(metrics: dict):
+def train_intent(args: argparse.Namespace):
     """
-    Función auxiliar para imprimir las métricas de rendimiento y costo 
-    de manera formateada y visualmente clara en la consola.
-    
+    Entrena y guarda el clasificador local, e imprime su exactitud y el ahorro
+    estimado del atajo off-topic sobre el log existente.
+
     Args:
-        metrics (dict): Diccionario que contiene las métricas a mostrar 
-                        (latencia, costo, tokens).
+        args (argparse.Namespace): Opciones del subcomando `train-intent`.
     """
-    print(Fore.CYAN + Style.BRIGHT + "\n--- 📊 Métricas de la Consulta ---")
-    print(f"⏱️  Latencia: {metrics['latency_ms']} ms")
-    print(f"💰 Costo Est.: ${metrics['cost_usd']:.6f}")
+    from groovehub.agent.intent import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD, estimate_savings, train_from_logs
+    from groovehub.observability.log_store import iter_log_entries
+
+    output = args.output or DEFAULT_MODEL_PATH
+    threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+    classifier, report = train_from_logs(args.log_dir)
+    classifier.save(output)
+    savings = estimate_savings(classifier, iter_log_entries(args.log_dir), threshold)
+
+    print(Fore.CYAN + Style.BRIGHT + "--- 🧭 Clasificador de intención ---")
+    print(f"📚 Ejemplos: {report['examples']} | Exactitud (holdout): {report['holdout_accuracy']:.1%}")
+    print(f"💾 Modelo guardado en {output}")
+    print(
+        f"⚡ Sobre {savings['turns']} turnos registrados, el atajo habría evitado "
+        f"{savings['llm_calls_saved']} llamadas al LLM ({savings['ms_saved']} ms, "
+        f"${savings['cost_saved_usd']:.6f})"
+    )
+    if savings["precision"] is not None:
+        print(f"🎯 Coincidencia con la intención del LLM: {savings['precision']:.1%}")
+
+
+def mine_faq_command(args: argparse.Namespace):
+    """
+    Mina y guarda el banco de preguntas frecuentes, e imprime su cobertura y
+    el ahorro estimado sobre el log existente.
+
+    Args:
+        args (argparse.Namespace): Opciones del subcomando `mine-faq`.
+    """
+    from groovehub.agent.faq import DEFAULT_INDEX_PATH, mine_from_logs
+
+    output = args.output or DEFAULT_INDEX_PATH
+    options = {
+        "threshold": args.threshold,
+        "min_support": args.min_support,
+        "min_confidence": args.min_confidence,
+    }
+    index, report = mine_from_logs(args.log_dir, **{k: v for k, v in options.items() if v is not None})
+    index.save(output)
+
+    print(Fore.CYAN + Style.BRIGHT + "--- 📚 Preguntas frecuentes ---")
+    print(
+        f"📂 Turnos: {report['turns']} | Aptos (primer turno, consulta completa): {report['eligible_turns']}"
+        f" | Consultas distintas: {report['distinct_queries']}"
+    )
+    print(f"💾 {report['answers']} respuestas guardadas en {output}")
     print(
-        f"🧮 Tokens: {metrics['total_tokens']} (In: {metrics['input_tokens']} / Out: {metrics['output_tokens']})"
+        f"🎯 Cobertura: {report['coverage']:.1%} de los turnos aptos | sin LLM: {report['saved_rate']:.1%}"
+        f" (una caché exacta: {report['exact_repeat_rate']:.1%})"
+    )
+    print(
+        f"⚡ Con el banco se habrían evitado {report['llm_calls_saved']} llamadas al LLM "
+        f"({report['ms_saved']} ms, ${report['cost_saved_usd']:.6f})"
+    )
+
+
+def start_session(args: argparse.Namespace, profile: StartupProfile):
+    """
+    Importa los módulos pesados y arma la sesión de chat (corre en segundo plano).
+
+    Args:
+        args (argparse.Namespace): Opciones del CLI.
+        profile (StartupProfile): Registro de fases del arranque.
+
+    Returns:
+        ChatSession: La sesión lista para atender consultas.
+    """
+    for module in ("dotenv", "pydantic", "groovehub.models", "groovehub.agent.core", "groovehub.cli.chat"):
+        profile.import_module(module)
+    from groovehub.cli.chat import ChatSession
+
+    with profile.phase("sesión (caché, clasificador de intención)"):
+        session = ChatSession(args)
+    session.warm_up(profile)
+    return session
+
+
+def run_batch_command(args: argparse.Namespace):
+    """Subcomando `batch`: procesa el archivo y muestra el resumen."""
+    from groovehub.agent.faq import load_if_exists
+    from groovehub.agent.fewshot import FewShotSelector
+    from groovehub.agent.intent import IntentFastPath, load_or_train
+    from groovehub.agent.repair import ADVISOR_SCHEMA
+    from groovehub.agent.router import make_router
+    from groovehub.agent.tools import default_tools
+    from groovehub.cli.batch import print_summary, run_batch
+    from groovehub.guardrails.leakage import LeakGuard
+    from groovehub.observability.tokens import TokenCounter
+    from groovehub.services.cache import CompletionCache
+    from groovehub.services.catalog import DEFAULT_CATALOG_PATH, Catalog
+    from groovehub.services.llm import AsyncLLMService
+    from groovehub.services.scheduler import RateScheduler
+
+    counter = TokenCounter()
+    scheduler = RateScheduler(counter) if args.rate_limit else None
+    tools = default_tools(Catalog.load(args.catalog or DEFAULT_CATALOG_PATH)) if args.tools else None
+    summary = asyncio.run(
+        run_batch(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            query_field=args.field,
+            id_field=args.id_field,
+            llm=AsyncLLMService(
+                cache=CompletionCache(),
+                hedge_after_ms=args.hedge_ms,
+                response_schema=ADVISOR_SCHEMA,
+                scheduler=scheduler,
+            ),
+            token_counter=counter,
+            output_guard=LeakGuard(action=args.leak_action) if args.leak_action != "off" else None,
+            router=make_router(args.route, args.escalate_below),
+            faq=load_if_exists() if args.faq else None,
+            tools=tools,
+            few_shot=FewShotSelector(counter=counter, k=args.few_shot) if args.few_shot else None,
+            fast_path=IntentFastPath(load_or_train()) if args.fast_path else None,
+        )
+    )
+    if tools is not None:
+        tools.close()
+    print_summary(summary)
+
+
+def run_stats_command(args: argparse.Namespace):
+    """Subcomando `stats`: compacta si se pide y muestra el reporte del log."""
+    import json
+
+    from groovehub.cli.stats import print_log_stats
+    from groovehub.observability.analytics import compact, compute_stats, parse_bound
+
+    compacted = compact(args.log_dir) if args.compact else None
+    report = compute_stats(
+        args.log_dir,
+        since=parse_bound(args.since) if args.since else None,
+        until=parse_bound(args.until, end=True) if args.until else None,
+        intents=args.intent,
+        columnar=args.columnar,
     )
-    print(Fore.CYAN + Style.BRIGHT + "----------------------------------\n")
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_log_stats(report, compacted)
+
+
+def run_route_eval_command(args: argparse.Namespace):
+    """Subcomando `route-eval`: re-juega las conversaciones guardadas y compara políticas."""
+    import json
+
+    from groovehub.agent.repair import ADVISOR_SCHEMA
+    from groovehub.agent.router import POLICIES
+    from groovehub.agent.sessions import DEFAULT_SESSIONS_PATH, SessionStore
+    from groovehub.cli.route_eval import print_route_eval, run_route_eval
+    from groovehub.observability.tokens import TokenCounter
+    from groovehub.services.llm import AsyncLLMService
+    from groovehub.services.scheduler import RateScheduler
+
+    store = SessionStore(args.sessions or DEFAULT_SESSIONS_PATH)
+    conversations = list(store.iter_conversations(args.limit))
+    store.close()
+    counter = TokenCounter()
+    # Sin caché: cada política paga (y mide) sus propias llamadas
+    llm = AsyncLLMService(
+        hedge_after_ms=args.hedge_ms,
+        response_schema=ADVISOR_SCHEMA,
+        scheduler=RateScheduler(counter) if args.rate_limit else None,
+    )
+
+    async def evaluate():
+        try:
+            return await run_route_eval(
+                conversations,
+                llm,
+                policies=tuple(dict.fromkeys(args.policy or POLICIES)),
+                escalate_below=args.escalate_below,
+                concurrency=args.concurrency,
+                token_counter=counter,
+            )
+        finally:
+            await llm.aclose()
+
+    report = asyncio.run(evaluate())
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_route_eval(report)
+
+
+def run_serve_command(args: argparse.Namespace):
+    """Subcomando `serve`: corre el servidor hasta Ctrl+C."""
+    from groovehub.server.app import run_server
+
+    try:
+        asyncio.run(
+            run_server(
+                args.host,
+                args.port,
+                max_sessions=args.max_sessions,
+                idle_timeout_s=args.idle_timeout,
+                max_memory_mb=args.max_memory_mb,
+                persist=args.persist,
+                hedge_after_ms=args.hedge_ms,
+                leak_action=args.leak_action,
+                rate_limit=args.rate_limit,
+                max_queue_wait_s=args.max_queue_wait,
+                route=args.route,
+                escalate_below=args.escalate_below,
+                faq=args.faq,
+                tools=args.tools,
+                catalog_path=args.catalog,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
     """
     Punto de entrada principal de la aplicación Groove Hub CLI.
     
-    Inicia la interfaz de línea de comandos interactiva. En un bucle infinito, 
-    gestiona el flujo completo de la interacción del usuario:
+    Inicia la interfaz de línea de comandos interactiva. El banner y el prompt
+    aparecen de inmediato; el agente, el tokenizer y los clientes LLM se
+    inicializan en un hilo de fondo mientras el usuario escribe, y la primera
+    consulta espera a que terminen (si todavía no lo hicieron).
+
+    En un bucle infinito gestiona el flujo completo de la interacción del
+    usuario (ver `ChatSession.handle`):
     1. Captura la entrada del usuario.
     2. Aplica filtros de seguridad preventivos.
     3. Inicia la medición de métricas (latencia).
@@ -46,6 +258,39 @@ def main():
     Maneja excepciones específicas como interrupciones del teclado y 
     errores de validación de esquemas (alucinaciones del LLM).
     """
+    args = parse_args()
+    if args.command == "batch":
+        run_batch_command(args)
+        return
+    if args.command == "serve":
+        run_serve_command(args)
+        return
+    if args.command == "stats":
+        run_stats_command(args)
+        return
+    if args.command == "route-eval":
+        run_route_eval_command(args)
+        return
+    if args.command == "train-intent":
+        train_intent(args)
+        return
+    if args.command == "mine-faq":
+        mine_faq_command(args)
+        return
+
+    profile = StartupProfile()
+    warmup = Warmup(lambda: start_session(args, profile))
+    if args.profile_startup:
+        profile.mark("prompt disponible")
+        try:
+            warmup.result().close()
+        except ValueError as e:
+            print(Fore.RED + str(e))
+            sys.exit(1)
+        profile.mark("sesión lista")
+        print_startup_report(profile)
+        return
+
     print("\033[H\033[J", end="")
 
     print(
@@ -69,11 +314,9 @@ def main():
         + Fore.WHITE
         + " ¡Hola! Soy tu experto musical. ¿En qué te ayudo hoy?"
     )
-    print(Style.DIM + "   (Escribe 'salir' o 'exit' para terminar)\n")
-
-    agent = MusicAgent()
-    tracker = MetricsTracker()
+    print(Style.DIM + "   (Escribe 'salir' o 'exit' para terminar, '/stats' para ver el agregado)\n")
 
+    session = None
     while True:
         try:
             # Pedir input al usuario
@@ -82,91 +325,43 @@ def main():
             # Condición de salida
             if user_input.lower() in ["salir", "exit", "quit", "chau", "adios"]:
                 print(Fore.GREEN + Style.BRIGHT + "¡Que siga la música! 👋")
+                # Si el arranque falló (por ejemplo, sin API Key) no hay nada que cerrar
+                if session is None and warmup.ready and not warmup.failed:
+                    session = warmup.result()
+                if session is not None:
+                    session.close()
                 break
 
             if not user_input:
                 continue
 
-            # Capa de seguridad
-            is_safe, reason = SecurityFilter.check_safety(user_input)
-            if not is_safe:
-                print(Fore.RED + f"🚫 ALERTA DE SEGURIDAD: {reason}")
-                continue
-
-            # --- INICIO DE LA MEDICIÓN ---
-            print(Style.DIM + "thinking...", end="\r")
-            tracker.start()
-
-            # Llamar al cerebro (El Agente)
-            response: AdvisorResponse = agent.ask(user_input)
-
-            # --- FIN DE LA MEDICIÓN ---
-            tracker.stop()
-
-            # Cálculos de Ingeniería (Métricas)
-            input_tokens = tracker.count_tokens(user_input)
-            output_tokens = tracker.count_tokens(response.model_dump_json())
-            cost = tracker.calculate_cost(input_tokens, output_tokens)
-
-            # Mostrar la Respuesta al Usuario
-            print(Fore.CYAN + "\n🤖 Groov: " + Fore.WHITE + response.answer)
-            print(
-                Style.DIM
-                + f"\n👀 (Confianza: {response.confidence_score * 100:.0f}% | Intención: {response.intent.value})"
-            )
-            print(Style.DIM + f"💭 {response.reasoning}")
-
-            # Mostrar acciones sugeridas (si las hay)
-            if response.recommended_actions:
-                actions_str = ", ".join(
-                    [action.value for action in response.recommended_actions]
-                )
+            if session is None:
+                if not warmup.ready:
+                    print(Style.DIM + "preparando...", end="\r")
+                try:
+                    session = warmup.result()
+                except ValueError as e:
+                    # Configuración inválida (por ejemplo, sin API Key)
+                    print(Fore.RED + str(e))
+                    sys.exit(1)
+                if args.metrics_port is not None and session.server is not None:
+                    print(Style.DIM + f"   📡 Métricas en {session.server.url}\n")
+                resumed = session.stored.total_turns
                 print(
-                    Fore.MAGENTA
-                    + Style.BRIGHT
-                    + f"\n⚡ Acciones sugeridas: [{actions_str}]"
+                    Style.DIM
+                    + f"   💾 Sesión {session.session_id}"
+                    + (f" ({resumed} turnos previos)" if resumed else "")
+                    + f" — retómala con --session {session.session_id}\n"
                 )
 
-            # Mostrar el reporte técnico (JSON + Métricas)
-            print_metrics(
-                {
-                    "latency_ms": tracker.latency_ms,
-                    "cost_usd": cost,
-                    "input_tokens": input_tokens,
-                    "output_tokens": output_tokens,
-                    "total_tokens": input_tokens + output_tokens,
-                }
-            )
-
-            # Preparar datos para el reporte
-            metrics_data = {
-                "latency_ms": tracker.latency_ms,
-                "cost_usd": cost,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": input_tokens + output_tokens,
-            }
-            # Guardar el archivo con el reporte
-            tracker.save_log(
-                user_query=user_input,
-                response_json=response.model_dump_json(),
-                metrics=metrics_data,
-            )
+            session.handle(user_input)
 
         except KeyboardInterrupt:
             print("\n" + Fore.RED + "Programa interrumpido. ¡Adiós!")
+            if session is not None:
+                session.close()
             sys.exit(0)
 
-        except ValidationError as e:
-            tracker.stop()
-            print(Fore.RED + "\n⚠️  Alerta de Alucinación:")
-            print(Fore.YELLOW + "El modelo intentó usar una categoría no permitida.")
-            print(Fore.WHITE + "Por favor, intenta reformular tu pregunta.\n")
-            print(Fore.RED + "\n" + str(e))
-
-        except Exception as e:
-            print(Fore.RED + f"💥 Error inesperado: {e}")
-
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
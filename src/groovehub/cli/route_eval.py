@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.router import DEFAULT_ESCALATE_BELOW, POLICIES, ModelRouter
+from groovehub.cli.batch import run_turn_with_retries
+from groovehub.observability.metrics import MetricsTracker, percentile
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.llm import AsyncLLMService
+from groovehub.services.providers import FAST, STRONG
+from groovehub.services.scheduler import BATCH
+
+
+async def replay_policy(
+    conversations: list,
+    llm: AsyncLLMService,
+    policy: str,
+    escalate_below: float = DEFAULT_ESCALATE_BELOW,
+    concurrency: int = 8,
+    token_counter: TokenCounter | None = None,
+) -> dict:
+    """
+    Re-juega conversaciones guardadas con una política de enrutamiento.
+
+    Cada conversación corre en un agente nuevo, turno a turno (el historial es
+    el que arma la propia política, no el registrado), y hasta `concurrency`
+    conversaciones en paralelo. Las llamadas van con prioridad 'batch'. El
+    servicio no debería tener caché: se mide el costo y la latencia reales.
+
+    Args:
+        conversations (list): Pares (ID de sesión, [(consulta, intención registrada), ...]).
+        llm (AsyncLLMService): Servicio a usar.
+        policy (str): 'strong', 'fast' o 'auto'.
+        escalate_below (float): Confianza mínima aceptada del modelo rápido.
+        concurrency (int): Conversaciones simultáneas.
+        token_counter (TokenCounter | None): Contador de tokens compartido.
+
+    Returns:
+        dict: Turnos, costo, latencia, coincidencia de intención con la
+              registrada y reparto entre niveles de modelo.
+    """
+    router = ModelRouter(policy, escalate_below)
+    tracker = MetricsTracker(token_counter=token_counter)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, cost = [], 0.0
+    counts = {"turns": 0, "blocked": 0, "errors": 0, "failed_outputs": 0, "agree": 0, FAST: 0, "escalated": 0}
+
+    async def replay(turns: list):
+        nonlocal cost
+        async with semaphore:
+            agent = MusicAgent(llm=llm, token_counter=tracker.tokens, priority=BATCH, router=router)
+            for query, logged_intent in turns:
+                try:
+                    outcome, _ = await run_turn_with_retries(agent, tracker, query)
+                except Exception:
+                    counts["errors"] += 1
+                    continue
+                if outcome.blocked_reason is not None:
+                    counts["blocked"] += 1
+                    continue
+                metrics = outcome.metrics
+                counts["turns"] += 1
+                counts["agree"] += outcome.response.intent.value == logged_intent
+                counts["failed_outputs"] += metrics["output_status"] == "failed"
+                counts["escalated"] += metrics["escalated"]
+                counts[FAST] += metrics["route"] == FAST and not metrics["escalated"]
+                latencies.append(metrics["latency_ms"])
+                cost += metrics["cost_usd"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(replay(turns) for _, turns in conversations))
+    elapsed = time.perf_counter() - start
+    tracker.close()
+
+    turns = counts["turns"]
+    return {
+        "turns": turns,
+        "blocked": counts["blocked"],
+        "errors": counts["errors"],
+        "failed_outputs": counts["failed_outputs"],
+        "elapsed_s": round(elapsed, 2),
+        "cost_usd": round(cost, 6),
+        "cost_per_turn_usd": cost / turns if turns else 0.0,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "intent_agreement": counts["agree"] / turns if turns else None,
+        # Turnos que respondió el modelo rápido sin escalar
+        "fast_share": counts[FAST] / turns if turns else 0.0,
+        "escalation_rate": counts["escalated"] / turns if turns else 0.0,
+    }
+
+
+async def run_route_eval(
+    conversations: list,
+    llm: AsyncLLMService,
+    policies: tuple = POLICIES,
+    escalate_below: float | None = None,
+    concurrency: int = 8,
+    token_counter: TokenCounter | None = None,
+) -> dict:
+    """
+    Compara políticas de enrutamiento re-jugando las mismas conversaciones.
+
+    Las políticas corren una después de otra, así la latencia de una no
+    contamina la de otra. La intención registrada la produjo el modelo que
+    estaba en uso (el fuerte, salvo que se haya enrutado), así que la
+    coincidencia de 'strong' es la línea de base del ruido propio del modelo.
+
+    Args:
+        conversations (list): Pares (ID de sesión, [(consulta, intención registrada), ...]).
+        llm (AsyncLLMService): Servicio a usar (sin caché).
+        policies (tuple): Políticas a evaluar.
+        escalate_below (float | None): Confianza mínima del modelo rápido (default: 0.6).
+        concurrency (int): Conversaciones simultáneas.
+        token_counter (TokenCounter | None): Contador de tokens compartido.
+
+    Returns:
+        dict: 'conversations', 'queries' y, por política, el resultado de
+              `replay_policy` más su costo relativo a 'strong' (si se evaluó).
+    """
+    escalate_below = DEFAULT_ESCALATE_BELOW if escalate_below is None else escalate_below
+    results = {}
+    for policy in policies:
+        results[policy] = await replay_policy(conversations, llm, policy, escalate_below, concurrency, token_counter)
+    baseline = results.get(STRONG)
+    if baseline is not None and baseline["cost_usd"]:
+        for result in results.values():
+            result["cost_vs_strong"] = result["cost_usd"] / baseline["cost_usd"]
+    return {
+        "conversations": len(conversations),
+        "queries": sum(len(turns) for _, turns in conversations),
+        "escalate_below": escalate_below,
+        "policies": results,
+    }
+
+
+def print_route_eval(report: dict):
+    """
+    Imprime la comparación de políticas del subcomando `route-eval`.
+
+    Args:
+        report (dict): Resultado de `run_route_eval`.
+    """
+    print("\n--- 🔀 Evaluación del router ---")
+    print(
+        f"📂 {report['conversations']} conversaciones, {report['queries']} consultas"
+        f" | escalar bajo confianza {report['escalate_below']}"
+    )
+    for policy, result in report["policies"].items():
+        print(f"▶ {policy}")
+        if not result["turns"]:
+            print(f"   Sin turnos respondidos ({result['errors']} errores).")
+            continue
+        relative = f" ({result['cost_vs_strong']:.0%} de strong)" if "cost_vs_strong" in result else ""
+        print(f"   💰 Costo: ${result['cost_usd']:.6f}{relative} | ${result['cost_per_turn_usd']:.6f} por turno")
+        print(f"   ⏱️  Latencia p50/p95: {result['latency_p50_ms']} / {result['latency_p95_ms']} ms")
+        print(
+            f"   🎯 Intención igual a la registrada: {result['intent_agreement']:.1%}"
+            f" | 🧩 Salidas fallidas: {result['failed_outputs']}"
+        )
+        print(f"   ⚡ Respondió el rápido: {result['fast_share']:.1%} | escaladas: {result['escalation_rate']:.1%}")
+        if result["errors"] or result["blocked"]:
+            print(f"   ({result['errors']} errores, {result['blocked']} bloqueadas)")
@@ -0,0 +1,109 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+# Referencia para medir el arranque: el momento en que se importó el CLI
+_T0 = time.perf_counter()
+
+
+class StartupProfile:
+    """
+    Registro de las fases del arranque: importaciones e inicializaciones,
+    con su duración y el instante (desde el inicio) en que terminaron.
+    """
+
+    def __init__(self):
+        self.phases: list[tuple[str, float, float, str]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mide el bloque como una fase con nombre."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append(
+                    (name, (end - start) * 1000, (end - _T0) * 1000, threading.current_thread().name)
+                )
+
+    def import_module(self, name: str):
+        """
+        Importa un módulo midiendo cuánto cuesta. Lo ya importado por fases
+        anteriores no se vuelve a contar, así que cada fila muestra el costo
+        incremental.
+        """
+        with self.phase(f"import {name}"):
+            return importlib.import_module(name)
+
+    def mark(self, name: str):
+        """Registra un hito instantáneo (por ejemplo, 'prompt visible')."""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, 0.0, (now - _T0) * 1000, threading.current_thread().name))
+
+
+class Warmup:
+    """
+    Ejecuta la inicialización pesada en un hilo de fondo mientras el CLI ya
+    muestra el banner y espera la primera consulta.
+    """
+
+    def __init__(self, target: Callable[[], object]):
+        """
+        Args:
+            target (Callable[[], object]): Función que arma y devuelve el runtime.
+        """
+        self._target = target
+        self._result = None
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name="groovehub-warmup")
+        self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return not self._thread.is_alive()
+
+    @property
+    def failed(self) -> bool:
+        """True si la inicialización ya terminó con un error."""
+        return self.ready and self._error is not None
+
+    def result(self):
+        """
+        Espera (si hace falta) a que termine la inicialización.
+
+        Returns:
+            object: Lo que devolvió `target`.
+
+        Raises:
+            BaseException: El error que haya ocurrido en el hilo de fondo.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self):
+        try:
+            self._result = self._target()
+        except BaseException as e:
+            self._error = e
+
+
+def print_startup_report(profile: StartupProfile):
+    """
+    Imprime la tabla de `--profile-startup`.
+
+    Args:
+        profile (StartupProfile): Fases registradas.
+    """
+    print("\n--- 🚀 Perfil de arranque ---")
+    print(f"{'fase':<42} {'duración':>10} {'fin (desde inicio)':>20}  hilo")
+    for name, duration_ms, end_ms, thread in profile.phases:
+        duration = f"{duration_ms:.1f} ms" if duration_ms else "-"
+        print(f"{name:<42} {duration:>10} {end_ms:>17.1f} ms  {thread}")
@@ -0,0 +1,57 @@
+from colorama import Fore, Style
+
+BAR_WIDTH = 30
+
+
+def _bar(count: int, total: int) -> str:
+    return "█" * round(BAR_WIDTH * count / total) if total else ""
+
+
+def print_log_stats(report: dict, compacted: dict | None = None):
+    """
+    Imprime el reporte del subcomando `stats` sobre el log de interacciones.
+
+    Args:
+        report (dict): Resultado de `compute_stats`.
+        compacted (dict | None): Resultado de `compact`, si se compactó antes.
+    """
+    print(Fore.CYAN + Style.BRIGHT + "\n--- 📊 Estadísticas del log ---")
+    if compacted is not None:
+        print(
+            Style.DIM + f"🗜️  Compactadas {compacted['new_rows']} filas nuevas "
+            f"({compacted['total_rows']} en formato columnar)"
+        )
+    sources = report["sources"]
+    print(
+        Style.DIM + f"📂 Filas: {sources['columnar_rows']} columnares + {sources['jsonl_rows']} del JSONL"
+        f" | segmentos leídos/salteados: {sources['parts_read']}/{sources['parts_skipped']}"
+    )
+    if not report["turns"]:
+        print("Sin turnos para los filtros pedidos.")
+        return
+
+    print(f"🕒 {report['first']} → {report['last']} | Turnos: {report['turns']}")
+    latency = report["latency_ms"]
+    print(
+        f"⏱️  Latencia (ms): p50 {latency['p50']:.0f} | p90 {latency['p90']:.0f} | "
+        f"p95 {latency['p95']:.0f} | p99 {latency['p99']:.0f} | máx {latency['max']:.0f}"
+    )
+    tokens = report["tokens"]
+    print(f"💰 Costo total: ${report['cost_usd']:.6f} | 🧮 Tokens: In {tokens['input']} / Out {tokens['output']}")
+
+    print(Fore.MAGENTA + "📅 Costo por día y proveedor")
+    for day, values in report["by_day"].items():
+        detail = ", ".join(f"{name} ${cost:.6f}" for name, cost in values["cost_usd"].items())
+        print(f"   {day}  {values['turns']:>7} turnos  {detail}")
+
+    for title, counts in (("🎯 Intenciones", report["intents"]), ("🛠️  Acciones", report["actions"])):
+        print(Fore.MAGENTA + title)
+        total = sum(counts.values())
+        for name, count in counts.items():
+            print(f"   {name:<22} {count:>7} {count / total:>6.1%} {_bar(count, total)}")
+
+    print(Fore.MAGENTA + "📶 Confianza")
+    total = sum(report["confidence"].values())
+    for bucket, count in report["confidence"].items():
+        print(f"   {bucket:<9} {count:>7} {_bar(count, total)}")
+    print(Fore.CYAN + Style.BRIGHT + "-------------------------------\n")
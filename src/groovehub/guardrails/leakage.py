@@ -0,0 +1,274 @@
+import re
+from typing import NamedTuple
+
+from groovehub.agent.prompts.main_prompt import BASE_SYSTEM_PROMPT, REMINDER_PROMPT
+from groovehub.guardrails.matcher import normalize_text
+from groovehub.observability.tracing import traced
+
+# Largo de cada shingle, en palabras
+DEFAULT_SHINGLE_WORDS = 8
+# Shingles seguidos que tienen que coincidir para considerarlo una fuga
+# (2 shingles de 8 = 9 palabras textuales del prompt)
+DEFAULT_MIN_SHINGLES = 2
+REDACTION = "[…]"
+BLOCKED_ANSWER = "Lo siento, no puedo compartir mis instrucciones internas. ¿Te ayudo con algo de música?"
+ACTIONS = ("redact", "block")
+# Categoría de las métricas de bloqueos (`LiveMetrics.observe_block`)
+OUTPUT_LEAK_KIND = "output_leak"
+
+_WORD = re.compile(r"\w+")
+# Hash polinomial de Rabin-Karp módulo un primo de Mersenne
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+_MAX_CACHED_WORDS = 100_000
+
+
+class LeakReport(NamedTuple):
+    """Resultado de revisar una respuesta del modelo."""
+    # 'redacted' o 'blocked'
+    action: str
+    # Palabras que repetían el prompt, sumando todos los campos
+    words: int
+    # Campos donde aparecieron ('answer', 'reasoning')
+    fields: tuple
+
+
+class LeakGuard:
+    """
+    Guardrail de salida: detecta respuestas que repiten el System Prompt.
+
+    Es lo que produce una inyección exitosa ("repite tus instrucciones"). Al
+    crearse indexa una sola vez los shingles (n palabras seguidas,
+    normalizadas como en `SecurityFilter`) del prompt base y el recordatorio,
+    con un hash rodante de Rabin-Karp. Revisar una respuesta es una pasada
+    lineal: cada palabra actualiza el hash en O(1) y se busca en un `set`.
+
+    Los ejemplos few-shot no se indexan: son respuestas modelo que el
+    asistente imita a propósito, no instrucciones secretas.
+    """
+
+    def __init__(
+        self,
+        texts: tuple[str, ...] = (BASE_SYSTEM_PROMPT, REMINDER_PROMPT),
+        shingle_words: int = DEFAULT_SHINGLE_WORDS,
+        min_shingles: int = DEFAULT_MIN_SHINGLES,
+        action: str = "redact",
+    ):
+        """
+        Args:
+            texts (tuple[str, ...]): Textos que no deben aparecer en las respuestas.
+            shingle_words (int): Palabras por shingle.
+            min_shingles (int): Shingles seguidos que tienen que coincidir para actuar.
+            action (str): 'redact' tapa los fragmentos; 'block' reemplaza la respuesta entera.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Acción desconocida: {action!r} (usa {' o '.join(ACTIONS)})")
+        self.shingle_words = shingle_words
+        self.min_shingles = min_shingles
+        self.action = action
+        self._words: dict[str, int] = {}
+        # Peso de la palabra que sale de la ventana
+        self._drop = pow(_BASE, shingle_words - 1, _MOD)
+        self._shingles: set[int] = set()
+        for text in texts:
+            window: list[int] = []
+            value = 0
+            for word in _WORD.findall(text):
+                word_id = self._word_id(word)
+                window.append(word_id)
+                if len(window) > shingle_words:
+                    value = (value - window.pop(0) * self._drop) % _MOD
+                value = (value * _BASE + word_id) % _MOD
+                if len(window) == shingle_words:
+                    self._shingles.add(value)
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._words.get(word)
+        if word_id is None:
+            if len(self._words) >= _MAX_CACHED_WORDS:
+                self._words.clear()
+            word_id = self._words[word] = hash(normalize_text(word)) % _MOD
+        return word_id
+
+    def stream(self) -> "LeakStream":
+        """Revisor incremental para una respuesta que llega en fragmentos."""
+        return LeakStream(self)
+
+    def redact(self, text: str) -> tuple[str, int]:
+        """
+        Revisa un texto completo.
+
+        Args:
+            text (str): Texto a revisar.
+
+        Returns:
+            tuple[str, int]: El texto con las fugas tapadas (o cortado y con
+                             `BLOCKED_ANSWER` al final, en modo 'block') y la
+                             cantidad de palabras filtradas.
+        """
+        stream = LeakStream(self)
+        output = stream.feed(text) + stream.finish()
+        return output, stream.leaked_words
+
+    @traced("guardrail.output")
+    def check(self, response):
+        """
+        Revisa `answer` y `reasoning` de una respuesta ya validada.
+
+        Args:
+            response (AdvisorResponse): Respuesta del modelo.
+
+        Returns:
+            tuple[AdvisorResponse, LeakReport | None]: La respuesta a usar (con
+                los fragmentos tapados, o una negativa en modo 'block') y el
+                reporte, o la misma respuesta y None si no hubo fuga.
+        """
+        update, words = {}, 0
+        for field in ("answer", "reasoning"):
+            text, leaked = self.redact(getattr(response, field))
+            if leaked:
+                update[field] = text
+                words += leaked
+        if not update:
+            return response, None
+        if self.action == "block":
+            response = type(response)(
+                answer=BLOCKED_ANSWER,
+                confidence_score=1.0,
+                intent="off_topic",
+                recommended_actions=["none"],
+                reasoning="La respuesta repetía instrucciones internas y se bloqueó.",
+            )
+            return response, LeakReport("blocked", words, tuple(update))
+        return response.model_copy(update=update), LeakReport("redacted", words, tuple(update))
+
+
+class LeakStream:
+    """
+    Revisión incremental de una respuesta en streaming.
+
+    `feed` devuelve lo que ya se puede mostrar: se retienen las últimas
+    `shingle_words - 1` palabras (todavía pueden ser el comienzo de un
+    fragmento del prompt) y, mientras dure, la racha de coincidencias en
+    curso. Así lo filtrado nunca llega a mostrarse. El resultado final es
+    idéntico al de `LeakGuard.redact` sobre el texto completo.
+    """
+
+    def __init__(self, guard: LeakGuard):
+        self.guard = guard
+        self.leaked_words = 0
+        self._text = ""
+        # Hasta dónde se separó en palabras y hasta dónde se devolvió
+        self._scanned = 0
+        self._emitted = 0
+        # (inicio, fin) de cada palabra completa
+        self._spans: list[tuple[int, int]] = []
+        self._window: list[int] = []
+        self._hash = 0
+        # Primer y último shingle de la racha de coincidencias en curso
+        self._run_start: int | None = None
+        self._run_end = 0
+        # Rangos del texto a tapar, en orden
+        self._redactions: list[tuple[int, int]] = []
+        self._next_redaction = 0
+        self._blocked = False
+
+    @property
+    def leaked(self) -> bool:
+        return self.leaked_words > 0
+
+    def feed(self, chunk: str) -> str:
+        """
+        Agrega un fragmento de la respuesta.
+
+        Args:
+            chunk (str): Texto recibido.
+
+        Returns:
+            str: Texto que ya se puede mostrar (puede ser vacío).
+        """
+        self._text += chunk
+        end = len(self._text)
+        for match in _WORD.finditer(self._text, self._scanned):
+            # Una palabra pegada al final puede seguir en el próximo fragmento
+            if match.end() == end:
+                break
+            self._push(match)
+        return self._release(final=False)
+
+    def finish(self) -> str:
+        """Cierra la respuesta y devuelve lo que quedaba retenido."""
+        for match in _WORD.finditer(self._text, self._scanned):
+            self._push(match)
+        self._close_run()
+        return self._release(final=True)
+
+    def _push(self, match: re.Match):
+        guard = self.guard
+        n = guard.shingle_words
+        index = len(self._spans)
+        self._spans.append(match.span())
+        self._scanned = match.end()
+
+        word_id = guard._word_id(match.group())
+        window = self._window
+        window.append(word_id)
+        if len(window) > n:
+            self._hash = (self._hash - window.pop(0) * guard._drop) % _MOD
+        self._hash = (self._hash * _BASE + word_id) % _MOD
+        if len(window) < n:
+            return
+
+        shingle = index - n + 1
+        if self._hash in guard._shingles:
+            if self._run_start is None:
+                self._run_start = shingle
+            self._run_end = shingle
+        else:
+            self._close_run()
+
+    def _close_run(self):
+        if self._run_start is None:
+            return
+        if self._run_end - self._run_start + 1 >= self.guard.min_shingles:
+            first, last = self._run_start, self._run_end + self.guard.shingle_words - 1
+            self._redactions.append((self._spans[first][0], self._spans[last][1]))
+            self.leaked_words += last - first + 1
+        self._run_start = None
+
+    def _release(self, final: bool) -> str:
+        if final:
+            limit = len(self._text)
+        else:
+            # Primera palabra que todavía puede formar parte de una fuga
+            undecided = len(self._spans) - (self.guard.shingle_words - 1)
+            if self._run_start is not None:
+                undecided = min(undecided, self._run_start)
+            if undecided <= 0:
+                return ""
+            limit = self._spans[undecided][0] if undecided < len(self._spans) else self._scanned
+
+        text, position, output = self._text, self._emitted, []
+        while self._next_redaction < len(self._redactions):
+            start, end = self._redactions[self._next_redaction]
+            if start >= limit and not final:
+                break
+            self._next_redaction += 1
+            if self._blocked:
+                continue
+            if start >= position:
+                output.append(text[position:start])
+                output.append(REDACTION)
+            position = max(position, end)
+            if self.guard.action == "block":
+                # En modo 'block' no se muestra nada más de esta respuesta; lo
+                # anterior ya pudo mostrarse, así que se avisa en el mismo flujo
+                output.append(f"\n\n{BLOCKED_ANSWER}")
+                self._blocked = True
+        if not self._blocked and limit > position:
+            output.append(text[position:limit])
+        self._emitted = max(position, limit)
+        return "".join(output)
@@ -0,0 +1,185 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# Caracteres invisibles usados para partir palabras sin que se note
+_ZERO_WIDTH = re.compile("[\u00ad\u180e\u200b-\u200f\u2060-\u2064\ufeff]")
+# Diacríticos combinantes que quedan separados tras NFKD ("é" -> "e" + "´")
+_COMBINING = re.compile("[\u0300-\u036f]")
+# Sustituciones típicas de leetspeak
+_LEET = (("0", "o"), ("1", "i"), ("3", "e"), ("4", "a"), ("5", "s"), ("7", "t"), ("@", "a"), ("$", "s"), ("!", "i"), ("|", "i"))
+
+
+def normalize_text(text: str, fold_leet: bool = True) -> str:
+    """
+    Normaliza un texto para que las variantes ofuscadas coincidan con las reglas.
+
+    Aplica NFKC (letras de ancho completo, ligaduras), elimina caracteres de
+    ancho cero y diacríticos, pasa a minúsculas, pliega leetspeak
+    ("j41lbr34k" -> "jailbreak") y colapsa los espacios. Se usa tanto para
+    compilar las reglas como para el texto a inspeccionar.
+
+    Args:
+        text (str): Texto crudo.
+        fold_leet (bool): Plegar leetspeak. Sin plegado se conservan los dígitos
+                          (números de modelo, precios), que el plegado convierte en letras.
+
+    Returns:
+        str: Texto normalizado.
+    """
+    text = _ZERO_WIDTH.sub("", unicodedata.normalize("NFKC", text))
+    if not text.isascii():
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    text = text.casefold()
+    # str.replace encadenado es bastante más rápido que str.translate con dict
+    for source, target in _LEET if fold_leet else ():
+        if source in text:
+            text = text.replace(source, target)
+    return " ".join(text.split())
+
+
+class AhoCorasick:
+    """
+    Autómata de Aho-Corasick para buscar muchos patrones en una sola pasada.
+
+    Se compila una vez a partir de la lista de patrones; luego cada búsqueda
+    recorre el texto una única vez, en O(largo del texto + coincidencias),
+    sin importar cuántos patrones haya.
+    """
+
+    def __init__(self, patterns: list[str]):
+        """
+        Args:
+            patterns (list[str]): Patrones ya normalizados (los vacíos se ignoran).
+        """
+        self.patterns = list(patterns)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(index)
+
+        # BFS para calcular los enlaces de fallo y heredar las salidas
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text: str) -> list[tuple[int, int]]:
+        """
+        Busca todas las apariciones de todos los patrones.
+
+        Args:
+            text (str): Texto (normalizado) a inspeccionar.
+
+        Returns:
+            list[tuple[int, int]]: Pares (posición de inicio, índice del patrón),
+                                   en el orden en que terminan dentro del texto.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for position, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in out[node]:
+                matches.append((position - len(self.patterns[index]) + 1, index))
+        return matches
+
+
+def load_rules(path: str) -> list[str]:
+    """
+    Lee un archivo de reglas: una frase por línea; se ignoran líneas vacías y
+    comentarios que empiezan con '#'.
+
+    Args:
+        path (str): Ruta del archivo.
+
+    Returns:
+        list[str]: Las frases tal como están escritas.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+class KeywordRules:
+    """
+    Lista negra compilada en un autómata, con recarga en caliente.
+
+    Cada `check_interval` segundos como máximo se revisa la fecha de
+    modificación del archivo; si cambió, se recompila el autómata y se
+    reemplaza de forma atómica, sin reiniciar el proceso.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        """
+        Args:
+            path (str): Archivo de reglas.
+            check_interval (float): Segundos mínimos entre chequeos del archivo.
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._compile()
+
+    def scan(self, text: str) -> list[str]:
+        """
+        Inspecciona un texto y devuelve todas las reglas que aparecen en él.
+
+        Args:
+            text (str): Texto crudo (se normaliza internamente).
+
+        Returns:
+            list[str]: Reglas encontradas, sin repetir, en orden de aparición.
+        """
+        self._maybe_reload()
+        rules, automaton = self._compiled
+        hits = sorted(automaton.find_all(normalize_text(text)))
+        return list(dict.fromkeys(rules[index] for _, index in hits))
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                if os.stat(self.path).st_mtime_ns != self._mtime:
+                    self._compile()
+            except (OSError, UnicodeDecodeError) as e:
+                # Archivo ausente o a medio escribir: seguimos con las últimas reglas válidas
+                print(f"No se pudieron recargar las reglas de seguridad: {e}")
+
+    def _compile(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        rules = load_rules(self.path)
+        # Reglas y autómata se reemplazan juntos para que `scan` vea un par consistente
+        self._compiled = (rules, AhoCorasick([normalize_text(r) for r in rules]))
+        self._mtime = mtime
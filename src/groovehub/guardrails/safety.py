@@ -1,5 +1,9 @@
+import os
 from typing import Tuple
 
+from groovehub.guardrails.matcher import KeywordRules
+from groovehub.observability.tracing import traced
+
 
 class SecurityFilter:
     """
@@ -11,38 +15,51 @@ class SecurityFilter:
     además los costos de API al descartar peticiones inválidas tempranamente.
     """
 
-    # Lista negra de palabras clave
-    FORBIDDEN_KEYWORDS = [
-        # Jailbreak & Prompt Engineering Attacks
-        "ignore previous instructions",
-        "developer mode",
-        "jailbreak",
-        "DAN mode",
-        "reveal system prompt",
-        "override",
-        # Database & System Security
-        "drop table",
-        "sql injection",
-        "rm -rf",
-        "format c:",
-        "os.system",
-        # Ethics & Safety
-        "malware",
-        "exploit",
-        "hate speech",
-        "self-harm",
-        "illegal substances",
-        # PII (Personally Identifiable Information)
-        "api_key",
-        "secret_token",
-        "private_key",
-    ]
+    # Lista negra de palabras clave (un archivo de texto, recargable en caliente)
+    RULES_PATH = os.getenv(
+        "GROOVEHUB_RULES_FILE",
+        os.path.join(os.path.dirname(__file__), "rules", "forbidden_keywords.txt"),
+    )
+    _rules: KeywordRules | None = None
+    LENGTH_REASON = "Input demasiado largo (max 1000 caracteres)."
+
+    @staticmethod
+    def load_rules(path: str | None = None) -> KeywordRules:
+        """
+        Compila (o recompila) la lista negra desde un archivo de reglas.
+
+        Args:
+            path (str | None): Archivo a usar; por defecto `RULES_PATH`.
+
+        Returns:
+            KeywordRules: Las reglas compiladas en un autómata Aho-Corasick.
+        """
+        SecurityFilter._rules = KeywordRules(path or SecurityFilter.RULES_PATH)
+        return SecurityFilter._rules
 
     @staticmethod
+    def find_violations(user_input: str) -> list[str]:
+        """
+        Devuelve todas las reglas de la lista negra presentes en el texto, en
+        una sola pasada lineal y tras normalizar ofuscaciones (Unicode, ancho
+        cero, leetspeak).
+
+        Args:
+            user_input (str): El texto crudo ingresado por el usuario.
+
+        Returns:
+            list[str]: Reglas encontradas, en orden de aparición.
+        """
+        rules = SecurityFilter._rules or SecurityFilter.load_rules()
+        return rules.scan(user_input)
+
+    @staticmethod
+    @traced("safety.check")
     def check_safety(user_input: str) -> Tuple[bool, str]:
         """
         Evalúa la entrada del usuario contra reglas de seguridad estáticas,
-        incluyendo límites de longitud y una lista negra de palabras clave.
+        incluyendo límites de longitud y una lista negra de palabras clave
+        compilada en un autómata (ver `find_violations`).
         
         Args:
             user_input (str): El texto crudo ingresado por el usuario.
@@ -53,19 +70,46 @@ class SecurityFilter:
                               elemento contiene un mensaje descriptivo del 
                               resultado o la razón del bloqueo.
         """
-        normalized_input = user_input.lower()
-
         # 1. Chequeo de longitud (evitar ataques de buffer overflow o spam)
         if len(user_input) > 1000:
-            return False, "Input demasiado largo (max 1000 caracteres)."
+            return False, SecurityFilter.LENGTH_REASON
 
-        # 2. Chequeo de palabras prohibidas
-        for bad_word in SecurityFilter.FORBIDDEN_KEYWORDS:
-            if bad_word in normalized_input:
-                return (
-                    False,
-                    f"Contenido bloqueado por política de seguridad: '{bad_word}' detected.",
-                )
+        # 2. Chequeo de palabras prohibidas (todas las reglas en una sola pasada)
+        violations = SecurityFilter.find_violations(user_input)
+        if violations:
+            return (
+                False,
+                f"Contenido bloqueado por política de seguridad: '{violations[0]}' detected.",
+            )
 
         # 3. Todo OK
-        return True, "Safe"
\ No newline at end of file
+        return True, "Safe"
+
+    @staticmethod
+    def block_kind(reason: str) -> str:
+        """
+        Agrupa el motivo de un bloqueo en una categoría estable para las métricas.
+
+        Args:
+            reason (str): Mensaje devuelto por `check_safety`.
+
+        Returns:
+            str: 'length' o 'keyword'.
+        """
+        return "length" if reason == SecurityFilter.LENGTH_REASON else "keyword"
+
+    @staticmethod
+    async def check_safety_async(user_input: str) -> Tuple[bool, str]:
+        """
+        Hook asíncrono del filtro de seguridad para el pipeline basado en asyncio.
+
+        El chequeo es puramente en memoria y toma microsegundos, así que se
+        ejecuta inline: delegarlo a un hilo costaría más que el propio chequeo.
+
+        Args:
+            user_input (str): El texto crudo ingresado por el usuario.
+
+        Returns:
+            Tuple[bool, str]: Igual que `check_safety`.
+        """
+        return SecurityFilter.check_safety(user_input)
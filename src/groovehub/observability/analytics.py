@@ -0,0 +1,574 @@
+import array
+import bisect
+import json
+import os
+import struct
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import compress, islice
+from typing import Iterable, Iterator, NamedTuple
+
+from groovehub.observability.log_store import (
+    FileLock,
+    migrate_legacy_log,
+    pending_legacy_log,
+    read_segment,
+    segment_paths,
+)
+from groovehub.observability.metrics import percentile
+
+COLUMNAR_DIR = "columnar"
+MANIFEST_FILE = "manifest.json"
+PART_PREFIX = "part-"
+PART_SUFFIX = ".gcol"
+MAGIC = b"GHCOL1\n"
+# Filas por segmento columnar, y por lote al recorrer el JSONL
+ROWS_PER_PART = 1 << 18
+DAY_S = 86400
+_EPOCH = datetime(1970, 1, 1)
+
+# Columnas y su typecode de `array`. Los textos se guardan como códigos de un
+# diccionario propio de cada segmento y las acciones como máscara de bits. La
+# confianza va en centésimos (0-100); NO_CONFIDENCE marca que no vino.
+COLUMNS = (
+    ("ts", "d"),
+    ("latency_ms", "f"),
+    ("cost_usd", "d"),
+    ("input_tokens", "I"),
+    ("output_tokens", "I"),
+    ("confidence", "B"),
+    ("intent", "H"),
+    ("provider", "H"),
+    ("actions", "I"),
+)
+TYPECODES = dict(COLUMNS)
+DICTIONARY_COLUMNS = ("intent", "provider", "actions")
+NO_CONFIDENCE = 255
+MAX_ACTIONS = 32
+PERCENTILES = (50, 90, 95, 99)
+
+# Para registros viejos sin el campo `provider`
+_MODEL_PROVIDERS = (("llama", "Groq"), ("gpt", "OpenAI"))
+
+
+class Row(NamedTuple):
+    """Un turno del log, reducido a lo que usan las estadísticas."""
+    ts: float
+    latency_ms: float
+    cost_usd: float
+    input_tokens: int
+    output_tokens: int
+    confidence: int
+    intent: str
+    provider: str
+    actions: tuple
+
+
+def to_epoch(moment: datetime) -> float:
+    """
+    Segundos desde 1970 de la hora *de reloj* de un datetime.
+
+    El log guarda la hora local sin zona; se conserva tal cual para que los
+    días del reporte coincidan con los del log.
+    """
+    return (moment.replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def parse_bound(text: str, end: bool = False) -> datetime:
+    """
+    Interpreta un límite de `--since`/`--until` (fecha u hora ISO).
+
+    Args:
+        text (str): Por ejemplo '2026-02-16' o '2026-02-16T17:30'.
+        end (bool): Si es el límite superior y es solo una fecha, incluye ese día entero.
+
+    Returns:
+        datetime: El instante correspondiente.
+    """
+    moment = datetime.fromisoformat(text)
+    if end and len(text) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def provider_of(metrics: dict) -> str:
+    """Proveedor de un turno; los servidos por la caché o el atajo local se agrupan aparte."""
+    source = metrics.get("token_source")
+    if source in ("cache", "local"):
+        return source
+    if metrics.get("provider"):
+        return metrics["provider"]
+    model = metrics.get("model") or ""
+    for prefix, name in _MODEL_PROVIDERS:
+        if model.startswith(prefix):
+            return name
+    return "desconocido"
+
+
+def row_from_entry(entry: dict) -> Row | None:
+    """
+    Convierte un registro del log en una fila (None si no tiene timestamp válido).
+
+    Args:
+        entry (dict): Registro tal como lo escribe `MetricsTracker.save_log`.
+
+    Returns:
+        Row | None: La fila.
+    """
+    try:
+        ts = to_epoch(datetime.fromisoformat(entry["timestamp"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+    metrics = entry.get("metrics") or {}
+    response = entry.get("response_data") or {}
+    confidence = response.get("confidence_score")
+    if isinstance(confidence, (int, float)):
+        confidence = min(100, max(0, round(confidence * 100)))
+    else:
+        confidence = NO_CONFIDENCE
+    return Row(
+        ts,
+        float(metrics.get("latency_ms") or 0),
+        float(metrics.get("cost_usd") or 0),
+        int(metrics.get("input_tokens") or 0),
+        int(metrics.get("output_tokens") or 0),
+        confidence,
+        response.get("intent") or "desconocida",
+        provider_of(metrics),
+        tuple(response.get("recommended_actions") or ()),
+    )
+
+
+class ColumnBatch:
+    """
+    Un lote de turnos en columnas (`array.array` tipados) con sus diccionarios.
+
+    Es la unidad que se escribe como segmento columnar y la que consume
+    `StatsAccumulator`, venga de un segmento o del JSONL.
+    """
+
+    def __init__(self):
+        self.columns = {name: array.array(code) for name, code in COLUMNS}
+        self.dicts: dict[str, list[str]] = {name: [] for name in DICTIONARY_COLUMNS}
+        self._codes: dict[str, dict[str, int]] = {name: {} for name in DICTIONARY_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.dicts[column])
+            self.dicts[column].append(value)
+        return code
+
+    def append(self, row: Row):
+        columns = self.columns
+        columns["ts"].append(row.ts)
+        columns["latency_ms"].append(row.latency_ms)
+        columns["cost_usd"].append(row.cost_usd)
+        columns["input_tokens"].append(row.input_tokens)
+        columns["output_tokens"].append(row.output_tokens)
+        columns["confidence"].append(row.confidence)
+        columns["intent"].append(self._code("intent", row.intent))
+        columns["provider"].append(self._code("provider", row.provider))
+        mask = 0
+        for action in row.actions:
+            bit = self._code("actions", action)
+            # Las acciones del esquema son muchas menos; el resto no entra en la máscara
+            if bit < MAX_ACTIONS:
+                mask |= 1 << bit
+        columns["actions"].append(mask)
+
+    def extend(self, columns: dict, dicts: dict):
+        """Agrega las filas de otro lote (p. ej. un segmento leído), re-codificando sus diccionarios."""
+        for name in ("intent", "provider"):
+            table = [self._code(name, value) for value in dicts[name]]
+            self.columns[name].extend(map(table.__getitem__, columns[name]))
+        bits = [self._code("actions", action) for action in dicts["actions"]]
+        masks: dict[int, int] = {}
+        for mask in set(columns["actions"]):
+            masks[mask] = sum(1 << bits[i] for i in range(len(bits)) if mask >> i & 1 and bits[i] < MAX_ACTIONS)
+        self.columns["actions"].extend(map(masks.__getitem__, columns["actions"]))
+        for name in ("ts", "latency_ms", "cost_usd", "input_tokens", "output_tokens", "confidence"):
+            self.columns[name].extend(columns[name])
+
+    def sort(self):
+        """Ordena las filas por timestamp (varios procesos pueden intercalar escrituras)."""
+        ts = self.columns["ts"]
+        if all(a <= b for a, b in zip(ts, islice(ts, 1, None))):
+            return
+        order = sorted(range(len(ts)), key=ts.__getitem__)
+        for name, code in COLUMNS:
+            column = self.columns[name]
+            self.columns[name] = array.array(code, map(column.__getitem__, order))
+
+
+def write_part(path: str, batch: ColumnBatch) -> dict:
+    """
+    Escribe un lote como segmento columnar: cabecera JSON y luego cada columna cruda.
+
+    Args:
+        path (str): Archivo de destino (se reemplaza de forma atómica).
+        batch (ColumnBatch): Filas ordenadas por timestamp.
+
+    Returns:
+        dict: Entrada del manifiesto (archivo, filas y rango de timestamps).
+    """
+    ts = batch.columns["ts"]
+    header = {
+        "rows": len(batch),
+        "ts_min": ts[0],
+        "ts_max": ts[-1],
+        "byteorder": sys.byteorder,
+        "dicts": batch.dicts,
+        "columns": [[name, code, len(batch.columns[name]) * batch.columns[name].itemsize] for name, code in COLUMNS],
+    }
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        for name, _ in COLUMNS:
+            batch.columns[name].tofile(f)
+    os.replace(tmp_path, path)
+    return {"file": os.path.basename(path), "rows": len(batch), "ts_min": ts[0], "ts_max": ts[-1]}
+
+
+def read_part(path: str, names: Iterable[str] | None = None) -> tuple[dict, dict]:
+    """
+    Lee un segmento columnar (solo las columnas pedidas).
+
+    Args:
+        path (str): Archivo del segmento.
+        names (Iterable[str] | None): Columnas a cargar; por defecto todas.
+
+    Returns:
+        tuple[dict, dict]: La cabecera y las columnas (`array.array`) por nombre.
+    """
+    wanted = set(names) if names is not None else set(TYPECODES)
+    columns = {}
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un segmento columnar de Groove Hub")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+        for name, code, nbytes in header["columns"]:
+            if name not in wanted:
+                f.seek(nbytes, os.SEEK_CUR)
+                continue
+            column = array.array(code)
+            column.frombytes(f.read(nbytes))
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            columns[name] = column
+    return header, columns
+
+
+def _columnar_dir(log_dir: str) -> str:
+    return os.path.join(log_dir, COLUMNAR_DIR)
+
+
+def load_manifest(log_dir: str) -> dict | None:
+    """Manifiesto de la versión compactada (None si nunca se compactó)."""
+    path = os.path.join(_columnar_dir(log_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(log_dir: str, manifest: dict):
+    path = os.path.join(_columnar_dir(log_dir), MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_orphans(directory: str, manifest: dict):
+    """Borra los segmentos que no figuran en el manifiesto (restos de una compactación interrumpida)."""
+    listed = {part["file"] for part in manifest["parts"]}
+    for name in os.listdir(directory):
+        if name.startswith(PART_PREFIX) and name.removesuffix(".tmp").endswith(PART_SUFFIX) and name not in listed:
+            os.remove(os.path.join(directory, name))
+
+
+def compact(log_dir: str = "metrics", rows_per_part: int = ROWS_PER_PART) -> dict:
+    """
+    Pasa al formato columnar lo que el log JSONL agregó desde la última compactación.
+
+    Es incremental: el manifiesto recuerda hasta qué byte de cada segmento JSONL
+    se compactó y solo se lee lo nuevo. Si el último segmento columnar quedó
+    chico se reescribe junto con las filas nuevas, para no acumular segmentos
+    diminutos. Ese reemplazo se escribe con un nombre nuevo y el segmento
+    viejo se borra recién después de guardar el manifiesto, así que un corte
+    a mitad de camino nunca cuenta filas dos veces. El log JSONL no se toca:
+    sigue siendo la fuente de verdad.
+
+    Args:
+        log_dir (str): Directorio de métricas.
+        rows_per_part (int): Filas por segmento columnar.
+
+    Returns:
+        dict: Filas nuevas, segmentos escritos y total de filas compactadas.
+    """
+    migrate_legacy_log(log_dir)
+    directory = _columnar_dir(log_dir)
+    os.makedirs(directory, exist_ok=True)
+    with FileLock(os.path.join(directory, ".lock")):
+        manifest = load_manifest(log_dir) or {"version": 1, "parts": [], "sources": {}}
+        # Los manifiestos anteriores numeraban los segmentos de 0 a n-1
+        manifest.setdefault("next_part", len(manifest["parts"]))
+        _remove_orphans(directory, manifest)
+        sources = dict(manifest["sources"])
+        batch = ColumnBatch()
+        new_rows = written = 0
+
+        def flush():
+            nonlocal batch, written
+            parts = manifest["parts"]
+            replaced = None
+            if parts and parts[-1]["rows"] + len(batch) <= rows_per_part:
+                replaced = parts.pop()["file"]
+                header, columns = read_part(os.path.join(directory, replaced))
+                merged = ColumnBatch()
+                merged.extend(columns, header["dicts"])
+                merged.extend(batch.columns, batch.dicts)
+                batch = merged
+            batch.sort()
+            name = f"{PART_PREFIX}{manifest['next_part']:05d}{PART_SUFFIX}"
+            manifest["next_part"] += 1
+            parts.append(write_part(os.path.join(directory, name), batch))
+            written += 1
+            manifest["sources"] = dict(sources)
+            _save_manifest(log_dir, manifest)
+            if replaced is not None:
+                os.remove(os.path.join(directory, replaced))
+            batch = ColumnBatch()
+
+        for path in segment_paths(log_dir):
+            name = os.path.basename(path)
+            for entry, end in read_segment(path, sources.get(name, 0)):
+                sources[name] = end
+                row = row_from_entry(entry)
+                if row is None:
+                    continue
+                batch.append(row)
+                new_rows += 1
+                if len(batch) >= rows_per_part:
+                    flush()
+        if len(batch):
+            flush()
+    return {
+        "new_rows": new_rows,
+        "parts_written": written,
+        "total_rows": sum(part["rows"] for part in manifest["parts"]),
+    }
+
+
+class StatsAccumulator:
+    """
+    Agregados de un conjunto de turnos, alimentados lote a lote.
+
+    Todo es de memoria acotada salvo las latencias (4 bytes por turno), que se
+    guardan para dar percentiles exactos.
+    """
+
+    def __init__(self):
+        self.turns = 0
+        self.latencies = array.array("f")
+        self.cost_usd = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.ts_min = float("inf")
+        self.ts_max = float("-inf")
+        self.turns_by_day: Counter = Counter()
+        self.cost_by_day: dict[int, Counter] = {}
+        self.intents: Counter = Counter()
+        self.actions: Counter = Counter()
+        self.confidence: Counter = Counter()
+
+    def add(self, columns: dict, dicts: dict):
+        """
+        Suma un lote (columnas ordenadas por timestamp).
+
+        Args:
+            columns (dict): Columnas por nombre.
+            dicts (dict): Diccionarios de las columnas codificadas.
+        """
+        ts = columns["ts"]
+        n = len(ts)
+        if not n:
+            return
+        self.turns += n
+        self.latencies.extend(columns["latency_ms"])
+        self.input_tokens += sum(columns["input_tokens"])
+        self.output_tokens += sum(columns["output_tokens"])
+        self.ts_min = min(self.ts_min, ts[0])
+        self.ts_max = max(self.ts_max, ts[-1])
+
+        # Las filas están ordenadas: cada día es un rango contiguo que se encuentra por bisección
+        providers, codes, cost = dicts["provider"], columns["provider"], columns["cost_usd"]
+        start = 0
+        while start < n:
+            day = int(ts[start] // DAY_S)
+            end = bisect.bisect_left(ts, (day + 1) * DAY_S, start)
+            self.turns_by_day[day] += end - start
+            by_provider = self.cost_by_day.setdefault(day, Counter())
+            if len(providers) == 1:
+                by_provider[providers[0]] += sum(cost[start:end])
+            else:
+                day_codes = codes[start:end]
+                sums = [0.0] * len(providers)
+                for code, value in zip(day_codes, cost[start:end]):
+                    sums[code] += value
+                for code in Counter(day_codes):
+                    by_provider[providers[code]] += sums[code]
+            self.cost_usd += sum(cost[start:end])
+            start = end
+
+        # Los conteos se hacen sobre los códigos y se traducen una vez por valor distinto
+        for code, count in Counter(columns["intent"]).items():
+            self.intents[dicts["intent"][code]] += count
+        actions = dicts["actions"]
+        for mask, count in Counter(columns["actions"]).items():
+            for bit, name in enumerate(actions[:MAX_ACTIONS]):
+                if mask >> bit & 1:
+                    self.actions[name] += count
+        for value, count in Counter(columns["confidence"]).items():
+            self.confidence[None if value == NO_CONFIDENCE else min(value // 10, 9)] += count
+
+    def report(self) -> dict:
+        """Reporte final (JSON-serializable)."""
+        latencies = sorted(self.latencies)
+        day = lambda d: (_EPOCH + timedelta(days=d)).date().isoformat()  # noqa: E731
+        confidence = {f"{b / 10:.1f}-{(b + 1) / 10:.1f}": self.confidence.get(b, 0) for b in range(10)}
+        confidence["sin dato"] = self.confidence.get(None, 0)
+        return {
+            "turns": self.turns,
+            "first": (_EPOCH + timedelta(seconds=self.ts_min)).isoformat(timespec="seconds") if self.turns else None,
+            "last": (_EPOCH + timedelta(seconds=self.ts_max)).isoformat(timespec="seconds") if self.turns else None,
+            "latency_ms": {
+                **{f"p{q}": round(percentile(latencies, q), 1) for q in PERCENTILES},
+                "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "max": round(latencies[-1], 1) if latencies else 0.0,
+            },
+            "cost_usd": round(self.cost_usd, 6),
+            "tokens": {"input": self.input_tokens, "output": self.output_tokens},
+            "by_day": {
+                day(d): {
+                    "turns": self.turns_by_day[d],
+                    "cost_usd": {name: round(value, 6) for name, value in sorted(self.cost_by_day[d].items())},
+                }
+                for d in sorted(self.turns_by_day)
+            },
+            "intents": dict(self.intents.most_common()),
+            "actions": dict(self.actions.most_common()),
+            "confidence": confidence,
+        }
+
+
+def _select(columns: dict, dicts: dict, since: float, until: float, intents: set | None) -> dict | None:
+    # Rango de tiempo por bisección (filas ordenadas) y luego máscara por intención
+    ts = columns["ts"]
+    lo = bisect.bisect_left(ts, since) if since > ts[0] else 0
+    hi = bisect.bisect_left(ts, until) if until <= ts[-1] else len(ts)
+    if lo >= hi:
+        return None
+    if intents is not None:
+        codes = {code for code, name in enumerate(dicts["intent"]) if name in intents}
+        if not codes:
+            return None
+        mask = [code in codes for code in islice(columns["intent"], lo, hi)]
+        return {name: array.array(column.typecode, compress(column[lo:hi], mask)) for name, column in columns.items()}
+    if lo == 0 and hi == len(ts):
+        return columns
+    return {name: column[lo:hi] for name, column in columns.items()}
+
+
+def _iter_tail(log_dir: str, offsets: dict) -> Iterator[ColumnBatch]:
+    # Lo que todavía no está compactado (todo, si no hay manifiesto), en lotes ordenados
+    batch = ColumnBatch()
+    entries: Iterable = ()
+    legacy_path = pending_legacy_log(log_dir)
+    if not offsets and legacy_path is not None:
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+    sources = [((entry, 0) for entry in entries)]
+    sources += [
+        read_segment(path, offsets.get(os.path.basename(path), 0)) for path in segment_paths(log_dir)
+    ]
+    for source in sources:
+        for entry, _ in source:
+            row = row_from_entry(entry)
+            if row is None:
+                continue
+            batch.append(row)
+            if len(batch) >= ROWS_PER_PART:
+                batch.sort()
+                yield batch
+                batch = ColumnBatch()
+    if len(batch):
+        batch.sort()
+        yield batch
+
+
+def compute_stats(
+    log_dir: str = "metrics",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    intents: Iterable[str] | None = None,
+    columnar: bool = True,
+) -> dict:
+    """
+    Estadísticas del log de interacciones, sin cargarlo entero en memoria.
+
+    Si hay versión compactada, se leen sus segmentos columnares (salteando
+    los que quedan fuera del rango de tiempo o no contienen las intenciones
+    pedidas) y después solo la cola del JSONL que todavía no se compactó. Si
+    no, se recorre el JSONL en streaming, por lotes.
+
+    Args:
+        log_dir (str): Directorio de métricas.
+        since (datetime | None): Desde este instante (inclusive).
+        until (datetime | None): Hasta este instante (exclusive).
+        intents (Iterable[str] | None): Solo estas intenciones.
+        columnar (bool): Usar la versión compactada si existe.
+
+    Returns:
+        dict: Reporte de `StatsAccumulator.report`, más de dónde salieron las filas.
+    """
+    lower = to_epoch(since) if since is not None else float("-inf")
+    upper = to_epoch(until) if until is not None else float("inf")
+    wanted = set(intents) if intents else None
+    accumulator = StatsAccumulator()
+    sources = {"columnar_rows": 0, "jsonl_rows": 0, "parts_read": 0, "parts_skipped": 0}
+
+    manifest = load_manifest(log_dir) if columnar else None
+    offsets = manifest["sources"] if manifest else {}
+    for part in manifest["parts"] if manifest else ():
+        if part["ts_max"] < lower or part["ts_min"] >= upper:
+            sources["parts_skipped"] += 1
+            continue
+        header, columns = read_part(os.path.join(_columnar_dir(log_dir), part["file"]))
+        selected = _select(columns, header["dicts"], lower, upper, wanted)
+        if selected is None:
+            sources["parts_skipped"] += 1
+            continue
+        sources["parts_read"] += 1
+        sources["columnar_rows"] += len(selected["ts"])
+        accumulator.add(selected, header["dicts"])
+
+    for batch in _iter_tail(log_dir, offsets):
+        selected = _select(batch.columns, batch.dicts, lower, upper, wanted)
+        if selected is not None:
+            sources["jsonl_rows"] += len(selected["ts"])
+            accumulator.add(selected, batch.dicts)
+
+    report = accumulator.report()
+    report["sources"] = sources
+    return report
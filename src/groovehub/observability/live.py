@@ -0,0 +1,377 @@
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ventanas móviles expuestas: nombre -> (segundos totales, cantidad de franjas)
+WINDOWS = {"1m": (60, 6), "15m": (900, 15)}
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def exponential_bounds(start: float, factor: float, count: int) -> list[float]:
+    """
+    Límites superiores de buckets que crecen geométricamente.
+
+    Con `factor=1.25` el error relativo de un cuantil estimado queda por
+    debajo del 12,5 %, con unas pocas decenas de buckets.
+
+    Args:
+        start (float): Límite del primer bucket.
+        factor (float): Razón entre límites consecutivos.
+        count (int): Cantidad de buckets (más uno implícito para +Inf).
+
+    Returns:
+        list[float]: Límites ordenados.
+    """
+    return [start * factor**i for i in range(count)]
+
+
+# 1 ms .. ~2 min, 1 token .. ~250K tokens, 1e-7 .. ~3 USD
+LATENCY_BOUNDS = exponential_bounds(1.0, 1.25, 53)
+TOKEN_BOUNDS = exponential_bounds(1.0, 1.25, 56)
+COST_BOUNDS = exponential_bounds(1e-7, 1.25, 77)
+# Herramientas: desde 10 µs (búsquedas locales) hasta unos 6 s
+TOOL_LATENCY_BOUNDS = exponential_bounds(0.01, 1.25, 60)
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos: memoria constante sin importar cuántas
+    muestras reciba, y cuantiles aproximados por interpolación dentro del
+    bucket (acotados por el mínimo y el máximo observados).
+    """
+
+    def __init__(self, bounds: list[float]):
+        """
+        Args:
+            bounds (list[float]): Límites superiores de los buckets, ordenados.
+        """
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estima un cuantil.
+
+        Args:
+            q (float): Cuantil buscado, entre 0 y 1.
+
+        Returns:
+            float: Valor estimado, o 0.0 si no hay muestras.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / c
+                return min(max(value, self.min), self.max)
+            seen += c
+        return self.max
+
+
+class RollingHistogram:
+    """
+    Histograma sobre una ventana móvil de tiempo, dividida en franjas.
+
+    Cada franja es un `Histogram`; al avanzar el reloj la franja más vieja se
+    reutiliza, así que la memoria es `franjas × buckets` para siempre.
+    """
+
+    def __init__(self, bounds: list[float], window_s: float, slots: int):
+        """
+        Args:
+            bounds (list[float]): Límites de los buckets.
+            window_s (float): Duración de la ventana en segundos.
+            slots (int): Cantidad de franjas en que se divide la ventana.
+        """
+        self.bounds = bounds
+        self.slot_s = window_s / slots
+        self._slots = [Histogram(bounds) for _ in range(slots)]
+        self._epochs = [-1] * slots
+
+    def observe(self, value: float, now: float):
+        slot = self._slot(now)
+        slot.observe(value)
+
+    def merged(self, now: float) -> Histogram:
+        """Histograma con todas las muestras de la ventana que termina en `now`."""
+        current = int(now // self.slot_s)
+        result = Histogram(self.bounds)
+        for epoch, slot in zip(self._epochs, self._slots):
+            if current - epoch < len(self._slots):
+                result.merge(slot)
+        return result
+
+    def _slot(self, now: float) -> Histogram:
+        epoch = int(now // self.slot_s)
+        index = epoch % len(self._slots)
+        if self._epochs[index] != epoch:
+            self._slots[index].reset()
+            self._epochs[index] = epoch
+        return self._slots[index]
+
+
+class LiveMetrics:
+    """
+    Agregador en proceso de las métricas de todos los turnos.
+
+    Lleva histogramas acumulados (para Prometheus) y por ventana móvil (para
+    ver p50/p95/p99 recientes) de latencia, tokens y costo, más contadores de
+    intenciones, bloqueos del guardrail, resultado de la salida estructurada
+    (válida, reparada localmente, re-preguntada o fallida), nivel de modelo
+    que respondió (rápido, fuerte o escalado) y, por herramienta, llamadas,
+    errores y latencia. Es seguro entre hilos y su memoria no crece con la
+    cantidad de turnos.
+    """
+
+    SERIES = {
+        "latency_ms": LATENCY_BOUNDS,
+        "total_tokens": TOKEN_BOUNDS,
+        "cost_usd": COST_BOUNDS,
+    }
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Args:
+            clock (Callable[[], float]): Reloj en segundos (inyectable en tests).
+        """
+        self.clock = clock
+        self.started_at = clock()
+        self.turns = 0
+        self.intents: dict[str, int] = {}
+        self.blocks: dict[str, int] = {}
+        self.outputs: dict[str, int] = {}
+        self.routes: dict[str, int] = {}
+        # Por herramienta: llamadas por resultado ('ok', 'error', 'timeout') y latencia
+        self.tool_calls: dict[str, dict[str, int]] = {}
+        self.tool_latency: dict[str, Histogram] = {}
+        self._totals = {name: Histogram(bounds) for name, bounds in self.SERIES.items()}
+        self._windows = {
+            name: {w: RollingHistogram(bounds, secs, slots) for w, (secs, slots) in WINDOWS.items()}
+            for name, bounds in self.SERIES.items()
+        }
+        self._lock = threading.Lock()
+
+    def observe_turn(self, metrics: dict, intent: str | None = None):
+        """
+        Registra un turno respondido.
+
+        Args:
+            metrics (dict): Métricas del turno (ver `build_turn_metrics`).
+            intent (str | None): Intención clasificada por el modelo.
+        """
+        now = self.clock()
+        with self._lock:
+            self.turns += 1
+            if intent is not None:
+                self.intents[intent] = self.intents.get(intent, 0) + 1
+            status = metrics.get("output_status")
+            if status is not None:
+                self.outputs[status] = self.outputs.get(status, 0) + 1
+            route = "escalated" if metrics.get("escalated") else metrics.get("route")
+            if route is not None:
+                self.routes[route] = self.routes.get(route, 0) + 1
+            for call in metrics.get("tool_calls") or ():
+                self._observe_tool(call["name"], call["status"], call["latency_ms"])
+            for name in self.SERIES:
+                value = metrics.get(name)
+                if value is None:
+                    continue
+                self._totals[name].observe(value)
+                for window in self._windows[name].values():
+                    window.observe(value, now)
+
+    def _observe_tool(self, name: str, status: str, latency_ms: float):
+        # Con el lock tomado
+        counts = self.tool_calls.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+        histogram = self.tool_latency.get(name)
+        if histogram is None:
+            histogram = self.tool_latency[name] = Histogram(TOOL_LATENCY_BOUNDS)
+        histogram.observe(latency_ms)
+
+    def observe_block(self, kind: str):
+        """
+        Registra una consulta bloqueada por el guardrail.
+
+        Args:
+            kind (str): Tipo de bloqueo (por ejemplo 'keyword' o 'length').
+        """
+        with self._lock:
+            self.blocks[kind] = self.blocks.get(kind, 0) + 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Turnos, intenciones, bloqueos, resultados de la salida
+                  estructurada (conteo y tasa), rutas del router, llamadas y
+                  latencia por herramienta y, por serie y ventana (más 'total'),
+                  la cantidad de muestras y p50/p95/p99.
+        """
+        now = self.clock()
+        with self._lock:
+            series = {}
+            for name in self.SERIES:
+                histograms = {w: rolling.merged(now) for w, rolling in self._windows[name].items()}
+                histograms["total"] = self._totals[name]
+                series[name] = {
+                    window: {"count": h.count, **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+                    for window, h in histograms.items()
+                }
+            return {
+                "uptime_s": round(now - self.started_at, 1),
+                "turns": self.turns,
+                "intents": dict(self.intents),
+                "blocks": dict(self.blocks),
+                "outputs": {
+                    status: {"count": count, "rate": count / sum(self.outputs.values())}
+                    for status, count in self.outputs.items()
+                },
+                "routes": dict(self.routes),
+                "tools": {
+                    name: {
+                        "calls": dict(self.tool_calls[name]),
+                        **{f"p{int(q * 100)}_ms": histogram.quantile(q) for q in QUANTILES},
+                    }
+                    for name, histogram in self.tool_latency.items()
+                },
+                "series": series,
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Serializa las métricas en el formato de texto de Prometheus.
+
+        Returns:
+            str: Histogramas acumulados, cuantiles por ventana como gauges y contadores.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE groovehub_turns_total counter",
+            f"groovehub_turns_total {snapshot['turns']}",
+            "# TYPE groovehub_intents_total counter",
+        ]
+        lines += [f'groovehub_intents_total{{intent="{k}"}} {v}' for k, v in sorted(snapshot["intents"].items())]
+        lines.append("# TYPE groovehub_guardrail_blocks_total counter")
+        lines += [f'groovehub_guardrail_blocks_total{{kind="{k}"}} {v}' for k, v in sorted(snapshot["blocks"].items())]
+        lines.append("# TYPE groovehub_structured_output_total counter")
+        lines += [
+            f'groovehub_structured_output_total{{outcome="{k}"}} {v["count"]}'
+            for k, v in sorted(snapshot["outputs"].items())
+        ]
+        lines.append("# TYPE groovehub_model_routes_total counter")
+        lines += [f'groovehub_model_routes_total{{route="{k}"}} {v}' for k, v in sorted(snapshot["routes"].items())]
+        lines.append("# TYPE groovehub_tool_calls_total counter")
+        lines += [
+            f'groovehub_tool_calls_total{{tool="{tool}",status="{status}"}} {count}'
+            for tool, values in sorted(snapshot["tools"].items())
+            for status, count in sorted(values["calls"].items())
+        ]
+        lines.append("# TYPE groovehub_tool_latency_ms gauge")
+        lines += [
+            f'groovehub_tool_latency_ms{{tool="{tool}",quantile="{q}"}} {values[f"p{int(q * 100)}_ms"]:.6g}'
+            for tool, values in sorted(snapshot["tools"].items())
+            for q in QUANTILES
+        ]
+
+        with self._lock:
+            for name, histogram in self._totals.items():
+                metric = f"groovehub_turn_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum:.6g}")
+                lines.append(f"{metric}_count {histogram.count}")
+
+        for name, windows in snapshot["series"].items():
+            metric = f"groovehub_turn_{name}_window"
+            lines.append(f"# TYPE {metric} gauge")
+            for window, values in windows.items():
+                if window == "total":
+                    continue
+                for q in QUANTILES:
+                    value = values[f"p{int(q * 100)}"]
+                    lines.append(f'{metric}{{window="{window}",quantile="{q}"}} {value:.6g}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Endpoint HTTP local (`GET /metrics`) con las métricas en formato Prometheus.
+
+    Corre en un hilo daemon; pensado para escuchar solo en localhost.
+    """
+
+    def __init__(self, live: LiveMetrics, host: str = "127.0.0.1", port: int = 9464):
+        """
+        Args:
+            live (LiveMetrics): Agregador a exponer.
+            host (str): Dirección de escucha.
+            port (int): Puerto (0 elige uno libre).
+        """
+        handler = self._handler(live)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="groovehub-metrics")
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _handler(live: LiveMetrics):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = live.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
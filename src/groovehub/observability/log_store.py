@@ -0,0 +1,361 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+from typing import Iterator
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+SEGMENT_PREFIX = "interactions-"
+SEGMENT_SUFFIX = ".jsonl"
+LEGACY_FILE = "metrics.json"
+# Marca de migración hecha: el archivo legado puede estar versionado, así que no se mueve
+LEGACY_MARKER_FILE = ".legacy-migrated"
+# Nombre al que lo renombraban las versiones anteriores (también cuenta como migrado)
+LEGACY_MIGRATED_FILE = "metrics.legacy.json"
+LOCK_FILE = ".lock"
+
+_STOP = object()
+
+
+class FileLock:
+    """
+    Lock exclusivo entre procesos basado en un archivo auxiliar.
+
+    Usa `fcntl.flock` en sistemas POSIX y `msvcrt.locking` en Windows, de modo
+    que varias instancias del CLI puedan compartir el mismo directorio de logs
+    sin intercalar escrituras ni rotar segmentos al mismo tiempo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def segment_paths(log_dir: str) -> list[str]:
+    """
+    Lista los segmentos JSONL del directorio en orden cronológico.
+
+    Args:
+        log_dir (str): Directorio donde viven los segmentos.
+
+    Returns:
+        list[str]: Rutas de los segmentos ordenadas por índice.
+    """
+    pattern = os.path.join(log_dir, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+    return sorted(glob.glob(pattern))
+
+
+def _segment_path(log_dir: str, index: int) -> str:
+    return os.path.join(log_dir, f"{SEGMENT_PREFIX}{index:05d}{SEGMENT_SUFFIX}")
+
+
+def _segment_index(path: str) -> int:
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+
+
+def encode_entry(entry: dict, response_json: str | None = None) -> str:
+    """
+    Serializa un registro como una línea JSONL.
+
+    Si se pasa `response_json` (ya serializado por Pydantic), se incrusta tal
+    cual bajo la clave `response_data`, evitando volver a parsearlo y
+    serializarlo.
+
+    Args:
+        entry (dict): Campos del registro (timestamp, métricas, etc.).
+        response_json (str | None): Respuesta del modelo ya en formato JSON.
+
+    Returns:
+        str: La línea lista para escribir, terminada en salto de línea.
+    """
+    line = json.dumps(entry, ensure_ascii=False)
+    if response_json is not None:
+        line = f'{line[:-1]}, "response_data": {response_json}}}'
+    return line + "\n"
+
+
+def pending_legacy_log(log_dir: str) -> str | None:
+    """Ruta del `metrics.json` legado si todavía no se migró, o None."""
+    legacy_path = os.path.join(log_dir, LEGACY_FILE)
+    if not os.path.exists(legacy_path):
+        return None
+    for done in (LEGACY_MARKER_FILE, LEGACY_MIGRATED_FILE):
+        if os.path.exists(os.path.join(log_dir, done)):
+            return None
+    return legacy_path
+
+
+def migrate_legacy_log(log_dir: str) -> int:
+    """
+    Migración única del antiguo `metrics.json` (un array JSON) a segmentos JSONL.
+
+    Las entradas se copian al segmento 0 y se deja la marca `.legacy-migrated`,
+    por lo que una segunda llamada no hace nada. El archivo original queda
+    donde está (puede estar versionado en git) y desde entonces se ignora. Si
+    está corrupto tampoco se toca.
+
+    Args:
+        log_dir (str): Directorio de métricas.
+
+    Returns:
+        int: Cantidad de entradas migradas.
+    """
+    if pending_legacy_log(log_dir) is None:
+        return 0
+
+    os.makedirs(log_dir, exist_ok=True)
+    with FileLock(os.path.join(log_dir, LOCK_FILE)):
+        # Otro proceso pudo haber migrado mientras esperábamos el lock
+        legacy_path = pending_legacy_log(log_dir)
+        if legacy_path is None:
+            return 0
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 0
+        if not isinstance(history, list):
+            return 0
+
+        # El legado siempre va antes que cualquier segmento existente
+        existing = segment_paths(log_dir)
+        target = _segment_path(log_dir, 0)
+        previous = ""
+        if target in existing:
+            with open(target, "r", encoding="utf-8") as f:
+                previous = f.read()
+
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(encode_entry(entry) for entry in history)
+            f.write(previous)
+        os.replace(tmp_path, target)
+        with open(os.path.join(log_dir, LEGACY_MARKER_FILE), "w", encoding="utf-8") as f:
+            json.dump({"entries": len(history)}, f)
+        return len(history)
+
+
+def iter_log_entries(log_dir: str = "metrics") -> Iterator[dict]:
+    """
+    Recorre todas las interacciones registradas sin cargarlas en memoria.
+
+    Lee primero el archivo legado (si todavía no fue migrado) y luego cada
+    segmento JSONL en orden. Las líneas corruptas o truncadas se omiten.
+
+    Args:
+        log_dir (str): Directorio de métricas.
+
+    Yields:
+        dict: Cada registro de interacción.
+    """
+    legacy_path = pending_legacy_log(log_dir)
+    if legacy_path is not None:
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+
+    for path in segment_paths(log_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def read_segment(path: str, offset: int = 0) -> Iterator[tuple[dict, int]]:
+    """
+    Recorre un segmento JSONL desde un byte dado, devolviendo dónde termina cada línea.
+
+    Solo se leen líneas completas: una última línea a medio escribir (el hilo
+    escritor puede estar agregando en ese momento) se deja para la próxima
+    lectura. Las líneas corruptas se omiten.
+
+    Args:
+        path (str): Segmento a leer.
+        offset (int): Byte desde el que empezar (el fin de una lectura previa).
+
+    Yields:
+        tuple[dict, int]: Cada registro y el byte donde termina su línea.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            try:
+                yield json.loads(line), offset
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+
+
+class InteractionLog:
+    """
+    Registro de interacciones append-only con escritura en segundo plano.
+
+    Cada interacción se encola y un hilo escritor la agrega, en lotes, al
+    segmento JSONL activo. Cuando el segmento supera `max_segment_bytes` se
+    abre uno nuevo. El costo por turno es O(tamaño de la entrada), sin importar
+    cuánto historial exista, y un lock de archivo permite que varios procesos
+    compartan el mismo directorio.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = "metrics",
+        max_segment_bytes: int = 5 * 1024 * 1024,
+        max_queue: int = 1000,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        put_timeout: float = 1.0,
+    ):
+        """
+        Prepara el directorio, migra el log legado y arranca el hilo escritor.
+
+        Args:
+            log_dir (str): Directorio donde se guardan los segmentos.
+            max_segment_bytes (int): Tamaño a partir del cual se rota el segmento.
+            max_queue (int): Capacidad máxima de la cola de escritura.
+            batch_size (int): Máximo de entradas escritas por lote.
+            flush_interval (float): Segundos de espera antes de vaciar un lote parcial.
+            put_timeout (float): Segundos que `append` espera si la cola está llena.
+        """
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.written = 0
+
+        os.makedirs(log_dir, exist_ok=True)
+        self.lock_path = os.path.join(log_dir, LOCK_FILE)
+        migrate_legacy_log(log_dir)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="groovehub-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, entry: dict, response_json: str | None = None) -> bool:
+        """
+        Encola una interacción para ser escrita por el hilo de fondo.
+
+        La serialización ocurre en el hilo escritor, así el turno del usuario
+        no paga ese costo.
+
+        Args:
+            entry (dict): Campos del registro.
+            response_json (str | None): Respuesta ya serializada, incrustada sin re-parsear.
+
+        Returns:
+            bool: True si se encoló; False si la cola siguió llena (entrada descartada).
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put((entry, response_json), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """Bloquea hasta que todas las entradas encoladas estén en disco."""
+        self._queue.join()
+
+    def close(self):
+        """Vacía la cola, detiene el hilo escritor y libera recursos. Es idempotente."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+            # Drenamos lo que ya esté disponible para escribir en un solo lote
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except OSError as e:
+                print(f"Error escribiendo el log de métricas: {e}")
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def _write_batch(self, batch: list):
+        data = "".join(encode_entry(entry, response) for entry, response in batch)
+        encoded = data.encode("utf-8")
+
+        with FileLock(self.lock_path):
+            segments = segment_paths(self.log_dir)
+            path = segments[-1] if segments else _segment_path(self.log_dir, 0)
+            if (
+                os.path.exists(path)
+                and os.path.getsize(path) + len(encoded) > self.max_segment_bytes
+                and os.path.getsize(path) > 0
+            ):
+                path = _segment_path(self.log_dir, _segment_index(path) + 1)
+
+            with open(path, "ab") as f:
+                f.write(encoded)
+                f.flush()
+
+        self.written += len(batch)
@@ -1,12 +1,50 @@
+import asyncio
+import math
 import time
-import json
-import os
 from datetime import datetime
-import tiktoken
 
-# Precios de referencia (GPT-3.5 Turbo)
-COST_PER_1K_INPUT = 0.0015
-COST_PER_1K_OUTPUT = 0.0020
+from groovehub.observability.live import LiveMetrics
+from groovehub.observability.log_store import InteractionLog
+from groovehub.observability.tokens import TokenCounter
+from groovehub.observability.tracing import traced
+
+# Precios de referencia por modelo, en USD cada 1K tokens: (input, output)
+MODEL_PRICING = {
+    "gpt-3.5-turbo": (0.0015, 0.0020),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.0100),
+    "llama-3.3-70b-versatile": (0.00059, 0.00079),
+    "llama-3.1-8b-instant": (0.00005, 0.00008),
+}
+DEFAULT_MODEL = "gpt-3.5-turbo"
+# El log guarda solo el comienzo de la consulta; las cortadas terminan en "..."
+PREVIEW_CHARS = 50
+PREVIEW_SUFFIX = "..."
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Percentil por el método del rango más cercano.
+
+    Args:
+        values (list): Muestras (no necesitan estar ordenadas).
+        q (float): Percentil buscado, entre 0 y 100.
+
+    Returns:
+        float: El valor del percentil, o 0.0 si no hay muestras.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def query_preview(user_query: str) -> str:
+    """Comienzo de la consulta tal como queda en el log (`query_preview`)."""
+    if len(user_query) > PREVIEW_CHARS:
+        return user_query[:PREVIEW_CHARS] + PREVIEW_SUFFIX
+    return user_query
 
 
 class MetricsTracker:
@@ -14,20 +52,52 @@ class MetricsTracker:
     Clase encargada de rastrear y calcular las métricas de rendimiento y costos 
     de las interacciones con el LLM.
     
-    Maneja el cálculo de latencia, conteo de tokens usando tiktoken y 
-    estimación de costos basados en precios de referencia. También persiste 
-    el historial de interacciones en un archivo local JSON.
+    Maneja el cálculo de latencia, conteo de tokens (priorizando el bloque
+    `usage` del proveedor y, si falta, estimando con tiktoken) y estimación de
+    costos según la tabla de precios del modelo usado. También persiste 
+    el historial de interacciones en un log JSONL append-only.
     """
     
-    def __init__(self):
-        """Inicializa los contadores de tiempo y el codificador de tokens."""
+    def __init__(self, log_dir: str = "metrics", token_counter: TokenCounter | None = None):
+        """
+        Inicializa los contadores de tiempo y el codificador de tokens.
+
+        Args:
+            log_dir (str): Directorio del log de interacciones. El escritor de
+                           fondo se crea recién en el primer `save_log`.
+            token_counter (TokenCounter | None): Contador compartido; por defecto uno propio.
+        """
         self.start_time = 0
         self.end_time = 0
-        self.encoder = tiktoken.get_encoding("cl100k_base")
+        self.first_token_time = None
+        self.first_answer_time = None
+        self.tokens = token_counter or TokenCounter()
+        self.log_dir = log_dir
+        self.log: InteractionLog | None = None
+        self.cache = None
+        # Agregado de todos los turnos del proceso (histogramas de memoria fija)
+        self.live = LiveMetrics()
+
+    @property
+    def encoder(self):
+        """Codificador del contador de tokens (se carga en el primer uso)."""
+        return self.tokens.encoder
 
     def start(self):
         """Inicia el cronómetro para medir la latencia."""
         self.start_time = time.time()
+        self.first_token_time = None
+        self.first_answer_time = None
+
+    def mark_first_token(self):
+        """Registra la llegada del primer fragmento del stream (solo la primera vez por turno)."""
+        if self.first_token_time is None:
+            self.first_token_time = time.time()
+
+    def mark_first_answer_char(self):
+        """Registra el primer carácter visible del campo `answer` (solo la primera vez por turno)."""
+        if self.first_answer_time is None:
+            self.first_answer_time = time.time()
 
     def stop(self):
         """Detiene el cronómetro para finalizar la medición de latencia."""
@@ -43,6 +113,28 @@ class MetricsTracker:
         """
         return int((self.end_time - self.start_time) * 1000)
 
+    @property
+    def ttft_ms(self) -> int | None:
+        """
+        Returns:
+            int | None: Time-to-first-token en milisegundos, o None si no hubo streaming.
+        """
+        if self.first_token_time is None:
+            return None
+        return int((self.first_token_time - self.start_time) * 1000)
+
+    @property
+    def ttfa_ms(self) -> int | None:
+        """
+        Returns:
+            int | None: Tiempo hasta el primer carácter de `answer`, en milisegundos,
+                        o None si no hubo streaming.
+        """
+        if self.first_answer_time is None:
+            return None
+        return int((self.first_answer_time - self.start_time) * 1000)
+
+    @traced("metrics.count_tokens")
     def count_tokens(self, text: str) -> int:
         """
         Cuenta la cantidad de tokens en un texto dado usando el codificador cl100k_base.
@@ -53,63 +145,119 @@ class MetricsTracker:
         Returns:
             int: La cantidad de tokens calculada. Devuelve 0 si el texto está vacío.
         """
-        if not text:
-            return 0
-        return len(self.encoder.encode(text))
+        return self.tokens.count(text)
+
+    @traced("metrics.count_prompt_tokens")
+    def count_prompt_tokens(self, messages: list) -> int:
+        """
+        Estima los tokens de entrada de una llamada completa (System Prompt,
+        historial y recordatorio), reutilizando el conteo cacheado de cada mensaje.
 
-    def calculate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        Args:
+            messages (list): Mensajes enviados al LLM en el turno.
+
+        Returns:
+            int: Tokens de entrada estimados.
+        """
+        return self.tokens.count_messages(messages)
+
+    @traced("metrics.turn_usage")
+    def turn_usage(self, messages: list, completion_text: str, usage: dict | None = None) -> dict:
+        """
+        Determina los tokens consumidos en un turno.
+
+        Usa el bloque `usage` informado por el proveedor cuando existe; si no,
+        estima localmente el prompt completo y la respuesta cruda.
+
+        Args:
+            messages (list): Mensajes enviados al LLM.
+            completion_text (str): Texto crudo generado por el modelo.
+            usage (dict | None): Bloque `usage` devuelto por la API, si lo hubo.
+
+        Returns:
+            dict: `input_tokens`, `output_tokens` y `token_source` ('provider' o 'estimated').
+        """
+        if usage and usage.get("prompt_tokens") is not None:
+            return {
+                "input_tokens": usage["prompt_tokens"],
+                "output_tokens": usage.get("completion_tokens") or 0,
+                "token_source": "provider",
+            }
+        return {
+            "input_tokens": self.count_prompt_tokens(messages),
+            "output_tokens": self.count_tokens(completion_text),
+            "token_source": "estimated",
+        }
+
+    def calculate_cost(self, prompt_tokens: int, completion_tokens: int, model: str | None = None) -> float:
         """
         Calcula el costo estimado de la llamada al modelo.
         
         Args:
             prompt_tokens (int): Cantidad de tokens consumidos en la entrada (prompt).
             completion_tokens (int): Cantidad de tokens generados en la salida.
+            model (str | None): Modelo usado. Si no figura en `MODEL_PRICING`
+                                se usan los precios de GPT-3.5 Turbo.
             
         Returns:
             float: Costo total estimado en dólares, redondeado a 6 decimales.
         """
-        input_cost = (prompt_tokens / 1000) * COST_PER_1K_INPUT
-        output_cost = (completion_tokens / 1000) * COST_PER_1K_OUTPUT
+        cost_in, cost_out = MODEL_PRICING.get(model, MODEL_PRICING[DEFAULT_MODEL])
+        input_cost = (prompt_tokens / 1000) * cost_in
+        output_cost = (completion_tokens / 1000) * cost_out
         return round(input_cost + output_cost, 6)
 
+    def attach_cache(self, cache):
+        """
+        Vincula la caché de respuestas para exponer sus contadores.
+
+        Args:
+            cache (CompletionCache): Caché usada por el servicio LLM.
+        """
+        self.cache = cache
+
+    def cache_stats(self) -> dict | None:
+        """
+        Returns:
+            dict | None: Aciertos, fallos y latencia ahorrada por la caché, o
+                         None si no hay caché vinculada.
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    @traced("metrics.save_log")
     def save_log(self, user_query: str, response_json: str, metrics: dict):
         """
-        Guarda un registro detallado de la ejecución en metrics/metrics.json.
-        
-        Crea el directorio si no existe y maneja el caso en que el archivo JSON 
-        previo esté corrupto, reiniciando el historial.
-        
+        Registra la interacción en el log append-only de `metrics/`.
+
+        La entrada se encola y un hilo de fondo la agrega al segmento JSONL
+        activo, por lo que el costo por turno no depende del tamaño del historial.
+        La respuesta ya serializada se incrusta tal cual, sin volver a parsearla.
+
         Args:
             user_query (str): El mensaje original enviado por el usuario.
             response_json (str): La respuesta del LLM en formato JSON (como string).
             metrics (dict): Diccionario con las métricas calculadas (tokens, costo, etc.).
         """
-        # 1. Asegurar que la carpeta existe
-        log_dir = "metrics"
-        os.makedirs(log_dir, exist_ok=True)
-        file_path = os.path.join(log_dir, "metrics.json")
+        if self.log is None:
+            self.log = InteractionLog(self.log_dir)
 
-        # 2. Crear el registro actual
         log_entry = {
             "timestamp": datetime.now().isoformat(),
-            "query_preview": user_query[:50] + "..."
-            if len(user_query) > 50
-            else user_query,
+            "query_preview": query_preview(user_query),
             "metrics": metrics,
-            "response_data": json.loads(response_json),
         }
+        self.log.append(log_entry, response_json)
 
-        # 3. Leer archivo existente (si hay) y agregar
-        history = []
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    history = json.load(f)
-            except json.JSONDecodeError:
-                history = []  # Si el archivo está corrupto, empezamos de nuevo
+    async def save_log_async(self, user_query: str, response_json: str, metrics: dict):
+        """
+        Versión asíncrona de `save_log` para el pipeline asyncio.
 
-        history.append(log_entry)
+        Encolar es inmediato salvo que la cola esté llena; en ese caso la espera
+        ocurre en un hilo y no bloquea al resto de las sesiones del event loop.
+        """
+        await asyncio.to_thread(self.save_log, user_query, response_json, metrics)
 
-        # 4. Guardar todo de nuevo
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+    def close(self):
+        """Vacía los registros pendientes y detiene el escritor de fondo."""
+        if self.log is not None:
+            self.log.close()
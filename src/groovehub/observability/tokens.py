@@ -0,0 +1,141 @@
+import os
+import re
+import threading
+
+# Overhead del formato chat de OpenAI: cada mensaje agrega ~3 tokens de
+# delimitadores y toda respuesta arranca con ~3 tokens de "priming".
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Caché local de los BPE de tiktoken: una vez descargado (o copiado a mano en
+# máquinas sin red) el tokenizer se carga sin tocar la red
+TOKENIZER_CACHE_DIR = os.getenv(
+    "GROOVEHUB_TOKENIZER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "groovehub", "tiktoken")
+)
+
+# Palabras, números o signos sueltos; las palabras largas se cortan cada 4 caracteres
+_APPROX_PIECES = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+class ApproxEncoder:
+    """
+    Tokenizador aproximado sin dependencias, para cuando el BPE de tiktoken no
+    está disponible (por ejemplo, sin red y sin caché). Se equivoca en pocos
+    puntos porcentuales respecto de cl100k_base en texto en español, suficiente
+    para estimar costos y presupuestos de contexto.
+    """
+
+    def encode(self, text: str) -> list[str]:
+        return _APPROX_PIECES.findall(text)
+
+
+def load_encoder(encoding_name: str = "cl100k_base", cache_dir: str = TOKENIZER_CACHE_DIR):
+    """
+    Carga un codificador de tiktoken usando la caché local de BPE.
+
+    Si tiktoken no puede obtener el archivo (sin red y sin caché), se usa
+    `ApproxEncoder` en lugar de fallar.
+
+    Args:
+        encoding_name (str): Nombre de la codificación de tiktoken.
+        cache_dir (str): Directorio de la caché de BPE (se respeta TIKTOKEN_CACHE_DIR si ya está definido).
+
+    Returns:
+        Un objeto con método `encode(str)`.
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", cache_dir)
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        print(f"Tokenizer '{encoding_name}' no disponible ({type(e).__name__}); se usa una estimación aproximada.")
+        return ApproxEncoder()
+
+
+class TokenCounter:
+    """
+    Estimador local de tokens con caché por mensaje.
+
+    Cada mensaje (rol + contenido) se codifica una sola vez; los turnos
+    siguientes reutilizan el conteo guardado. Así, el System Prompt y el
+    recordatorio de la Sandwich Defense se tokenizan una única vez por proceso
+    y estimar el prompt completo cuesta O(mensaje nuevo) en lugar de
+    re-codificar todo el historial.
+
+    El codificador se carga recién en el primer uso (o en `warm_up`, desde un
+    hilo de fondo), para no demorar el arranque del CLI.
+    """
+
+    def __init__(self, encoder=None, encoding_name: str = "cl100k_base", max_cache: int = 4096):
+        """
+        Args:
+            encoder: Codificador con método `encode(str)`. Si es None se carga
+                     el de tiktoken indicado por `encoding_name` al primer uso.
+            encoding_name (str): Nombre de la codificación de tiktoken.
+            max_cache (int): Cantidad máxima de mensajes memorizados.
+        """
+        self._encoder = encoder
+        self.encoding_name = encoding_name
+        self.max_cache = max_cache
+        self._cache: dict[tuple[str, str], int] = {}
+        self._load_lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    self._encoder = load_encoder(self.encoding_name)
+        return self._encoder
+
+    def warm_up(self):
+        """Carga el codificador ahora (pensado para llamarse desde un hilo de fondo)."""
+        return self.encoder
+
+    def count(self, text: str) -> int:
+        """
+        Cuenta los tokens de un texto suelto (sin caché).
+
+        Args:
+            text (str): Texto a tokenizar.
+
+        Returns:
+            int: Cantidad de tokens. 0 si el texto está vacío.
+        """
+        if not text:
+            return 0
+        return len(self.encoder.encode(text))
+
+    def count_message(self, message: dict) -> int:
+        """
+        Cuenta los tokens de un mensaje del chat, incluyendo su overhead de formato.
+
+        Args:
+            message (dict): Mensaje con claves 'role' y 'content'.
+
+        Returns:
+            int: Tokens que ocupa el mensaje dentro del prompt.
+        """
+        key = (message["role"], message.get("content") or "")
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        tokens = TOKENS_PER_MESSAGE + self.count(key[0]) + self.count(key[1])
+        if len(self._cache) >= self.max_cache:
+            self._cache.clear()
+        self._cache[key] = tokens
+        return tokens
+
+    def count_messages(self, messages: list) -> int:
+        """
+        Estima los tokens de prompt de una lista completa de mensajes.
+
+        Args:
+            messages (list): Mensajes tal como se envían al proveedor.
+
+        Returns:
+            int: Tokens de entrada estimados para la llamada.
+        """
+        return TOKENS_PER_REPLY + sum(self.count_message(m) for m in messages)
@@ -0,0 +1,257 @@
+import contextlib
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Callable, NamedTuple
+
+# Tracer activo del proceso; None = trazas desactivadas (el caso normal)
+_tracer: "Tracer | None" = None
+# Span abierto en el contexto actual (hilo o tarea asyncio), para anidar
+_current: ContextVar[int | None] = ContextVar("groovehub_span", default=None)
+
+
+class _NoopSpan:
+    """Context manager nulo que devuelve `span` con las trazas desactivadas."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span(NamedTuple):
+    """Un tramo medido del pipeline."""
+    id: int
+    parent: int | None
+    name: str
+    # Inicio relativo al arranque del tracer y duración, en microsegundos
+    start_us: float
+    duration_us: float
+    thread: int
+    attrs: dict
+    # Variación de memoria asignada durante el tramo (solo con `memory=True`)
+    mem_delta_kib: float | None = None
+
+
+class Tracer:
+    """
+    Recolector de spans en memoria.
+
+    Los spans se anidan por contexto (`contextvars`), así que la jerarquía es
+    correcta tanto entre hilos como entre tareas concurrentes de asyncio.
+    """
+
+    def __init__(self, memory: bool = False):
+        """
+        Args:
+            memory (bool): Si es True, activa tracemalloc y registra en cada span
+                           la variación de memoria asignada.
+        """
+        self.memory = memory
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        span_id = next(self._ids)
+        parent = _current.get()
+        token = _current.set(span_id)
+        mem_start = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            end = time.perf_counter()
+            _current.reset(token)
+            mem_delta = None
+            if self.memory:
+                mem_delta = round((tracemalloc.get_traced_memory()[0] - mem_start) / 1024, 1)
+            span = Span(
+                span_id,
+                parent,
+                name,
+                (start - self.origin) * 1e6,
+                (end - start) * 1e6,
+                threading.get_ident(),
+                attrs,
+                mem_delta,
+            )
+            with self._lock:
+                self.spans.append(span)
+
+    def drain(self) -> list[Span]:
+        """
+        Devuelve los spans terminados desde la última llamada y los descarta.
+
+        Returns:
+            list[Span]: Spans en orden de finalización.
+        """
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def close(self):
+        if self.memory:
+            tracemalloc.stop()
+
+
+def enable_tracing(memory: bool = False) -> Tracer:
+    """
+    Activa las trazas para todo el proceso.
+
+    Args:
+        memory (bool): Registrar variaciones de memoria (tracemalloc, más lento).
+
+    Returns:
+        Tracer: El tracer activo.
+    """
+    global _tracer
+    _tracer = Tracer(memory=memory)
+    return _tracer
+
+
+def disable_tracing():
+    """Desactiva las trazas; los spans ya recolectados se descartan."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = None
+
+
+def span(name: str, **attrs):
+    """
+    Mide un bloque como un span: `with span("llm.http", model=m) as attrs: ...`.
+
+    Con las trazas desactivadas devuelve un context manager nulo compartido,
+    así que el costo es una llamada a función. El dict que entrega el `with`
+    permite agregar atributos durante el bloque (vacío si están desactivadas).
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, **attrs)
+
+
+def traced(name: str | None = None) -> Callable:
+    """
+    Decorador equivalente a envolver el cuerpo de la función en `span`.
+
+    Funciona con funciones normales y corrutinas.
+
+    Args:
+        name (str | None): Nombre del span; por defecto `módulo.función`.
+    """
+
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with _tracer.span(label):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def export_jsonl(spans: list[Span], path: str):
+    """
+    Agrega los spans a un archivo JSONL (un objeto por línea).
+
+    Args:
+        spans (list[Span]): Spans a exportar.
+        path (str): Archivo de destino.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for s in spans:
+            f.write(json.dumps(s._asdict(), ensure_ascii=False, default=str) + "\n")
+
+
+def export_chrome(spans: list[Span], path: str):
+    """
+    Escribe los spans en el formato trace-event de Chrome (`chrome://tracing`,
+    Perfetto o speedscope).
+
+    Args:
+        spans (list[Span]): Spans a exportar.
+        path (str): Archivo JSON de destino.
+    """
+    pid = os.getpid()
+    events = []
+    for s in spans:
+        args = dict(s.attrs)
+        if s.mem_delta_kib is not None:
+            args["mem_delta_kib"] = s.mem_delta_kib
+        events.append(
+            {
+                "name": s.name,
+                "cat": s.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round(s.start_us, 1),
+                "dur": round(s.duration_us, 1),
+                "pid": pid,
+                "tid": s.thread,
+                "args": args,
+            }
+        )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+
+def span_tree(spans: list[Span]) -> list[tuple[int, Span]]:
+    """
+    Ordena spans en preorden (padres antes que hijos, por inicio) con su profundidad.
+
+    Args:
+        spans (list[Span]): Spans de uno o varios turnos.
+
+    Returns:
+        list[tuple[int, Span]]: Pares (profundidad, span).
+    """
+    ids = {s.id for s in spans}
+    children: dict[int | None, list[Span]] = {}
+    for s in spans:
+        # Un padre fuera del lote (p. ej. ya drenado) convierte al span en raíz
+        parent = s.parent if s.parent in ids else None
+        children.setdefault(parent, []).append(s)
+
+    ordered = []
+
+    def visit(parent, depth):
+        for s in sorted(children.get(parent, []), key=lambda s: s.start_us):
+            ordered.append((depth, s))
+            visit(s.id, depth + 1)
+
+    visit(None, 0)
+    return ordered
@@ -0,0 +1,585 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import os
+import re
+import secrets
+import sys
+import time
+import traceback
+from typing import Awaitable, Callable, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import run_turn_async
+from groovehub.agent.faq import FaqIndex, load_if_exists
+from groovehub.agent.router import ModelRouter, make_router
+from groovehub.agent.tools import ToolRunner
+from groovehub.agent.sessions import SessionStore, new_session_id
+from groovehub.guardrails.leakage import LeakGuard
+from groovehub.guardrails.safety import SecurityFilter
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.server.pool import SessionPool
+from groovehub.server.websocket import WebSocket, WebSocketClosed, accept_key
+from groovehub.services.llm import AsyncLLMService
+from groovehub.services.scheduler import INTERACTIVE, RateLimitedError, RateScheduler
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+# Secreto con que se firman los tokens de sesión; fijarlo permite retomar
+# sesiones persistidas después de reiniciar el servidor
+SESSION_SECRET_ENV = "GROOVEHUB_SESSION_SECRET"
+# Token de sesión que ve el cliente: "<id>.<firma>" (el resto se rechaza)
+_SESSION_TOKEN = re.compile(r"([A-Za-z0-9_-]{1,64})\.([0-9a-f]{32})")
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class Request(NamedTuple):
+    """Petición HTTP ya interpretada (o un mensaje recibido por WebSocket)."""
+    method: str
+    path: str
+    query: dict
+    headers: dict
+    body: dict
+    # Sesión resuelta para las rutas de chat (el ID interno)
+    session_id: str | None = None
+    # Token de esa sesión, el único identificador que ve el cliente
+    session_token: str | None = None
+
+
+class Response(NamedTuple):
+    """Respuesta JSON (o texto plano, si `body` es str)."""
+    status: int
+    body: dict | str
+    content_type: str = "application/json"
+    # Cabeceras adicionales (por ejemplo, Retry-After)
+    headers: dict | None = None
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+Middleware = Callable[[Request, Handler], Awaitable[Response]]
+
+
+class SessionTokens:
+    """
+    Emite y verifica los tokens de sesión del servidor.
+
+    El cliente nunca elige el ID de su sesión: el servidor genera uno al azar
+    y le entrega `<id>.<HMAC-SHA256 del id>`. Solo quien recibió ese token
+    puede seguir, retomar o borrar la sesión; un ID inventado o ajeno no
+    tiene una firma válida.
+    """
+
+    def __init__(self, secret: bytes | None = None):
+        """
+        Args:
+            secret (bytes | None): Clave de la firma. Por defecto, la de
+                                   `GROOVEHUB_SESSION_SECRET` o una al azar por proceso.
+        """
+        if secret is None:
+            secret = os.environ.get(SESSION_SECRET_ENV, "").encode("utf-8") or secrets.token_bytes(32)
+        self._secret = secret
+
+    def issue(self) -> tuple[str, str]:
+        """
+        Returns:
+            tuple[str, str]: Un ID de sesión nuevo y su token.
+        """
+        session_id = new_session_id()
+        return session_id, self.sign(session_id)
+
+    def sign(self, session_id: str) -> str:
+        signature = hmac.new(self._secret, session_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+        return f"{session_id}.{signature}"
+
+    def verify(self, token) -> str | None:
+        """
+        Args:
+            token: Token recibido del cliente.
+
+        Returns:
+            str | None: El ID de la sesión si el token es válido, o None.
+        """
+        match = _SESSION_TOKEN.fullmatch(token) if isinstance(token, str) else None
+        if match is None:
+            return None
+        return match.group(1) if hmac.compare_digest(self.sign(match.group(1)), token) else None
+
+
+def safety_middleware(tracker: MetricsTracker) -> Middleware:
+    """
+    Middleware que pasa el mensaje de cada petición de chat por `SecurityFilter`
+    antes de que llegue al agente.
+
+    Args:
+        tracker (MetricsTracker): Donde se registran los bloqueos.
+
+    Returns:
+        Middleware: Función `(request, call_next) -> Response`.
+    """
+
+    async def middleware(request: Request, call_next: Handler) -> Response:
+        message = request.body.get("message")
+        if isinstance(message, str):
+            is_safe, reason = await SecurityFilter.check_safety_async(message)
+            if not is_safe:
+                tracker.live.observe_block(SecurityFilter.block_kind(reason))
+                return Response(400, {"error": "blocked", "reason": reason, "session_id": request.session_token})
+        return await call_next(request)
+
+    return middleware
+
+
+class GrooveServer:
+    """
+    Servidor HTTP/WebSocket multi-cliente para el chat de Groov, sobre asyncio.
+
+    Cada cliente tiene su propia sesión (`MusicAgent`) en un `SessionPool`
+    acotado; el servicio LLM, el contador de tokens y el tracker se comparten.
+    Las rutas de chat pasan por una cadena de middlewares (por defecto, el
+    filtro de seguridad) tanto por HTTP como por cada mensaje de WebSocket.
+    Si el planificador del LLM rechaza la llamada por cuota, el chat responde
+    429 con `Retry-After` (por WebSocket, un evento 'rate_limited').
+
+    El `session_id` que ven los clientes es un token firmado que emite el
+    servidor (ver `SessionTokens`): sin él no se puede seguir ni borrar una
+    sesión ajena. Un token inválido responde 403.
+
+    Rutas:
+        POST   /v1/chat                {"message", "session_id"?} -> respuesta completa
+        GET    /v1/chat/ws?session_id= WebSocket: el `answer` llega en fragmentos
+        DELETE /v1/sessions/<token>    Quita la sesión de memoria
+        GET    /healthz                Estado del pool de sesiones
+        GET    /metrics                Métricas en formato Prometheus
+    """
+
+    def __init__(
+        self,
+        llm: AsyncLLMService,
+        tracker: MetricsTracker,
+        pool: SessionPool | None = None,
+        store: SessionStore | None = None,
+        middlewares: list[Middleware] | None = None,
+        output_guard: LeakGuard | None = None,
+        router: ModelRouter | None = None,
+        faq: FaqIndex | None = None,
+        tools: ToolRunner | None = None,
+        tokens: SessionTokens | None = None,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        save_log: bool = True,
+    ):
+        """
+        Args:
+            llm (AsyncLLMService): Servicio compartido por todas las sesiones.
+            tracker (MetricsTracker): Tracker compartido (tokens, costo, log, métricas en vivo).
+            pool (SessionPool | None): Pool de sesiones; por defecto uno con los límites estándar.
+            store (SessionStore | None): Si se pasa, las sesiones se persisten y una
+                                         sesión desalojada se retoma desde SQLite.
+            middlewares (list[Middleware] | None): Cadena de las rutas de chat; por
+                                                   defecto, `safety_middleware`.
+            output_guard (LeakGuard | None): Guardrail de salida compartido por las sesiones.
+            router (ModelRouter | None): Router de nivel de modelo compartido por las sesiones.
+            faq (FaqIndex | None): Banco de preguntas frecuentes compartido por las sesiones.
+            tools (ToolRunner | None): Herramientas (y su pool de hilos) compartidas por las sesiones.
+            tokens (SessionTokens | None): Emisor de tokens de sesión; por defecto uno nuevo.
+            host (str): Dirección de escucha.
+            port (int): Puerto (0 elige uno libre).
+            save_log (bool): Registrar cada turno en el log de interacciones.
+        """
+        self.llm = llm
+        self.tracker = tracker
+        self.store = store
+        self.pool = pool if pool is not None else SessionPool(self._new_agent)
+        self.middlewares = middlewares if middlewares is not None else [safety_middleware(tracker)]
+        self.output_guard = output_guard
+        self.router = router
+        self.faq = faq
+        self.tools = tools
+        self.tokens = tokens or SessionTokens()
+        self.host = host
+        self.port = port
+        self.save_log = save_log
+        self.connections = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._reaper: asyncio.Task | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _new_agent(self, session_id: str) -> MusicAgent:
+        agent = MusicAgent(
+            llm=self.llm,
+            token_counter=self.tracker.tokens,
+            output_guard=self.output_guard,
+            router=self.router,
+            faq=self.faq,
+            tools=self.tools,
+        )
+        if self.store is not None:
+            agent.attach_session(self.store, session_id)
+        return agent
+
+    async def start(self) -> "GrooveServer":
+        """Empieza a escuchar (y a desalojar sesiones inactivas)."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._reaper = asyncio.create_task(self._reap_idle())
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _reap_idle(self):
+        interval = max(1.0, min(self.pool.idle_timeout_s / 4, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            self.pool.evict_idle()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            # Keep-alive: varias peticiones por conexión hasta que el cliente la cierre
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                method, target, headers = _parse_head(head)
+                if method is None:
+                    await _write_response(writer, Response(400, {"error": "petición inválida"}), close=True)
+                    return
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self._handle_websocket(reader, writer, url.path, query, headers)
+                    return
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _write_response(writer, Response(400, {"error": "Content-Length inválido"}), close=True)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await _write_response(writer, Response(413, {"error": "cuerpo demasiado grande"}), close=True)
+                    return
+                raw = await reader.readexactly(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    body = None
+                if not isinstance(body, dict):
+                    response = Response(400, {"error": "el cuerpo debe ser un objeto JSON"})
+                else:
+                    response = await self._route(Request(method, url.path, query, headers, body))
+                close = headers.get("connection", "").lower() == "close"
+                await _write_response(writer, response, close=close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _route(self, request: Request) -> Response:
+        path, method = request.path, request.method
+        if path == "/v1/chat":
+            if method != "POST":
+                return Response(405, {"error": "usa POST"})
+            session = self._session(request.body.get("session_id"))
+            if session is None:
+                return Response(403, {"error": "session_id inválido"})
+            if not isinstance(request.body.get("message"), str) or not request.body["message"].strip():
+                return Response(400, {"error": "falta 'message'"})
+            session_id, token = session
+            return await self._dispatch(request._replace(session_id=session_id, session_token=token), self._chat)
+        if path.startswith("/v1/sessions/") and method == "DELETE":
+            session_id = self.tokens.verify(path.rsplit("/", 1)[-1])
+            if session_id is None:
+                return Response(403, {"error": "session_id inválido"})
+            found = self.pool.discard(session_id)
+            return Response(200 if found else 404, {"deleted": found})
+        if path == "/healthz":
+            return Response(200, {"status": "ok", "connections": self.connections, **self.pool.stats()})
+        if path == "/metrics":
+            return Response(200, self._render_metrics(), "text/plain; version=0.0.4; charset=utf-8")
+        return Response(404, {"error": "ruta inexistente"})
+
+    def _session(self, token) -> tuple[str, str] | None:
+        # Sin token, una sesión nueva; con uno, la suya si la firma es válida
+        if not token:
+            return self.tokens.issue()
+        session_id = self.tokens.verify(token)
+        return (session_id, token) if session_id is not None else None
+
+    async def _dispatch(self, request: Request, handler: Handler) -> Response:
+        """Ejecuta `handler` envuelto por la cadena de middlewares."""
+        call = handler
+        for middleware in reversed(self.middlewares):
+            call = _bind(middleware, call)
+        try:
+            return await call(request)
+        except RateLimitedError as e:
+            # Rechazo temprano del planificador: el cliente sabe cuándo volver
+            return Response(
+                429,
+                {"error": "rate_limited", "retry_after_s": round(e.retry_after, 1), "session_id": request.session_token},
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        except Exception as e:
+            # El detalle queda en el log del servidor; el cliente no ve internos
+            print(f"Error atendiendo {request.method} {request.path} (sesión {request.session_id}):", file=sys.stderr)
+            traceback.print_exception(e, file=sys.stderr)
+            return Response(500, {"error": "error interno", "session_id": request.session_token})
+
+    async def _chat(self, request: Request, on_answer: Callable[[str], None] | None = None) -> Response:
+        agent = await self.pool.get_async(request.session_id)
+        outcome = await run_turn_async(
+            agent,
+            self.tracker,
+            request.body["message"],
+            save_log=self.save_log,
+            on_answer=on_answer,
+            # Ya lo hizo el middleware
+            check_safety=False,
+        )
+        self.pool.update(request.session_id)
+        return Response(
+            200,
+            {
+                "session_id": request.session_token,
+                "response": outcome.response.model_dump(mode="json"),
+                "metrics": outcome.metrics,
+            },
+        )
+
+    def _render_metrics(self) -> str:
+        stats = self.pool.stats()
+        lines = [
+            self.tracker.live.render_prometheus().rstrip("\n"),
+            "# HELP groovehub_server_sessions Sesiones en memoria.",
+            "# TYPE groovehub_server_sessions gauge",
+            f"groovehub_server_sessions {stats['sessions']}",
+            "# HELP groovehub_server_session_memory_bytes Memoria estimada de las sesiones.",
+            "# TYPE groovehub_server_session_memory_bytes gauge",
+            f"groovehub_server_session_memory_bytes {stats['memory_bytes']}",
+            "# HELP groovehub_server_sessions_evicted_total Sesiones desalojadas por motivo.",
+            "# TYPE groovehub_server_sessions_evicted_total counter",
+        ]
+        lines += [f'groovehub_server_sessions_evicted_total{{reason="{k}"}} {v}' for k, v in stats["evicted"].items()]
+        if self.llm.scheduler is not None:
+            lines.append(self.llm.scheduler.render_prometheus().rstrip("\n"))
+        return "\n".join(lines) + "\n"
+
+    # --- WebSocket ---
+
+    async def _handle_websocket(self, reader, writer, path: str, query: dict, headers: dict):
+        key = headers.get("sec-websocket-key")
+        if path != "/v1/chat/ws" or not key:
+            error = Response(404 if key else 400, {"error": "WebSocket solo en /v1/chat/ws"})
+            await _write_response(writer, error, close=True)
+            return
+        session = self._session(query.get("session_id"))
+        if session is None:
+            await _write_response(writer, Response(403, {"error": "session_id inválido"}), close=True)
+            return
+        session_id, token = session
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+            ).encode("ascii")
+        )
+        ws = WebSocket(reader, writer)
+        await ws.send(json.dumps({"type": "session", "session_id": token}))
+
+        while True:
+            try:
+                raw = await ws.recv()
+            except WebSocketClosed:
+                return
+            try:
+                body = json.loads(raw)
+            except json.JSONDecodeError:
+                body = {"message": raw}
+            message = body.get("message") if isinstance(body, dict) else None
+            if not isinstance(message, str) or not message.strip():
+                await ws.send(json.dumps({"type": "error", "error": "falta 'message'"}))
+                continue
+
+            def on_answer(text: str):
+                ws.send_nowait(json.dumps({"type": "delta", "text": text}, ensure_ascii=False))
+
+            request = Request("WS", path, query, headers, {"message": message}, session_id, token)
+            response = await self._dispatch(request, lambda r: self._chat(r, on_answer))
+            if response.status == 200:
+                event = {"type": "final", **response.body}
+            elif response.body.get("error") == "blocked":
+                event = {"type": "blocked", "reason": response.body["reason"]}
+            elif response.status == 429:
+                event = {"type": "rate_limited", "retry_after_s": response.body["retry_after_s"]}
+            else:
+                event = {"type": "error", "error": response.body.get("error")}
+            await ws.send(json.dumps(event, ensure_ascii=False))
+
+
+def _bind(middleware: Middleware, call_next: Handler) -> Handler:
+    async def call(request: Request) -> Response:
+        return await middleware(request, call_next)
+
+    return call
+
+
+def _parse_head(head: bytes) -> tuple[str | None, str, dict]:
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        return None, "", {}
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, headers
+
+
+async def _write_response(writer: asyncio.StreamWriter, response: Response, close: bool = False):
+    if isinstance(response.body, str):
+        payload = response.body.encode("utf-8")
+    else:
+        payload = json.dumps(response.body, ensure_ascii=False).encode("utf-8")
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (response.headers or {}).items())
+    writer.write(
+        (
+            f"HTTP/1.1 {response.status} {_REASONS.get(response.status, '')}\r\n"
+            f"Content-Type: {response.content_type}\r\nContent-Length: {len(payload)}\r\n{extra}"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        ).encode("ascii")
+        + payload
+    )
+    await writer.drain()
+
+
+async def run_server(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    max_sessions: int | None = None,
+    idle_timeout_s: float | None = None,
+    max_memory_mb: float | None = None,
+    persist: bool = True,
+    hedge_after_ms: int | None = None,
+    leak_action: str = "redact",
+    rate_limit: bool = True,
+    max_queue_wait_s: float | None = None,
+    route: str = "strong",
+    escalate_below: float | None = None,
+    faq: bool = False,
+    tools: bool = False,
+    catalog_path: str | None = None,
+):
+    """
+    Arma y corre el servidor con los servicios por defecto (subcomando `serve`).
+
+    Args:
+        host (str): Dirección de escucha.
+        port (int): Puerto.
+        max_sessions (int | None): Máximo de sesiones en memoria.
+        idle_timeout_s (float | None): Inactividad antes de desalojar una sesión.
+        max_memory_mb (float | None): Tope de memoria estimada de las sesiones.
+        persist (bool): Guardar las conversaciones en `metrics/sessions.sqlite`.
+        hedge_after_ms (int | None): Umbral de hedging entre proveedores.
+        leak_action (str): Guardrail de salida: 'redact', 'block' u 'off'.
+        rate_limit (bool): Regular las llamadas según los límites RPM/TPM de cada proveedor.
+        max_queue_wait_s (float | None): Espera estimada máxima antes de responder 429.
+        route (str): Política de nivel de modelo: 'strong', 'fast' o 'auto'.
+        escalate_below (float | None): Confianza mínima aceptada del modelo rápido.
+        faq (bool): Responder el primer turno desde el banco de preguntas frecuentes, si existe.
+        tools (bool): Dejar que el modelo llame a las herramientas locales antes de responder.
+        catalog_path (str | None): Catálogo de las herramientas (default: el de ejemplo).
+    """
+    from groovehub.agent.repair import ADVISOR_SCHEMA
+    from groovehub.agent.tools import default_tools
+    from groovehub.services.cache import CompletionCache
+    from groovehub.services.catalog import DEFAULT_CATALOG_PATH, Catalog
+
+    tracker = MetricsTracker()
+    scheduler = None
+    if rate_limit:
+        max_wait = {INTERACTIVE: max_queue_wait_s} if max_queue_wait_s is not None else None
+        scheduler = RateScheduler(tracker.tokens, max_wait_s=max_wait)
+    llm = AsyncLLMService(
+        cache=CompletionCache(),
+        hedge_after_ms=hedge_after_ms,
+        response_schema=ADVISOR_SCHEMA,
+        scheduler=scheduler,
+    )
+    store = SessionStore() if persist else None
+    limits = {}
+    if max_sessions is not None:
+        limits["max_sessions"] = max_sessions
+    if idle_timeout_s is not None:
+        limits["idle_timeout_s"] = idle_timeout_s
+    if max_memory_mb is not None:
+        limits["max_memory_bytes"] = int(max_memory_mb * 1024 * 1024)
+    pool = SessionPool(lambda session_id: server._new_agent(session_id), **limits)
+    output_guard = LeakGuard(action=leak_action) if leak_action != "off" else None
+    tool_runner = None
+    if tools:
+        tool_runner = default_tools(Catalog.load(catalog_path or DEFAULT_CATALOG_PATH))
+    server = GrooveServer(
+        llm,
+        tracker,
+        pool=pool,
+        store=store,
+        output_guard=output_guard,
+        router=make_router(route, escalate_below),
+        faq=load_if_exists() if faq else None,
+        tools=tool_runner,
+        host=host,
+        port=port,
+    )
+
+    await server.start()
+    print(f"Groov escuchando en {server.url} (WebSocket en /v1/chat/ws)", flush=True)
+    started = time.monotonic()
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        await llm.aclose()
+        if tool_runner is not None:
+            tool_runner.close()
+        tracker.close()
+        if store is not None:
+            store.close()
+        print(f"Servidor detenido tras {time.monotonic() - started:.0f} s", flush=True)
@@ -0,0 +1,186 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from groovehub.agent.core import MusicAgent
+
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_IDLE_TIMEOUT_S = 15 * 60
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+# Costo fijo aproximado de un agente vacío (objetos, ventana de contexto, lock)
+SESSION_OVERHEAD_BYTES = 4 * 1024
+
+
+def session_footprint(agent: MusicAgent) -> int:
+    """
+    Estima la memoria propia de una sesión: su historial y su resumen.
+
+    El System Prompt es el mismo objeto en todas las sesiones y no se cuenta.
+    `sys.getsizeof` de un `str` es exacto y O(1), así que estimar es barato
+    aunque se haga después de cada turno.
+
+    Args:
+        agent (MusicAgent): Sesión a medir.
+
+    Returns:
+        int: Bytes aproximados.
+    """
+    size = SESSION_OVERHEAD_BYTES + sys.getsizeof(agent.context.summary)
+    for message in agent.history[1:]:
+        size += sys.getsizeof(message["content"]) + 64
+    return size
+
+
+class SessionPool:
+    """
+    Sesiones (`MusicAgent`) en memoria de un servidor multi-cliente.
+
+    Se ordenan por último uso (LRU). Una sesión se desaloja si pasa
+    `idle_timeout_s` sin actividad o si hace falta lugar: hay un máximo de
+    sesiones y un tope de memoria total entre todas. Nunca se desaloja una
+    sesión con un turno en curso. Si el agente está asociado a un
+    `SessionStore`, desalojar no pierde nada: la próxima petición con ese ID
+    la retoma desde SQLite.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], MusicAgent],
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout_s: float = DEFAULT_IDLE_TIMEOUT_S,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            factory (Callable[[str], MusicAgent]): Crea (o retoma) el agente de un ID de sesión.
+            max_sessions (int): Máximo de sesiones en memoria.
+            idle_timeout_s (float): Inactividad tras la cual una sesión se desaloja.
+            max_memory_bytes (int): Tope de memoria estimada entre todas las sesiones.
+            clock (Callable[[], float]): Reloj monótono (inyectable en tests).
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout_s = idle_timeout_s
+        self.max_memory_bytes = max_memory_bytes
+        self.clock = clock
+        # id -> [agente, último uso, bytes estimados]
+        self._sessions: OrderedDict[str, list] = OrderedDict()
+        self.memory_bytes = 0
+        self.created = 0
+        self.evicted = {"idle": 0, "lru": 0, "memory": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> MusicAgent:
+        """
+        Devuelve el agente de una sesión, creándolo si no está en memoria.
+
+        Args:
+            session_id (str): Identificador de la sesión.
+
+        Returns:
+            MusicAgent: El agente, marcado como el más recientemente usado.
+        """
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry[1] = self.clock()
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+        return self._add(session_id, self.factory(session_id))
+
+    async def get_async(self, session_id: str) -> MusicAgent:
+        """
+        Como `get`, pero crea el agente (que puede retomar la sesión desde
+        SQLite) en un hilo, sin bloquear el event loop.
+
+        Args:
+            session_id (str): Identificador de la sesión.
+
+        Returns:
+            MusicAgent: El agente, marcado como el más recientemente usado.
+        """
+        if session_id not in self._sessions:
+            agent = await asyncio.to_thread(self.factory, session_id)
+            # Otra petición de la misma sesión pudo llegar antes: vale la primera
+            if session_id not in self._sessions:
+                self._add(session_id, agent)
+        return self.get(session_id)
+
+    def _add(self, session_id: str, agent: MusicAgent) -> MusicAgent:
+        size = session_footprint(agent)
+        self._sessions[session_id] = [agent, self.clock(), size]
+        self.memory_bytes += size
+        self.created += 1
+        self._enforce_limits(keep=session_id)
+        return agent
+
+    def update(self, session_id: str):
+        """
+        Recalcula la memoria de una sesión después de un turno y aplica los topes.
+
+        Args:
+            session_id (str): Sesión que acaba de responder.
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        size = session_footprint(entry[0])
+        self.memory_bytes += size - entry[2]
+        entry[1], entry[2] = self.clock(), size
+        self._enforce_limits(keep=session_id)
+
+    def discard(self, session_id: str) -> bool:
+        """Quita una sesión de memoria (p. ej. el cliente la cerró). True si existía."""
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self.memory_bytes -= entry[2]
+        return True
+
+    def evict_idle(self) -> int:
+        """
+        Desaloja las sesiones inactivas por más de `idle_timeout_s`.
+
+        Returns:
+            int: Sesiones desalojadas.
+        """
+        deadline = self.clock() - self.idle_timeout_s
+        expired = [
+            sid for sid, (agent, last_used, _) in self._sessions.items()
+            if last_used < deadline and not _busy(agent)
+        ]
+        for sid in expired:
+            self.discard(sid)
+        self.evicted["idle"] += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self.memory_bytes,
+            "created": self.created,
+            "evicted": dict(self.evicted),
+        }
+
+    def _enforce_limits(self, keep: str):
+        # Desde la menos usada; se saltean la actual y las que están respondiendo
+        for sid in list(self._sessions):
+            over_count = len(self._sessions) > self.max_sessions
+            over_memory = self.memory_bytes > self.max_memory_bytes
+            if not (over_count or over_memory):
+                return
+            if sid == keep or _busy(self._sessions[sid][0]):
+                continue
+            self.discard(sid)
+            self.evicted["lru" if over_count else "memory"] += 1
+
+
+def _busy(agent: MusicAgent) -> bool:
+    return agent._turn_lock.locked()
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+# RFC 6455
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+DEFAULT_MAX_MESSAGE_BYTES = 64 * 1024
+
+
+class WebSocketClosed(Exception):
+    """El otro extremo cerró la conexión (o mandó algo inválido)."""
+
+    def __init__(self, code: int = 1000, reason: str = ""):
+        super().__init__(f"{code} {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+def accept_key(key: str) -> str:
+    """Valor de `Sec-WebSocket-Accept` para un `Sec-WebSocket-Key`."""
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode("ascii")).digest()).decode("ascii")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool = False) -> bytes:
+    """
+    Arma un frame completo (FIN=1).
+
+    Args:
+        opcode (int): Tipo de frame.
+        payload (bytes): Contenido.
+        mask (bool): Enmascarar (obligatorio del lado del cliente).
+
+    Returns:
+        bytes: El frame listo para escribir.
+    """
+    length = len(payload)
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    return bytes(header) + key + _xor(payload, key)
+
+
+def _xor(data: bytes, key: bytes) -> bytes:
+    # XOR del bloque entero como un solo entero grande: mucho más rápido que byte a byte
+    if not data:
+        return b""
+    repeated = (key * (len(data) // 4 + 1))[: len(data)]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(data), "big")
+
+
+class WebSocket:
+    """
+    Conexión WebSocket sobre un par de streams de asyncio (ya hecho el handshake).
+
+    Implementa lo necesario para un chat: mensajes de texto (fragmentados o
+    no), ping/pong y cierre. Los mensajes más grandes que `max_message_bytes`
+    cierran la conexión con 1009, y un frame con el enmascarado equivocado
+    (sin máscara desde un cliente), con 1002.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        client: bool = False,
+        max_message_bytes: int = DEFAULT_MAX_MESSAGE_BYTES,
+    ):
+        """
+        Args:
+            reader (asyncio.StreamReader): Lado de lectura.
+            writer (asyncio.StreamWriter): Lado de escritura.
+            client (bool): True si este extremo es el cliente (enmascara lo que envía).
+            max_message_bytes (int): Tamaño máximo de un mensaje recibido.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+        self.max_message_bytes = max_message_bytes
+        self.closed = False
+
+    def send_nowait(self, text: str):
+        """Encola un mensaje de texto sin esperar (para callbacks síncronos)."""
+        if not self.closed:
+            self.writer.write(encode_frame(OP_TEXT, text.encode("utf-8"), mask=self.client))
+
+    async def send(self, text: str):
+        self.send_nowait(text)
+        await self.writer.drain()
+
+    async def recv(self) -> str:
+        """
+        Espera el próximo mensaje de texto, respondiendo pings en el camino.
+
+        Returns:
+            str: El mensaje.
+
+        Raises:
+            WebSocketClosed: Si el otro extremo cerró o violó el protocolo.
+        """
+        parts, size = [], 0
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.closed = True
+                raise WebSocketClosed(1006, "conexión cortada") from e
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload, mask=self.client))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else 1005
+                await self.close(1000 if code == 1005 else code)
+                raise WebSocketClosed(code, payload[2:].decode("utf-8", "replace"))
+            size += len(payload)
+            if size > self.max_message_bytes:
+                await self.close(1009, "mensaje demasiado grande")
+                raise WebSocketClosed(1009, "mensaje demasiado grande")
+            parts.append(payload)
+            if fin:
+                try:
+                    return b"".join(parts).decode("utf-8")
+                except UnicodeDecodeError:
+                    await self.close(1007, "texto inválido")
+                    raise WebSocketClosed(1007, "texto inválido")
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            payload = struct.pack("!H", code) + reason.encode("utf-8")
+            self.writer.write(encode_frame(OP_CLOSE, payload, mask=self.client))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _read_frame(self) -> tuple[bool, int, bytes]:
+        first, second = await self.reader.readexactly(2)
+        masked = bool(second & 0x80)
+        if masked == self.client:
+            # RFC 6455 §5.1: el cliente siempre enmascara y el servidor nunca
+            reason = "frame enmascarado" if masked else "frame sin máscara"
+            await self.close(1002, reason)
+            raise WebSocketClosed(1002, reason)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        if length > self.max_message_bytes:
+            await self.close(1009, "mensaje demasiado grande")
+            raise WebSocketClosed(1009, "mensaje demasiado grande")
+        key = await self.reader.readexactly(4) if masked else None
+        payload = await self.reader.readexactly(length)
+        if key is not None:
+            payload = _xor(payload, key)
+        return bool(first & 0x80), first & 0x0F, payload
+
+
+async def connect(host: str, port: int, path: str = "/", **kwargs) -> WebSocket:
+    """
+    Abre una conexión WebSocket como cliente (pruebas de carga y tests).
+
+    Args:
+        host (str): Servidor.
+        port (int): Puerto.
+        path (str): Ruta, con query string si hace falta.
+
+    Returns:
+        WebSocket: La conexión, con el handshake ya completo.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write(
+        (
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii")
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = head.split(b"\r\n", 1)[0]
+    if b" 101 " not in status or accept_key(key).encode("ascii") not in head:
+        writer.close()
+        raise WebSocketClosed(1002, f"handshake rechazado: {status.decode('latin-1')}")
+    return WebSocket(reader, writer, client=True, **kwargs)
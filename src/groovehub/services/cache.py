@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_messages(messages: list) -> list:
+    """
+    Normaliza los mensajes para que variaciones triviales compartan la misma clave.
+
+    Colapsa espacios en todos los mensajes y, en los del usuario, además ignora
+    mayúsculas ("¿Qué baquetas?" y "¿qué  baquetas?" son la misma consulta).
+
+    Args:
+        messages (list): Mensajes tal como se envían al LLM.
+
+    Returns:
+        list: Pares [rol, contenido normalizado].
+    """
+    normalized = []
+    for message in messages:
+        content = _WHITESPACE.sub(" ", message.get("content") or "").strip()
+        if message["role"] == "user":
+            content = content.casefold()
+        normalized.append([message["role"], content])
+    return normalized
+
+
+def make_cache_key(messages: list, model: str, temperature: float) -> str:
+    """
+    Calcula la clave de caché de una llamada al LLM.
+
+    Args:
+        messages (list): Mensajes de la llamada.
+        model (str): Modelo usado.
+        temperature (float): Temperatura de muestreo.
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal.
+    """
+    payload = json.dumps(
+        [model, temperature, normalize_messages(messages)],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Caché de respuestas del LLM en dos niveles: LRU en memoria y SQLite en disco.
+
+    Las entradas expiran tras `ttl_seconds` y cada nivel se poda por tamaño.
+    Las consultas idénticas concurrentes se agrupan (single-flight): solo una
+    llega al proveedor y las demás esperan su resultado. Lleva contadores de
+    aciertos, fallos y latencia ahorrada.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join("metrics", "completion_cache.sqlite"),
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+        ttl_seconds: float = 24 * 3600,
+    ):
+        """
+        Args:
+            path (str): Archivo SQLite. ":memory:" desactiva la persistencia.
+            max_memory_entries (int): Capacidad del nivel LRU en memoria.
+            max_disk_entries (int): Capacidad del nivel en disco.
+            ttl_seconds (float): Vida útil de cada entrada en segundos.
+        """
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.latency_saved_ms = 0
+
+        self._memory: OrderedDict[str, tuple[str, float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[str, threading.Event] = {}
+        self._puts = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, content TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, latency_ms INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        """
+        Busca una respuesta vigente, primero en memoria y luego en disco.
+
+        Args:
+            key (str): Clave calculada con `make_cache_key`.
+
+        Returns:
+            str | None: El contenido cacheado, o None si no existe o expiró.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._record_hit(entry[2])
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT content, expires_at, latency_ms FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, row)
+            self._record_hit(row[2])
+            return row[0]
+
+    def put(self, key: str, content: str, latency_ms: int):
+        """
+        Guarda una respuesta en ambos niveles.
+
+        Args:
+            key (str): Clave de la llamada.
+            content (str): Respuesta cruda del modelo.
+            latency_ms (int): Latencia que costó obtenerla (para medir el ahorro).
+        """
+        now = time.time()
+        entry = (content, now + self.ttl_seconds, latency_ms)
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (key, content, entry[1], latency_ms, now),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._evict_disk(now)
+            self._db.commit()
+
+    def invalidate(self, key: str):
+        """Elimina una entrada (por ejemplo, si su contenido no pasó la validación)."""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> tuple[str, bool]:
+        """
+        Devuelve la respuesta cacheada o la calcula una sola vez por clave.
+
+        Si otra llamada con la misma clave ya está en curso, espera su resultado
+        en lugar de repetir la petición al proveedor.
+
+        Args:
+            key (str): Clave de la llamada.
+            compute (Callable[[], str]): Función que consulta al LLM.
+
+        Returns:
+            tuple[str, bool]: El contenido y si provino de la caché.
+        """
+        while True:
+            content = self.get(key)
+            if content is not None:
+                return content, True
+
+            with self._lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+                else:
+                    self.coalesced += 1
+
+            if not leader:
+                # Si el líder falla, no hay entrada y reintentamos como líder
+                event.wait()
+                continue
+
+            try:
+                start = time.perf_counter()
+                content = compute()
+                self.put(key, content, int((time.perf_counter() - start) * 1000))
+                return content, False
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Aciertos, fallos, tasa de aciertos, llamadas agrupadas y latencia ahorrada.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "latency_saved_ms": self.latency_saved_ms,
+        }
+
+    def close(self):
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._db.close()
+
+    def _record_hit(self, latency_ms: int):
+        self.hits += 1
+        self.latency_saved_ms += latency_ms
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = tuple(entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key IN ("
+            " SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
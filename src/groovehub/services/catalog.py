@@ -0,0 +1,411 @@
+import bisect
+import contextvars
+import csv
+import json
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, NamedTuple
+
+from groovehub.models.response import AdvisorAction, AdvisorResponse
+from groovehub.observability.tracing import traced
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "data", "catalog.csv")
+# Acciones de la respuesta que se resuelven con el catálogo local
+CATALOG_ACTIONS = (AdvisorAction.CHECK_STOCK, AdvisorAction.SHOW_CATALOG)
+
+_COMBINING = re.compile("[\u0300-\u036f]")
+_WORD = re.compile(r"[a-z0-9]+")
+# "menos de $300", "hasta u$s 500", "máximo 1000 dólares": sin moneda no es un precio ("hasta 3 días")
+_PRICE_CAP = re.compile(
+    r"(?:menos de|hasta|maximo|no mas de)\s*"
+    r"(?:(?:u\$s|us\$|u?\$|usd)\s*(\d+(?:[.,]\d+)?)|(\d+(?:[.,]\d+)?)\s*(?:\$|(?:usd|dolares?|pesos)\b))"
+)
+_STOPWORDS = frozenset(
+    "a al algo con de del el en es esta este hay la las lo los mas me mi mis muy no o para pero por que "
+    "quiero se si sin soy su tengo tienen tu un una uno y ya como cual cuanto donde recomiendas recomienda".split()
+)
+# Formas coloquiales que apuntan a una categoría
+CATEGORY_SYNONYMS = {
+    "palillo": "baquetas",
+    "bata": "baterias",
+    "ampli": "amplificadores",
+    "efecto": "pedales",
+    "mic": "microfonos",
+    "piano": "teclados",
+    "cuerda": "cuerdas",
+    "guitarra": "guitarras",
+    "bajo": "bajos",
+    "bateria": "baterias",
+    "platillo": "platillos",
+    "parche": "parches",
+    "pedal": "pedales",
+}
+# Sinónimos que también son adjetivos: "precio bajo" o "el más bajo" no piden un bajo
+_ADJECTIVE_SYNONYMS = frozenset({"bajo"})
+_ADJECTIVE_CUES = frozenset({"precio", "costo", "mas", "muy"})
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin acentos ni signos: la forma en que se indexa y se consulta."""
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", text.casefold()))
+
+
+def stem(word: str) -> str:
+    """
+    Reduce un plural castellano a su singular aproximado ("pedales" → "pedal",
+    "baquetas" → "baqueta"), suficiente para que consulta e índice coincidan.
+    """
+    if len(word) > 4 and word.endswith("es") and word[-3] in "lrndjz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Parte un texto en términos normalizados y sin plural, descartando
+    palabras vacías.
+
+    Args:
+        text (str): Texto crudo.
+
+    Returns:
+        list[str]: Términos en orden de aparición.
+    """
+    return [stem(w) for w in _WORD.findall(normalize(text)) if w not in _STOPWORDS]
+
+
+def _compact(text: str) -> str:
+    """Clave de marca sin espacios ni signos ("D'Addario" → "daddario")."""
+    return "".join(_WORD.findall(normalize(text)))
+
+
+class Product(NamedTuple):
+    """Un artículo del catálogo."""
+    sku: str
+    name: str
+    brand: str
+    category: str
+    price: float
+    stock: int
+    tags: str = ""
+
+
+class Mentions(NamedTuple):
+    """Productos, marcas y filtros detectados en un texto."""
+    terms: list[str]
+    brands: list[str]
+    categories: list[str]
+    max_price: float | None
+
+
+class CatalogHits(NamedTuple):
+    """Resultado de una búsqueda lista para ejecutar acciones."""
+    # Mejores coincidencias con la consulta (para `check_stock`)
+    matches: list[Product]
+    # Productos de las mismas categorías, en stock y por precio (para `show_catalog`)
+    related: list[Product]
+
+
+class ActionResult(NamedTuple):
+    """Acción de catálogo ejecutada para una respuesta."""
+    action: AdvisorAction
+    products: list[Product]
+    # True si los datos ya estaban precargados cuando llegó la respuesta
+    prefetched: bool
+    # Tiempo que se esperó por los datos después de la respuesta del LLM
+    wait_ms: float
+
+
+class Catalog:
+    """
+    Catálogo local de productos con un índice invertido en memoria.
+
+    Cada término apunta a los productos que lo contienen (con más peso si está
+    en el nombre o la marca que en la categoría o las etiquetas). Marca y
+    categoría son facetas exactas y el precio se filtra por rango con una lista
+    ordenada, así que una consulta toca solo los productos candidatos: unos
+    pocos microsegundos con miles de artículos.
+    """
+
+    def __init__(self, products: Iterable[Product]):
+        """
+        Args:
+            products (Iterable[Product]): Artículos a indexar.
+        """
+        self.products = list(products)
+        self._by_sku = {p.sku: i for i, p in enumerate(self.products)}
+        self._postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self._brands: dict[str, set[int]] = defaultdict(set)
+        self._categories: dict[str, set[int]] = defaultdict(set)
+        self.brand_names: dict[str, str] = {}
+
+        for i, p in enumerate(self.products):
+            for weight, text in ((2.0, f"{p.name} {p.brand}"), (1.0, f"{p.category} {p.tags}")):
+                for term in tokenize(text):
+                    postings = self._postings[term]
+                    postings[i] = max(postings.get(i, 0.0), weight)
+            key = _compact(p.brand)
+            self._brands[key].add(i)
+            self.brand_names[key] = p.brand
+            self._categories[p.category].add(i)
+
+        # Precio ascendente para filtrar rangos con bisect
+        self._by_price = sorted(range(len(self.products)), key=lambda i: self.products[i].price)
+        self._prices = [self.products[i].price for i in self._by_price]
+        total = len(self.products) or 1
+        self._idf = {term: math.log(1 + total / len(docs)) for term, docs in self._postings.items()}
+        self._category_terms = {stem(c): c for c in self._categories}
+        self._category_terms.update({k: v for k, v in CATEGORY_SYNONYMS.items() if v in self._categories})
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH) -> "Catalog":
+        """
+        Carga el catálogo desde un CSV (con encabezado) o un JSON (lista de objetos).
+
+        Args:
+            path (str): Archivo con columnas sku, name, brand, category, price, stock y tags.
+
+        Returns:
+            Catalog: El catálogo indexado.
+        """
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = json.load(f) if path.endswith(".json") else list(csv.DictReader(f))
+        return cls(
+            Product(
+                str(row["sku"]),
+                row["name"],
+                row["brand"],
+                normalize(row["category"]),
+                float(row["price"]),
+                int(row["stock"]),
+                row.get("tags") or "",
+            )
+            for row in rows
+        )
+
+    def get(self, sku: str) -> Product | None:
+        index = self._by_sku.get(sku)
+        return None if index is None else self.products[index]
+
+    def mentions(self, text: str) -> Mentions:
+        """
+        Detecta marcas, categorías y un tope de precio en un texto libre.
+
+        Las marcas se reconocen aunque vengan sin espacios o signos
+        ("vicfirth", "daddario") comparando n-gramas de hasta tres palabras.
+
+        Args:
+            text (str): Consulta del usuario o respuesta del modelo.
+
+        Returns:
+            Mentions: Lo detectado; `terms` son los términos presentes en el índice.
+        """
+        words = _WORD.findall(normalize(text))
+        brands = []
+        for n in (3, 2, 1):
+            for i in range(len(words) - n + 1):
+                key = "".join(words[i : i + n])
+                if key in self._brands and key not in brands:
+                    brands.append(key)
+        stems = [
+            stem(w)
+            for i, w in enumerate(words)
+            if w not in _STOPWORDS and not (stem(w) in _ADJECTIVE_SYNONYMS and i and words[i - 1] in _ADJECTIVE_CUES)
+        ]
+        terms = [t for t in stems if t in self._postings]
+        categories = []
+        for term in stems:
+            category = self._category_terms.get(term)
+            if category is not None and category not in categories:
+                categories.append(category)
+        cap = _PRICE_CAP.search(normalize(text))
+        max_price = float((cap.group(1) or cap.group(2)).replace(",", ".")) if cap else None
+        return Mentions(terms, brands, categories, max_price)
+
+    def _candidates(
+        self,
+        brands: list[str] | None,
+        categories: list[str] | None,
+        max_price: float | None,
+        in_stock: bool,
+    ) -> set[int] | None:
+        """Intersección de las facetas pedidas (None = sin restricción)."""
+        allowed = None
+        if brands:
+            allowed = set().union(*(self._brands.get(b, ()) for b in brands))
+        if categories:
+            in_categories = set().union(*(self._categories.get(c, ()) for c in categories))
+            allowed = in_categories if allowed is None else allowed & in_categories
+        if max_price is not None:
+            cheap = set(self._by_price[: bisect.bisect_right(self._prices, max_price)])
+            allowed = cheap if allowed is None else allowed & cheap
+        if in_stock:
+            pool = allowed if allowed is not None else range(len(self.products))
+            allowed = {i for i in pool if self.products[i].stock > 0}
+        return allowed
+
+    def search(
+        self,
+        query: str | list[str],
+        brands: list[str] | None = None,
+        categories: list[str] | None = None,
+        max_price: float | None = None,
+        in_stock: bool = False,
+        limit: int = 5,
+    ) -> list[Product]:
+        """
+        Busca productos por texto con filtros por faceta.
+
+        Args:
+            query (str | list[str]): Texto libre o términos ya tokenizados.
+            brands (list[str] | None): Marcas (clave compacta, ver `mentions`).
+            categories (list[str] | None): Categorías.
+            max_price (float | None): Precio máximo.
+            in_stock (bool): Solo productos con stock.
+            limit (int): Máximo de resultados.
+
+        Returns:
+            list[Product]: Ordenados por relevancia (TF-IDF ponderado por campo) y precio.
+        """
+        terms = tokenize(query) if isinstance(query, str) else query
+        allowed = self._candidates(brands, categories, max_price, in_stock)
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, weight in self._postings[term].items():
+                if allowed is None or i in allowed:
+                    scores[i] += weight * idf
+        if not scores and allowed is not None and (brands or categories):
+            # Sin coincidencias de texto, las facetas solas también son una respuesta
+            scores = dict.fromkeys(allowed, 0.0)
+        ranked = sorted(scores, key=lambda i: (-scores[i], self.products[i].price))
+        return [self.products[i] for i in ranked[:limit]]
+
+    def browse(
+        self, categories: list[str], max_price: float | None = None, limit: int = 5
+    ) -> list[Product]:
+        """
+        Lista productos en stock de unas categorías, del más barato al más caro.
+
+        Args:
+            categories (list[str]): Categorías a mostrar.
+            max_price (float | None): Precio máximo.
+            limit (int): Máximo de resultados.
+
+        Returns:
+            list[Product]: Productos disponibles.
+        """
+        allowed = self._candidates(None, categories, max_price, in_stock=True) or set()
+        return [self.products[i] for i in self._by_price if i in allowed][:limit]
+
+    @traced("catalog.lookup")
+    def lookup(self, text: str, limit: int = 5) -> CatalogHits:
+        """
+        Resuelve de una vez lo que piden `check_stock` y `show_catalog` para un texto.
+
+        Args:
+            text (str): Consulta del usuario (o respuesta del modelo).
+            limit (int): Máximo de productos por lista.
+
+        Returns:
+            CatalogHits: Coincidencias y productos relacionados.
+        """
+        found = self.mentions(text)
+        matches = self.search(found.terms, found.brands, found.categories, found.max_price, limit=limit)
+        if not matches and (found.brands or found.categories):
+            # Una marca que no tiene esa categoría: mejor algo parecido que nada
+            matches = self.search(found.terms, max_price=found.max_price, limit=limit)
+        categories = found.categories or list(dict.fromkeys(p.category for p in matches))
+        related = self.browse(categories, found.max_price, limit) if categories else []
+        return CatalogHits(matches, related)
+
+
+class CatalogActions:
+    """
+    Ejecuta `check_stock` y `show_catalog` contra el catálogo local.
+
+    En modo especulativo, `prefetch` busca en segundo plano los productos que
+    menciona la consulta mientras la llamada al LLM está en curso; cuando la
+    respuesta pide una acción de catálogo, el resultado ya está listo.
+    """
+
+    def __init__(self, catalog: Catalog, speculative: bool = True):
+        """
+        Args:
+            catalog (Catalog): Catálogo indexado.
+            speculative (bool): Precargar resultados durante la llamada al LLM.
+        """
+        self.catalog = catalog
+        self.speculative = speculative
+        self.prefetches = 0
+        self.prefetch_hits = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-prefetch")
+        self._pending: tuple[str, Future] | None = None
+
+    def prefetch(self, query: str):
+        """
+        Lanza la búsqueda especulativa de una consulta (no bloquea).
+
+        Args:
+            query (str): Consulta del usuario, antes de enviarla al LLM.
+        """
+        if not self.speculative:
+            return
+        self.prefetches += 1
+        # El contexto se copia para que el span de la búsqueda cuelgue del turno
+        context = contextvars.copy_context()
+        self._pending = (query, self._executor.submit(context.run, self.catalog.lookup, query))
+
+    def execute(self, query: str, response: AdvisorResponse) -> list[ActionResult]:
+        """
+        Ejecuta las acciones de catálogo que recomendó el modelo.
+
+        Usa la precarga de la consulta si existe. Si la consulta no menciona
+        productos, busca en la respuesta del modelo (que suele nombrarlos).
+
+        Args:
+            query (str): Consulta del usuario.
+            response (AdvisorResponse): Respuesta validada del turno.
+
+        Returns:
+            list[ActionResult]: Una entrada por acción de catálogo, en el orden recomendado.
+        """
+        pending, self._pending = self._pending, None
+        actions = [a for a in response.recommended_actions if a in CATALOG_ACTIONS]
+        if not actions:
+            return []
+
+        start = time.perf_counter()
+        prefetched = pending is not None and pending[0] == query and pending[1].done()
+        if pending is not None and pending[0] == query:
+            hits = pending[1].result()
+        else:
+            hits = self.catalog.lookup(query)
+        if not hits.matches:
+            prefetched = False
+            hits = self.catalog.lookup(response.answer)
+        wait_ms = round((time.perf_counter() - start) * 1000, 3)
+        if prefetched:
+            self.prefetch_hits += 1
+
+        return [
+            ActionResult(
+                action,
+                hits.matches if action is AdvisorAction.CHECK_STOCK else hits.related or hits.matches,
+                prefetched,
+                wait_ms,
+            )
+            for action in actions
+        ]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,72 +1,524 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import importlib
+from typing import Callable, NamedTuple
 
-load_dotenv()
+from groovehub.observability.tracing import span, traced
+from groovehub.services.cache import CompletionCache, make_cache_key
+from groovehub.services.providers import (
+    JSON_SCHEMA_MODELS,
+    STRONG,
+    CircuitBreaker,
+    Provider,
+    ProviderConfig,
+    ProviderPool,
+    discover_providers,
+)
+from groovehub.services.scheduler import INTERACTIVE, RateScheduler
+
+
+class CompletionResult(NamedTuple):
+    """Contenido generado por el modelo junto con el bloque `usage` del proveedor."""
+    content: str
+    usage: dict | None = None
+    cached: bool = False
+    # True si la respuesta se resolvió localmente, sin llamar a ningún proveedor
+    local: bool = False
+    # Modelo que generó la respuesta (con varios proveedores puede variar por turno)
+    model: str | None = None
+    # Proveedor que la generó (nombre de su `ProviderConfig`)
+    provider: str | None = None
+    # Herramientas que pidió llamar el modelo: dicts con 'id', 'name' y 'arguments'
+    tool_calls: list | None = None
+
+
+class StreamInterruptedError(RuntimeError):
+    """El stream se cortó después de entregar fragmentos: no se puede reintentar sin duplicarlos."""
 
 
 class LLMService:
     """
     Servicio encargado de gestionar la conexión y comunicación con los proveedores de LLM.
     
-    Detecta automáticamente las credenciales en el entorno (.env) y configura
-    el cliente apropiado. Prioriza OpenAI (producción) si la clave está disponible; 
-    de lo contrario, utiliza Groq (ideal para desarrollo rápido) sin requerir 
-    cambios adicionales en el código.
+    Detecta automáticamente las credenciales en el entorno (.env) y arma un
+    pool con todos los proveedores configurados (OpenAI y/o Groq), cada uno con
+    su cliente y su pool de conexiones keep-alive. Las peticiones se enrutan al
+    proveedor con menor p95 reciente, con reintentos, circuit breaker y, si se
+    pide, peticiones de respaldo (hedging); ver `ProviderPool`. Con un
+    `RateScheduler`, cada llamada espera su turno según los límites de RPM y
+    TPM del proveedor (o se rechaza antes de salir). Cada llamada elige el
+    nivel de modelo: el fuerte (`model`) o el rápido (`fast_model`).
     """
 
-    def __init__(self):
+    TEMPERATURE = 0.2
+    # Nombre de la clase cliente del SDK `openai`, que se importa recién al construirla
+    CLIENT_CLASS = "OpenAI"
+    # Timeout por intento: los reintentos y el failover los maneja el pool
+    REQUEST_TIMEOUT = 30.0
+
+    def __init__(
+        self,
+        cache: CompletionCache | None = None,
+        providers: list[ProviderConfig] | None = None,
+        hedge_after_ms: int | None = None,
+        max_attempts: int = 3,
+        response_schema: dict | None = None,
+        scheduler: RateScheduler | None = None,
+    ):
         """
         Inicializa el servicio LLM, cargando las variables de entorno y
-        estableciendo el cliente, el modelo y el proveedor correspondiente.
+        estableciendo los clientes, el modelo y el proveedor principal.
+
+        Args:
+            cache (CompletionCache | None): Caché de respuestas opcional que se
+                                            consulta antes de llamar al proveedor.
+            providers (list[ProviderConfig] | None): Backends a usar, en orden de
+                                            preferencia. Por defecto, los del entorno.
+            hedge_after_ms (int | None): Si la respuesta tarda más que esto, se
+                                         lanza la misma petición a otro proveedor.
+            max_attempts (int): Intentos totales por petición (entre todos los proveedores).
+            response_schema (dict | None): Esquema JSON estricto de la respuesta. Con los
+                                           modelos que lo soportan se envía como
+                                           `json_schema`; con el resto, `json_object`.
+            scheduler (RateScheduler | None): Control de admisión; se le registran
+                                              los límites de cada proveedor.
         
         Raises:
             ValueError: Si no se encuentra ninguna API Key (OpenAI o Groq) en el entorno.
         """
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-
-        if self.openai_api_key:
-            self.client = OpenAI(api_key=self.openai_api_key)
-            self.model = "gpt-3.5-turbo"
-            self.provider = "OpenAI"
-
-        elif self.groq_api_key:
-            self.client = OpenAI(
-                api_key=self.groq_api_key, base_url="https://api.groq.com/openai/v1"
-            )
-            self.model = "llama-3.3-70b-versatile"
-            self.provider = "Groq"
-        else:
+        configs = discover_providers() if providers is None else providers
+        if not configs:
             raise ValueError(
                 "❌ No se encontró API Key. Configura OPENAI_API_KEY o GROQ_API_KEY en tu .env"
             )
 
-    def get_completion(self, messages: list) -> str:
+        if scheduler is not None:
+            for config in configs:
+                scheduler.register(config.name, config.rpm, config.tpm)
+        self.scheduler = scheduler
+        self.pool = ProviderPool(
+            [Provider(config, self._make_client, CircuitBreaker()) for config in configs],
+            max_attempts=max_attempts,
+            hedge_after_ms=hedge_after_ms,
+            scheduler=scheduler,
+        )
+        # El proveedor principal define la clave de caché y el modelo por defecto
+        self.model = configs[0].model
+        self.fast_model = configs[0].fast_model or configs[0].model
+        self.provider = configs[0].name
+        self.cache = cache
+        self.response_schema = response_schema
+
+    def warm_up(self, connect: bool = False):
+        """
+        Construye los clientes de todos los proveedores (importando el SDK) y,
+        opcionalmente, abre la conexión TLS de cada uno con una petición
+        liviana (`GET /models`), para que el primer turno no pague el handshake.
+
+        Pensado para correr en un hilo de fondo mientras el usuario escribe;
+        los errores de la pre-conexión se ignoran (el turno real los reportará).
+
+        Args:
+            connect (bool): Si es True, además se pre-calienta la conexión.
+        """
+        for provider in self.pool.providers:
+            client = provider.client
+            if connect:
+                try:
+                    client.models.list()
+                except Exception:
+                    pass
+
+    def _make_client(self, config: ProviderConfig):
+        client_class = getattr(importlib.import_module("openai"), self.CLIENT_CLASS)
+        return client_class(
+            api_key=config.api_key,
+            base_url=config.base_url,
+            max_retries=0,
+            timeout=self.REQUEST_TIMEOUT,
+        )
+
+    def cache_key(self, messages: list, tier: str = STRONG) -> str:
+        """Clave de caché de una llamada con el modelo del nivel y la temperatura actuales."""
+        return make_cache_key(messages, self.model_for(tier), self.TEMPERATURE)
+
+    def model_for(self, tier: str) -> str:
+        """Modelo del proveedor principal para un nivel ('fast' o 'strong')."""
+        return self.model if tier == STRONG else self.fast_model
+
+    @traced("llm.completion")
+    def get_completion(
+        self,
+        messages: list,
+        use_cache: bool = True,
+        on_delta: Callable[[str], None] | None = None,
+        response_schema: dict | None = None,
+        priority: str = INTERACTIVE,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
         """
         Envía el historial de mensajes al LLM configurado y retorna el contenido generado.
         
         Aplica configuraciones estrictas como temperatura baja (0.2) para mayor 
-        determinismo y fuerza el formato de respuesta a un objeto JSON.
+        determinismo y fuerza el formato de respuesta a un objeto JSON. Si hay
+        una caché configurada, las consultas repetidas se responden desde ella y
+        las idénticas concurrentes comparten una única petición.
+
+        Si se pasa `on_delta`, la respuesta se pide en modo streaming y cada
+        fragmento se entrega a ese callback a medida que llega (una respuesta
+        cacheada se entrega en un único fragmento).
         
         Args:
             messages (list): Lista de diccionarios representando el historial de 
                              conversación (roles 'system', 'user', 'assistant').
+            use_cache (bool): Si es False, se consulta siempre al proveedor.
+            on_delta (Callable[[str], None] | None): Receptor de fragmentos en streaming.
+            response_schema (dict | None): Esquema para esta llamada en lugar del del
+                             servicio (por ejemplo, al re-preguntar solo algunos campos).
+            priority (str): 'interactive' o 'batch': orden en la cola del planificador.
+            tier (str): 'strong' (por defecto) o 'fast': nivel de modelo a usar.
+            tools (dict | None): `tools` y `tool_choice` a agregar a la petición. Con
+                             herramientas no se usa la caché (sus resultados cambian).
                              
         Returns:
-            str: La respuesta cruda del modelo en formato JSON (como string).
+            CompletionResult: La respuesta cruda del modelo en formato JSON (como string)
+                              y el conteo de tokens informado por el proveedor
+                              (`prompt_tokens`, `completion_tokens`, `total_tokens`),
+                              o None si la API no lo devolvió o vino de la caché.
             
         Raises:
-            Exception: Si ocurre un error crítico de conexión o de la API del proveedor.
+            NoProviderAvailableError: Si todos los proveedores tienen el circuito abierto.
+            RateLimitedError: Si el planificador rechazó la llamada (trae `retry_after`).
+            Exception: El último error del proveedor si se agotan los reintentos.
+        """
+        if self.cache is None or not use_cache or tools is not None:
+            return self._request(messages, on_delta, response_schema, priority, tier, tools)
+
+        result = None
+
+        def compute() -> str:
+            nonlocal result
+            result = self._request(messages, on_delta, response_schema, priority, tier)
+            return result.content
+
+        content, cached = self.cache.get_or_compute(self.cache_key(messages, tier), compute)
+        if cached:
+            if on_delta is not None:
+                on_delta(content)
+            return CompletionResult(content, None, cached=True)
+        return result
+
+    def _demand(self, messages: list, priority: str):
+        return self.scheduler.demand(messages, priority) if self.scheduler is not None else None
+
+    def _request(
+        self,
+        messages: list,
+        on_delta: Callable[[str], None] | None = None,
+        response_schema: dict | None = None,
+        priority: str = INTERACTIVE,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        demand = self._demand(messages, priority)
+        if on_delta is None:
+            return self.pool.call(
+                lambda provider: self._complete(provider, messages, response_schema, tier, tools), demand=demand
+            )
+
+        emitted = False
+
+        def forward(delta: str):
+            nonlocal emitted
+            emitted = True
+            on_delta(delta)
+
+        def request(provider: Provider) -> CompletionResult:
+            try:
+                return self._stream(provider, messages, forward, tier, tools)
+            except Exception as e:
+                # Reintentar duplicaría los fragmentos que el usuario ya vio
+                if emitted:
+                    raise StreamInterruptedError(f"Se cortó el stream de {provider.name}: {e}") from e
+                raise
+
+        # En streaming no hay hedging: el usuario ya estaría viendo los fragmentos del primero
+        return self.pool.call(request, hedge=False, demand=demand)
+
+    def _complete(
+        self,
+        provider: Provider,
+        messages: list,
+        response_schema: dict | None = None,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        model = provider.model_for(tier)
+        with span("llm.http", provider=provider.name, model=model):
+            response = provider.client.chat.completions.create(
+                **self._request_params(messages, model, response_schema=response_schema, tools=tools)
+            )
+        return self._result(response, model, provider)
+
+    @staticmethod
+    def _result(response, model: str, provider: Provider) -> CompletionResult:
+        usage = response.usage.model_dump() if response.usage else None
+        message = response.choices[0].message
+        tool_calls = [
+            {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+            for call in message.tool_calls or ()
+        ]
+        return CompletionResult(
+            message.content or "", usage, model=model, provider=provider.name, tool_calls=tool_calls or None
+        )
+
+    def _request_params(
+        self,
+        messages: list,
+        model: str,
+        stream: bool = False,
+        response_schema: dict | None = None,
+        tools: dict | None = None,
+    ) -> dict:
+        schema = response_schema or self.response_schema
+        if schema is not None and model in JSON_SCHEMA_MODELS:
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "advisor_response", "strict": True, "schema": schema},
+            }
+        else:
+            response_format = {"type": "json_object"}
+        params = {
+            "model": model,
+            "messages": messages,
+            "temperature": self.TEMPERATURE,
+            "response_format": response_format,
+        }
+        if tools is not None:
+            params.update(tools)
+        if stream:
+            params["stream"] = True
+            params["stream_options"] = {"include_usage": True}
+        return params
+
+    def _stream(
+        self,
+        provider: Provider,
+        messages: list,
+        on_delta: Callable[[str], None],
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        model = provider.model_for(tier)
+        parts = []
+        calls = {}
+        usage = None
+        with span("llm.http_stream", provider=provider.name, model=model):
+            stream = provider.client.chat.completions.create(
+                **self._request_params(messages, model, stream=True, tools=tools)
+            )
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    _merge_tool_calls(calls, delta.tool_calls)
+                if delta.content:
+                    parts.append(delta.content)
+                    on_delta(delta.content)
+        return CompletionResult(
+            "".join(parts), usage, model=model, provider=provider.name, tool_calls=_tool_calls(calls)
+        )
+
+
+class AsyncLLMService(LLMService):
+    """
+    Variante asíncrona del servicio LLM, construida sobre `AsyncOpenAI`.
+
+    Comparte la detección de proveedor, los parámetros de la petición y la caché
+    con `LLMService`, pero sus llamadas no bloquean el event loop: una sola
+    instancia puede atender cientos de conversaciones concurrentes. Las
+    consultas idénticas en curso se agrupan en una única tarea (single-flight).
+    """
+
+    CLIENT_CLASS = "AsyncOpenAI"
+
+    def __init__(
+        self,
+        cache: CompletionCache | None = None,
+        providers: list[ProviderConfig] | None = None,
+        hedge_after_ms: int | None = None,
+        max_attempts: int = 3,
+        response_schema: dict | None = None,
+        scheduler: RateScheduler | None = None,
+    ):
+        super().__init__(cache, providers, hedge_after_ms, max_attempts, response_schema, scheduler)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def warm_up(self, connect: bool = False):
+        """
+        Construye los clientes. La pre-conexión no aplica: el pool de un
+        cliente asíncrono pertenece al event loop que lo usa.
+        """
+        super().warm_up(connect=False)
+
+    async def aclose(self):
+        """
+        Cierra los clientes ya creados. Hay que llamarlo antes de cerrar el
+        event loop en que se usaron (por ejemplo, al final de `asyncio.run`).
         """
+        for provider in self.pool.providers:
+            client = provider.release_client()
+            if client is not None:
+                await client.close()
+
+    @traced("llm.completion")
+    async def get_completion(
+        self,
+        messages: list,
+        use_cache: bool = True,
+        on_delta: Callable[[str], None] | None = None,
+        response_schema: dict | None = None,
+        priority: str = INTERACTIVE,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        """
+        Versión asíncrona de `LLMService.get_completion`.
+
+        Args:
+            messages (list): Historial de mensajes a enviar.
+            use_cache (bool): Si es False, se consulta siempre al proveedor.
+            on_delta (Callable[[str], None] | None): Receptor de fragmentos en streaming.
+            response_schema (dict | None): Esquema para esta llamada en lugar del del servicio.
+            priority (str): 'interactive' o 'batch': orden en la cola del planificador.
+            tier (str): 'strong' (por defecto) o 'fast': nivel de modelo a usar.
+            tools (dict | None): `tools` y `tool_choice` a agregar a la petición (sin caché).
+
+        Returns:
+            CompletionResult: Contenido, `usage` del proveedor y si vino de la caché.
+        """
+        if self.cache is None or not use_cache or tools is not None:
+            return await self._request(messages, on_delta, response_schema, priority, tier, tools)
+
+        key = self.cache_key(messages, tier)
+        content = None
+        if key not in self._inflight:
+            # SQLite en un hilo, fuera del event loop
+            content = await asyncio.to_thread(self.cache.get, key)
+        # Sin `await` entre esta verificación y el registro de la tarea
+        if content is None and key in self._inflight:
+            # Otra sesión ya pidió exactamente lo mismo: esperamos su resultado
+            self.cache.coalesced += 1
+            content = (await asyncio.shield(self._inflight[key])).content
+        if content is not None:
+            if on_delta is not None:
+                on_delta(content)
+            return CompletionResult(content, None, cached=True)
+
+        task = asyncio.ensure_future(self._request(messages, on_delta, response_schema, priority, tier))
+        self._inflight[key] = task
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.2,
-                response_format={"type": "json_object"},
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await task
+            await asyncio.to_thread(self.cache.put, key, result.content, int((loop.time() - start) * 1000))
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _request(
+        self,
+        messages: list,
+        on_delta: Callable[[str], None] | None = None,
+        response_schema: dict | None = None,
+        priority: str = INTERACTIVE,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        demand = self._demand(messages, priority)
+        if on_delta is None:
+            return await self.pool.call_async(
+                lambda provider: self._complete(provider, messages, response_schema, tier, tools), demand=demand
+            )
+
+        emitted = False
+
+        def forward(delta: str):
+            nonlocal emitted
+            emitted = True
+            on_delta(delta)
+
+        async def request(provider: Provider) -> CompletionResult:
+            try:
+                return await self._stream(provider, messages, forward, tier, tools)
+            except Exception as e:
+                if emitted:
+                    raise StreamInterruptedError(f"Se cortó el stream de {provider.name}: {e}") from e
+                raise
+
+        return await self.pool.call_async(request, hedge=False, demand=demand)
+
+    async def _complete(
+        self,
+        provider: Provider,
+        messages: list,
+        response_schema: dict | None = None,
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        model = provider.model_for(tier)
+        with span("llm.http", provider=provider.name, model=model):
+            response = await provider.client.chat.completions.create(
+                **self._request_params(messages, model, response_schema=response_schema, tools=tools)
+            )
+        return self._result(response, model, provider)
+
+    async def _stream(
+        self,
+        provider: Provider,
+        messages: list,
+        on_delta: Callable[[str], None],
+        tier: str = STRONG,
+        tools: dict | None = None,
+    ) -> CompletionResult:
+        model = provider.model_for(tier)
+        parts = []
+        calls = {}
+        usage = None
+        with span("llm.http_stream", provider=provider.name, model=model):
+            stream = await provider.client.chat.completions.create(
+                **self._request_params(messages, model, stream=True, tools=tools)
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Error crítico conectando con {self.provider}: {e}")
-            raise e
\ No newline at end of file
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    _merge_tool_calls(calls, delta.tool_calls)
+                if delta.content:
+                    parts.append(delta.content)
+                    on_delta(delta.content)
+        return CompletionResult(
+            "".join(parts), usage, model=model, provider=provider.name, tool_calls=_tool_calls(calls)
+        )
+
+
+def _merge_tool_calls(calls: dict, deltas: list):
+    # En streaming cada llamada llega en fragmentos identificados por `index`:
+    # el primero trae id y nombre, los siguientes pedazos de los argumentos
+    for delta in deltas:
+        call = calls.setdefault(delta.index, {"id": "", "name": "", "arguments": ""})
+        if delta.id:
+            call["id"] = delta.id
+        if delta.function is not None:
+            call["name"] += delta.function.name or ""
+            call["arguments"] += delta.function.arguments or ""
+
+
+def _tool_calls(calls: dict) -> list | None:
+    return [calls[index] for index in sorted(calls)] or None
@@ -0,0 +1,523 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, NamedTuple
+
+from dotenv import load_dotenv
+
+from groovehub.observability.metrics import percentile
+from groovehub.observability.tracing import span
+from groovehub.services.scheduler import Demand, RateLimitedError, RateScheduler
+
+# Modelos que aceptan `response_format` de tipo `json_schema` en modo estricto;
+# el resto recibe `json_object` (JSON válido, pero sin garantía de esquema)
+JSON_SCHEMA_MODELS = {"gpt-4o", "gpt-4o-mini"}
+
+# Códigos HTTP transitorios que vale la pena reintentar (además de los 5xx)
+RETRYABLE_STATUS = (408, 409, 429)
+
+# Límites por defecto de cada cuenta (peticiones y tokens por minuto): el tier
+# inicial de OpenAI y el gratuito de Groq. Se cambian con <NOMBRE>_RPM y <NOMBRE>_TPM
+DEFAULT_RATE_LIMITS = {"OpenAI": (500, 200_000), "Groq": (30, 12_000)}
+
+# Niveles de modelo de cada proveedor: el rápido y barato, y el fuerte (`model`)
+FAST = "fast"
+STRONG = "strong"
+TIERS = (FAST, STRONG)
+# Modelo del nivel rápido de cada cuenta. Se cambia con <NOMBRE>_FAST_MODEL
+DEFAULT_FAST_MODELS = {"OpenAI": "gpt-4o-mini", "Groq": "llama-3.1-8b-instant"}
+
+
+class ProviderConfig(NamedTuple):
+    """Datos de conexión de un backend compatible con la API de OpenAI."""
+    name: str
+    model: str
+    api_key: str
+    base_url: str | None = None
+    # Límites de la cuenta; None = sin regular
+    rpm: int | None = None
+    tpm: int | None = None
+    # Modelo del nivel rápido; None = se usa `model` también para ese nivel
+    fast_model: str | None = None
+
+
+class NoProviderAvailableError(RuntimeError):
+    """Todos los proveedores tienen el circuito abierto."""
+
+
+def discover_providers() -> list[ProviderConfig]:
+    """
+    Arma la lista de proveedores configurados en el entorno (.env).
+
+    OpenAI va primero (producción) y Groq después; si ambas claves están
+    presentes se usan los dos.
+
+    Returns:
+        list[ProviderConfig]: Proveedores en orden de preferencia.
+    """
+    load_dotenv()
+    providers = []
+    if os.getenv("OPENAI_API_KEY"):
+        providers.append(
+            ProviderConfig(
+                "OpenAI",
+                "gpt-3.5-turbo",
+                os.getenv("OPENAI_API_KEY"),
+                None,
+                *_rate_limits("OpenAI"),
+                fast_model=_fast_model("OpenAI"),
+            )
+        )
+    if os.getenv("GROQ_API_KEY"):
+        providers.append(
+            ProviderConfig(
+                "Groq",
+                "llama-3.3-70b-versatile",
+                os.getenv("GROQ_API_KEY"),
+                "https://api.groq.com/openai/v1",
+                *_rate_limits("Groq"),
+                fast_model=_fast_model("Groq"),
+            )
+        )
+    return providers
+
+
+def _rate_limits(name: str) -> tuple[int | None, int | None]:
+    rpm, tpm = DEFAULT_RATE_LIMITS.get(name, (None, None))
+    rpm = os.getenv(f"{name.upper()}_RPM", rpm)
+    tpm = os.getenv(f"{name.upper()}_TPM", tpm)
+    # 0 (o vacío) desactiva ese límite
+    return int(rpm) if rpm else None, int(tpm) if tpm else None
+
+
+def _fast_model(name: str) -> str | None:
+    return os.getenv(f"{name.upper()}_FAST_MODEL", DEFAULT_FAST_MODELS.get(name)) or None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Indica si un error del proveedor es transitorio (red, timeout, 429 o 5xx).
+
+    Los errores de la petición en sí (400, 401, 404...) fallarían igual en un
+    reintento y se propagan de inmediato.
+    """
+    # Si el error vino del SDK, `openai` ya está importado y esto es gratis
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code in RETRYABLE_STATUS
+    return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por proveedor.
+
+    Tras `failure_threshold` fallos consecutivos el circuito se abre y el
+    proveedor deja de recibir tráfico durante `reset_timeout` segundos; luego
+    pasa a semiabierto y deja pasar una petición de prueba: si funciona se
+    cierra, y si falla vuelve a abrirse.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold (int): Fallos consecutivos que abren el circuito.
+            reset_timeout (float): Segundos que el circuito queda abierto.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Indica si el proveedor puede recibir una petición ahora."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel(self):
+        """
+        La petición admitida no llegó a una respuesta (la rechazó el planificador
+        o se canceló): libera la sonda sin cambiar el estado.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_response(self):
+        """
+        El proveedor respondió con un error de la petición (400, 401...): está
+        vivo, así que una sonda en semiabierto cierra el circuito. Con el
+        circuito cerrado no cambia nada.
+        """
+        with self._lock:
+            if self._probing:
+                self.failures = 0
+                self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Provider:
+    """
+    Un backend del pool: su cliente (con su propio pool de conexiones
+    keep-alive), su circuit breaker y una ventana móvil de latencias.
+
+    El cliente se construye en el primer uso: importar el SDK y armarlo
+    lleva cientos de milisegundos que no deben demorar el arranque.
+    """
+
+    def __init__(self, config: ProviderConfig, client_factory: Callable, breaker: CircuitBreaker, window: int = 50):
+        """
+        Args:
+            config (ProviderConfig): Datos de conexión.
+            client_factory (Callable): Recibe el `config` y devuelve el cliente
+                                       OpenAI (síncrono o asíncrono).
+            breaker (CircuitBreaker): Circuit breaker del proveedor.
+            window (int): Cantidad de latencias recientes usadas para el p95.
+        """
+        self.config = config
+        self.breaker = breaker
+        self.latencies: deque[int] = deque(maxlen=window)
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory(self.config)
+        return self._client
+
+    def release_client(self):
+        """Devuelve el cliente ya creado (o None) y lo olvida; el próximo uso crea otro."""
+        with self._client_lock:
+            client, self._client = self._client, None
+        return client
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def model(self) -> str:
+        return self.config.model
+
+    def model_for(self, tier: str) -> str:
+        """Modelo a usar para un nivel ('fast' o 'strong')."""
+        if tier == FAST and self.config.fast_model:
+            return self.config.fast_model
+        return self.config.model
+
+    def p95_ms(self) -> int:
+        """p95 de las latencias recientes (0 si todavía no hay muestras)."""
+        return percentile(list(self.latencies), 95)
+
+
+class ProviderPool:
+    """
+    Enruta las peticiones entre varios proveedores.
+
+    Elige el proveedor con menor p95 móvil entre los que tienen el circuito
+    cerrado (los que aún no tienen muestras se prueban primero), reintenta los
+    errores transitorios con backoff exponencial con jitter priorizando en
+    cada reintento un proveedor distinto y, si se configura `hedge_after_ms`,
+    lanza la misma petición al segundo proveedor cuando el primero tarda más
+    que ese umbral y se queda con la primera respuesta que llegue.
+
+    Con un `RateScheduler`, cada intento espera su turno en el proveedor
+    elegido antes de salir (la espera no cuenta en su p95); si el planificador
+    lo rechaza, se prueba enseguida con otro proveedor, sin backoff ni
+    penalizar su circuito.
+    """
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        max_attempts: int = 3,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        hedge_after_ms: int | None = None,
+        scheduler: RateScheduler | None = None,
+    ):
+        """
+        Args:
+            providers (list[Provider]): Proveedores en orden de preferencia.
+            max_attempts (int): Intentos totales por petición.
+            backoff_base (float): Espera base (segundos) antes del primer reintento.
+            backoff_max (float): Tope de la espera entre reintentos.
+            hedge_after_ms (int | None): Umbral para la petición de respaldo; None la desactiva.
+            scheduler (RateScheduler | None): Control de admisión por límites de cada proveedor.
+        """
+        self.providers = providers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after_ms = hedge_after_ms
+        self.scheduler = scheduler
+        self.retries = 0
+        self.hedges = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    def ranked(self, avoid: set | None = None) -> list[Provider]:
+        """
+        Proveedores disponibles, del más al menos conveniente.
+
+        Args:
+            avoid (set | None): Nombres que ya fallaron en esta petición; van al final.
+
+        Returns:
+            list[Provider]: Candidatos ordenados por (ya falló, p95).
+        """
+        avoid = avoid or set()
+        candidates = [p for p in self.providers if p.breaker.state != CircuitBreaker.OPEN]
+        return sorted(candidates, key=lambda p: (p.name in avoid, p.p95_ms()))
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del reintento `attempt` (full jitter)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def call(self, request: Callable[[Provider], object], hedge: bool = True, demand: Demand | None = None):
+        """
+        Ejecuta `request` contra el mejor proveedor, con reintentos y hedging.
+
+        Args:
+            request (Callable[[Provider], object]): Hace la llamada con un proveedor.
+            hedge (bool): Si es False no se lanza la petición de respaldo
+                          (por ejemplo, en streaming ya visible al usuario).
+            demand (Demand | None): Tokens y prioridad para el planificador;
+                                    None la envía sin control de admisión.
+
+        Returns:
+            object: Lo que devuelva `request`.
+
+        Raises:
+            NoProviderAvailableError: Si todos los circuitos están abiertos.
+            RateLimitedError: Si el planificador rechazó la petición en todos los proveedores.
+            Exception: El último error si se agotan los intentos, o uno no reintentable.
+        """
+        failed: set[str] = set()
+        rejected: RateLimitedError | None = None
+        for attempt in range(self.max_attempts):
+            primary = self._acquire(failed)
+            try:
+                if hedge and self.hedge_after_ms is not None:
+                    return self._hedged(request, primary, failed, demand)
+                return self._timed(request, primary, failed, demand)
+            except RateLimitedError as e:
+                rejected = self._rejected(e, rejected, failed, attempt)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                time.sleep(self.backoff(attempt))
+
+    async def call_async(
+        self, request: Callable[[Provider], Awaitable], hedge: bool = True, demand: Demand | None = None
+    ):
+        """Versión asíncrona de `call`: `request` devuelve una corrutina."""
+        failed: set[str] = set()
+        rejected: RateLimitedError | None = None
+        for attempt in range(self.max_attempts):
+            primary = self._acquire(failed)
+            try:
+                if hedge and self.hedge_after_ms is not None:
+                    return await self._hedged_async(request, primary, failed, demand)
+                return await self._timed_async(request, primary, failed, demand)
+            except RateLimitedError as e:
+                rejected = self._rejected(e, rejected, failed, attempt)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Estado del circuito, p95 y muestras por proveedor, más
+                  reintentos y peticiones de respaldo acumulados.
+        """
+        return {
+            "providers": {
+                p.name: {"state": p.breaker.state, "p95_ms": p.p95_ms(), "samples": len(p.latencies)}
+                for p in self.providers
+            },
+            "retries": self.retries,
+            "hedges": self.hedges,
+        }
+
+    def _acquire(self, failed: set, exclude: Provider | None = None) -> Provider | None:
+        # `allow()` se consulta solo para el proveedor que se va a usar: en
+        # semiabierto reserva la única petición de prueba
+        for provider in self.ranked(failed):
+            if provider is not exclude and provider.breaker.allow():
+                return provider
+        if exclude is not None:
+            return None
+        raise NoProviderAvailableError("❌ Ningún proveedor de LLM disponible (circuitos abiertos)")
+
+    def _rejected(
+        self, error: RateLimitedError, previous: RateLimitedError | None, failed: set, attempt: int
+    ) -> RateLimitedError:
+        # Rechazo local: se prueba otro proveedor sin esperar; si no queda
+        # ninguno, se propaga el que sugiere reintentar antes
+        if previous is not None and previous.retry_after <= error.retry_after:
+            error = previous
+        if attempt == self.max_attempts - 1 or all(p.name in failed for p in self.providers):
+            raise error
+        return error
+
+    def _admit(self, provider: Provider, demand: Demand | None, failed: set):
+        if self.scheduler is None or demand is None:
+            return None
+        try:
+            with span("llm.queue", provider=provider.name, priority=demand.priority):
+                return self.scheduler.acquire(provider.name, demand)
+        except RateLimitedError:
+            provider.breaker.cancel()
+            failed.add(provider.name)
+            raise
+
+    async def _admit_async(self, provider: Provider, demand: Demand | None, failed: set):
+        if self.scheduler is None or demand is None:
+            return None
+        try:
+            with span("llm.queue", provider=provider.name, priority=demand.priority):
+                return await self.scheduler.acquire_async(provider.name, demand)
+        except RateLimitedError:
+            provider.breaker.cancel()
+            failed.add(provider.name)
+            raise
+        except asyncio.CancelledError:
+            provider.breaker.cancel()
+            raise
+
+    def _settle(self, ticket, result):
+        if ticket is not None:
+            self.scheduler.settle(ticket, getattr(result, "usage", None))
+
+    def _record(self, provider: Provider, start: float, error: Exception | None):
+        if error is None:
+            provider.latencies.append(int((time.perf_counter() - start) * 1000))
+            provider.breaker.record_success()
+        elif is_retryable(error):
+            provider.breaker.record_failure()
+        else:
+            provider.breaker.record_response()
+
+    def _timed(self, request, provider: Provider, failed: set, demand: Demand | None = None):
+        ticket = self._admit(provider, demand, failed)
+        start = time.perf_counter()
+        try:
+            result = request(provider)
+        except Exception as e:
+            self._record(provider, start, e)
+            failed.add(provider.name)
+            print(f"Error conectando con {provider.name}: {e}")
+            raise
+        except BaseException:
+            # Interrumpida sin respuesta (Ctrl+C): la sonda se libera
+            provider.breaker.cancel()
+            raise
+        self._record(provider, start, None)
+        self._settle(ticket, result)
+        return result
+
+    async def _timed_async(self, request, provider: Provider, failed: set, demand: Demand | None = None):
+        ticket = await self._admit_async(provider, demand, failed)
+        start = time.perf_counter()
+        try:
+            result = await request(provider)
+        except Exception as e:
+            self._record(provider, start, e)
+            failed.add(provider.name)
+            print(f"Error conectando con {provider.name}: {e}")
+            raise
+        except BaseException:
+            # Cancelada sin respuesta (la perdedora de un hedge): la sonda se libera
+            provider.breaker.cancel()
+            raise
+        self._record(provider, start, None)
+        self._settle(ticket, result)
+        return result
+
+    def _hedged(self, request, primary: Provider, failed: set, demand: Demand | None = None):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="groovehub-hedge")
+        pending = {self._executor.submit(self._timed, request, primary, failed, demand)}
+        done, pending = wait(pending, timeout=self.hedge_after_ms / 1000)
+        backup = None if done else self._acquire(failed, exclude=primary)
+        if backup is not None:
+            self.hedges += 1
+            pending.add(self._executor.submit(self._timed, request, backup, failed, demand))
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    # La petición perdedora termina en segundo plano y solo aporta su latencia
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    async def _hedged_async(self, request, primary: Provider, failed: set, demand: Demand | None = None):
+        pending = {asyncio.ensure_future(self._timed_async(request, primary, failed, demand))}
+        done, pending = await asyncio.wait(pending, timeout=self.hedge_after_ms / 1000)
+        backup = None if done else self._acquire(failed, exclude=primary)
+        if backup is not None:
+            self.hedges += 1
+            pending.add(asyncio.ensure_future(self._timed_async(request, backup, failed, demand)))
+        error = None
+        try:
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,418 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from groovehub.observability.live import QUANTILES, Histogram, exponential_bounds
+from groovehub.observability.tokens import TokenCounter
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# De mayor a menor prioridad
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Peticiones en espera por proveedor y prioridad; más allá se rechaza de inmediato
+DEFAULT_MAX_QUEUE = 64
+# Espera estimada máxima antes de rechazar: un usuario en el chat no espera
+# lo mismo que un job batch
+DEFAULT_MAX_WAIT_S = {INTERACTIVE: 10.0, BATCH: 300.0}
+# Tokens de salida supuestos hasta tener el `usage` real de un proveedor
+DEFAULT_OUTPUT_TOKENS = 300
+# Peso de cada respuesta nueva en el promedio móvil de tokens de salida
+OUTPUT_EWMA = 0.2
+
+# 1 ms .. ~10 min
+WAIT_BOUNDS = exponential_bounds(1.0, 1.25, 60)
+
+
+class RateLimitedError(RuntimeError):
+    """El planificador rechazó la petición antes de enviarla: cola llena o espera excesiva."""
+
+    def __init__(self, provider: str, retry_after: float, reason: str):
+        super().__init__(f"{provider} saturado ({reason}); reintenta en {retry_after:.1f} s")
+        self.provider = provider
+        # Segundos sugeridos antes de reintentar
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Demand(NamedTuple):
+    """Lo que pide una llamada al LLM antes de saber a qué proveedor va."""
+    prompt_tokens: int
+    priority: str = INTERACTIVE
+
+
+class Ticket(NamedTuple):
+    """Turno concedido por el planificador."""
+    provider: str
+    # Tokens reservados (prompt + salida estimada); se ajustan con el `usage` real
+    tokens: int
+    wait_s: float
+
+
+class TokenBucket:
+    """
+    Cubeta de capacidad `per_minute` que se rellena a ritmo constante.
+
+    El nivel puede quedar negativo: si una respuesta usó más tokens de los
+    reservados, la deuda se paga con la recarga antes de admitir la siguiente.
+    """
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self._updated = now
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Segundos hasta poder tomar `amount` (tras `refill`)."""
+        # Una petición más grande que la cubeta entra cuando está llena
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    """Petición encolada: se despierta con un `Event` (hilos) o un future (asyncio)."""
+
+    __slots__ = ("priority", "tokens", "since", "granted", "event", "future", "loop")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.tokens = 0
+        self.since = 0.0
+        self.granted = False
+        self.event: threading.Event | None = None
+        self.future: asyncio.Future | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def grant(self):
+        self.granted = True
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ProviderLimiter:
+    """
+    Límites de un proveedor: cubetas de peticiones y de tokens por minuto,
+    colas por prioridad y contadores. No es seguro entre hilos por sí solo:
+    `RateScheduler` lo usa siempre bajo su lock.
+    """
+
+    def __init__(self, name: str, rpm: int | None, tpm: int | None, now: float):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, now) if rpm else None
+        self.tokens = TokenBucket(tpm, now) if tpm else None
+        self.output_tokens = float(DEFAULT_OUTPUT_TOKENS)
+        self.queues: dict[str, deque[_Waiter]] = {p: deque() for p in PRIORITIES}
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.rejected = {p: 0 for p in PRIORITIES}
+        self.wait_ms = {p: Histogram(WAIT_BOUNDS) for p in PRIORITIES}
+
+    def _buckets(self, requests: float, tokens: float):
+        return [(b, n) for b, n in ((self.requests, requests), (self.tokens, tokens)) if b is not None]
+
+    def delay(self, tokens: int, now: float) -> float:
+        """Segundos hasta que ambas cubetas admitan una petición de `tokens`."""
+        delay = 0.0
+        for bucket, amount in self._buckets(1, tokens):
+            bucket.refill(now)
+            delay = max(delay, bucket.delay(amount))
+        return delay
+
+    def ahead(self, priority: str) -> list[_Waiter]:
+        """Peticiones encoladas que se atenderían antes que una nueva de `priority`."""
+        rank = PRIORITIES.index(priority)
+        return [w for p in PRIORITIES[: rank + 1] for w in self.queues[p]]
+
+    def estimate_wait(self, tokens: int, priority: str, now: float) -> float:
+        """Espera si se encolara ahora (sin contar las de mayor prioridad que lleguen después)."""
+        ahead = self.ahead(priority)
+        wait = 0.0
+        for bucket, amount in self._buckets(len(ahead) + 1, sum(w.tokens for w in ahead) + tokens):
+            bucket.refill(now)
+            wait = max(wait, (amount - bucket.level) / bucket.rate)
+        return wait
+
+    def admit(self, tokens: int, priority: str, wait_s: float):
+        for bucket, amount in self._buckets(1, tokens):
+            bucket.take(amount)
+        self.admitted[priority] += 1
+        self.wait_ms[priority].observe(wait_s * 1000)
+
+    def refund(self, tokens: int):
+        """Devuelve a las cubetas un turno concedido que no llegó a usarse."""
+        for bucket, amount in self._buckets(1, tokens):
+            bucket.give(min(amount, bucket.capacity))
+
+    def dispatch(self, now: float) -> float | None:
+        """
+        Concede turnos en orden de prioridad mientras las cubetas alcancen.
+
+        Returns:
+            float | None: Segundos hasta poder atender la próxima en cola, o
+                          None si no queda ninguna.
+        """
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue:
+                waiter = queue[0]
+                delay = self.delay(waiter.tokens, now)
+                if delay > 0:
+                    # Prioridad estricta: una batch no pasa delante de una interactiva trabada
+                    return delay
+                queue.popleft()
+                self.admit(waiter.tokens, priority, now - waiter.since)
+                waiter.grant()
+        return None
+
+
+class RateScheduler:
+    """
+    Control de admisión de las llamadas salientes al LLM.
+
+    Cada proveedor tiene cubetas de peticiones (RPM) y tokens (TPM) por
+    minuto, con los tokens del prompt estimados por el mismo `TokenCounter`
+    que usa `MetricsTracker` más un promedio móvil de los de salida. Si no
+    hay lugar, la petición espera en una cola acotada por prioridad (las
+    interactivas antes que las batch); si la cola está llena o la espera
+    estimada supera el máximo de su prioridad, se rechaza de inmediato con
+    `RateLimitedError` y una sugerencia de cuándo reintentar, en lugar de
+    salir al proveedor y volver con un 429.
+
+    Sirve tanto para `LLMService` (hilos) como para `AsyncLLMService`.
+    """
+
+    def __init__(
+        self,
+        token_counter: TokenCounter | None = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_wait_s: dict | None = None,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            token_counter (TokenCounter | None): Contador para estimar el prompt;
+                                                 idealmente el de `MetricsTracker`.
+            max_queue (int): Peticiones en espera por proveedor y prioridad.
+            max_wait_s (dict | None): Espera estimada máxima por prioridad (se
+                                      combina con `DEFAULT_MAX_WAIT_S`).
+            clock (Callable[[], float]): Reloj en segundos (inyectable en tests).
+        """
+        self.counter = token_counter or TokenCounter()
+        self.max_queue = max_queue
+        self.max_wait_s = {**DEFAULT_MAX_WAIT_S, **(max_wait_s or {})}
+        self.clock = clock
+        self._limiters: dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: str, rpm: int | None, tpm: int | None):
+        """
+        Declara los límites de un proveedor. Sin ninguno, sus llamadas no se regulan.
+
+        Args:
+            provider (str): Nombre del proveedor (el de su `ProviderConfig`).
+            rpm (int | None): Peticiones por minuto.
+            tpm (int | None): Tokens (entrada + salida) por minuto.
+        """
+        with self._lock:
+            if rpm or tpm:
+                self._limiters[provider] = ProviderLimiter(provider, rpm, tpm, self.clock())
+            else:
+                self._limiters.pop(provider, None)
+
+    def demand(self, messages: list, priority: str = INTERACTIVE) -> Demand:
+        """
+        Args:
+            messages (list): Mensajes tal como se enviarán.
+            priority (str): 'interactive' o 'batch'.
+
+        Returns:
+            Demand: Tokens de prompt estimados y prioridad de la llamada.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {priority!r}")
+        return Demand(self.counter.count_messages(messages), priority)
+
+    def acquire(self, provider: str, demand: Demand) -> Ticket | None:
+        """
+        Espera (bloqueando el hilo) el turno de una llamada a `provider`.
+
+        Returns:
+            Ticket | None: El turno concedido, o None si el proveedor no tiene límites.
+
+        Raises:
+            RateLimitedError: Si la cola está llena o la espera sería excesiva.
+        """
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return None
+        waiter = _Waiter(demand.priority)
+        if self._enter(limiter, demand, waiter):
+            return Ticket(provider, waiter.tokens, 0.0)
+        waiter.event = threading.Event()
+        try:
+            while True:
+                delay = self._poll(limiter, waiter)
+                if delay is None:
+                    break
+                waiter.event.wait(delay)
+        except BaseException:
+            self._leave(limiter, waiter)
+            raise
+        return Ticket(provider, waiter.tokens, self.clock() - waiter.since)
+
+    async def acquire_async(self, provider: str, demand: Demand) -> Ticket | None:
+        """Versión asíncrona de `acquire`: espera sin bloquear el event loop."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return None
+        waiter = _Waiter(demand.priority)
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        if self._enter(limiter, demand, waiter):
+            return Ticket(provider, waiter.tokens, 0.0)
+        try:
+            while True:
+                delay = self._poll(limiter, waiter)
+                if delay is None:
+                    break
+                await asyncio.wait({waiter.future}, timeout=delay)
+        except BaseException:
+            self._leave(limiter, waiter)
+            raise
+        return Ticket(provider, waiter.tokens, self.clock() - waiter.since)
+
+    def settle(self, ticket: Ticket | None, usage: dict | None):
+        """
+        Ajusta la reserva con el `usage` real del proveedor (devuelve lo que
+        sobró o registra la deuda) y actualiza el promedio de tokens de salida.
+
+        Args:
+            ticket (Ticket | None): Turno devuelto por `acquire`.
+            usage (dict | None): Bloque `usage` de la respuesta.
+        """
+        if ticket is None or not usage:
+            return
+        limiter = self._limiters.get(ticket.provider)
+        if limiter is None:
+            return
+        with self._lock:
+            completion = usage.get("completion_tokens")
+            if completion is not None:
+                limiter.output_tokens += OUTPUT_EWMA * (completion - limiter.output_tokens)
+            total = usage.get("total_tokens")
+            if total is not None and limiter.tokens is not None:
+                limiter.tokens.give(ticket.tokens - total)
+                # Si sobró, la próxima en cola puede entrar ya
+                limiter.dispatch(self.clock())
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Por proveedor: límites, cola actual, admitidas, rechazadas y
+                  p50/p95/p99 de la espera (ms), todo por prioridad.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "rpm": limiter.rpm,
+                    "tpm": limiter.tpm,
+                    "output_tokens_est": round(limiter.output_tokens),
+                    "queued": {p: len(q) for p, q in limiter.queues.items()},
+                    "admitted": dict(limiter.admitted),
+                    "rejected": dict(limiter.rejected),
+                    "wait_ms": {
+                        p: {f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}
+                        for p, h in limiter.wait_ms.items()
+                    },
+                }
+                for name, limiter in self._limiters.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Returns:
+            str: Profundidad de las colas, admitidas, rechazadas y cuantiles de
+                 la espera, en el formato de texto de Prometheus.
+        """
+        stats = self.stats()
+        lines = ["# TYPE groovehub_scheduler_queue_depth gauge"]
+        lines += [
+            f'groovehub_scheduler_queue_depth{{provider="{name}",priority="{p}"}} {n}'
+            for name, s in stats.items()
+            for p, n in s["queued"].items()
+        ]
+        for metric in ("admitted", "rejected"):
+            lines.append(f"# TYPE groovehub_scheduler_{metric}_total counter")
+            lines += [
+                f'groovehub_scheduler_{metric}_total{{provider="{name}",priority="{p}"}} {n}'
+                for name, s in stats.items()
+                for p, n in s[metric].items()
+            ]
+        lines.append("# TYPE groovehub_scheduler_wait_ms gauge")
+        for name, s in stats.items():
+            for p, values in s["wait_ms"].items():
+                for q in QUANTILES:
+                    value = values[f"p{int(q * 100)}"]
+                    lines.append(f'groovehub_scheduler_wait_ms{{provider="{name}",priority="{p}",quantile="{q}"}} {value:.6g}')
+        return "\n".join(lines) + "\n"
+
+    def _enter(self, limiter: ProviderLimiter, demand: Demand, waiter: _Waiter) -> bool:
+        # True si la petición entra ya; si no, la encola o la rechaza
+        with self._lock:
+            now = self.clock()
+            waiter.tokens = demand.prompt_tokens + round(limiter.output_tokens)
+            waiter.since = now
+            if not limiter.ahead(demand.priority) and limiter.delay(waiter.tokens, now) == 0:
+                limiter.admit(waiter.tokens, demand.priority, 0.0)
+                return True
+            wait = limiter.estimate_wait(waiter.tokens, demand.priority, now)
+            queue = limiter.queues[demand.priority]
+            if len(queue) >= self.max_queue:
+                reason = "cola llena"
+            elif wait > self.max_wait_s[demand.priority]:
+                reason = f"espera estimada de {wait:.1f} s"
+            else:
+                queue.append(waiter)
+                return False
+            limiter.rejected[demand.priority] += 1
+        raise RateLimitedError(limiter.name, wait, reason)
+
+    def _poll(self, limiter: ProviderLimiter, waiter: _Waiter) -> float | None:
+        # None si ya tiene turno; si no, cuánto dormir antes de volver a mirar
+        with self._lock:
+            if not waiter.granted:
+                delay = limiter.dispatch(self.clock())
+                if not waiter.granted:
+                    return delay
+        return None
+
+    def _leave(self, limiter: ProviderLimiter, waiter: _Waiter):
+        # Cancelada mientras esperaba: deja su lugar en la cola o, si el turno
+        # ya se le había concedido, devuelve la reserva (nunca salió al proveedor)
+        with self._lock:
+            if not waiter.granted:
+                limiter.queues[waiter.priority].remove(waiter)
+            else:
+                limiter.refund(waiter.tokens)
+                limiter.dispatch(self.clock())
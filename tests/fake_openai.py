@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONTENT = json.dumps(
+    {
+        "answer": "Te recomiendo unas baquetas 5B de nogal.",
+        "confidence_score": 0.9,
+        "intent": "sales_advisory",
+        "recommended_actions": ["check_stock"],
+    }
+)
+
+
+class FakeOpenAIServer:
+    """
+    Servidor HTTP local compatible con `POST /v1/chat/completions`.
+
+    Permite simular latencia y fallos (las primeras `fail_times` peticiones
+    responden con `fail_status`) y lleva la cuenta de peticiones y de
+    conexiones TCP abiertas, para verificar el keep-alive del cliente.
+
+    Con `tool_calls` (pares nombre, argumentos), mientras la petición ofrezca
+    herramientas y lleve menos de `tool_rounds` rondas, responde pidiendo esas
+    llamadas en lugar de `content`. Guarda el cuerpo de cada petición en `bodies`.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        fail_times: int = 0,
+        fail_status: int = 500,
+        content: str = DEFAULT_CONTENT,
+        tool_calls: list | None = None,
+        tool_rounds: int = 1,
+    ):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.fail_status = fail_status
+        self.content = content
+        self.tool_calls = tool_calls
+        self.tool_rounds = tool_rounds
+        self.bodies = []
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                # `GET /v1/models`: lo usa la pre-conexión del cliente
+                self._send(200, "application/json", json.dumps({"object": "list", "data": []}))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bodies.append(body)
+                    failing = fake.fail_times > 0
+                    if failing:
+                        fake.fail_times -= 1
+                time.sleep(fake.delay)
+
+                if failing:
+                    self._send(fake.fail_status, "application/json", json.dumps({"error": {"message": "falla simulada"}}))
+                elif body.get("stream"):
+                    self._send(200, "text/event-stream", fake._sse(body["model"], fake._calls_for(body)))
+                else:
+                    self._send(200, "application/json", json.dumps(fake._completion(body["model"], fake._calls_for(body))))
+
+            def _send(self, status: int, content_type: str, payload: str):
+                data = payload.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def _calls_for(self, body: dict) -> list | None:
+        if not self.tool_calls or not body.get("tools") or body.get("tool_choice") == "none":
+            return None
+        rounds = sum(1 for m in body["messages"] if m.get("tool_calls"))
+        if rounds >= self.tool_rounds:
+            return None
+        return [
+            {"id": f"call_{rounds}_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+            for i, (name, args) in enumerate(self.tool_calls)
+        ]
+
+    def _completion(self, model: str, calls: list | None = None) -> dict:
+        message = {"role": "assistant", "content": None, "tool_calls": calls} if calls else {
+            "role": "assistant",
+            "content": self.content,
+        }
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if calls else "stop"}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 10, "total_tokens": 30},
+        }
+
+    def _sse(self, model: str, calls: list | None = None) -> str:
+        def event(choices, usage=None):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": choices}
+            if usage:
+                chunk["usage"] = usage
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        step = 8
+        if calls:
+            # Como la API real: id y nombre en el primer fragmento, los argumentos en pedazos
+            events = []
+            for index, call in enumerate(calls):
+                head = {"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"]}}
+                events.append(event([{"index": 0, "delta": {"tool_calls": [head]}, "finish_reason": None}]))
+                arguments = call["function"]["arguments"]
+                for i in range(0, len(arguments), step):
+                    part = {"index": index, "function": {"arguments": arguments[i : i + step]}}
+                    events.append(event([{"index": 0, "delta": {"tool_calls": [part]}, "finish_reason": None}]))
+        else:
+            events = [
+                event([{"index": 0, "delta": {"content": self.content[i : i + step]}, "finish_reason": None}])
+                for i in range(0, len(self.content), step)
+            ]
+        events.append(event([], {"prompt_tokens": 20, "completion_tokens": 10, "total_tokens": 30}))
+        return "".join(events) + "data: [DONE]\n\n"
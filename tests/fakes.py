@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+from groovehub.services.llm import AsyncLLMService, CompletionResult
+
+
+class WordEncoder:
+    """Codificador falso: un token por palabra (evita descargar el BPE de tiktoken)."""
+
+    def encode(self, text):
+        return text.split()
+
+
+class FakeAsyncLLM(AsyncLLMService):
+    """Servicio asíncrono falso: responde con eco tras una latencia fija."""
+
+    def __init__(self, cache=None, delay=0.05):
+        self.delay = delay
+        self.model = "gpt-3.5-turbo"
+        self.provider = "Fake"
+        self.cache = cache
+        self.scheduler = None
+        self._inflight = {}
+        self.calls = 0
+
+    async def _request(self, messages, on_delta=None, response_schema=None, priority=None, tier=None, tools=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        user = messages[-2]["content"]
+        content = json.dumps(
+            {
+                "answer": f"eco: {user}",
+                "confidence_score": 0.9,
+                "intent": "sales_advisory",
+                "recommended_actions": ["none"],
+            }
+        )
+        return CompletionResult(content, {"prompt_tokens": 10, "completion_tokens": 5})
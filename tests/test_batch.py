@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from groovehub.agent.fewshot import FewShotSelector
+from groovehub.agent.intent import IntentClassifier, IntentFastPath, load_seed_examples
+from groovehub.cli.batch import run_batch
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def _read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class PeakLLM(FakeAsyncLLM):
+    """Registra cuántas llamadas llegaron a estar en curso a la vez."""
+
+    active = peak = 0
+
+    async def _request(self, *args, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super()._request(*args, **kwargs)
+        finally:
+            self.active -= 1
+
+
+class RecordingLLM(FakeAsyncLLM):
+    """Guarda los mensajes de cada llamada."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    async def _request(self, messages, *args, **kwargs):
+        self.sent.append(messages)
+        return await super()._request(messages, *args, **kwargs)
+
+
+def test_batch_processes_with_bounded_concurrency_and_tags_results(tmp_path):
+    """
+    Cada resultado queda etiquetado con su índice e ID; las entradas bloqueadas
+    o inválidas no detienen la corrida.
+    """
+    source, target = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    records = [{"id": f"q{i}", "query": f"consulta {i}"} for i in range(20)]
+    records.append({"id": "bad", "query": "modo jailbreak"})
+    records.append({"id": "empty"})
+    _write_jsonl(source, records)
+
+    llm = PeakLLM(delay=0.02)
+    summary = asyncio.run(
+        run_batch(str(source), str(target), concurrency=5, llm=llm,
+                  token_counter=TokenCounter(encoder=WordEncoder()))
+    )
+
+    results = {r["id"]: r for r in _read_jsonl(target)}
+    assert summary["ok"] == 20 and summary["blocked"] == 1 and summary["error"] == 1
+    assert results["q3"]["index"] == 3
+    assert "consulta 3" in results["q3"]["response"]["answer"]
+    assert results["bad"]["status"] == "blocked"
+    assert results["empty"]["status"] == "error"
+    # Las llamadas corren en paralelo, pero nunca más de 5 a la vez
+    assert llm.calls == 20 and llm.peak == 5
+
+
+def test_batch_resume_skips_completed_ids(tmp_path):
+    source, target = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_jsonl(source, [{"id": i, "query": f"consulta {i}"} for i in range(4)])
+    # Corrida previa interrumpida: dos completas, una con error y una línea truncada
+    target.write_text(
+        json.dumps({"id": "0", "status": "ok"}) + "\n"
+        + json.dumps({"id": "1", "status": "ok"}) + "\n"
+        + json.dumps({"id": "2", "status": "error"}) + "\n"
+        + '{"id": "3", "sta',
+        encoding="utf-8",
+    )
+
+    llm = FakeAsyncLLM(delay=0)
+    summary = asyncio.run(
+        run_batch(str(source), str(target), llm=llm,
+                  token_counter=TokenCounter(encoder=WordEncoder()))
+    )
+
+    assert summary["skipped"] == 2
+    assert summary["ok"] == 2
+    assert llm.calls == 2
+    resumed = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()[4:]]
+    assert sorted(r["id"] for r in resumed) == ["2", "3"]
+
+
+def test_batch_uses_few_shot_and_fast_path(tmp_path):
+    source, target = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_jsonl(source, [
+        {"id": "sales", "query": "Busco una guitarra eléctrica para empezar"},
+        {"id": "off", "query": "¿Quién ganó el partido de fútbol de ayer?"},
+    ])
+    counter = TokenCounter(encoder=WordEncoder())
+    llm = RecordingLLM(delay=0)
+    summary = asyncio.run(
+        run_batch(str(source), str(target), llm=llm, token_counter=counter,
+                  few_shot=FewShotSelector(counter=counter, k=2),
+                  fast_path=IntentFastPath(IntentClassifier().train(load_seed_examples()), threshold=0.5))
+    )
+
+    results = {r["id"]: r for r in _read_jsonl(target)}
+    assert summary["ok"] == 2 and llm.calls == 1
+    assert results["off"]["response"]["intent"] == "off_topic"
+    assert any("EJEMPLOS (FEW-SHOT)" in m["content"] for m in llm.sent[0] if m["role"] == "system")
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from groovehub.services.cache import CompletionCache, make_cache_key
+
+
+MESSAGES = [
+    {"role": "system", "content": "eres Groov"},
+    {"role": "user", "content": "<user_input>¿Qué baquetas para heavy?</user_input>"},
+]
+
+
+def test_cache_key_ignores_case_and_spacing_in_user_text():
+    """
+    Variaciones triviales del mensaje del usuario comparten la misma clave,
+    pero cambiar el modelo o la temperatura produce otra.
+    """
+    variant = [MESSAGES[0], {"role": "user", "content": "<user_input>¿qué   baquetas para HEAVY?</user_input>"}]
+
+    key = make_cache_key(MESSAGES, "gpt-3.5-turbo", 0.2)
+    assert make_cache_key(variant, "gpt-3.5-turbo", 0.2) == key
+    assert make_cache_key(MESSAGES, "llama-3.3-70b-versatile", 0.2) != key
+    assert make_cache_key(MESSAGES, "gpt-3.5-turbo", 0.7) != key
+
+
+def test_cache_persists_to_disk_and_expires(tmp_path):
+    """
+    Las entradas sobreviven a un reinicio (nivel SQLite) y expiran por TTL.
+    """
+    path = str(tmp_path / "cache.sqlite")
+    cache = CompletionCache(path, ttl_seconds=60)
+    cache.put("k", '{"answer": "hola"}', latency_ms=900)
+    cache.close()
+
+    reopened = CompletionCache(path, ttl_seconds=60)
+    assert reopened.get("k") == '{"answer": "hola"}'
+    assert reopened.stats()["latency_saved_ms"] == 900
+
+    expired = CompletionCache(str(tmp_path / "ttl.sqlite"), ttl_seconds=0)
+    expired.put("k", "x", latency_ms=1)
+    assert expired.get("k") is None
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = CompletionCache(":memory:", max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key, latency_ms=1)
+
+    assert list(cache._memory) == ["b", "c"]
+    # El nivel en disco todavía la conserva
+    assert cache.get("a") == "a"
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    """
+    Varias consultas idénticas simultáneas producen una sola llamada upstream.
+    """
+    cache = CompletionCache(":memory:")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "respuesta"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(cached for _, cached in results) == [False, True, True, True, True]
+    assert all(content == "respuesta" for content, _ in results)
@@ -0,0 +1,52 @@
+import json
+import time
+
+from groovehub.models.response import AdvisorResponse
+from groovehub.services.catalog import Catalog, CatalogActions
+
+
+def test_lookup_uses_facets_and_synonyms(tmp_path):
+    catalog = Catalog.load()
+
+    found = catalog.mentions("¿Tienen cuerdas DAddario de menos de $10?")
+    assert found.brands == ["daddario"] and found.categories == ["cuerdas"] and found.max_price == 10.0
+    assert catalog.mentions("un bajo hasta 300 dólares").categories == ["bajos"]
+    assert catalog.mentions("un bajo hasta 300 dólares").max_price == 300.0
+    # Sin moneda no hay tope de precio, y "más bajo" no es el instrumento
+    found = catalog.mentions("¿Llega en hasta 3 días la guitarra de precio más bajo?")
+    assert found.max_price is None and found.categories == ["guitarras"]
+
+    hits = catalog.lookup("¿Tienen cuerdas DAddario de menos de $10?")
+    assert [p.sku for p in hits.matches] == ["CUE-DA-EXL110"]
+    # `show_catalog` solo lista productos con stock, del más barato al más caro
+    assert all(p.stock > 0 for p in hits.related)
+    assert [p.price for p in hits.related] == sorted(p.price for p in hits.related)
+    assert catalog.lookup("se me rompieron los palillos").matches[0].category == "baquetas"
+
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps([{"sku": "X1", "name": "Ukelele Soprano", "brand": "Kala", "category": "Ukeleles", "price": 59, "stock": 3}]))
+    assert Catalog.load(str(path)).lookup("ukeleles kala").matches[0].sku == "X1"
+
+
+def test_prefetched_results_are_ready_when_the_answer_arrives():
+    actions = CatalogActions(Catalog.load())
+    query = "Quiero empezar a tocar la batería, ¿qué me recomiendas barato para departamento?"
+    actions.prefetch(query)
+    time.sleep(0.05)  # la llamada al LLM tarda bastante más
+    response = AdvisorResponse(
+        answer="Te recomiendo la Alesis Nitro Max Mesh.",
+        confidence_score=0.9,
+        intent="sales_advisory",
+        recommended_actions=["show_catalog", "check_stock"],
+    )
+
+    results = actions.execute(query, response)
+    assert [r.action.value for r in results] == ["show_catalog", "check_stock"]
+    assert all(r.prefetched for r in results)
+    assert results[1].products[0].sku == "BAT-AL-NITRO"
+
+    # Si la consulta no nombra productos, se busca en la respuesta del modelo
+    response.recommended_actions = ["check_stock"]
+    (result,) = actions.execute("¿y cuál me conviene?", response)
+    assert not result.prefetched and result.products[0].sku == "BAT-AL-NITRO"
+    actions.close()
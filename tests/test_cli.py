@@ -0,0 +1,22 @@
+import pytest
+
+from groovehub.cli.args import parse_args
+
+
+def test_shared_options_work_before_and_after_the_subcommand():
+    """Las opciones comunes valen en cualquier posición y los subcomandos no pisan lo escrito antes."""
+    after = parse_args(["batch", "in.jsonl", "out.jsonl", "--tools", "--route", "auto"])
+    before = parse_args(["--tools", "--route", "auto", "batch", "in.jsonl", "out.jsonl"])
+    for args in (after, before):
+        assert args.command == "batch" and args.tools and args.route == "auto"
+        assert args.faq is False and args.leak_action == "redact" and args.rate_limit
+
+    served = parse_args(["serve", "--faq", "--leak-action", "block", "--no-rate-limit", "--max-queue-wait", "3"])
+    assert served.faq and served.leak_action == "block" and not served.rate_limit and served.max_queue_wait == 3.0
+    assert parse_args(["--hedge-ms", "300", "serve"]).hedge_ms == 300
+
+    chat = parse_args([])
+    assert chat.command is None and chat.route == "strong" and chat.catalog is None and chat.max_queue_wait is None
+    # Lo que no es común sigue siendo solo del chat
+    with pytest.raises(SystemExit):
+        parse_args(["stats", "--tools"])
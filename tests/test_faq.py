@@ -0,0 +1,122 @@
+import asyncio
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.faq import FaqIndex, mine_faq
+from groovehub.agent.pipeline import build_turn_metrics
+from groovehub.models.response import UserIntent
+from groovehub.observability.metrics import MetricsTracker, query_preview
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+SHIPPING = {
+    "answer": "Enviamos a todo el país en 3 a 5 días hábiles.",
+    "confidence_score": 0.95,
+    "intent": "shipping_info",
+    "recommended_actions": ["none"],
+}
+
+
+def entry(query, response=SHIPPING, **metrics):
+    return {
+        # El mismo recorte que hace `MetricsTracker.save_log`
+        "query_preview": query_preview(query),
+        "metrics": {"cost_usd": 0.001, "latency_ms": 800, **metrics},
+        "response_data": response,
+    }
+
+
+def shipping_log():
+    return [
+        entry("¿Hacen envíos a todo el país?"),
+        entry("¿hacen envios a todo el pais?"),
+        entry("Hacen envíos a todo el país??"),
+        entry("¿Hacen envíos a todo el país?", {**SHIPPING, "confidence_score": 0.7}),
+    ]
+
+
+def test_mines_near_duplicates_and_skips_unsafe_turns(tmp_path):
+    """Las variantes de una misma pregunta se agrupan; seguimientos y consultas cortadas no cuentan."""
+    unsure = {**SHIPPING, "intent": "sales_advisory", "confidence_score": 0.6}
+    entries = shipping_log() + [
+        # Un seguimiento depende de la conversación
+        entry("¿Hacen envíos a todo el país?", turn_index=2),
+        # La consulta del log está cortada a 50 caracteres
+        entry("Hacen envíos a todo el país? Porque vivo en Ushuaia y necesito una batería"),
+        # Una respuesta tapada por el guardrail de salida no se guarda
+        entry("¿Hacen envíos a todo el país?", output_leak="redacted"),
+        entry("Busco una guitarra eléctrica", unsure),
+        entry("Busco una guitarra electrica", unsure),
+        entry("busco una guitarra eléctrica!", unsure),
+    ]
+    index, report = mine_faq(entries)
+
+    assert (report["turns"], report["eligible_turns"]) == (10, 7)
+    # Las guitarras no llegan a la confianza mínima: solo queda la de envíos
+    assert len(index) == 1 and index.answers[0]["support"] == 4
+    assert index.answers[0]["response"]["confidence_score"] == 0.95
+    assert report["coverage"] == round(4 / 7, 3) and report["llm_calls_saved"] == 3
+    # Una caché exacta solo cubría las repeticiones literales (tras normalizar)
+    assert report["exact_repeat_rate"] < report["coverage"]
+    assert report["cost_saved_usd"] == 0.003 and report["ms_saved"] == 2400
+
+    path = tmp_path / "faq.json"
+    index.save(str(path))
+    loaded = FaqIndex.load(str(path))
+    match = loaded.lookup("hacen envios a todo el pais")
+    assert match.response.intent is UserIntent.SHIPPING_INFO and match.similarity >= 0.7
+    assert loaded.lookup("¿Tienen baterías electrónicas?") is None
+    assert FaqIndex.load(str(path), threshold=1.01).lookup("hacen envios a todo el pais") is None
+
+
+def test_agent_answers_first_turn_from_faq(tmp_path):
+    """El primer turno casi igual a una pregunta frecuente sale del banco; los siguientes van al LLM."""
+    index, _ = mine_faq(shipping_log())
+    llm = FakeAsyncLLM(delay=0)
+    counter = TokenCounter(encoder=WordEncoder())
+    tracker = MetricsTracker(log_dir=str(tmp_path), token_counter=counter)
+    agent = MusicAgent(llm=llm, token_counter=counter, faq=index)
+
+    response = asyncio.run(agent.ask_async("Hacen envíos a todo el país?"))
+    metrics = build_turn_metrics(tracker, agent, 1)
+    assert response.answer == SHIPPING["answer"] and llm.calls == 0
+    assert metrics["faq_hit"] and metrics["turn_index"] == 1
+    assert (metrics["cost_usd"], metrics["token_source"]) == (0.0, "local")
+
+    # La misma pregunta como seguimiento ya no se responde desde el banco
+    asyncio.run(agent.ask_async("¿Hacen envíos a todo el país?"))
+    metrics = build_turn_metrics(tracker, agent, 1)
+    assert llm.calls == 1 and not metrics["faq_hit"] and metrics["turn_index"] == 2
+    assert index.report()["checks"] == 1 and index.report()["hits"] == 1
+    tracker.close()
+
+
+def test_model_numbers_and_volatile_answers_stay_out_of_the_bank():
+    """Un número de modelo distinto o una negación es otra pregunta; stock y precios no se precalculan."""
+    p45 = {**SHIPPING, "answer": "El Yamaha P-45 llega en 3 días.", "intent": "sales_advisory"}
+    stock = {**p45, "recommended_actions": ["check_stock"]}
+    price = {**p45, "answer": "El Yamaha P-45 cuesta $450."}
+    short = {**SHIPPING, "answer": "Sí, hacemos envíos."}
+    entries = [entry("¿Llega rápido el Yamaha P-45?", p45) for _ in range(3)]
+    entries += [entry("¿Tienen stock de la Yamaha P-45?", stock) for _ in range(3)]
+    entries += [entry("¿Cuánto sale la Yamaha P-45?", price) for _ in range(3)]
+    entries += [entry("¿Envíos?", short) for _ in range(3)]
+    jazz = {**SHIPPING, "answer": "Sí, con la pastilla del mástil suena cálida.", "intent": "sales_advisory"}
+    not_jazz = {**jazz, "answer": "Sirve, pero una hollow body es más típica."}
+    entries += [entry("¿La Fender Stratocaster sirve para jazz?", jazz) for _ in range(3)]
+    entries += [entry("¿La Fender Stratocaster no sirve para jazz?", not_jazz) for _ in range(3)]
+    # Una consulta de 49 caracteres no está cortada
+    entries += [entry("¿Hacen envíos a Tierra del Fuego y a las Malvinas?") for _ in range(3)]
+    index, report = mine_faq(entries)
+
+    assert report["eligible_turns"] == 15 and len(index) == 5
+    assert index.lookup("¿la fender stratocaster sirve para jazz?").response.answer == jazz["answer"]
+    assert index.lookup("la fender stratocaster no sirve para jazz").response.answer == not_jazz["answer"]
+    assert index.lookup("¿La Fender Stratocaster nunca sirve para jazz?") is None
+    assert index.lookup("¿llega rapido el yamaha p-45?").response.answer == p45["answer"]
+    assert index.lookup("Hola, ¿llega rápido el Yamaha P-45?") is not None
+    # Carácter a carácter se parecen, pero es otro producto
+    assert index.lookup("¿Llega rápido el Yamaha P-125?") is None
+    assert index.lookup("¿Tienen stock de la Yamaha P-45?") is None
+    # Las preguntas cortas repetidas tal cual también se responden
+    assert index.lookup("¿Envíos?").similarity == 1.0
@@ -0,0 +1,38 @@
+import asyncio
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.fewshot import FewShotSelector, hash_vector, load_examples
+from groovehub.agent.prompts.main_prompt import BASE_SYSTEM_PROMPT, FEW_SHOT_EXAMPLES, SYSTEM_PROMPT
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def test_selects_similar_examples_within_the_token_budget():
+    counter = TokenCounter(encoder=WordEncoder())
+    selector = FewShotSelector(counter=counter, k=3)
+
+    assert abs(sum(v * v for v in hash_vector("baquetas para jazz").values()) - 1) < 1e-9
+    chosen = selector.select("¿Tienen cuerdas Ernie Ball 10-46 en stock?")
+    assert chosen[0].user.startswith("¿Tienen stock de cuerdas Ernie Ball")
+    assert len(chosen) == 3
+
+    tight = FewShotSelector(counter=counter, k=3, max_tokens=60)
+    assert sum(tight._cost(e) for e in tight.select("¿Cuánto tarda un envío a Córdoba?")) <= 60
+    assert FewShotSelector(load_examples(), counter=counter, max_tokens=1).message("hola") is None
+
+
+def test_agent_sends_base_prompt_plus_selected_examples():
+    assert FEW_SHOT_EXAMPLES not in BASE_SYSTEM_PROMPT and FEW_SHOT_EXAMPLES in SYSTEM_PROMPT
+    counter = TokenCounter(encoder=WordEncoder())
+    llm = FakeAsyncLLM(delay=0)
+    agent = MusicAgent(llm=llm, token_counter=counter, few_shot=FewShotSelector(counter=counter, k=2))
+
+    asyncio.run(agent.ask_async("¿Hacen envíos al interior?"))
+
+    system, examples = agent.last_prompt[0], agent.last_prompt[1]
+    assert system["content"] == BASE_SYSTEM_PROMPT
+    assert examples["role"] == "system" and "¿Hacen envíos al interior del país?" in examples["content"]
+    # Los ejemplos no quedan en la memoria: cada turno elige los suyos
+    assert all(m["content"] != examples["content"] for m in agent.history)
+    assert agent.last_prompt[-2]["content"] == "<user_input>¿Hacen envíos al interior?</user_input>"
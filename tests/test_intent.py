@@ -0,0 +1,54 @@
+import asyncio
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.intent import IntentClassifier, IntentFastPath, load_seed_examples
+from groovehub.agent.pipeline import build_turn_metrics
+from groovehub.models.response import UserIntent
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def _trained():
+    classifier = IntentClassifier()
+    classifier.train(load_seed_examples())
+    return classifier
+
+
+def test_classifier_separates_obvious_intents(tmp_path):
+    """El modelo entrenado con las semillas reconoce consultas obvias y sobrevive a un save/load."""
+    classifier = _trained()
+    path = tmp_path / "intent.json"
+    classifier.save(str(path))
+    loaded = IntentClassifier.load(str(path))
+
+    for model in (classifier, loaded):
+        assert model.predict("¿Cuál es la capital de Francia?").intent is UserIntent.OFF_TOPIC
+        assert model.predict("¿Cuánto tarda el envío a Córdoba?").intent is UserIntent.SHIPPING_INFO
+    assert loaded.predict("receta de pizza").confidence == classifier.predict("receta de pizza").confidence
+
+
+def test_fast_path_skips_llm_for_off_topic(tmp_path):
+    """Una consulta fuera de dominio se responde localmente, sin costo ni llamada al proveedor."""
+    llm = FakeAsyncLLM(delay=0)
+    counter = TokenCounter(encoder=WordEncoder())
+    tracker = MetricsTracker(log_dir=str(tmp_path), token_counter=counter)
+    fast_path = IntentFastPath(_trained(), threshold=0.5)
+    agent = MusicAgent(llm=llm, token_counter=counter, fast_path=fast_path)
+
+    response = asyncio.run(agent.ask_async("¿Quién ganó el partido de fútbol de ayer?"))
+    metrics = build_turn_metrics(tracker, agent, 1)
+
+    assert response.intent is UserIntent.OFF_TOPIC
+    assert llm.calls == 0
+    assert metrics["cost_usd"] == 0.0 and metrics["token_source"] == "local"
+    assert fast_path.report()["llm_calls_saved"] == 1
+    assert [m["role"] for m in agent.history[-2:]] == ["user", "assistant"]
+
+    asyncio.run(agent.ask_async("Busco una guitarra eléctrica para empezar"))
+    assert llm.calls == 1
+    # A mitad de la conversación la consulta suelta no alcanza: va al LLM con el historial
+    asyncio.run(agent.ask_async("¿Quién ganó el partido de fútbol de ayer?"))
+    assert llm.calls == 2 and fast_path.checks == 1
+    tracker.close()
@@ -0,0 +1,49 @@
+import random
+import urllib.request
+
+from groovehub.observability.live import LATENCY_BOUNDS, Histogram, LiveMetrics, MetricsServer
+from groovehub.observability.metrics import percentile
+
+
+def test_histogram_quantiles_are_close_to_exact():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(6, 0.8) for _ in range(20000)]
+    histogram = Histogram(LATENCY_BOUNDS)
+    for v in values:
+        histogram.observe(v)
+
+    assert len(histogram.counts) == len(LATENCY_BOUNDS) + 1
+    for q in (50, 95, 99):
+        exact = percentile(values, q)
+        assert abs(histogram.quantile(q / 100) - exact) / exact < 0.125
+
+
+def test_rolling_windows_forget_old_turns():
+    now = [0.0]
+    live = LiveMetrics(clock=lambda: now[0])
+    live.observe_turn({"latency_ms": 5000, "total_tokens": 100, "cost_usd": 0.001}, "sales_advisory")
+    now[0] = 120.0
+    live.observe_turn({"latency_ms": 200, "total_tokens": 50, "cost_usd": 0.0}, "off_topic")
+    live.observe_block("keyword")
+
+    latency = live.snapshot()["series"]["latency_ms"]
+    assert latency["1m"]["count"] == 1 and latency["1m"]["p99"] == 200
+    assert latency["15m"]["count"] == 2 and latency["total"]["p99"] == 5000
+    assert live.snapshot()["intents"] == {"sales_advisory": 1, "off_topic": 1}
+
+
+def test_prometheus_endpoint():
+    live = LiveMetrics()
+    live.observe_turn({"latency_ms": 900, "total_tokens": 300, "cost_usd": 0.0004}, "repair_support")
+    live.observe_block("length")
+    server = MetricsServer(live, port=0).start()
+    try:
+        body = urllib.request.urlopen(server.url, timeout=5).read().decode("utf-8")
+    finally:
+        server.close()
+
+    assert "groovehub_turns_total 1" in body
+    assert 'groovehub_intents_total{intent="repair_support"} 1' in body
+    assert 'groovehub_guardrail_blocks_total{kind="length"} 1' in body
+    assert 'groovehub_turn_latency_ms_bucket{le="+Inf"} 1' in body
+    assert 'groovehub_turn_latency_ms_window{window="1m",quantile="0.95"} 900' in body
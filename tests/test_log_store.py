@@ -0,0 +1,57 @@
+import json
+import os
+
+from groovehub.observability.log_store import (
+    InteractionLog,
+    encode_entry,
+    iter_log_entries,
+    segment_paths,
+)
+
+
+def test_encode_entry_embeds_response_without_reparsing():
+    """
+    La respuesta ya serializada se incrusta tal cual dentro de la línea JSONL.
+    """
+    line = encode_entry({"query_preview": "hola"}, '{"answer":"¡Hola!"}')
+
+    assert line.endswith("\n")
+    assert json.loads(line) == {
+        "query_preview": "hola",
+        "response_data": {"answer": "¡Hola!"},
+    }
+
+
+def test_interaction_log_appends_and_rotates(tmp_path):
+    """
+    Las entradas se escriben en orden y el segmento rota al superar el tamaño máximo.
+    """
+    log = InteractionLog(
+        str(tmp_path), max_segment_bytes=60, batch_size=2, flush_interval=0.01
+    )
+    for i in range(10):
+        assert log.append({"i": i}, '{"answer": "ok"}')
+    log.close()
+
+    assert len(segment_paths(str(tmp_path))) > 1
+    entries = list(iter_log_entries(str(tmp_path)))
+    assert [e["i"] for e in entries] == list(range(10))
+    assert log.written == 10
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    """
+    El array JSON legado se convierte a JSONL una sola vez y conserva el orden.
+    """
+    legacy = [{"query_preview": "a"}, {"query_preview": "b"}]
+    (tmp_path / "metrics.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    log = InteractionLog(str(tmp_path), flush_interval=0.01)
+    log.append({"query_preview": "c"})
+    log.close()
+    InteractionLog(str(tmp_path)).close()
+
+    # El original queda intacto (puede estar versionado) y ya no se vuelve a leer
+    assert json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8")) == legacy
+    previews = [e["query_preview"] for e in iter_log_entries(str(tmp_path))]
+    assert previews == ["a", "b", "c"]
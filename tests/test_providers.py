@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from groovehub.services.llm import AsyncLLMService, LLMService
+from groovehub.services.providers import CircuitBreaker, NoProviderAvailableError, ProviderConfig
+
+from fake_openai import DEFAULT_CONTENT, FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "¿Qué baquetas me recomiendas?"}]
+
+
+def _config(name, server, model="gpt-4o-mini"):
+    return ProviderConfig(name, model, "sk-test", server.base_url)
+
+
+def test_reuses_keep_alive_connection():
+    with FakeOpenAIServer() as server:
+        llm = LLMService(providers=[_config("A", server)])
+        for _ in range(5):
+            assert llm.get_completion(MESSAGES).content == DEFAULT_CONTENT
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+def test_retries_transient_errors_and_fails_over():
+    """Un proveedor caído abre su circuito y el tráfico pasa al otro."""
+    with FakeOpenAIServer(fail_times=100, fail_status=503) as down, FakeOpenAIServer() as up:
+        llm = LLMService(providers=[_config("down", down), _config("up", up, "llama-3.1-8b-instant")])
+        llm.pool.backoff_base = 0.001
+        for breaker in (p.breaker for p in llm.pool.providers):
+            breaker.failure_threshold = 2
+
+        results = [llm.get_completion(MESSAGES) for _ in range(4)]
+
+    assert all(r.model == "llama-3.1-8b-instant" for r in results)
+    stats = llm.pool.stats()
+    assert stats["providers"]["down"]["state"] == CircuitBreaker.OPEN
+    # Tras abrirse el circuito el proveedor caído ya no recibe peticiones
+    assert down.requests == 2
+
+
+def test_client_errors_are_not_retried():
+    with FakeOpenAIServer(fail_times=1, fail_status=400) as server:
+        llm = LLMService(providers=[_config("A", server)])
+        with pytest.raises(openai.BadRequestError):
+            llm.get_completion(MESSAGES)
+    assert server.requests == 1
+    assert llm.pool.providers[0].breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuits_raise_and_half_open_probe_recovers():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()  # una sola sonda en semiabierto
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with FakeOpenAIServer(fail_times=10) as server:
+        llm = LLMService(providers=[_config("A", server)], max_attempts=1)
+        llm.pool.providers[0].breaker.failure_threshold = 1
+        with pytest.raises(openai.InternalServerError):
+            llm.get_completion(MESSAGES)
+        with pytest.raises(NoProviderAvailableError):
+            llm.get_completion(MESSAGES)
+
+
+def test_routes_to_lowest_p95_and_streams():
+    with FakeOpenAIServer(delay=0.08) as slow, FakeOpenAIServer() as fast:
+        llm = LLMService(providers=[_config("slow", slow), _config("fast", fast)])
+        for _ in range(4):
+            llm.get_completion(MESSAGES)
+        deltas = []
+        result = llm.get_completion(MESSAGES, on_delta=deltas.append)
+
+    # Cada uno recibe una muestra al principio; después el rápido se lleva todo
+    assert slow.requests == 1
+    assert "".join(deltas) == result.content == DEFAULT_CONTENT
+    assert result.usage["completion_tokens"] == 10
+
+
+def test_hedged_request_takes_the_first_answer():
+    with FakeOpenAIServer(delay=0.5) as slow, FakeOpenAIServer() as fast:
+        llm = AsyncLLMService(providers=[_config("slow", slow), _config("fast", fast, "gpt-4o")], hedge_after_ms=50)
+
+        result = asyncio.run(llm.get_completion(MESSAGES))
+
+    # Ganó la réplica: el lento recibió la petición original y el rápido la copia
+    assert result.model == "gpt-4o"
+    assert (slow.requests, fast.requests) == (1, 1)
+    assert llm.pool.hedges == 1
+
+
+def test_clients_are_built_on_first_use():
+    with FakeOpenAIServer() as server:
+        llm = LLMService(providers=[_config("A", server)])
+        assert llm.pool.providers[0]._client is None
+        llm.warm_up(connect=True)
+        assert llm.pool.providers[0]._client is not None
+        llm.get_completion(MESSAGES)
+    # La pre-conexión dejó abierta la conexión que usa el primer turno
+    assert server.connections == 1
+
+
+def test_half_open_probe_is_released_on_every_outcome():
+    """Una sonda con error de la petición o cancelada no deja al proveedor bloqueado."""
+    with FakeOpenAIServer(fail_times=1, fail_status=400) as server:
+        llm = LLMService(providers=[_config("A", server)])
+        breaker = llm.pool.providers[0].breaker
+        breaker.failure_threshold, breaker.reset_timeout = 1, 0.01
+        breaker.record_failure()
+        time.sleep(0.02)
+        with pytest.raises(openai.BadRequestError):
+            llm.get_completion(MESSAGES)
+        # El 400 prueba que el proveedor responde: el circuito se cierra
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert llm.get_completion(MESSAGES).content == DEFAULT_CONTENT
+
+    with FakeOpenAIServer(delay=0.5) as slow, FakeOpenAIServer() as fast:
+        llm = AsyncLLMService(providers=[_config("slow", slow), _config("fast", fast, "gpt-4o")], hedge_after_ms=50)
+        breaker = llm.pool.providers[0].breaker
+        breaker.failure_threshold, breaker.reset_timeout = 1, 0.01
+        breaker.record_failure()
+        time.sleep(0.02)
+        # La sonda al proveedor lento pierde el hedge y se cancela
+        result = asyncio.run(llm.get_completion(MESSAGES))
+        assert result.model == "gpt-4o" and llm.pool.hedges == 1
+        assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.allow()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import run_turn_async
+from groovehub.agent.repair import ADVISOR_SCHEMA, INTENT_SYNONYMS, coerce_enum, extract_json, repair_fields
+from groovehub.models.response import UserIntent
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.cache import CompletionCache
+from groovehub.services.llm import CompletionResult
+from groovehub.services.scheduler import RateLimitedError
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+class ReaskLLM(FakeAsyncLLM):
+    """Responde primero con una intención inventada y luego con la corrección."""
+
+    def __init__(self, cache=None):
+        super().__init__(cache=cache, delay=0)
+        self.schemas = []
+
+    async def _request(self, messages, on_delta=None, response_schema=None, priority=None, tier=None, tools=None):
+        self.calls += 1
+        self.schemas.append(response_schema)
+        if self.calls == 1:
+            content = '```json\n{"answer": "Tenemos cajas.", "confidence_score": "85%", "intent": "comprar_batería", "recommended_actions": "stock",}\n```'
+        else:
+            content = json.dumps({"intent": "sales_advisory"})
+        return CompletionResult(content, {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+
+
+def test_extracts_and_repairs_locally():
+    data = extract_json('Claro:\n```json\n{"answer": "Hola {amigo}", "intent": "Sales Advisory", "confidence_score": "85%",}\n```')
+    assert data["answer"] == "Hola {amigo}"
+    assert coerce_enum("envío", UserIntent, INTENT_SYNONYMS) is UserIntent.SHIPPING_INFO
+
+    result = repair_fields({**data, "recommended_actions": ["Check Stock", "descuento"]})
+    assert result.failing == []
+    assert result.data["intent"] == "sales_advisory"
+    assert result.data["confidence_score"] == 0.85
+    assert result.data["recommended_actions"] == ["check_stock", "offer_discount"]
+
+
+def test_strict_schema_requires_every_field_and_hides_error_intent():
+    assert set(ADVISOR_SCHEMA["required"]) == set(ADVISOR_SCHEMA["properties"])
+    assert ADVISOR_SCHEMA["additionalProperties"] is False
+    assert "error" not in ADVISOR_SCHEMA["properties"]["intent"]["enum"]
+
+
+def test_reasks_only_failing_fields_and_keeps_the_repaired_turn(tmp_path):
+    cache = CompletionCache(path=str(tmp_path / "cache.sqlite"))
+    llm = ReaskLLM(cache=cache)
+    counter = TokenCounter(encoder=WordEncoder())
+    tracker = MetricsTracker(log_dir=str(tmp_path), token_counter=counter)
+    agent = MusicAgent(llm=llm, token_counter=counter)
+
+    outcome = asyncio.run(run_turn_async(agent, tracker, "¿Tienen cajas?", save_log=False))
+    tracker.close()
+
+    assert llm.calls == 2
+    assert list(llm.schemas[1]["properties"]) == ["intent"]
+    assert outcome.response.intent is UserIntent.SALES_ADVISORY
+    assert outcome.response.recommended_actions[0].value == "check_stock"
+    assert outcome.metrics["output_status"] == "reasked"
+    assert outcome.metrics["input_tokens"] == 20
+    # La memoria y la caché guardan la versión corregida
+    assert json.loads(agent.history[-1]["content"])["intent"] == "sales_advisory"
+    assert tracker.live.snapshot()["outputs"] == {"reasked": {"count": 1, "rate": 1.0}}
+    assert json.loads(cache.get(llm.cache_key(agent.last_prompt)))["confidence_score"] == 0.85
+
+
+class RejectedReaskLLM(ReaskLLM):
+    """El planificador rechaza la re-pregunta del primer intento."""
+
+    rejected = False
+
+    async def _request(self, messages, on_delta=None, response_schema=None, priority=None, tier=None, tools=None):
+        if self.calls == 1 and not self.rejected:
+            self.rejected = True
+            raise RateLimitedError("fake", 2.0, "queue_full")
+        return await super()._request(messages, on_delta, response_schema, priority, tier, tools)
+
+
+def test_rejected_reask_drops_the_pending_user_message():
+    llm = RejectedReaskLLM()
+    agent = MusicAgent(llm=llm, token_counter=TokenCounter(encoder=WordEncoder()))
+
+    with pytest.raises(RateLimitedError):
+        asyncio.run(agent.ask_async("¿Tienen cajas?"))
+    assert [m["role"] for m in agent.history] == ["system"]
+
+    # El reintento no duplica la consulta
+    llm.calls = 0
+    asyncio.run(agent.ask_async("¿Tienen cajas?"))
+    assert [m["role"] for m in agent.history] == ["system", "user", "assistant"]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import run_turn_async
+from groovehub.agent.router import ModelRouter
+from groovehub.cli.route_eval import run_route_eval
+from groovehub.models import AdvisorResponse
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.cache import CompletionCache
+from groovehub.services.llm import CompletionResult, LLMService
+from groovehub.services.providers import FAST, STRONG, ProviderConfig
+
+from fake_openai import FakeOpenAIServer
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def assistant(intent, confidence):
+    content = json.dumps({"answer": "ok", "confidence_score": confidence, "intent": intent, "recommended_actions": []})
+    return {"role": "assistant", "content": content}
+
+
+class TieredLLM(FakeAsyncLLM):
+    """Modelo rápido inseguro con las consultas de trastes; el fuerte, siempre seguro."""
+
+    def __init__(self):
+        super().__init__(delay=0)
+        self.fast_model = "gpt-4o-mini"
+        self.tiers = []
+
+    async def _request(self, messages, on_delta=None, response_schema=None, priority=None, tier=None, tools=None):
+        self.tiers.append(tier)
+        hard = "traste" in messages[-2]["content"]
+        content = json.dumps(
+            {
+                "answer": f"respuesta {tier}",
+                "confidence_score": 0.3 if hard and tier == FAST else 0.9,
+                "intent": "technical_support" if hard else "shipping_info",
+                "recommended_actions": ["none"],
+            }
+        )
+        if on_delta is not None:
+            on_delta(content)
+        usage = {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+        return CompletionResult(content, usage, model=self.model_for(tier), provider="Fake")
+
+
+def test_scores_turns_from_length_intents_and_confidence():
+    router = ModelRouter()
+    system = {"role": "system", "content": "prompt"}
+    assert router.route("¿Hacen envíos a Rosario?", [system]).tier == FAST
+    long_query = router.route("palabra " * 45, [system])
+    assert long_query.tier == STRONG and long_query.reasons == ("long_query",)
+    # Una respuesta previa dudosa manda el turno siguiente al modelo fuerte
+    unsure = router.route("¿Y eso?", [system, assistant("sales_advisory", 0.4)])
+    assert unsure.tier == STRONG and unsure.reasons == ("low_confidence",)
+    # Soporte técnico reciente más una consulta mediana también
+    history = [system, assistant("technical_support", 0.9), assistant("shipping_info", 0.9)]
+    assert router.route("palabra " * 20, history).reasons == ("intent:technical_support",)
+    assert router.route("palabra " * 20, [system]).tier == FAST
+    assert ModelRouter("fast").route("palabra " * 45, [system]).tier == FAST
+    sure = AdvisorResponse(answer="ok", confidence_score=0.7, intent="sales_advisory", recommended_actions=[])
+    assert router.should_escalate(None) and not router.should_escalate(sure)
+    assert router.should_escalate(sure.model_copy(update={"confidence_score": 0.5}))
+
+    with FakeOpenAIServer() as server:
+        llm = LLMService(
+            cache=CompletionCache(path=":memory:"),
+            providers=[ProviderConfig("OpenAI", "gpt-3.5-turbo", "sk-test", server.base_url, fast_model="gpt-4o-mini")],
+        )
+        messages = [system, {"role": "user", "content": "hola"}]
+        assert llm.get_completion(messages, tier=FAST).model == "gpt-4o-mini"
+        # La respuesta barata no se sirve desde la caché cuando se pide la del modelo fuerte
+        assert llm.get_completion(messages).model == "gpt-3.5-turbo"
+        assert server.requests == 2
+
+
+def test_escalates_low_confidence_and_replays_policies():
+    async def scenario():
+        llm = TieredLLM()
+        counter = TokenCounter(encoder=WordEncoder())
+        tracker = MetricsTracker(token_counter=counter)
+        agent = MusicAgent(llm=llm, token_counter=counter, router=ModelRouter())
+        answers = []
+        outcomes = [
+            await run_turn_async(agent, tracker, "¿Cuánto tarda el envío?", save_log=False),
+            await run_turn_async(
+                agent, tracker, "Se me traba el traste de la guitarra", save_log=False, on_answer=answers.append
+            ),
+            await run_turn_async(agent, tracker, "¿y el traste nuevo? " + "palabra " * 20, save_log=False),
+        ]
+        tiers = list(llm.tiers)
+        conversations = [("s1", [("¿Cuánto tarda el envío?", "shipping_info"), ("¿Llega el lunes?", "shipping_info")])]
+        report = await run_route_eval(conversations, TieredLLM(), token_counter=counter)
+        return outcomes, answers, tiers, agent.history, report
+
+    outcomes, answers, tiers, history, report = asyncio.run(scenario())
+    fast, escalated, direct = (outcome.metrics for outcome in outcomes)
+    assert tiers == [FAST, FAST, STRONG, STRONG]
+    assert (fast["route"], fast["escalated"], fast["model"]) == (FAST, False, "gpt-4o-mini")
+    assert (escalated["route"], escalated["escalated"], escalated["model"]) == (FAST, True, "gpt-3.5-turbo")
+    # La respuesta descartada suma sus tokens y se cotiza al precio del modelo rápido
+    assert escalated["total_tokens"] == 2 * fast["total_tokens"]
+    assert escalated["cost_usd"] > direct["cost_usd"] > fast["cost_usd"]
+    # El usuario solo vio la respuesta del modelo fuerte
+    assert "".join(answers) == "respuesta strong"
+    assert json.loads(history[4]["content"])["confidence_score"] == 0.9
+    assert (direct["route"], direct["escalated"]) == (STRONG, False)
+
+    policies = report["policies"]
+    assert policies["strong"]["fast_share"] == 0.0 and policies["fast"]["fast_share"] == 1.0
+    assert policies["auto"]["intent_agreement"] == 1.0
+    assert policies["auto"]["cost_vs_strong"] < 0.2
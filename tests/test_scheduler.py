@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from groovehub.agent.core import MusicAgent
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.llm import LLMService
+from groovehub.services.providers import CircuitBreaker, ProviderConfig
+from groovehub.services.scheduler import BATCH, INTERACTIVE, Demand, RateLimitedError, RateScheduler, Ticket
+
+from fake_openai import FakeOpenAIServer
+from fakes import WordEncoder
+
+
+def test_interactive_jumps_the_queue_and_full_queues_reject_early():
+    async def scenario():
+        scheduler = RateScheduler(TokenCounter(encoder=WordEncoder()), max_queue=2)
+        # 20 peticiones por segundo, con la cuota del minuto ya gastada
+        scheduler.register("P", rpm=1200, tpm=None)
+        scheduler._limiters["P"].requests.level = 0
+        order = []
+
+        async def call(name, priority):
+            ticket = await scheduler.acquire_async("P", Demand(10, priority))
+            order.append((name, ticket.wait_s))
+
+        batch = [asyncio.create_task(call(f"batch-{i}", BATCH)) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitedError) as rejected:
+            await scheduler.acquire_async("P", Demand(10, BATCH))
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.sleep(0)
+        queued = scheduler.stats()["P"]["queued"]
+        await asyncio.gather(*batch, interactive)
+        return order, queued, rejected.value, scheduler.stats()["P"]
+
+    order, queued, rejected, stats = asyncio.run(scenario())
+    assert queued == {INTERACTIVE: 1, BATCH: 2}
+    # La interactiva llegó última pero sale primera
+    assert [name for name, _ in order] == ["interactive", "batch-0", "batch-1"]
+    assert all(wait > 0 for _, wait in order)
+    assert rejected.reason == "cola llena" and rejected.retry_after > 0
+    assert stats["admitted"] == {INTERACTIVE: 1, BATCH: 2}
+    assert stats["rejected"] == {INTERACTIVE: 0, BATCH: 1}
+    assert stats["wait_ms"][BATCH]["p95"] > stats["wait_ms"][INTERACTIVE]["p50"]
+
+
+def test_cancelled_waiter_refunds_a_granted_reservation():
+    async def scenario():
+        scheduler = RateScheduler(TokenCounter(encoder=WordEncoder()))
+        scheduler.register("P", rpm=60, tpm=600)
+        limiter = scheduler._limiters["P"]
+        limiter.tokens.level = 0
+        waiting = asyncio.create_task(scheduler.acquire_async("P", Demand(10, BATCH)))
+        await asyncio.sleep(0)
+        requests_before = limiter.requests.level
+        # Una respuesta anterior devuelve tokens: se le concede el turno...
+        scheduler.settle(Ticket("P", 600, 0.0), {"total_tokens": 0})
+        granted = limiter.tokens.level
+        # ...pero se cancela (p. ej. ganó la réplica) antes de usarlo
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return requests_before, granted, limiter
+
+    requests_before, granted, limiter = asyncio.run(scenario())
+    assert granted < 600
+    assert limiter.tokens.level == 600 and limiter.requests.level >= requests_before
+    assert not any(limiter.queues.values())
+
+
+def test_token_budget_fails_over_and_settles_with_real_usage():
+    counter = TokenCounter(encoder=WordEncoder())
+    with FakeOpenAIServer() as limited, FakeOpenAIServer() as spare:
+        scheduler = RateScheduler(counter)
+        # El primero solo admite una petición por minuto
+        llm = LLMService(
+            providers=[
+                ProviderConfig("limited", "gpt-4o-mini", "sk-test", limited.base_url, rpm=1),
+                ProviderConfig("spare", "gpt-4o-mini", "sk-test", spare.base_url),
+            ],
+            scheduler=scheduler,
+        )
+        agent = MusicAgent(llm=llm, token_counter=counter)
+        agent.ask("¿Qué baquetas me recomiendas?")
+        # El rechazo local pasa al otro proveedor sin backoff ni penalizar el circuito
+        agent.ask("¿Y para jazz?")
+        assert (limited.requests, spare.requests) == (1, 1)
+        assert llm.pool.retries == 0
+        assert llm.pool.providers[0].breaker.state == CircuitBreaker.CLOSED
+        # El promedio de salida se ajustó con el `usage` real (10 tokens)
+        assert scheduler.stats()["limited"]["output_tokens_est"] < 300
+
+        solo = LLMService(
+            providers=[ProviderConfig("limited", "gpt-4o-mini", "sk-test", limited.base_url, tpm=600)],
+            scheduler=RateScheduler(counter, max_wait_s={INTERACTIVE: 1.0}),
+        )
+        solo.scheduler._limiters["limited"].tokens.level = 0
+        lonely = MusicAgent(llm=solo, token_counter=counter)
+        history = list(lonely.history)
+        with pytest.raises(RateLimitedError) as rejected:
+            lonely.ask("¿Tienen parches Remo?")
+    assert limited.requests == 1
+    # Sin cuota, se rechaza antes de salir y la consulta no queda en la memoria
+    assert rejected.value.retry_after > 1.0
+    assert lonely.history == history
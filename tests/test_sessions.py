@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.sessions import SessionStore
+from groovehub.models import AdvisorResponse
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def _response(i):
+    return AdvisorResponse(
+        answer=f"respuesta {i}",
+        confidence_score=0.8,
+        intent="sales_advisory",
+        recommended_actions=["check_stock", "show_catalog"],
+    )
+
+
+def test_resumes_recent_window_and_interns_prompts(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    counter = TokenCounter(encoder=WordEncoder())
+    store = SessionStore(path)
+    agents = [MusicAgent(llm=FakeAsyncLLM(delay=0), token_counter=counter) for _ in range(3)]
+    for i, agent in enumerate(agents):
+        agent.attach_session(store, f"s{i}")
+
+    async def chat():
+        for turn in range(3):
+            await agents[0].ask_async(f"pregunta {turn}")
+
+    asyncio.run(chat())
+    store.close()
+
+    store = SessionStore(path)
+    # Tres sesiones, una sola copia del System Prompt y del recordatorio
+    assert store._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 2
+    assert store.latest() == "s0"
+
+    resumed = MusicAgent(llm=FakeAsyncLLM(delay=0), token_counter=counter)
+    stored = resumed.attach_session(store, "s0")
+    assert stored.total_turns == 3
+    assert [m["role"] for m in resumed.history] == ["system"] + ["user", "assistant"] * 3
+    for restored, original in zip(resumed.history[1:], agents[0].history[1:]):
+        if original["role"] == "user":
+            assert restored == original
+        else:
+            assert AdvisorResponse.model_validate_json(restored["content"]) == AdvisorResponse.model_validate_json(
+                original["content"]
+            )
+
+    resumed.clear_memory()
+    assert store.load("s0").turns == []
+    store.close()
+
+
+def test_loads_a_long_session_in_milliseconds(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite"))
+    store.open("long", "system", "reminder")
+    for i in range(1000):
+        store.append_turn("long", f"consulta {i}", _response(i), f"resumen hasta {i - 8}", max(i - 8, 0), 50 * i)
+
+    agent = MusicAgent(llm=FakeAsyncLLM(), token_counter=TokenCounter(encoder=WordEncoder()))
+    start = time.perf_counter()
+    stored = agent.attach_session(store, "long")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    store.close()
+
+    assert elapsed_ms < 50
+    assert stored.total_turns == 1000
+    assert stored.summary == "resumen hasta 991"
+    # Solo los turnos posteriores al resumen, reconstruidos con el mismo JSON que Pydantic
+    assert len(agent.history) == 1 + 2 * 9
+    assert agent.history[-1]["content"] == _response(999).model_dump_json()
+    assert agent.context.folded_turns == 991
+
+
+def test_clear_and_unsummarized_turns_survive_resume(tmp_path):
+    """Tras un clear se retoma solo lo posterior; los turnos sin resumir se pliegan al cargar."""
+    counter = TokenCounter(encoder=WordEncoder())
+    store = SessionStore(str(tmp_path / "sessions.sqlite"))
+    agent = MusicAgent(llm=FakeAsyncLLM(delay=0), token_counter=counter)
+    agent.attach_session(store, "c")
+
+    async def chat(queries):
+        for query in queries:
+            await agent.ask_async(query)
+
+    asyncio.run(chat(["uno", "dos", "tres"]))
+    agent.clear_memory()
+    asyncio.run(chat(["despues del clear"]))
+
+    resumed = MusicAgent(llm=FakeAsyncLLM(delay=0), token_counter=counter)
+    stored = resumed.attach_session(store, "c")
+    assert [user for user, _ in stored.turns] == ["despues del clear"]
+    assert (stored.folded_turns, stored.total_turns) == (3, 4)
+
+    # 30 turnos sin que el plegado haya llegado a guardar un resumen
+    store.open("lag", "system", "reminder")
+    for i in range(30):
+        store.append_turn("lag", f"consulta {i}", _response(i), "", 0, 0)
+    stored = store.load("lag", max_turns=20)
+    assert len(stored.turns) == 20 and stored.turns[0][0] == "consulta 10"
+    assert [user for user, _ in stored.unsummarized] == [f"consulta {i}" for i in range(10)]
+
+    resumed = MusicAgent(llm=FakeAsyncLLM(delay=0), token_counter=counter)
+    resumed.attach_session(store, "lag", max_turns=20)
+    assert "consulta 9" in resumed.context.summary and resumed.context.folded_turns == 10
+    assert resumed.context.folded_tokens > 0
+    store.close()
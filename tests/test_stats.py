@@ -0,0 +1,81 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from groovehub.observability import analytics
+from groovehub.observability.analytics import compact, compute_stats, parse_bound
+from groovehub.observability.log_store import encode_entry
+
+
+def _entry(day: int, hour: int, intent: str, latency: int, provider: str | None = "OpenAI", confidence=0.9):
+    entry = {
+        "timestamp": datetime(2026, 3, day, hour).isoformat(),
+        "query_preview": "hola",
+        "metrics": {"latency_ms": latency, "cost_usd": 0.001, "input_tokens": 10, "output_tokens": 5, "provider": provider},
+    }
+    response = {"intent": intent, "confidence_score": confidence, "recommended_actions": ["check_stock", "none"][: day % 2 + 1]}
+    return encode_entry(entry, json.dumps(response))
+
+
+def _write(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def test_streaming_and_columnar_reports_match_with_filters(tmp_path):
+    lines = [_entry(day, hour, "sales_advisory" if hour % 3 else "off_topic", 100 * hour) for day in (1, 2, 3) for hour in range(1, 13)]
+    lines.insert(5, "{corrupta\n")
+    _write(tmp_path / "interactions-00000.jsonl", lines[:20])
+    _write(tmp_path / "interactions-00001.jsonl", lines[20:])
+
+    streamed = compute_stats(str(tmp_path))
+    assert streamed["turns"] == 36 and streamed["sources"]["jsonl_rows"] == 36
+    assert streamed["intents"] == {"sales_advisory": 24, "off_topic": 12}
+    assert streamed["latency_ms"]["p50"] == 600 and streamed["latency_ms"]["max"] == 1200
+    assert streamed["by_day"]["2026-03-02"] == {"turns": 12, "cost_usd": {"OpenAI": 0.012}}
+    assert streamed["confidence"]["0.9-1.0"] == 36
+
+    summary = compact(str(tmp_path), rows_per_part=16)
+    assert summary == {"new_rows": 36, "parts_written": 3, "total_rows": 36}
+    filters = {"since": parse_bound("2026-03-02"), "until": parse_bound("2026-03-02", end=True), "intents": ["off_topic"]}
+    columnar = compute_stats(str(tmp_path), **filters)
+    assert columnar["sources"]["jsonl_rows"] == 0 and columnar["sources"]["parts_skipped"] >= 1
+    drop = lambda report: {k: v for k, v in report.items() if k != "sources"}  # noqa: E731
+    assert drop(columnar) == drop(compute_stats(str(tmp_path), columnar=False, **filters))
+    assert columnar["turns"] == 4 and columnar["actions"] == {"check_stock": 4}
+
+
+def test_compaction_is_incremental_and_picks_up_the_jsonl_tail(tmp_path, monkeypatch):
+    segment = tmp_path / "interactions-00000.jsonl"
+    _write(segment, [_entry(1, hour, "sales_advisory", 100, provider="Groq") for hour in range(10)])
+    assert compact(str(tmp_path))["new_rows"] == 10
+
+    # Turnos nuevos (uno servido por la caché) y una línea a medio escribir
+    _write(segment, [_entry(4, 1, "off_topic", 50, provider=None)])
+    _write(segment, ['{"timestamp": "2026-03-04T02:00:00", "metr'])
+    report = compute_stats(str(tmp_path))
+    assert report["turns"] == 11 and report["sources"] == {
+        "columnar_rows": 10, "jsonl_rows": 1, "parts_read": 1, "parts_skipped": 0
+    }
+    assert report["by_day"]["2026-03-01"]["cost_usd"] == {"Groq": 0.01}
+    assert report["by_day"]["2026-03-04"]["cost_usd"] == {"desconocido": 0.001}
+
+    _write(segment, [' "x": 1}\n'])  # la línea se completa (sin timestamp válido: se ignora)
+
+    # Un corte entre el segmento reescrito y el manifiesto no cuenta filas dos veces
+    def crash(log_dir, manifest):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(analytics, "_save_manifest", crash)
+    with pytest.raises(OSError):
+        compact(str(tmp_path))
+    monkeypatch.undo()
+    assert compute_stats(str(tmp_path))["turns"] == 11
+
+    summary = compact(str(tmp_path))
+    assert summary == {"new_rows": 1, "parts_written": 1, "total_rows": 11}
+    assert sorted(os.listdir(tmp_path / "columnar")) == [".lock", "manifest.json", "part-00001.gcol"]
+    assert compact(str(tmp_path))["new_rows"] == 0
+    assert compute_stats(str(tmp_path))["sources"]["jsonl_rows"] == 0
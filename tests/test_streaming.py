@@ -0,0 +1,42 @@
+import json
+
+from groovehub.agent.streaming import AnswerStreamParser
+
+
+DOCUMENT = json.dumps(
+    {
+        "reasoning": 'Cita "answer" dentro de otro campo',
+        "answer": 'Línea 1\nUsá "5B" 🥁 \\ fin',
+        "confidence_score": 0.9,
+        "intent": "sales_advisory",
+        "recommended_actions": ["answer", "check_stock"],
+    }
+)
+
+
+def test_answer_is_extracted_at_any_chunk_boundary():
+    """
+    El campo `answer` se decodifica correctamente sin importar dónde se corten
+    los fragmentos (escapes y pares sustitutos partidos incluidos).
+    """
+    expected = json.loads(DOCUMENT)["answer"]
+    for size in range(1, 12):
+        parser = AnswerStreamParser("answer")
+        pieces = [parser.feed(DOCUMENT[i : i + size]) for i in range(0, len(DOCUMENT), size)]
+
+        assert "".join(pieces) == expected
+        assert parser.value == expected
+        assert parser.done
+
+
+def test_answer_streams_before_document_completes():
+    """
+    El texto de `answer` se emite apenas llega, antes de cerrar el objeto JSON.
+    """
+    parser = AnswerStreamParser("answer")
+
+    assert parser.feed('{"reasoning": "x", "answer": "Hola') == "Hola"
+    assert parser.feed(" mundo") == " mundo"
+    assert not parser.done
+    assert parser.feed('", "intent": "off_topic"}') == ""
+    assert parser.done
@@ -0,0 +1,68 @@
+from groovehub.observability.metrics import MODEL_PRICING, MetricsTracker
+from groovehub.observability.tokens import TOKENS_PER_REPLY, ApproxEncoder, TokenCounter
+
+
+class WordEncoder:
+    """Codificador falso (un token por palabra) que cuenta sus invocaciones."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return text.split()
+
+
+def test_token_counter_caches_each_message():
+    """
+    Los mensajes ya vistos no se vuelven a codificar en turnos siguientes.
+    """
+    encoder = WordEncoder()
+    counter = TokenCounter(encoder=encoder)
+    system = {"role": "system", "content": "eres Groov"}
+    turn_1 = [system, {"role": "user", "content": "hola"}]
+
+    first = counter.count_messages(turn_1)
+    calls_after_first = encoder.calls
+    second = counter.count_messages(turn_1 + [{"role": "assistant", "content": "que tal"}])
+
+    assert first == TOKENS_PER_REPLY + (3 + 1 + 2) + (3 + 1 + 1)
+    assert second == first + 3 + 1 + 2
+    # Solo se codificó el mensaje nuevo (rol + contenido)
+    assert encoder.calls - calls_after_first == 2
+
+
+def test_turn_usage_prefers_provider_and_prices_by_model(monkeypatch):
+    """
+    El bloque `usage` del proveedor tiene prioridad y el costo depende del modelo.
+    """
+    monkeypatch.setattr("tiktoken.get_encoding", lambda name: WordEncoder())
+    tracker = MetricsTracker()
+    messages = [{"role": "user", "content": "hola groov"}]
+
+    provider = tracker.turn_usage(messages, "x", {"prompt_tokens": 120, "completion_tokens": 30})
+    estimated = tracker.turn_usage(messages, "respuesta del modelo", None)
+
+    assert provider == {"input_tokens": 120, "output_tokens": 30, "token_source": "provider"}
+    assert estimated["token_source"] == "estimated"
+    assert estimated["input_tokens"] == TOKENS_PER_REPLY + 3 + 1 + 2
+    assert estimated["output_tokens"] == 3
+
+    cost_in, cost_out = MODEL_PRICING["llama-3.3-70b-versatile"]
+    expected = round(1.2 * cost_in + 0.03 * cost_out, 6)
+    assert tracker.calculate_cost(1200, 30, "llama-3.3-70b-versatile") == expected
+    assert tracker.calculate_cost(1000, 0, "modelo-desconocido") == MODEL_PRICING["gpt-3.5-turbo"][0]
+
+
+def test_encoder_loads_lazily_and_falls_back_offline(monkeypatch):
+    """Sin red ni caché de BPE el contador no falla: usa el tokenizador aproximado."""
+
+    def offline(name):
+        raise ConnectionError("sin red")
+
+    monkeypatch.setattr("tiktoken.get_encoding", offline)
+    counter = TokenCounter()
+    assert counter._encoder is None
+
+    assert counter.count("Hola, quiero unas baquetas") == 7
+    assert isinstance(counter.encoder, ApproxEncoder)
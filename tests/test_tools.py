@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import build_turn_metrics, run_turn_async
+from groovehub.agent.tools import EscalateToHumanTool, ToolCall, ToolHandler, ToolRunner, default_tools
+from groovehub.models.response import AdvisorAction
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tokens import TokenCounter
+from groovehub.services.catalog import Catalog
+from groovehub.services.llm import AsyncLLMService, LLMService
+from groovehub.services.providers import ProviderConfig
+
+from fake_openai import DEFAULT_CONTENT, FakeOpenAIServer
+from fakes import WordEncoder
+
+STOCK_AND_SHIPPING = [
+    ("check_stock", {"product": "Alesis Nitro Mesh"}),
+    ("quote_shipping", {"destination": "Córdoba", "product": "Alesis Nitro Mesh"}),
+]
+
+
+class SleepTool(ToolHandler):
+    name = "sleep"
+
+    def run(self, arguments):
+        time.sleep(arguments["seconds"])
+        return {"slept": arguments["seconds"]}
+
+
+class HangTool(SleepTool):
+    name = "hang"
+    timeout_s = 0.05
+
+
+class PingTool(ToolHandler):
+    name = "ping"
+
+    async def run(self, arguments):
+        await asyncio.sleep(0.01)
+        return {"pong": arguments["n"]}
+
+
+def test_runner_runs_calls_in_parallel_with_timeouts():
+    """Las llamadas de una ronda corren a la vez; las lentas, desconocidas o mal formadas vuelven como error."""
+    runner = ToolRunner([SleepTool(), HangTool(), PingTool()])
+    calls = [
+        ToolCall("a", "sleep", '{"seconds": 0.2}'),
+        ToolCall("b", "sleep", '{"seconds": 0.2}'),
+        ToolCall("c", "hang", '{"seconds": 0.5}'),
+        ToolCall("d", "missing", "{}"),
+        ToolCall("e", "sleep", "{no es json"),
+        ToolCall("f", "ping", '{"n": 7}'),
+    ]
+    for run in (runner.run, lambda calls: asyncio.run(runner.run_async(calls))):
+        start = time.perf_counter()
+        results = run(calls)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.35
+        assert [r.status for r in results] == ["ok", "ok", "timeout", "error", "error", "ok"]
+        assert [r.call.id for r in results] == list("abcdef")
+        assert results[0].latency_ms >= 200 and results[2].latency_ms < 200
+        assert "desconocida" in results[3].content["error"]
+        assert results[5].content == {"pong": 7}
+    runner.close()
+
+    tools = default_tools(Catalog.load())
+    names = {spec["function"]["name"] for spec in tools.request_params()["tools"]}
+    assert {a.value for a in AdvisorAction if a is not AdvisorAction.NONE} < names
+    assert tools.request_params(last_round=True)["tool_choice"] == "none"
+    stock, shipping = tools.run([ToolCall(str(i), name, json.dumps(args)) for i, (name, args) in enumerate(STOCK_AND_SHIPPING)])
+    assert stock.content["products"][0]["sku"] == "BAT-AL-NITRO" and stock.content["products"][0]["stock"] == 11
+    # Un producto de más de 300 USD viaja gratis
+    assert shipping.content == {"destination": "Córdoba", "cost_usd": 0.0, "business_days": 3}
+    tools.close()
+
+    # La espera depende de los tickets pendientes, no de todos los que se abrieron
+    now = [0.0]
+    escalate = EscalateToHumanTool(clock=lambda: now[0])
+    assert [escalate.run({"reason": "enojo"})["eta_minutes"] for _ in range(3)] == [5, 10, 15]
+    now[0] += 3600
+    for _ in range(500):
+        assert escalate.run({"reason": "reclamo"})["eta_minutes"] == 5
+        now[0] += 600
+    assert len(escalate.tickets) == EscalateToHumanTool.MAX_RECENT_TICKETS
+    assert escalate.tickets[-1]["ticket"] == "H-0503"
+
+
+def test_agent_feeds_tool_results_back_and_caps_rounds(tmp_path):
+    """Las llamadas de una ronda vuelven juntas en una sola petición y las rondas tienen tope."""
+    counter = TokenCounter(encoder=WordEncoder())
+    tracker = MetricsTracker(log_dir=str(tmp_path), token_counter=counter)
+    query = "¿Está en stock la Alesis Nitro Mesh y cuánto sale el envío a Córdoba?"
+
+    with FakeOpenAIServer(tool_calls=STOCK_AND_SHIPPING) as server:
+        llm = LLMService(providers=[ProviderConfig("OpenAI", "gpt-3.5-turbo", "sk-test", server.base_url)])
+        agent = MusicAgent(llm=llm, token_counter=counter, tools=default_tools(Catalog.load()))
+        answers = []
+        # En streaming: las llamadas llegan en fragmentos y se rearman
+        response = agent.ask(query, on_answer=answers.append)
+        follow_up = server.bodies[1]
+
+    assert server.requests == 2 and response.answer == "".join(answers)
+    assert response.answer == json.loads(DEFAULT_CONTENT)["answer"]
+    assistant, *results = follow_up["messages"][-3:]
+    assert [call["id"] for call in assistant["tool_calls"]] == ["call_0_0", "call_0_1"]
+    assert [m["tool_call_id"] for m in results] == ["call_0_0", "call_0_1"]
+    assert "BAT-AL-NITRO" in results[0]["content"]
+    # El intercambio con las herramientas no queda en la memoria
+    assert [m["role"] for m in agent.history] == ["system", "user", "assistant"]
+
+    metrics = build_turn_metrics(tracker, agent, 1)
+    assert metrics["tool_rounds"] == 1 and metrics["input_tokens"] == 40
+    assert [(c["name"], c["status"]) for c in metrics["tool_calls"]] == [("check_stock", "ok"), ("quote_shipping", "ok")]
+    tracker.live.observe_turn(metrics, response.intent.value)
+    assert tracker.live.snapshot()["tools"]["check_stock"]["calls"] == {"ok": 1}
+    assert 'groovehub_tool_calls_total{tool="quote_shipping",status="ok"} 1' in tracker.live.render_prometheus()
+
+    async def scenario(base_url):
+        llm = AsyncLLMService(providers=[ProviderConfig("OpenAI", "gpt-3.5-turbo", "sk-test", base_url)])
+        agent = MusicAgent(llm=llm, token_counter=counter, tools=default_tools(Catalog.load(), max_rounds=2))
+        try:
+            return await run_turn_async(agent, tracker, query, save_log=False)
+        finally:
+            await llm.aclose()
+
+    # Un modelo que no deja de pedir herramientas: tras la segunda ronda se le exige responder
+    with FakeOpenAIServer(tool_calls=STOCK_AND_SHIPPING, tool_rounds=10) as server:
+        outcome = asyncio.run(scenario(server.base_url))
+        choices = [body["tool_choice"] for body in server.bodies]
+
+    assert choices == ["auto", "auto", "none"]
+    assert outcome.metrics["tool_rounds"] == 2 and len(outcome.metrics["tool_calls"]) == 4
+    assert outcome.metrics["output_status"] == "valid"
+    assert tracker.live.snapshot()["tools"]["check_stock"]["calls"] == {"ok": 3}
+    tracker.close()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from groovehub.agent.core import MusicAgent
+from groovehub.agent.pipeline import run_turn_async
+from groovehub.observability import tracing
+from groovehub.observability.metrics import MetricsTracker
+from groovehub.observability.tokens import TokenCounter
+
+from fakes import FakeAsyncLLM, WordEncoder
+
+
+def test_disabled_tracing_records_nothing():
+    assert tracing.span("x") is tracing.span("y")  # el mismo context manager nulo
+
+    @tracing.traced()
+    def work():
+        return 42
+
+    assert work() == 42
+    tracer = tracing.enable_tracing()
+    tracing.disable_tracing()
+    assert work() == 42 and tracer.spans == []
+
+
+def test_turn_spans_nest_per_task_and_export_chrome(tmp_path):
+    counter = TokenCounter(encoder=WordEncoder())
+    tracker = MetricsTracker(log_dir=str(tmp_path), token_counter=counter)
+    llm = FakeAsyncLLM(delay=0.01)
+    agents = [MusicAgent(llm=llm, token_counter=counter) for _ in range(2)]
+
+    tracer = tracing.enable_tracing(memory=True)
+    try:
+        async def run():
+            await asyncio.gather(*(run_turn_async(a, tracker, f"pregunta {i}") for i, a in enumerate(agents)))
+
+        asyncio.run(run())
+        spans = tracer.drain()
+    finally:
+        tracing.disable_tracing()
+        tracker.close()
+
+    by_id = {s.id: s for s in spans}
+    turns = [s for s in spans if s.name == "turn"]
+    assert len(turns) == 2 and all(s.parent is None for s in turns)
+    # Cada `agent.ask` cuelga de su propio turno, aunque corran intercalados
+    asks = [s for s in spans if s.name == "agent.ask"]
+    assert sorted(s.parent for s in asks) == sorted(s.id for s in turns)
+    for s in spans:
+        if s.name in ("agent.prepare_prompt", "agent.parse_output", "llm.completion"):
+            assert by_id[s.parent].name == "agent.ask"
+    assert all(s.mem_delta_kib is not None for s in spans)
+
+    tree = tracing.span_tree(spans)
+    assert [depth for depth, s in tree if s.name == "turn"] == [0, 0]
+
+    path = tmp_path / "trace.json"
+    tracing.export_chrome(spans, str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert len(events) == len(spans)
+    assert {"name", "ph", "ts", "dur", "pid", "tid"} <= set(events[0])